@@ -0,0 +1,123 @@
+"""Store VectorMemory embeddings as packed float32 bytes instead of JSON lists
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Rows are converted in id order, BATCH_SIZE at a time, so memory stays flat
+on large tables. Databases created by init_db after this change already have
+the binary columns and are left as they are.
+"""
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+
+def _columns(bind):
+    inspector = sa.inspect(bind)
+    if "vector_memory" not in inspector.get_table_names():
+        return None
+    return {column["name"] for column in inspector.get_columns("vector_memory")}
+
+
+def _batches(bind, table, *columns):
+    """Rows of (id, *columns) in id order, BATCH_SIZE at a time (keyset pagination)"""
+    last_id = ""
+    while True:
+        rows = bind.execute(
+            sa.select(table.c.id, *(table.c[name] for name in columns))
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    bind = op.get_bind()
+    columns = _columns(bind)
+    if columns is None or "embedding_dtype" in columns:
+        return
+
+    with op.batch_alter_table("vector_memory") as batch:
+        batch.add_column(sa.Column("embedding_packed", sa.LargeBinary(), nullable=True))
+        batch.add_column(sa.Column("embedding_dtype", sa.String(8), nullable=True))
+        batch.add_column(sa.Column("embedding_dim", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("embedding_scale", sa.Float(), nullable=True))
+
+    table = sa.table(
+        "vector_memory",
+        sa.column("id", sa.String),
+        sa.column("embedding", sa.JSON),
+        sa.column("embedding_packed", sa.LargeBinary),
+        sa.column("embedding_dtype", sa.String),
+        sa.column("embedding_dim", sa.Integer),
+    )
+    update = (
+        table.update()
+        .where(table.c.id == sa.bindparam("row_id"))
+        .values(embedding_packed=sa.bindparam("packed"), embedding_dtype="float32", embedding_dim=sa.bindparam("dim"))
+    )
+    for rows in _batches(bind, table, "embedding"):
+        params = []
+        for row_id, embedding in rows:
+            vector = np.asarray(embedding or [], dtype="<f4")
+            params.append({"row_id": row_id, "packed": vector.tobytes(), "dim": vector.size})
+        bind.execute(update, params)
+
+    with op.batch_alter_table("vector_memory") as batch:
+        batch.drop_column("embedding")
+        batch.alter_column("embedding_packed", new_column_name="embedding", existing_type=sa.LargeBinary(), nullable=False)
+        batch.alter_column("embedding_dtype", existing_type=sa.String(8), nullable=False)
+        batch.alter_column("embedding_dim", existing_type=sa.Integer(), nullable=False)
+
+
+def downgrade():
+    bind = op.get_bind()
+    columns = _columns(bind)
+    if columns is None or "embedding_dtype" not in columns:
+        return
+
+    with op.batch_alter_table("vector_memory") as batch:
+        batch.add_column(sa.Column("embedding_json", sa.JSON(), nullable=True))
+
+    table = sa.table(
+        "vector_memory",
+        sa.column("id", sa.String),
+        sa.column("embedding", sa.LargeBinary),
+        sa.column("embedding_dtype", sa.String),
+        sa.column("embedding_scale", sa.Float),
+        sa.column("embedding_json", sa.JSON),
+    )
+    dtypes = {"float32": "<f4", "float16": "<f2", "int8": "i1"}
+    update = (
+        table.update()
+        .where(table.c.id == sa.bindparam("row_id"))
+        .values(embedding_json=sa.bindparam("restored"))
+    )
+    for rows in _batches(bind, table, "embedding", "embedding_dtype", "embedding_scale"):
+        params = []
+        for row_id, packed, dtype, scale in rows:
+            vector = np.frombuffer(packed, dtype=dtypes[dtype]).astype(np.float64)
+            if dtype == "int8":
+                vector *= scale or 1.0
+            params.append({"row_id": row_id, "restored": vector.tolist()})
+        bind.execute(update, params)
+
+    with op.batch_alter_table("vector_memory") as batch:
+        batch.drop_column("embedding")
+        batch.drop_column("embedding_dtype")
+        batch.drop_column("embedding_dim")
+        batch.drop_column("embedding_scale")
+        batch.alter_column("embedding_json", new_column_name="embedding", existing_type=sa.JSON(), nullable=False)
@@ -0,0 +1,40 @@
+"""Record the project name on code_analysis rows
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+The analysis API used to keep results in memory; they now live in
+code_analysis, which had nowhere to keep the project they were run for.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def _columns(bind):
+    inspector = sa.inspect(bind)
+    if "code_analysis" not in inspector.get_table_names():
+        return None
+    return {column["name"] for column in inspector.get_columns("code_analysis")}
+
+
+def upgrade():
+    columns = _columns(op.get_bind())
+    if columns is None or "project_name" in columns:
+        return
+    with op.batch_alter_table("code_analysis") as batch:
+        batch.add_column(sa.Column("project_name", sa.String(255), nullable=True))
+
+
+def downgrade():
+    columns = _columns(op.get_bind())
+    if columns is None or "project_name" not in columns:
+        return
+    with op.batch_alter_table("code_analysis") as batch:
+        batch.drop_column("project_name")
@@ -0,0 +1,168 @@
+"""Move generated code, build logs and analysed sources into the blob store
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+builds.generated_code, builds.build_logs and code_analysis.code_to_analyze
+become sha256 digest columns referencing the new blobs table; the content
+is written to the content-addressed store under settings.blob_store_dir
+(see app.db.blob_store), once per distinct value. Rows are converted in id
+order, BATCH_SIZE at a time.
+
+Downgrade copies the content back into Text columns; the files are left in
+the store.
+"""
+
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.blob_store import BlobStore
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+# (table, text column, digest column)
+MOVED = (
+    ("builds", "generated_code", "generated_code_digest"),
+    ("builds", "build_logs", "build_logs_digest"),
+    ("code_analysis", "code_to_analyze", "code_digest"),
+)
+
+
+def _columns(bind, table):
+    inspector = sa.inspect(bind)
+    if table not in inspector.get_table_names():
+        return None
+    return {column["name"] for column in inspector.get_columns(table)}
+
+
+def _batches(bind, table, column):
+    """Rows of (id, column) in id order, BATCH_SIZE at a time (keyset pagination)"""
+    last_id = ""
+    while True:
+        rows = bind.execute(
+            sa.select(table.c.id, table.c[column])
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def _blobs_table():
+    return sa.table(
+        "blobs",
+        sa.column("digest", sa.String),
+        sa.column("size", sa.BigInteger),
+        sa.column("stored_size", sa.BigInteger),
+        sa.column("refcount", sa.Integer),
+        sa.column("created_at", sa.DateTime),
+        sa.column("updated_at", sa.DateTime),
+    )
+
+
+def _reference(bind, references):
+    """Add counted references ({digest: [size, stored_size, count]}) to blobs rows"""
+    blobs = _blobs_table()
+    now = datetime.utcnow()
+    for digest, (size, stored_size, count) in references.items():
+        updated = bind.execute(
+            blobs.update().where(blobs.c.digest == digest).values(refcount=blobs.c.refcount + count, updated_at=now)
+        )
+        if not updated.rowcount:
+            bind.execute(blobs.insert().values(
+                digest=digest, size=size, stored_size=stored_size, refcount=count, created_at=now, updated_at=now,
+            ))
+
+
+def upgrade():
+    bind = op.get_bind()
+    tables = sa.inspect(bind).get_table_names()
+    if "builds" not in tables and "code_analysis" not in tables:
+        return
+    if "blobs" not in tables:
+        op.create_table(
+            "blobs",
+            sa.Column("digest", sa.String(64), primary_key=True),
+            sa.Column("size", sa.BigInteger(), nullable=False),
+            sa.Column("stored_size", sa.BigInteger(), nullable=False),
+            sa.Column("refcount", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("idx_blob_unreferenced", "blobs", ["refcount", "updated_at"])
+
+    store = BlobStore()
+    for table_name, text_column, digest_column in MOVED:
+        columns = _columns(bind, table_name)
+        if columns is None or text_column not in columns:
+            continue
+
+        with op.batch_alter_table(table_name) as batch:
+            batch.add_column(sa.Column(digest_column, sa.String(64), nullable=True))
+
+        table = sa.table(table_name, sa.column("id", sa.String), sa.column(text_column, sa.Text), sa.column(digest_column, sa.String))
+        update = (
+            table.update()
+            .where(table.c.id == sa.bindparam("row_id"))
+            .values({digest_column: sa.bindparam("digest")})
+        )
+        for rows in _batches(bind, table, text_column):
+            references = {}
+            params = []
+            for row_id, text in rows:
+                if not text:
+                    continue
+                digest, size, stored_size, _ = store.put(text)
+                references.setdefault(digest, [size, stored_size, 0])[2] += 1
+                params.append({"row_id": row_id, "digest": digest})
+            if params:
+                _reference(bind, references)
+                bind.execute(update, params)
+
+        # Every digest has its blobs row by now, so the foreign key holds
+        with op.batch_alter_table(table_name) as batch:
+            batch.drop_column(text_column)
+            batch.create_foreign_key(f"fk_{table_name}_{digest_column}", "blobs", [digest_column], ["digest"])
+
+
+def downgrade():
+    bind = op.get_bind()
+    store = BlobStore()
+    for table_name, text_column, digest_column in MOVED:
+        columns = _columns(bind, table_name)
+        if columns is None or digest_column not in columns:
+            continue
+
+        with op.batch_alter_table(table_name) as batch:
+            batch.add_column(sa.Column(text_column, sa.Text(), nullable=True))
+
+        table = sa.table(table_name, sa.column("id", sa.String), sa.column(text_column, sa.Text), sa.column(digest_column, sa.String))
+        update = (
+            table.update()
+            .where(table.c.id == sa.bindparam("row_id"))
+            .values({text_column: sa.bindparam("text")})
+        )
+        for rows in _batches(bind, table, digest_column):
+            params = [
+                {"row_id": row_id, "text": store.get(digest).decode("utf-8") if digest else None}
+                for row_id, digest in rows
+            ]
+            bind.execute(update, params)
+
+        with op.batch_alter_table(table_name) as batch:
+            batch.drop_column(digest_column)
+
+    if "blobs" in sa.inspect(bind).get_table_names():
+        op.drop_index("idx_blob_unreferenced", table_name="blobs")
+        op.drop_table("blobs")
@@ -0,0 +1,45 @@
+"""Index expires_at on memory and workflow_sessions
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+Retention deletes expired rows from both tables in batches ordered by
+expires_at; without an index every batch scans the table.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("memory", "idx_memory_expires"),
+    ("workflow_sessions", "idx_workflow_expires"),
+)
+
+
+def _indexes(bind, table):
+    inspector = sa.inspect(bind)
+    if table not in inspector.get_table_names():
+        return None
+    return {index["name"] for index in inspector.get_indexes(table)}
+
+
+def upgrade():
+    bind = op.get_bind()
+    for table, name in INDEXES:
+        indexes = _indexes(bind, table)
+        if indexes is not None and name not in indexes:
+            op.create_index(name, table, ["expires_at"])
+
+
+def downgrade():
+    bind = op.get_bind()
+    for table, name in INDEXES:
+        indexes = _indexes(bind, table)
+        if indexes is not None and name in indexes:
+            op.drop_index(name, table_name=table)
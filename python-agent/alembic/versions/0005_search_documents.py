@@ -0,0 +1,54 @@
+"""Add search_documents and its full-text index
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+Chat messages, builds and build logs are indexed for full-text search.
+The index is backend-specific (an FTS5 table with sync triggers on SQLite,
+a generated tsvector column with a GIN index on PostgreSQL) and created by
+app.db.search.ensure_search_schema, which init_db also runs. Existing
+builds are not backfilled: they become searchable when they next change.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.search import ensure_search_schema
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    tables = sa.inspect(bind).get_table_names()
+    if "builds" not in tables:
+        return
+    if "search_documents" not in tables:
+        op.create_table(
+            "search_documents",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("kind", sa.String(20), nullable=False),
+            sa.Column("ref_id", sa.String(64), nullable=False),
+            sa.Column("owner", sa.String(64), nullable=False),
+            sa.Column("title", sa.String(255), nullable=False),
+            sa.Column("body", sa.Text(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("idx_search_ref", "search_documents", ["kind", "ref_id"], unique=True)
+        op.create_index("idx_search_owner", "search_documents", ["owner", "created_at"])
+    ensure_search_schema(bind)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if "search_documents" not in sa.inspect(bind).get_table_names():
+        return
+    if bind.dialect.name == "sqlite":
+        for trigger in ("search_documents_ai", "search_documents_ad", "search_documents_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS search_fts")
+    op.drop_table("search_documents")
@@ -0,0 +1,52 @@
+"""Give REST API principals their own identity column
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+
+API subjects (the JWT "sub") used to be matched against users.username,
+which Telegram linking fills with the user's chosen handle, so a subject
+equal to someone's handle resolved to their account. API subjects now live
+in users.api_subject. Rows the API created (email ``<subject>@api.agent.local``)
+are backfilled; rows a subject adopted from a Telegram account keep
+belonging to that account.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+API_EMAIL = "%@api.agent.local"
+
+
+def _columns(bind):
+    inspector = sa.inspect(bind)
+    if "users" not in inspector.get_table_names():
+        return None
+    return {column["name"] for column in inspector.get_columns("users")}
+
+
+def upgrade():
+    columns = _columns(op.get_bind())
+    if columns is None or "api_subject" in columns:
+        return
+    with op.batch_alter_table("users") as batch:
+        batch.add_column(sa.Column("api_subject", sa.String(255), nullable=True))
+        batch.create_index("idx_api_subject", ["api_subject"], unique=True)
+    op.execute(
+        sa.text("UPDATE users SET api_subject = username WHERE email LIKE :api_email")
+        .bindparams(api_email=API_EMAIL)
+    )
+
+
+def downgrade():
+    columns = _columns(op.get_bind())
+    if columns is None or "api_subject" not in columns:
+        return
+    with op.batch_alter_table("users") as batch:
+        batch.drop_index("idx_api_subject")
+        batch.drop_column("api_subject")
@@ -3,14 +3,20 @@ Autonomous Agent Worker - Operates independently using Ollama Qwen3 Coder
 """
 import asyncio
 import logging
+import time
+import uuid
 from datetime import datetime
 from typing import Dict, List, Optional
 from pathlib import Path
 import json
 
 from app.core.config import settings
+from app.core.task_journal import TaskJournal
 from app.core.workflow_logger import WorkflowLogger
+from app.agents.schedule import ScheduleHeap
 from app.integrations.ollama import get_ollama_client
+from app.monitoring.metrics import get_metrics
+from app.monitoring.telemetry import get_telemetry_sampler
 
 logger = logging.getLogger(__name__)
 
@@ -21,76 +27,129 @@ class AutonomousWorker:
     Uses Ollama Qwen3 Coder as the main AI brain
     """
 
+    # Seconds stop() lets in-flight tasks finish before cancelling them
+    STOP_GRACE = 10.0
+
     def __init__(self):
         self.ollama = get_ollama_client()
+        self.metrics = get_metrics()
         self.is_running = False
-        self.tasks_file = Path(settings.memory_dir) / "TASKS.md"
+        self.journal = TaskJournal(
+            Path(settings.memory_dir) / "task_journal",
+            max_file_bytes=settings.task_journal_max_mb * 1024 * 1024,
+            keep_files=settings.task_journal_keep_files,
+        )
         self.schedules_file = Path(settings.config_dir) / "schedules.json"
-        self.current_task = None
+        self.schedule = ScheduleHeap(self.schedules_file)
+        self.running_tasks: Dict[int, Dict] = {}
+        self._inflight: set = set()
+        # Schedule keys with a run dispatched and not yet finished (queued or running)
+        self._inflight_keys: set = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self._next_proactive = 0.0
 
         WorkflowLogger.log_system("🤖 Autonomous Worker initialized with Ollama Qwen3 Coder")
 
     async def start(self):
         """Start autonomous operation"""
         self.is_running = True
+        self._loop_task = asyncio.current_task()
+        self._wakeup = asyncio.Event()
+        # autonomous_max_tasks bounds how many tasks run at the same time
+        self._semaphore = asyncio.Semaphore(settings.autonomous_max_tasks)
+        await self.journal.start()
         WorkflowLogger.log_success("▶️  Autonomous mode ACTIVE")
 
-        while self.is_running:
-            try:
-                await self._check_and_execute_tasks()
-                await asyncio.sleep(settings.check_interval)
-            except Exception as e:
-                WorkflowLogger.log_error(f"Autonomous worker error", e)
-                await asyncio.sleep(60)  # Wait 1 minute on error
+        try:
+            while self.is_running:
+                try:
+                    await self._check_and_execute_tasks()
+                    await self._sleep_until_next_event()
+                except Exception as e:
+                    WorkflowLogger.log_error(f"Autonomous worker error", e)
+                    await asyncio.sleep(60)  # Wait 1 minute on error
+        finally:
+            await self.journal.close()
 
     async def _check_and_execute_tasks(self):
-        """Check for tasks and execute them"""
-        WorkflowLogger.log_step("autonomous", "check_tasks", "Scanning for pending tasks")
-
-        # 1. Check for scheduled tasks
-        scheduled = await self._get_scheduled_tasks()
-
-        # 2. Check Telegram messages (if integrated)
-        telegram_tasks = await self._check_telegram()
-
-        # 3. Proactive checks (system health, updates, etc.)
-        proactive_tasks = await self._proactive_checks()
-
-        all_tasks = scheduled + telegram_tasks + proactive_tasks
-
-        if all_tasks:
-            WorkflowLogger.log_success(f"Found {len(all_tasks)} tasks to execute")
-            for task in all_tasks[:settings.autonomous_max_tasks]:
-                await self._execute_task(task)
-        else:
-            logger.debug("No tasks found, standing by...")
-
-    async def _get_scheduled_tasks(self) -> List[Dict]:
-        """Get tasks from schedule"""
-        if not self.schedules_file.exists():
-            return []
+        """Dispatch every task that is due now"""
+        now = time.time()
+
+        # 1. Scheduled tasks (schedules.json is only re-read when it changes)
+        self.schedule.reload_if_changed()
+        due = self.schedule.pop_due(now)
+        for job, scheduled_at in due:
+            self._dispatch(job.to_task(), scheduled_at)
+        if due:
+            self.schedule.save_last_runs()
+
+        # 2. Telegram and proactive checks run every check_interval
+        if now >= self._next_proactive:
+            self._next_proactive = now + settings.check_interval
+            telegram_tasks = await self._check_telegram()
+            proactive_tasks = await self._proactive_checks()
+            for task in telegram_tasks + proactive_tasks:
+                self._dispatch(task, now)
+
+        if not due:
+            logger.debug("No scheduled tasks due, standing by...")
+
+    async def _sleep_until_next_event(self):
+        """Sleep until the next fire time, proactive check or schedule file poll"""
+        now = time.time()
+        deadline = min(self._next_proactive, now + settings.schedule_poll_interval)
+        next_fire = self.schedule.next_fire_time()
+        if next_fire is not None:
+            deadline = min(deadline, next_fire)
 
         try:
-            with open(self.schedules_file) as f:
-                schedules = json.load(f)
-
-            now = datetime.now()
-            due_tasks = []
-
-            for schedule in schedules:
-                # Check if task is due
-                if self._is_task_due(schedule, now):
-                    due_tasks.append({
-                        'type': schedule['type'],
-                        'description': schedule['description'],
-                        'parameters': schedule.get('parameters', {}),
-                        'source': 'scheduled'
-                    })
-
-            return due_tasks
+            await asyncio.wait_for(self._wakeup.wait(), timeout=max(deadline - now, 0))
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    def _dispatch(self, task: Dict, scheduled_at: float):
+        """Start a task in the background unless the same schedule is still running"""
+        schedule_key = task.get("schedule_key")
+        if schedule_key:
+            if schedule_key in self._inflight_keys:
+                logger.warning(f"Skipping overlapping run of scheduled task: {schedule_key}")
+                return
+            # Claimed before the task exists, so copies dispatched together or queued behind the semaphore are caught
+            self._inflight_keys.add(schedule_key)
+
+        job = asyncio.create_task(self._run_task(task, scheduled_at))
+        self._inflight.add(job)
+        job.add_done_callback(self._inflight.discard)
+
+    async def _run_task(self, task: Dict, scheduled_at: float):
+        """Execute a task under the concurrency limit and record its metrics"""
+        task_key = id(task)
+        self.running_tasks[task_key] = task
+        try:
+            async with self._semaphore:
+                lag = time.time() - scheduled_at
+                self.metrics.autonomous_tasks_running.inc()
+                started = time.perf_counter()
+                success = False
+                try:
+                    success = await self._execute_task(task)
+                finally:
+                    self.metrics.autonomous_tasks_running.dec()
+                    self.metrics.record_autonomous_task(
+                        task_type=task['type'],
+                        source=task.get('source', 'unknown'),
+                        status="success" if success else "failed",
+                        lag=lag,
+                        duration=time.perf_counter() - started,
+                    )
         except Exception as e:
-            logger.error(f"Error loading scheduled tasks: {e}")
-            return []
+            logger.error(f"Autonomous task crashed: {e}")
+        finally:
+            self.running_tasks.pop(task_key, None)
+            self._inflight_keys.discard(task.get("schedule_key"))
 
     async def _check_telegram(self) -> List[Dict]:
         """Check for new Telegram messages/commands"""
@@ -104,27 +163,28 @@ class AutonomousWorker:
         tasks = []
 
         try:
-            import psutil
+            # Read the background sampler instead of blocking on psutil here
+            sample = get_telemetry_sampler().latest()
+            if sample is None:
+                return tasks
 
-            # Check system health
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
+            memory_percent = sample['memory_percent']
+            disk_percent = sample['disk_percent']
 
             # Alert if resources are running low
-            if memory.percent > 90:
+            if memory_percent > 90:
                 tasks.append({
                     'type': 'system_alert',
-                    'description': f"High memory usage: {memory.percent}%",
-                    'parameters': {'memory_percent': memory.percent},
+                    'description': f"High memory usage: {memory_percent}%",
+                    'parameters': {'memory_percent': memory_percent},
                     'source': 'proactive'
                 })
 
-            if disk.percent > 90:
+            if disk_percent > 90:
                 tasks.append({
                     'type': 'system_alert',
-                    'description': f"Low disk space: {disk.percent}% used",
-                    'parameters': {'disk_percent': disk.percent},
+                    'description': f"Low disk space: {disk_percent}% used",
+                    'parameters': {'disk_percent': disk_percent},
                     'source': 'proactive'
                 })
 
@@ -133,7 +193,7 @@ class AutonomousWorker:
 
         return tasks
 
-    async def _execute_task(self, task: Dict):
+    async def _execute_task(self, task: Dict) -> bool:
         """Execute a single task using Ollama Qwen3 Coder"""
         WorkflowLogger.log_step(
             "autonomous_execution",
@@ -141,29 +201,28 @@ class AutonomousWorker:
             f"Source: {task.get('source', 'unknown')}"
         )
 
-        self.current_task = task
+        task.setdefault('id', uuid.uuid4().hex[:12])
 
         try:
             # Log task start
-            await self._log_task_start(task)
+            self._log_task_start(task)
 
             # Use Ollama Qwen3 to analyze and execute the task
             result = await self._execute_with_ollama(task)
 
             # Log result
-            await self._log_task_complete(task, result)
+            self._log_task_complete(task, result)
 
             # Send notification if configured
             await self._notify_completion(task, result)
 
             WorkflowLogger.log_success(f"Task completed: {task['type']}")
+            return bool(result.get('success'))
 
         except Exception as e:
             WorkflowLogger.log_error(f"Task execution failed: {task['type']}", e)
-            await self._log_task_error(task, str(e))
-
-        finally:
-            self.current_task = None
+            self._log_task_error(task, str(e))
+            return False
 
     async def _execute_with_ollama(self, task: Dict) -> Dict:
         """
@@ -273,43 +332,40 @@ Be specific and actionable. Focus on completing the task efficiently.
                 'task': task
             }
 
-    async def _log_task_start(self, task: Dict):
-        """Log task to memory"""
-        try:
-            with open(self.tasks_file, 'a') as f:
-                f.write(f"\n## Task Started: {datetime.now().isoformat()}\n")
-                f.write(f"Type: {task['type']}\n")
-                f.write(f"Description: {task['description']}\n")
-                f.write(f"Source: {task.get('source', 'unknown')}\n\n")
-        except Exception as e:
-            logger.error(f"Error logging task start: {e}")
+    def _log_task_start(self, task: Dict):
+        """Record task start in the journal (buffered, no disk I/O here)"""
+        self.journal.record(
+            task['id'], "start",
+            type=task['type'],
+            description=task['description'],
+            source=task.get('source', 'unknown'),
+            schedule_key=task.get('schedule_key'),
+        )
 
-    async def _log_task_complete(self, task: Dict, result: Dict):
-        """Log task completion"""
-        try:
-            with open(self.tasks_file, 'a') as f:
-                f.write(f"## Task Completed: {datetime.now().isoformat()}\n")
-                f.write(f"Success: {result.get('success', False)}\n")
-                f.write(f"Action: {result.get('action', 'unknown')}\n")
-                f.write(f"Result: {json.dumps(result.get('output', {}), indent=2)}\n\n")
-        except Exception as e:
-            logger.error(f"Error logging task complete: {e}")
+    def _log_task_complete(self, task: Dict, result: Dict):
+        """Record task completion"""
+        self.journal.record(
+            task['id'], "complete",
+            type=task['type'],
+            success=result.get('success', False),
+            action=result.get('action', 'unknown'),
+            output=result.get('output', {}),
+        )
 
-    async def _log_task_error(self, task: Dict, error: str):
-        """Log task error"""
-        try:
-            with open(self.tasks_file, 'a') as f:
-                f.write(f"## Task Failed: {datetime.now().isoformat()}\n")
-                f.write(f"Error: {error}\n\n")
-        except Exception as e:
-            logger.error(f"Error logging task error: {e}")
+    def _log_task_error(self, task: Dict, error: str):
+        """Record task failure"""
+        self.journal.record(task['id'], "error", type=task['type'], error=error)
+
+    def render_task_log(self, limit: int = 50) -> str:
+        """Markdown view of recent task events (replaces the old TASKS.md)"""
+        return self.journal.render_markdown(limit)
 
     async def _notify_completion(self, task: Dict, result: Dict):
-        """Send notification via Telegram"""
+        """Queue a Telegram notification (merged into a digest with others)"""
         try:
             if settings.use_python_telegram and settings.admin_telegram_ids:
-                from app.integrations.telegram_bot import get_telegram_bot
-                bot = get_telegram_bot()
+                from app.integrations.telegram_outbox import get_telegram_outbox
+                outbox = get_telegram_outbox()
 
                 message = f"✅ Task Completed\n\n"
                 message += f"Type: {task['type']}\n"
@@ -317,40 +373,42 @@ Be specific and actionable. Focus on completing the task efficiently.
                 message += f"Status: {'Success' if result.get('success') else 'Failed'}\n"
 
                 for admin_id in settings.admin_telegram_ids:
-                    try:
-                        await bot.send_message(admin_id, message)
-                    except Exception as e:
-                        logger.error(f"Failed to send Telegram notification: {e}")
+                    outbox.notify(admin_id, message)
         except Exception as e:
             logger.error(f"Notification error: {e}")
 
-    def _is_task_due(self, schedule: Dict, now: datetime) -> bool:
-        """Check if scheduled task is due"""
-        # Simple time-based check
-        # In production, implement proper cron-like scheduling
-        last_run = schedule.get('last_run')
-        interval = schedule.get('interval_minutes', 60)
+    async def stop(self):
+        """
+        Stop autonomous operation
+        Ends the loop, gives in-flight tasks STOP_GRACE seconds before
+        cancelling them, then writes out the journal
+        """
+        self.is_running = False
+        if self._wakeup is not None:
+            self._wakeup.set()
 
-        if not last_run:
-            return True
+        loop_task, self._loop_task = self._loop_task, None
+        if loop_task is not None and loop_task is not asyncio.current_task():
+            loop_task.cancel()
+            await asyncio.gather(loop_task, return_exceptions=True)
 
-        try:
-            last_run_dt = datetime.fromisoformat(last_run)
-            minutes_since = (now - last_run_dt).total_seconds() / 60
-            return minutes_since >= interval
-        except Exception:
-            return True
-
-    def stop(self):
-        """Stop autonomous operation"""
-        self.is_running = False
+        if self._inflight:
+            _, unfinished = await asyncio.wait(list(self._inflight), timeout=self.STOP_GRACE)
+            for job in unfinished:
+                job.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+
+        await self.journal.close()
         WorkflowLogger.log_system("⏹️  Autonomous mode STOPPED")
 
     def get_status(self) -> Dict:
         """Get current status"""
+        next_fire = self.schedule.next_fire_time()
         return {
             'running': self.is_running,
-            'current_task': self.current_task,
+            'current_tasks': list(self.running_tasks.values()),
+            'scheduled_jobs': len(self.schedule.jobs),
+            'next_scheduled_run': datetime.fromtimestamp(next_fire).isoformat() if next_fire else None,
             'check_interval': settings.check_interval,
             'max_concurrent_tasks': settings.autonomous_max_tasks
         }
@@ -4,7 +4,6 @@ Integrates with Ollama, Chroma, and LangChain for full AI-powered pipeline
 """
 
 import json
-import asyncio
 import logging
 from typing import Dict, Any, List, Optional, TypedDict, Annotated
 from datetime import datetime
@@ -17,6 +16,7 @@ import structlog
 
 from app.db.vector import get_vector_store
 from app.core.config import settings
+from app.core.cancellation import checkpoint, get_cancellation_registry
 from app.integrations.ollama import get_ollama_client
 
 logger = structlog.get_logger(__name__)
@@ -382,11 +382,9 @@ Generate ONLY the code, no explanations or markdown formatting."""
             }
             
             if query:
-                snippets = await vector_store.search_similar_code(query, n_results=3)
-                context["code_snippets"] = snippets
-                
-                docs = await vector_store.search_documentation(query, n_results=2)
-                context["documentation"] = docs
+                found = await vector_store.hybrid_search(query, n_results=5)
+                context["code_snippets"] = found["code_snippets"]
+                context["documentation"] = found["documentation"]
             
             logger.info(f"Retrieved context", snippets=len(context["code_snippets"]))
             return context
@@ -409,12 +407,12 @@ class AgentWorkflow:
         graph = StateGraph(AgentState)
         
         # Add nodes
-        graph.add_node("analyze_requirements", self._analyze_requirements)
-        graph.add_node("create_plan", self._create_execution_plan)
-        graph.add_node("generate", self._generate_code)
-        graph.add_node("test", self._execute_and_test)
-        graph.add_node("finalize", self._finalize_results)
-        graph.add_node("error_handler", self._handle_error)
+        graph.add_node("analyze_requirements", self._cancellable(self._analyze_requirements))
+        graph.add_node("create_plan", self._cancellable(self._create_execution_plan))
+        graph.add_node("generate", self._cancellable(self._generate_code))
+        graph.add_node("test", self._cancellable(self._execute_and_test))
+        graph.add_node("finalize", self._cancellable(self._finalize_results))
+        graph.add_node("error_handler", self._cancellable(self._handle_error))
         
         # Add edges
         graph.add_edge("analyze_requirements", "create_plan")
@@ -435,6 +433,14 @@ class AgentWorkflow:
         
         return graph.compile()
     
+    @staticmethod
+    def _cancellable(step):
+        """Node wrapper: a cancelled run stops before starting the next step"""
+        async def node(state: AgentState) -> Dict[str, Any]:
+            checkpoint()
+            return await step(state)
+        return node
+    
     async def _analyze_requirements(self, state: AgentState) -> Dict[str, Any]:
         """Analyze user requirements"""
         logger.info("Step: Analyzing requirements", task_id=state["task_id"])
@@ -621,14 +627,23 @@ class AgentWorkflow:
             messages=[]
         )
         
-        # Execute graph
-        final_state = await asyncio.to_thread(self.graph.invoke, state)
+        # Execute graph on the event loop so cancelling the run interrupts the
+        # node in progress (a worker thread could not be stopped)
+        final_state = await get_cancellation_registry().run(
+            f"workflow:{state['task_id']}",
+            self.graph.ainvoke(state),
+            operation="agent_workflow"
+        )
         
         return final_state["results"] if final_state["results"] else {
             "status": "failed",
             "error": final_state.get("error"),
             "errors": final_state.get("errors", [])
         }
+    
+    def cancel(self, task_id: str, reason: str = "cancelled") -> bool:
+        """Cancel a running workflow; it raises ``OperationCancelled`` to its caller"""
+        return get_cancellation_registry().cancel(f"workflow:{task_id}", reason=reason)
 
 
 # Global workflow instance
@@ -0,0 +1,201 @@
+"""
+Schedule heap for the Autonomous Worker
+Keeps schedules.json entries in a min-heap keyed by next fire time so the
+worker can sleep exactly until the next task is due instead of polling.
+"""
+
+import heapq
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from apscheduler.triggers.cron import CronTrigger
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ScheduledJob:
+    """One entry of schedules.json with its parsed trigger"""
+    key: str
+    task_type: str
+    description: str
+    parameters: Dict[str, Any] = field(default_factory=dict)
+    interval_seconds: Optional[float] = None
+    cron: Optional[CronTrigger] = None
+    last_run: Optional[float] = None  # epoch seconds
+    next_run: float = 0.0  # epoch seconds
+    raw: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, entry: Dict[str, Any], index: int) -> "ScheduledJob":
+        """Parse a schedules.json entry (raises on invalid cron/timestamp)"""
+        cron_expr = entry.get("cron")
+        last_run = entry.get("last_run")
+        interval_minutes = None if cron_expr else float(entry.get("interval_minutes", 60))
+        if interval_minutes is not None and not interval_minutes > 0:
+            raise ValueError(f"interval_minutes must be positive, got {entry.get('interval_minutes')!r}")
+        job = cls(
+            key=str(entry.get("id") or entry.get("name") or f"{entry['type']}#{index}"),
+            task_type=entry["type"],
+            description=entry.get("description", ""),
+            parameters=entry.get("parameters", {}),
+            cron=CronTrigger.from_crontab(cron_expr) if cron_expr else None,
+            interval_seconds=None if cron_expr else interval_minutes * 60,
+            last_run=datetime.fromisoformat(last_run).timestamp() if last_run else None,
+            raw=entry,
+        )
+        job.next_run = job.compute_next_run(time.time())
+        return job
+
+    def compute_next_run(self, now: float) -> float:
+        """Next fire time (epoch seconds) strictly after the last run"""
+        if self.cron is not None:
+            return self._next_cron_fire(self.last_run, now)
+        if self.last_run is None:
+            return now
+        return self.last_run + self.interval_seconds
+
+    def next_run_after(self, now: float) -> float:
+        """First fire time strictly after ``now``, skipping every slot missed before it"""
+        if self.cron is not None:
+            return self._next_cron_fire(now, now)
+        fire_at = self.last_run if self.last_run is not None else now
+        return now + self.interval_seconds - (now - fire_at) % self.interval_seconds
+
+    def _next_cron_fire(self, previous: Optional[float], now: float) -> float:
+        tz = self.cron.timezone
+        previous_dt = datetime.fromtimestamp(previous, tz) if previous else None
+        fire = self.cron.get_next_fire_time(previous_dt, datetime.fromtimestamp(now, tz))
+        return fire.timestamp() if fire else float("inf")
+
+    def to_task(self) -> Dict[str, Any]:
+        """Task dict in the shape AutonomousWorker executes"""
+        return {
+            "type": self.task_type,
+            "description": self.description,
+            "parameters": self.parameters,
+            "source": "scheduled",
+            "schedule_key": self.key,
+        }
+
+
+class ScheduleHeap:
+    """
+    Min-heap of scheduled jobs backed by a JSON file
+
+    The file is only re-read when its mtime/size changes; ``pop_due`` returns
+    jobs whose next fire time has passed together with their scheduled time.
+    """
+
+    def __init__(self, schedules_file: Path):
+        self.schedules_file = schedules_file
+        self.jobs: Dict[str, ScheduledJob] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._counter = 0
+        self._signature: Optional[Tuple[int, int]] = None
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.schedules_file.stat()
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    def reload_if_changed(self) -> bool:
+        """Re-parse the schedules file if it changed since the last load"""
+        signature = self._file_signature()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        self.load()
+        return True
+
+    def load(self):
+        """(Re)build the heap from the schedules file, keeping known last runs"""
+        entries: List[Dict[str, Any]] = []
+        if self.schedules_file.exists():
+            try:
+                with open(self.schedules_file) as f:
+                    entries = json.load(f)
+            except Exception as e:
+                logger.error(f"Error loading scheduled tasks: {e}")
+                return
+
+        jobs: Dict[str, ScheduledJob] = {}
+        for index, entry in enumerate(entries):
+            if not entry.get("enabled", True):
+                continue
+            try:
+                job = ScheduledJob.from_dict(entry, index)
+            except Exception as e:
+                logger.error(f"Invalid schedule entry {index}: {e}")
+                continue
+            known = self.jobs.get(job.key)
+            if known and known.last_run and (job.last_run or 0) < known.last_run:
+                job.last_run = known.last_run
+                job.next_run = job.compute_next_run(time.time())
+            jobs[job.key] = job
+
+        self.jobs = jobs
+        self._heap = []
+        for job in jobs.values():
+            self._push(job)
+        logger.info(f"Loaded {len(jobs)} scheduled tasks")
+
+    def _push(self, job: ScheduledJob):
+        self._counter += 1
+        heapq.heappush(self._heap, (job.next_run, self._counter, job.key))
+
+    def next_fire_time(self) -> Optional[float]:
+        """Earliest pending fire time, discarding stale heap entries"""
+        while self._heap:
+            fire_at, _, key = self._heap[0]
+            job = self.jobs.get(key)
+            if job is not None and job.next_run == fire_at:
+                return fire_at
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now: float) -> List[Tuple[ScheduledJob, float]]:
+        """Remove due jobs, reschedule them and return (job, scheduled_at)"""
+        due = []
+        while True:
+            fire_at = self.next_fire_time()
+            if fire_at is None or fire_at > now:
+                break
+            _, _, key = heapq.heappop(self._heap)
+            job = self.jobs[key]
+            due.append((job, fire_at))
+            # Schedule from the slot that fired, not from now, so intervals keep their phase
+            job.last_run = fire_at
+            job.next_run = job.compute_next_run(now)
+            if job.next_run <= now:
+                # Slots missed while the worker was busy or down collapse into this run
+                job.next_run = job.next_run_after(now)
+            self._push(job)
+        return due
+
+    def save_last_runs(self):
+        """Write last_run back so interval jobs resume correctly after a restart"""
+        if not self.schedules_file.exists():
+            return
+        try:
+            with open(self.schedules_file) as f:
+                entries = json.load(f)
+            for index, entry in enumerate(entries):
+                key = str(entry.get("id") or entry.get("name") or f"{entry.get('type')}#{index}")
+                job = self.jobs.get(key)
+                if job and job.last_run:
+                    entry["last_run"] = datetime.fromtimestamp(job.last_run).isoformat()
+            tmp_file = self.schedules_file.with_suffix(".tmp")
+            with open(tmp_file, "w") as f:
+                json.dump(entries, f, indent=2)
+            tmp_file.replace(self.schedules_file)
+            self._signature = self._file_signature()
+        except Exception as e:
+            logger.error(f"Error saving schedule state: {e}")
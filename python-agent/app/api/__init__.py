@@ -4,5 +4,7 @@ from app.api.analysis import router as analysis_router
 from app.api.health import router as health_router
 from app.api.websocket import router as websocket_router
 from app.api.memory import router as memory_router
+from app.api.telegram import router as telegram_router
+from app.api.search import router as search_router
 
-__all__ = ["build_router", "analysis_router", "health_router", "websocket_router", "memory_router"]
+__all__ = ["build_router", "analysis_router", "health_router", "websocket_router", "memory_router", "telegram_router", "search_router"]
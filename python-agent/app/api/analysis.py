@@ -9,7 +9,6 @@ Provides REST endpoints for:
 """
 
 from typing import Dict, Optional
-from datetime import datetime
 import uuid
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status
@@ -24,19 +23,37 @@ from typing import Dict, Any
 User = Dict[str, Any]
 from app.security.validators import SecurityValidator
 from app.core.config import Settings, get_settings
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import build_store
+from app.db.blob_store import store_blob
+from app.db.session import get_db
+from app.models.database import CodeAnalysis
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/analysis", tags=["analysis"])
 
-# In-memory analysis results (Phase 2: use PostgreSQL)
-_analysis_results: Dict[str, CodeAnalysisResponse] = {}
+
+def _analysis_response(analysis: CodeAnalysis, performed_by: str) -> CodeAnalysisResponse:
+    return CodeAnalysisResponse(
+        analysis_id=analysis.id,
+        project_name=analysis.project_name,
+        timestamp=analysis.created_at,
+        performed_by=performed_by,
+        quality_score=analysis.quality_score,
+        security_issues=analysis.security_issues,
+        code_smells=len(analysis.code_smells),
+        type_errors=len(analysis.type_errors),
+        coverage_percent=analysis.coverage_percent,
+        recommendations=analysis.recommendations,
+    )
 
 
 class AnalysisService:
     """Service layer for code analysis operations."""
 
-    def __init__(self, settings: Settings):
+    def __init__(self, settings: Settings, db: AsyncSession):
         self.settings = settings
+        self.db = db
         self.validator = SecurityValidator()
 
     async def analyze_code(
@@ -61,24 +78,24 @@ class AnalysisService:
         # Generate analysis ID
         analysis_id = str(uuid.uuid4())
 
-        # Prepare response (Phase 2: actual analysis execution)
-        response = CodeAnalysisResponse(
-            analysis_id=analysis_id,
+        # Store results (Phase 2: actual analysis execution)
+        analysis = await build_store.create_analysis(
+            self.db,
+            analysis_id,
+            user.get('sub', 'unknown'),
             project_name=request.project_name,
-            timestamp=datetime.utcnow(),
-            performed_by=user.get('sub', 'unknown'),
+            code_digest=await store_blob(self.db, request.code),
             quality_score=8.5,
             security_issues=[],
-            code_smells=5,
-            type_errors=0,
+            code_smells=[],
+            type_errors=[],
             coverage_percent=87.5,
             recommendations=[
                 "Add docstrings to public functions",
                 "Extract complex methods into smaller functions",
             ],
         )
-
-        _analysis_results[analysis_id] = response
+        response = _analysis_response(analysis, user.get('sub', 'unknown'))
 
         logger.info(
             "Code analysis completed",
@@ -97,6 +114,7 @@ async def analyze_code(
     request: CodeAnalysisRequest,
     user: User = Depends(get_current_user_or_default),
     settings: Settings = Depends(get_settings),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Analyze code quality, security, and type safety.
@@ -115,7 +133,7 @@ async def analyze_code(
     ```
     """
     try:
-        service = AnalysisService(settings)
+        service = AnalysisService(settings, db)
         response = await service.analyze_code(request, user)
         return response
 
@@ -144,6 +162,7 @@ async def get_analysis_result(
     analysis_id: str,
     user: User = Depends(get_current_user_or_default),
     settings: Settings = Depends(get_settings),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Get results of a completed code analysis.
@@ -155,19 +174,20 @@ async def get_analysis_result(
     - 200 OK: Complete analysis results
     - 404 Not Found: Analysis not found
     """
-    if analysis_id not in _analysis_results:
+    found = await build_store.get_analysis(db, analysis_id)
+    if found is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Analysis not found",
         )
 
-    result = _analysis_results[analysis_id]
+    analysis, performed_by = found
 
     # Authorization: user can view their own analyses or admins can view all
-    if result.performed_by != user.get('sub', 'unknown') and user.role != "admin":
+    if performed_by != user.get('sub', 'unknown') and user.get("role") != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to view this analysis",
         )
 
-    return result
+    return _analysis_response(analysis, performed_by)
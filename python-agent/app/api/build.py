@@ -14,17 +14,16 @@ Security:
   - Command execution sandboxed
 """
 
-from typing import Dict, Optional, List
+from typing import Dict, Optional
 from datetime import datetime
 import uuid
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from app.models.schemas import (
     BuildRequest,
     BuildResponse,
-    BuildStatus,
     BuildStatusResponse,
     BuildHistoryResponse,
     ErrorResponse,
@@ -34,21 +33,41 @@ from typing import Dict, Any
 User = Dict[str, Any]
 from app.security.validators import SecurityValidator
 from app.services.command_executor import SecureCommandExecutor
+from app.core.cancellation import OperationCancelled, get_cancellation_registry
 from app.core.config import Settings, get_settings
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import build_store
+from app.db.blob_store import load_blob, release_blob, store_blob
+from app.db.build_store import api_status, get_build_progress
+from app.db.search import get_search_indexer
+from app.db.session import AsyncSessionLocal, get_db
+from app.models.database import Build, BuildStatus as BuildState
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/build", tags=["build"])
 
-# In-memory task store (Phase 2: replace with PostgreSQL)
-_build_tasks: Dict[str, BuildStatus] = {}
-_user_builds: Dict[str, List[str]] = {}
+
+def _status_response(build: Build, created_by: Optional[str]) -> BuildStatusResponse:
+    return BuildStatusResponse(
+        task_id=build.id,
+        project_name=build.project_name,
+        status=api_status(build.status),
+        progress=get_build_progress().get(build.id, build.status),
+        created_at=build.created_at,
+        # Builds started from Telegram have no API owner
+        created_by=created_by or "telegram",
+        goal=build.requirements,
+        results=build.test_results,
+        error=build.error_message,
+    )
 
 
 class BuildService:
     """Service layer for build operations."""
 
-    def __init__(self, settings: Settings):
+    def __init__(self, settings: Settings, db: AsyncSession):
         self.settings = settings
+        self.db = db
         self.executor = SecureCommandExecutor()
         self.validator = SecurityValidator()
 
@@ -74,21 +93,9 @@ class BuildService:
         # Generate unique task ID
         task_id = str(uuid.uuid4())
 
-        # Store minimal task info
-        _build_tasks[task_id] = {
-            "task_id": task_id,
-            "project_name": project_name,
-            "goal": request.goal,
-            "status": "initializing",
-            "progress": 0,
-            "created_at": datetime.utcnow(),
-            "created_by": user.get('sub', 'unknown'),
-        }
-
-        # Store task in user's list
-        if user.get('sub', 'unknown') not in _user_builds:
-            _user_builds[user.get('sub', 'unknown')] = []
-        _user_builds[user.get('sub', 'unknown')].append(task_id)
+        build = await build_store.create_build(
+            self.db, task_id, user.get('sub', 'unknown'), project_name, request.goal
+        )
 
         logger.info(
             "Build task created",
@@ -101,9 +108,9 @@ class BuildService:
 
         return BuildResponse(
             task_id=task_id,
-            status="initializing",
+            status=api_status(build.status),
             message="Build task created successfully",
-            created_at=datetime.utcnow(),
+            created_at=build.created_at,
             workspace_path=f"/tmp/workspace/{task_id}"
         )
 
@@ -121,35 +128,65 @@ class BuildService:
         Raises:
             HTTPException: If task not found or unauthorized
         """
-        if task_id not in _build_tasks:
+        found = await build_store.get_build(self.db, task_id)
+        if found is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Build task not found",
             )
 
-        task = _build_tasks[task_id]
+        build, created_by = found
 
         # Authorization: user can only view their own builds
-        if task.created_by != user.get('sub', 'unknown') and user.role != "admin":
+        if created_by != user.get('sub', 'unknown') and user.get("role") != "admin":
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not authorized to view this build",
             )
 
-        return BuildStatusResponse(
-            task_id=task.task_id,
-            project_name=task.project_name,
-            status=task.status,
-            progress=task.progress,
-            created_at=task.created_at,
-            created_by=task.created_by,
-            goal=task.goal,
-            results=task.results,
-            error=task.error,
-        )
+        return _status_response(build, created_by)
+
+    async def get_build_logs(self, task_id: str, user: User, offset: int = 0, limit: Optional[int] = None) -> bytes:
+        """
+        Read a range of a build's logs from the blob store.
+
+        Args:
+            task_id: Unique build task identifier
+            user: Current authenticated user
+            offset: First byte to return
+            limit: Maximum number of bytes (None for the rest of the log)
+
+        Returns:
+            The requested bytes of the log
+
+        Raises:
+            HTTPException: If task or logs not found, or unauthorized
+        """
+        found = await build_store.get_build(self.db, task_id)
+        if found is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Build task not found",
+            )
+
+        build, created_by = found
+
+        if created_by != user.get('sub', 'unknown') and user.get("role") != "admin":
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to view this build",
+            )
+
+        if build.build_logs_digest is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Build has no logs yet",
+            )
+
+        return await load_blob(build.build_logs_digest, offset, limit)
 
     async def get_user_build_history(
-        self, user: User, limit: int = 50, offset: int = 0
+        self, user: User, limit: int = 50, offset: int = 0, cursor: Optional[str] = None
     ) -> BuildHistoryResponse:
         """
         Get build history for current user.
@@ -157,41 +194,28 @@ class BuildService:
         Args:
             user: Current authenticated user
             limit: Maximum number of records (max 100)
-            offset: Pagination offset
+            offset: Pagination offset, used only without a cursor
+            cursor: next_cursor from the previous page
 
         Returns:
             BuildHistoryResponse with paginated build list
+
+        Raises:
+            ValueError: If the cursor is malformed
         """
         limit = min(limit, 100)  # Cap at 100
+        subject = user.get('sub', 'unknown')
 
-        user_task_ids = _user_builds.get(user.get('sub', 'unknown'), [])
-        tasks = [_build_tasks[tid] for tid in user_task_ids if tid in _build_tasks]
-
-        # Sort by creation time, newest first
-        tasks.sort(key=lambda t: t.created_at, reverse=True)
-
-        # Apply pagination
-        total = len(tasks)
-        paginated_tasks = tasks[offset : offset + limit]
+        total, builds, next_cursor = await build_store.list_user_builds(
+            self.db, subject, limit, cursor=cursor, offset=offset
+        )
 
         return BuildHistoryResponse(
             total=total,
             limit=limit,
-            offset=offset,
-            builds=[
-                BuildStatusResponse(
-                    task_id=t.task_id,
-                    project_name=t.project_name,
-                    status=t.status,
-                    progress=t.progress,
-                    created_at=t.created_at,
-                    created_by=t.created_by,
-                    goal=t.goal,
-                    results=t.results,
-                    error=t.error,
-                )
-                for t in paginated_tasks
-            ],
+            offset=0 if cursor else offset,
+            next_cursor=next_cursor,
+            builds=[_status_response(build, subject) for build in builds],
         )
 
     async def cancel_build(self, task_id: str, user: User) -> Dict:
@@ -208,35 +232,38 @@ class BuildService:
         Raises:
             HTTPException: If task not found or not cancellable
         """
-        if task_id not in _build_tasks:
+        found = await build_store.get_build(self.db, task_id)
+        if found is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Build task not found",
             )
 
-        task = _build_tasks[task_id]
+        build, created_by = found
 
         # Authorization check
-        if task.created_by != user.get('sub', 'unknown') and user.role != "admin":
+        if created_by != user.get('sub', 'unknown') and user.get("role") != "admin":
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not authorized to cancel this build",
             )
 
-        # Check if cancellable
-        if task.status not in ["initializing", "running"]:
+        # Mark as cancelled only if still cancellable, then stop the running
+        # work (model calls, subprocesses and workflow steps unwind immediately)
+        cancelled = await build_store.set_build_status(
+            self.db, task_id, BuildState.CANCELLED, completed_at=datetime.utcnow()
+        )
+        if not cancelled:
+            await self.db.refresh(build)
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
-                detail=f"Cannot cancel build in {task.status} state",
+                detail=f"Cannot cancel build in {api_status(build.status)} state",
             )
-
-        # Mark as cancelled
-        task.status = "cancelled"
-        task.progress = 0
+        stopped = get_cancellation_registry().cancel(f"build:{task_id}", reason="api")
 
         logger.info(
             "Build task cancelled",
-            extra={"task_id": task_id, "user": user.get('sub', 'unknown')},
+            extra={"task_id": task_id, "user": user.get('sub', 'unknown'), "was_running": stopped},
         )
 
         return {"message": "Build task cancelled successfully"}
@@ -250,6 +277,7 @@ async def create_build(
     request: BuildRequest,
     user: User = Depends(get_current_user_or_default),
     settings: Settings = Depends(get_settings),
+    db: AsyncSession = Depends(get_db),
     background_tasks: BackgroundTasks = None,
 ):
     """
@@ -273,7 +301,7 @@ async def create_build(
     **Response:** 202 Accepted with task_id for polling
     """
     try:
-        service = BuildService(settings)
+        service = BuildService(settings, db)
         response = await service.create_build_task(request, user)
 
         # Schedule actual build execution (Phase 2: use Celery)
@@ -309,6 +337,7 @@ async def get_build_status(
     task_id: str,
     user: User = Depends(get_current_user_or_default),
     settings: Settings = Depends(get_settings),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Get status of a specific build task.
@@ -334,7 +363,7 @@ async def get_build_status(
     ```
     """
     try:
-        service = BuildService(settings)
+        service = BuildService(settings, db)
         return await service.get_build_status(task_id, user)
     except HTTPException:
         raise
@@ -354,14 +383,19 @@ async def get_build_history(
     user: User = Depends(get_current_user_or_default),
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, max_length=200),
     settings: Settings = Depends(get_settings),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Get build history for current user.
 
     **Query Parameters:**
     - `limit`: Number of records (1-100, default 20)
-    - `offset`: Pagination offset (default 0)
+    - `cursor`: `next_cursor` from the previous page
+    - `offset`: Pagination offset (default 0); ignored when `cursor` is set.
+      Prefer the cursor: it stays fast on deep pages and stable while new
+      builds are created
 
     **Returns:**
     - Paginated list of user's builds ordered by newest first
@@ -372,13 +406,19 @@ async def get_build_history(
       "total": 42,
       "limit": 20,
       "offset": 0,
+      "next_cursor": "MjAyNi0wMi0wM1QxMDozMDowMHw1NTBl...",
       "builds": [...]
     }
     ```
     """
     try:
-        service = BuildService(settings)
-        return await service.get_user_build_history(user, limit, offset)
+        service = BuildService(settings, db)
+        return await service.get_user_build_history(user, limit, offset, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
     except Exception as e:
         logger.error(
             "Error fetching build history",
@@ -390,11 +430,50 @@ async def get_build_history(
         )
 
 
+@router.get("/{task_id}/logs", response_class=PlainTextResponse)
+async def get_build_logs(
+    task_id: str,
+    user: User = Depends(get_current_user_or_default),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=10_485_760),
+    settings: Settings = Depends(get_settings),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Get the logs of a build, or a byte range of them.
+
+    **Query Parameters:**
+    - `offset`: First byte to return (default 0)
+    - `limit`: Maximum number of bytes (default: to the end, at most 10 MiB)
+
+    **Returns:**
+    - 200 OK: Log text (a range may start or end inside a UTF-8 sequence)
+    - 404 Not Found: Task doesn't exist or has no logs
+    - 403 Forbidden: User doesn't have permission
+    """
+    try:
+        service = BuildService(settings, db)
+        data = await service.get_build_logs(task_id, user, offset, limit)
+        return PlainTextResponse(data.decode("utf-8", errors="replace"))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(
+            "Error fetching build logs",
+            extra={"task_id": task_id, "error": str(e)},
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to fetch build logs",
+        )
+
+
 @router.delete("/{task_id}", response_model=Dict)
 async def cancel_build(
     task_id: str,
     user: User = Depends(get_current_user_or_default),
     settings: Settings = Depends(get_settings),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Cancel an in-progress build task.
@@ -411,7 +490,7 @@ async def cancel_build(
     **Note:** Only task creator or admin can cancel.
     """
     try:
-        service = BuildService(settings)
+        service = BuildService(settings, db)
         return await service.cancel_build(task_id, user)
     except HTTPException:
         raise
@@ -439,46 +518,80 @@ async def execute_build_async(task_id: str, username: str):
         username: User who created the build
     """
     try:
-        if task_id not in _build_tasks:
-            return
-
-        task = _build_tasks[task_id]
-        task.status = "running"
-        task.progress = 10
-
-        logger.info(
-            "Build execution started",
-            extra={"task_id": task_id, "user": username},
+        await get_cancellation_registry().run(
+            f"build:{task_id}", _run_build(task_id, username), operation="build"
         )
-
-        # Simulate build process (Phase 2: actual LangGraph execution)
-        # In production, this would:
-        # 1. Clone/prepare project
-        # 2. Run LangGraph agent
-        # 3. Execute generated code
-        # 4. Collect results
-        # 5. Store artifacts
-
-        task.progress = 50
-        task.results = {
-            "generated_files": ["auth.py", "models.py"],
-            "tests_passed": 12,
-            "test_coverage": 87.5,
-        }
-        task.progress = 100
-        task.status = "completed"
-
+    except OperationCancelled as e:
         logger.info(
-            "Build execution completed",
-            extra={"task_id": task_id, "user": username},
+            "Build execution cancelled",
+            extra={"task_id": task_id, "user": username, "reason": e.reason},
         )
-
     except Exception as e:
-        if task_id in _build_tasks:
-            _build_tasks[task_id].status = "failed"
-            _build_tasks[task_id].error = str(e)
+        async with AsyncSessionLocal() as db:
+            await build_store.set_build_status(
+                db, task_id, BuildState.FAILED, error_message=str(e), completed_at=datetime.utcnow()
+            )
 
         logger.error(
             "Build execution failed",
             extra={"task_id": task_id, "user": username, "error": str(e)},
         )
+
+
+async def _run_build(task_id: str, username: str):
+    """Build steps; runs as the cancellable ``build:<task_id>`` operation"""
+    progress = get_build_progress()
+    started_at = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        # No-op when the build was cancelled (or removed) before it started
+        if not await build_store.set_build_status(
+            db, task_id, BuildState.RUNNING, expected=[BuildState.PENDING], started_at=started_at
+        ):
+            return
+    progress.set(task_id, 10)
+    build_log = [f"{started_at.isoformat()} Build started for {username}"]
+
+    logger.info(
+        "Build execution started",
+        extra={"task_id": task_id, "user": username},
+    )
+
+    # Simulate build process (Phase 2: actual LangGraph execution)
+    # In production, this would:
+    # 1. Clone/prepare project
+    # 2. Run LangGraph agent
+    # 3. Execute generated code
+    # 4. Collect results
+    # 5. Store artifacts
+
+    progress.set(task_id, 50)
+    results = {
+        "generated_files": ["auth.py", "models.py"],
+        "tests_passed": 12,
+        "test_coverage": 87.5,
+    }
+
+    completed_at = datetime.utcnow()
+    build_log.append(
+        f"{completed_at.isoformat()} Generated {', '.join(results['generated_files'])}; "
+        f"{results['tests_passed']} tests passed, {results['test_coverage']}% coverage"
+    )
+    async with AsyncSessionLocal() as db:
+        logs_digest = await store_blob(db, "\n".join(build_log) + "\n")
+        if not await build_store.set_build_status(
+            db, task_id, BuildState.COMPLETED, expected=[BuildState.RUNNING],
+            test_results=results, completed_at=completed_at,
+            duration_seconds=(completed_at - started_at).total_seconds(),
+            build_logs_digest=logs_digest,
+        ):
+            # Cancelled meanwhile: the reference was taken for nothing
+            await release_blob(db, logs_digest)
+            await db.commit()
+        elif get_settings().search_enabled:
+            build, _ = await build_store.get_build(db, task_id)
+            get_search_indexer().index_build_log(task_id, build.user_id, build.project_name, "\n".join(build_log))
+
+    logger.info(
+        "Build execution completed",
+        extra={"task_id": task_id, "user": username},
+    )
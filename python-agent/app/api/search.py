@@ -0,0 +1,80 @@
+"""
+Search API endpoints - Full-text search over chat messages, builds and build logs.
+
+Results are limited to the caller's own documents: their builds and build
+logs, and the chats of Telegram accounts linked to them. Admins search
+everything.
+"""
+
+from typing import Any, Dict, List, Optional
+import logging
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.search import KINDS, owners_for_subject, render_snippet, search
+from app.db.session import get_db
+from app.models.schemas import SearchHit, SearchResponse
+from app.security.auth import get_current_user_or_default
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/search", tags=["search"])
+
+
+@router.get("", response_model=SearchResponse)
+async def search_documents(
+    q: str = Query(..., min_length=1, max_length=500, description="Words to search for"),
+    kinds: Optional[List[str]] = Query(None, description="Only these kinds: message, build, build_log"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10_000),
+    user: Dict[str, Any] = Depends(get_current_user_or_default),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Search chat messages, builds and build logs, best match first.
+
+    **Query Parameters:**
+    - `q`: Words to search for; every word must match, the last one as a prefix
+    - `kinds`: Repeat to restrict to document kinds
+    - `limit`, `offset`: Page size and start; `next_offset` is set when there are more
+
+    **Returns:**
+    - 200 OK: Hits with a snippet, matched terms wrapped in `**`
+    - 400 Bad Request: Unknown kind
+    """
+    unknown = set(kinds or ()) - set(KINDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown kinds: {', '.join(sorted(unknown))}",
+        )
+    try:
+        owners = None if user.get("role") == "admin" else await owners_for_subject(db, user.get("sub", "unknown"))
+        page = await search(db, q, owners, kinds, limit, offset)
+    except Exception as e:
+        logger.error(
+            "Search failed",
+            extra={"user": user.get("sub", "unknown"), "error": str(e)},
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Search failed",
+        )
+
+    return SearchResponse(
+        query=q,
+        limit=limit,
+        offset=offset,
+        next_offset=page.next_offset,
+        hits=[
+            SearchHit(
+                kind=hit.kind,
+                ref_id=hit.ref_id,
+                title=hit.title,
+                snippet=render_snippet(hit.snippet, "**", "**"),
+                score=hit.score,
+                created_at=hit.created_at,
+            )
+            for hit in page.hits
+        ],
+    )
@@ -0,0 +1,39 @@
+"""
+Telegram webhook endpoint.
+
+Telegram POSTs each update here when the bot runs in webhook mode. The
+handler only verifies the secret token, decodes the update and queues it;
+processing happens on the bot's concurrent update processor, so Telegram
+gets its 200 right away.
+"""
+
+import logging
+from fastapi import APIRouter, Header, HTTPException, Request, status
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/telegram", tags=["Telegram"])
+
+
+@router.post("/webhook")
+async def telegram_webhook(
+    request: Request,
+    x_telegram_bot_api_secret_token: str = Header(default=None),
+):
+    """Receive a Telegram update"""
+    from app.integrations.telegram_bot import get_telegram_bot
+
+    bot = get_telegram_bot()
+    if not bot.application:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Bot not initialized")
+
+    if not bot.verify_webhook_secret(x_telegram_bot_api_secret_token):
+        logger.warning("Rejected Telegram webhook call with a bad secret token")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid secret token")
+
+    try:
+        await bot.feed_webhook_update(await request.body())
+    except (ValueError, KeyError) as e:
+        # Malformed payloads are acknowledged so Telegram does not redeliver them
+        logger.warning(f"Telegram webhook payload rejected: {e}")
+
+    return {"status": "ok"}
@@ -0,0 +1,136 @@
+"""
+Cooperative cancellation of in-flight work
+Each cancellable operation (an agent reply, a build, a workflow run) runs as
+its own asyncio task registered under a scope key such as ``agent:42`` or
+``build:<id>``. Cancelling the scope cancels that task, so whatever it is
+awaiting unwinds right away: HTTP requests to Ollama close their connection
+(which stops generation), subprocesses are killed and LangGraph stops before
+its next node. Starting new work in a busy scope supersedes the old work.
+"""
+
+import asyncio
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Dict, Optional
+
+import structlog
+
+from app.monitoring.metrics import get_metrics
+
+logger = structlog.get_logger(__name__)
+
+
+class OperationCancelled(Exception):
+    """Raised to the caller of ``CancellationRegistry.run`` when its work was cancelled"""
+
+    def __init__(self, scope: str, reason: str):
+        super().__init__(f"{scope} cancelled ({reason})")
+        self.scope = scope
+        self.reason = reason
+
+
+@dataclass
+class _InFlight:
+    scope: str
+    operation: str
+    task: Optional["asyncio.Task"]
+    started: float
+    reason: Optional[str] = None
+    requested_at: Optional[float] = None
+
+
+# Scope of the operation the current task (or thread started from it) belongs to
+_current: ContextVar[Optional[_InFlight]] = ContextVar("cancellation_scope", default=None)
+
+
+def cancellation_requested() -> bool:
+    """Whether the surrounding operation has been asked to stop"""
+    entry = _current.get()
+    return entry is not None and entry.reason is not None
+
+
+def checkpoint():
+    """
+    Raise ``CancelledError`` if the surrounding operation was cancelled.
+    Useful between steps that do not await (or in worker threads, which never
+    see the task cancellation itself).
+    """
+    if cancellation_requested():
+        raise asyncio.CancelledError()
+
+
+class CancellationRegistry:
+    """In-flight operations by scope"""
+
+    def __init__(self):
+        self._inflight: Dict[str, _InFlight] = {}
+
+    async def run(self, scope: str, coro: Awaitable[Any], operation: str = "work") -> Any:
+        """
+        Run ``coro`` as the operation for ``scope``, superseding any operation
+        already running there. Raises ``OperationCancelled`` if it gets
+        cancelled; cancelling the caller cancels the operation too.
+        """
+        self.cancel(scope, reason="superseded")
+
+        entry = _InFlight(scope=scope, operation=operation, task=None, started=time.perf_counter())
+
+        async def runner():
+            _current.set(entry)
+            return await coro
+
+        task = entry.task = asyncio.create_task(runner())
+        self._inflight[scope] = entry
+
+        try:
+            return await task
+        except asyncio.CancelledError:
+            caller = asyncio.current_task()
+            caller_cancelled = caller is not None and caller.cancelling() > 0
+            if entry.reason is not None and not caller_cancelled:
+                raise OperationCancelled(scope, entry.reason) from None
+            raise
+        finally:
+            if self._inflight.get(scope) is entry:
+                del self._inflight[scope]
+            if entry.reason is not None and task.cancelled():
+                release = time.perf_counter() - entry.requested_at
+                get_metrics().record_cancellation(operation, entry.reason, release)
+                logger.info("Operation cancelled", scope=scope, operation=operation,
+                            reason=entry.reason, release_ms=round(release * 1000, 2))
+
+    def cancel(self, scope: str, reason: str = "cancelled") -> bool:
+        """Cancel the operation running in ``scope``; False if there is none"""
+        entry = self._inflight.get(scope)
+        if entry is None or entry.task.done() or entry.reason is not None:
+            return False
+        entry.reason = reason
+        entry.requested_at = time.perf_counter()
+        entry.task.cancel()
+        return True
+
+    def is_running(self, scope: str) -> bool:
+        entry = self._inflight.get(scope)
+        return entry is not None and not entry.task.done()
+
+    def in_flight(self) -> Dict[str, Dict[str, Any]]:
+        """Snapshot of running operations (for status endpoints)"""
+        now = time.perf_counter()
+        return {
+            scope: {"operation": entry.operation, "running_seconds": round(now - entry.started, 3)}
+            for scope, entry in self._inflight.items()
+            if not entry.task.done()
+        }
+
+
+# Global registry instance
+_registry: Optional[CancellationRegistry] = None
+
+
+def get_cancellation_registry() -> CancellationRegistry:
+    """Get or create the cancellation registry"""
+    global _registry
+    if _registry is None:
+        _registry = CancellationRegistry()
+    return _registry
@@ -3,9 +3,9 @@ Configuration management for Ultimate Coding Agent (Python)
 Centralized settings with security best practices
 """
 
-from typing import Optional, List
+from typing import Optional, List, Literal
 from pydantic_settings import BaseSettings
-from pydantic import SecretStr, Field, field_validator, ConfigDict
+from pydantic import SecretStr, Field, field_validator, model_validator, ConfigDict
 
 
 class Settings(BaseSettings):
@@ -35,6 +35,11 @@ class Settings(BaseSettings):
     jwt_secret: SecretStr = Field(..., description="Secret key for JWT encoding")
     jwt_algorithm: str = "HS256"
     jwt_expiration_hours: int = 24
+    auth_token_cache_size: int = Field(default=10_000, description="Verified JWTs kept in memory; 0 verifies every request")
+    auth_token_cache_ttl_seconds: int = Field(default=300, description="Longest time a cached verification is reused, even if the token lives longer")
+    auth_hash_workers: int = Field(default=4, description="Threads for bcrypt hashing and verification")
+    api_key_hmac_secret: Optional[SecretStr] = Field(default=None, description="Key of the HMAC-SHA256 API key index; defaults to jwt_secret")
+    api_key_legacy_bcrypt: bool = Field(default=False, description="Accept bcrypt-hashed API keys sent as '<api_keys.id>.<key>' (one bcrypt check per request), rehashing them on use")
     
     # CORS Configuration
     allowed_origins: List[str] = Field(
@@ -55,12 +60,49 @@ class Settings(BaseSettings):
     db_echo: bool = False
     db_pool_size: int = 20
     db_max_overflow: int = 10
+    db_pool_timeout: float = Field(default=30.0, description="Seconds to wait for a pooled connection before failing")
+    db_pool_recycle: int = Field(default=1800, description="Seconds before a pooled connection is replaced")
+    db_sqlite_mmap_size: int = Field(default=268_435_456, description="SQLite PRAGMA mmap_size in bytes (0 disables memory-mapped reads)")
+    db_sqlite_cache_size: int = Field(default=-65_536, description="SQLite PRAGMA cache_size; negative values are KiB, so -65536 is 64 MB per connection")
+    db_sqlite_busy_timeout_ms: int = Field(default=5000, description="How long SQLite waits on a locked database before raising")
+
+    # ==================== Audit Log ====================
+    audit_enabled: bool = Field(default=True, description="Record API requests and Telegram commands in audit_logs")
+    audit_flush_interval_ms: int = Field(default=500, description="Longest time an audit event waits in memory before it is written")
+    audit_batch_size: int = Field(default=500, description="Audit events written per INSERT/COPY; a full batch is flushed immediately")
+    audit_queue_size: int = Field(default=20_000, description="Audit events held in memory before new ones are dropped")
+
+    # ==================== Blob Store ====================
+    blob_store_dir: str = Field(default="./data/blobs", description="Content-addressed store for generated code, build logs and analysed sources")
+    blob_zstd_level: int = Field(default=3, description="zstd compression level for stored blobs (1-22)")
+    blob_gc_grace_seconds: int = Field(default=3600, description="Unreferenced blobs and orphaned files younger than this are kept by garbage collection")
+
+    # ==================== Search ====================
+    search_enabled: bool = Field(default=True, description="Index chat messages, builds and build logs for full-text search")
+    search_index_interval_ms: int = Field(default=1000, description="Longest time a document waits in memory before it is indexed")
+    search_index_batch_size: int = Field(default=200, description="Documents upserted per indexing transaction; a full batch is indexed immediately")
+    search_queue_size: int = Field(default=10_000, description="Documents held in memory before new ones are dropped from the index")
+    search_max_body_chars: int = Field(default=200_000, description="Indexed text per document; longer build logs are truncated")
+
+    # ==================== Retention ====================
+    retention_builds_days: int = Field(default=30, description="Finished builds (with their analyses, vectors and blobs) older than this are deleted; 0 keeps them")
+    retention_analyses_days: int = Field(default=90, description="Standalone code analyses older than this are deleted; 0 keeps them")
+    retention_audit_days: int = Field(default=90, description="Audit log entries older than this are deleted; 0 keeps them")
+    retention_conversations_days: int = Field(default=90, description="Indexed chat messages older than this are removed from search; 0 keeps them")
+    retention_batch_size: int = Field(default=1000, description="Rows deleted per transaction, so no retention delete holds locks for long")
+    retention_batch_pause_ms: int = Field(default=50, description="Pause between delete batches to let other writers in")
+    retention_interval_hours: float = Field(default=6.0, description="Hours between in-process retention runs")
+    retention_in_process: bool = Field(default=True, description="Run retention from the API process; disable when Celery beat runs app.tasks.maintenance.cleanup_expired_builds")
 
     # ==================== Redis Configuration ====================
     redis_url: SecretStr = Field(default="redis://localhost:6379/0")
     redis_cache_ttl: int = 3600
     session_expiration_hours: int = 24
 
+    # ==================== Conversation Sessions ====================
+    session_timeout_minutes: int = Field(default=30, description="Idle time before a user session is reset")
+    session_max_messages: int = Field(default=50, description="Chat messages kept per user session")
+
     # ==================== Ollama Configuration (Local via SSH tunnel) ====================
     ollama_host: str = Field(default="http://localhost:11434")
     ollama_model: str = Field(default="qwen2.5-coder:480b")
@@ -71,6 +113,58 @@ class Settings(BaseSettings):
     telegram_bot_token: SecretStr = Field(default="")
     admin_telegram_ids: List[int] = Field(default=[])
     telegram_webhook_url: Optional[str] = None
+    telegram_mode: Literal["auto", "polling", "webhook"] = Field(default="auto", description="Update delivery: webhook needs TELEGRAM_WEBHOOK_URL, auto uses it when set")
+    telegram_webhook_secret: Optional[SecretStr] = Field(default=None, description="Webhook secret token, required in webhook mode")
+    telegram_api_base_url: Optional[str] = Field(default=None, description="Self-hosted Bot API server, e.g. http://localhost:8081")
+    telegram_update_concurrency: int = Field(default=16, description="Updates handled concurrently (ordered per chat)")
+    telegram_max_pending_updates: int = Field(default=1024, description="Updates admitted before the fetcher waits")
+    telegram_supersede_in_flight: bool = Field(default=True, description="A new message or button press cancels the reply still being generated for that chat")
+    telegram_dedup_ttl_seconds: int = Field(default=86400, description="How long seen update ids are remembered (Telegram keeps updates 24h)")
+    telegram_dedup_max_entries: int = Field(default=200000, description="Max update ids kept in memory")
+    telegram_dedup_spill_path: Optional[str] = Field(default="./data/telegram_seen_updates.sqlite", description="SQLite file that keeps seen ids across restarts (empty to disable)")
+    telegram_dedup_flush_seconds: float = Field(default=0.5, description="How often queued spill writes are committed, off the event loop")
+    telegram_global_rate: float = Field(default=25.0, description="Max outbound messages per second across all chats")
+    telegram_chat_rate: float = Field(default=1.0, description="Max outbound messages per second to one chat")
+    telegram_chat_burst: int = Field(default=3, description="Messages a chat may receive back to back")
+    telegram_max_retries: int = Field(default=3, description="Delivery retries on RetryAfter/network errors")
+    telegram_digest_interval: float = Field(default=60.0, description="Seconds autonomous notifications are batched into a digest")
+
+    # ==================== Vector Store (Chroma) ====================
+    vector_store_engine: str = Field(default="chroma", description="chroma, or local (built-in mmap float16 index, see app/db/local_index.py)")
+    vector_store_max_workers: int = Field(default=4, description="Threads dedicated to Chroma calls")
+    vector_store_max_pending: int = Field(default=64, description="Chroma calls admitted (running or queued) before callers wait")
+    vector_query_timeout: float = Field(default=10.0, description="Seconds a query/get may take, queueing included")
+    vector_write_timeout: float = Field(default=30.0, description="Seconds an add/delete may take, batching included")
+    vector_write_batch_size: int = Field(default=256, description="Max adds or deletes merged into one Chroma call")
+    vector_write_batch_window_ms: float = Field(default=5.0, description="How long a write waits for others to batch with")
+    vector_chunk_max_chars: int = Field(default=1500, description="Max characters per indexed code chunk")
+    vector_embed_batch_size: int = Field(default=64, description="Chunks embedded per embedding call during bulk ingestion")
+    vector_upsert_batch_size: int = Field(default=512, description="Chunks written per Chroma upsert during bulk ingestion")
+
+    # ==================== Local Vector Index ====================
+    local_index_ivf_min_rows: int = Field(default=10_000, description="Live rows before unfiltered searches use the IVF quantizer")
+    local_index_ivf_probes: int = Field(default=16, description="IVF lists scanned per query (more is slower, better recall)")
+    local_index_compact_ratio: float = Field(default=0.3, description="Tombstoned fraction of a vector file that triggers compaction")
+
+    # ==================== Retrieval ====================
+    retrieval_candidates: int = Field(default=20, description="Hits taken from each dense and keyword search before fusion")
+    retrieval_rrf_k: int = Field(default=60, description="Reciprocal-rank fusion constant (higher flattens rank differences)")
+    retrieval_token_budget: int = Field(default=3000, description="Estimated tokens of retrieved context passed on")
+    retrieval_cache_size: int = Field(default=512, description="Cached dense search results (0 disables)")
+    retrieval_cache_ttl: float = Field(default=300.0, description="Seconds a cached search result stays valid")
+    retrieval_embedding_cache_size: int = Field(default=2048, description="Cached query embeddings (0 disables)")
+
+    # ==================== Embeddings ====================
+    embedding_backend: str = Field(default="auto", description="ollama, onnx, hashed, or auto (first reachable, hashed as last resort)")
+    embedding_model: str = Field(default="nomic-embed-text", description="Ollama embedding model")
+    embedding_dimension: int = Field(default=384, description="Hashed backend dimension when the store is empty")
+    embedding_probe_timeout: float = Field(default=10.0, description="Seconds to wait for a model to answer at startup")
+
+    # ==================== Workspace Indexer ====================
+    workspace_index_enabled: bool = Field(default=True, description="Keep code_snippets in sync with the workspace directory")
+    workspace_index_poll_interval: float = Field(default=2.0, description="Seconds between stat scans when inotify is unavailable")
+    workspace_index_use_inotify: bool = Field(default=True, description="Watch with inotify (watchfiles) when installed")
+    workspace_index_max_file_bytes: int = Field(default=1_000_000, description="Larger files are not indexed")
 
     # ==================== Celery Configuration ====================
     celery_broker_url: SecretStr = Field(default="redis://localhost:6379/1")
@@ -81,6 +175,8 @@ class Settings(BaseSettings):
     log_level: str = Field(default="INFO", pattern="^(DEBUG|INFO|WARNING|ERROR|CRITICAL)$")
     prometheus_enabled: bool = True
     prometheus_port: int = 8001
+    telemetry_sample_interval: float = Field(default=2.0, description="Seconds between system telemetry samples")
+    telemetry_buffer_size: int = Field(default=1800, description="Telemetry samples kept in memory (ring buffer)")
     
     # Sentry Configuration (Optional)
     sentry_dsn: Optional[SecretStr] = None
@@ -118,6 +214,12 @@ class Settings(BaseSettings):
     autonomous_mode: bool = Field(default=True, description="Enable autonomous background operation")
     check_interval: int = Field(default=300, description="Task check interval in seconds (default: 5 minutes)")
     autonomous_max_tasks: int = Field(default=3, description="Max concurrent autonomous tasks")
+    schedule_poll_interval: int = Field(default=5, description="Seconds between schedules.json change checks")
+    task_journal_max_mb: int = Field(default=5, description="Task journal file size before rotation (MB)")
+    task_journal_keep_files: int = Field(default=10, description="Rotated task journal files kept")
+    scheduler_jobstore_url: str = Field(default="sqlite:///./data/scheduler_jobs.sqlite", description="Persistent APScheduler job store")
+    scheduler_max_workers: int = Field(default=4, description="Max scheduled skill jobs running at once")
+    scheduler_misfire_grace_seconds: int = Field(default=300, description="How late a scheduled job may still run")
 
     # ==================== MCP Integration ====================
     enable_mcp_servers: bool = Field(default=True, description="Enable MCP server integration")
@@ -146,10 +248,21 @@ class Settings(BaseSettings):
     def validate_db_url(cls, v):
         """Validate database URL format"""
         url = v.get_secret_value()
-        if not any(url.startswith(prefix) for prefix in ["postgresql://", "sqlite://", "mysql://"]):
-            raise ValueError("Database URL must start with valid scheme (postgresql, sqlite, mysql)")
+        if url.startswith("mysql"):
+            # The app also runs on an async engine, configured for aiosqlite and asyncpg only
+            raise ValueError("MySQL is not supported; use a postgresql:// or sqlite:// database URL")
+        if not any(url.startswith(prefix) for prefix in ["postgresql://", "sqlite://"]):
+            raise ValueError("Database URL must start with valid scheme (postgresql, sqlite)")
         return v
 
+    @model_validator(mode="after")
+    def validate_telegram_webhook(self):
+        """Webhook mode needs a fixed secret so the endpoint can authenticate Telegram"""
+        webhook = self.telegram_mode == "webhook" or (self.telegram_mode == "auto" and self.telegram_webhook_url)
+        if webhook and not (self.telegram_webhook_secret and self.telegram_webhook_secret.get_secret_value()):
+            raise ValueError("Telegram webhook mode requires TELEGRAM_WEBHOOK_SECRET")
+        return self
+
 
 # Create global settings instance
 settings = Settings()
@@ -6,56 +6,15 @@ Manages conversation history, context windows, and SOUL.md integration
 import structlog
 import json
 from typing import List, Dict, Optional, Any
-from datetime import datetime, timedelta
 from pathlib import Path
-from dataclasses import dataclass, field, asdict
-from collections import deque
-
-logger = structlog.get_logger(__name__)
 
+from app.core.session_store import Message, UserSession, SessionStore, get_session_store
 
-@dataclass
-class Message:
-    """Single message in conversation"""
-    role: str  # user, assistant, system
-    content: str
-    timestamp: datetime = field(default_factory=datetime.now)
-    metadata: Dict[str, Any] = field(default_factory=dict)
-    
-    def to_ollama_format(self) -> Dict[str, str]:
-        """Convert to Ollama message format"""
-        return {
-            "role": self.role,
-            "content": self.content
-        }
+logger = structlog.get_logger(__name__)
 
 
-@dataclass
-class ConversationContext:
-    """Conversation context for a user"""
-    user_id: int
-    messages: deque = field(default_factory=lambda: deque(maxlen=50))
-    last_activity: datetime = field(default_factory=datetime.now)
-    metadata: Dict[str, Any] = field(default_factory=dict)
-    
-    def add_message(self, role: str, content: str, metadata: Optional[Dict] = None):
-        """Add message to context"""
-        msg = Message(
-            role=role,
-            content=content,
-            metadata=metadata or {}
-        )
-        self.messages.append(msg)
-        self.last_activity = datetime.now()
-    
-    def get_recent_messages(self, count: int = 10) -> List[Message]:
-        """Get recent messages"""
-        return list(self.messages)[-count:]
-    
-    def clear(self):
-        """Clear conversation history"""
-        self.messages.clear()
-        self.last_activity = datetime.now()
+# Chat history now lives on the unified per-user session
+ConversationContext = UserSession
 
 
 class MemoryManager:
@@ -67,16 +26,15 @@ class MemoryManager:
     def __init__(
         self,
         max_context_messages: int = 20,
-        context_timeout_minutes: int = 30,
-        soul_file: Optional[Path] = None
+        soul_file: Optional[Path] = None,
+        session_store: Optional[SessionStore] = None
     ):
         self.max_context_messages = max_context_messages
-        self.context_timeout = timedelta(minutes=context_timeout_minutes)
         # Fix: The plan used Path(__file__).parent.parent.parent / "SOUL.md" which would be project root.
         self.soul_file = soul_file or Path(__file__).parent.parent.parent / "SOUL.md"
         
-        # User contexts
-        self.contexts: Dict[int, ConversationContext] = {}
+        # User contexts are shared with AgentHandler through the session store
+        self.sessions = session_store if session_store is not None else get_session_store()
         
         # Load SOUL configuration
         self.soul_identity = self._load_soul()
@@ -84,7 +42,7 @@ class MemoryManager:
         logger.info(
             "memory_manager_initialized",
             max_context=max_context_messages,
-            timeout_minutes=context_timeout_minutes,
+            timeout_minutes=int(self.sessions.timeout.total_seconds() // 60),
             soul_loaded=bool(self.soul_identity)
         )
     
@@ -104,18 +62,7 @@ class MemoryManager:
     
     def get_context(self, user_id: int) -> ConversationContext:
         """Get or create conversation context for user"""
-        if user_id not in self.contexts:
-            self.contexts[user_id] = ConversationContext(user_id=user_id)
-            logger.info("context_created", user_id=user_id)
-        
-        context = self.contexts[user_id]
-        
-        # Check if context expired
-        if datetime.now() - context.last_activity > self.context_timeout:
-            logger.info("context_expired", user_id=user_id, clearing=True)
-            context.clear()
-        
-        return context
+        return self.sessions.get(user_id)
     
     def add_user_message(self, user_id: int, content: str, metadata: Optional[Dict] = None):
         """Add user message to context"""
@@ -169,10 +116,10 @@ class MemoryManager:
     
     def get_context_summary(self, user_id: int) -> Dict[str, Any]:
         """Get summary of user's context"""
-        if user_id not in self.contexts:
+        context = self.sessions.peek(user_id)
+        if context is None:
             return {"exists": False}
         
-        context = self.contexts[user_id]
         return {
             "exists": True,
             "message_count": len(context.messages),
@@ -182,25 +129,16 @@ class MemoryManager:
     
     def clear_context(self, user_id: int):
         """Clear user's conversation context"""
-        if user_id in self.contexts:
-            self.contexts[user_id].clear()
+        context = self.sessions.peek(user_id)
+        if context is not None:
+            context.clear()
             logger.info("context_cleared", user_id=user_id)
     
     def cleanup_expired_contexts(self):
         """Remove expired contexts to free memory"""
-        now = datetime.now()
-        expired_users = []
-        
-        for user_id, context in self.contexts.items():
-            if now - context.last_activity > self.context_timeout * 2:
-                expired_users.append(user_id)
-        
-        for user_id in expired_users:
-            del self.contexts[user_id]
-            logger.info("expired_context_removed", user_id=user_id)
-        
-        if expired_users:
-            logger.info("cleanup_complete", removed_count=len(expired_users))
+        removed_count = self.sessions.cleanup_expired()
+        if removed_count:
+            logger.info("cleanup_complete", removed_count=removed_count)
 
 
 # Global memory manager instance
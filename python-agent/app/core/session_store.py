@@ -0,0 +1,326 @@
+"""
+Unified Session Store - One in-memory session object per user
+Holds workflow state (wizards) and chat history behind a single lookup,
+a single expiry policy and a single persistence path (workflow_sessions table)
+"""
+
+import asyncio
+import structlog
+from typing import Callable, Dict, Iterator, List, Optional, Any
+from datetime import datetime, timedelta
+from dataclasses import dataclass, field
+from collections import deque
+from enum import Enum
+
+logger = structlog.get_logger(__name__)
+
+
+class WorkflowState(Enum):
+    IDLE = "idle"
+    # Project Wizard (1.2)
+    PROJECT_NAME = "project_name"
+    PROJECT_GOAL = "project_goal"
+    PROJECT_DETAILS = "project_details"
+    PROJECT_TECH = "project_tech"
+    PROJECT_LANG = "project_lang"
+    # Social Wizard (1.3)
+    SOCIAL_TYPE = "social_type"
+    SOCIAL_PLATFORM = "social_platform"
+    SOCIAL_CONTENT = "social_content"
+    # Schedule Wizard (1.4)
+    SCHEDULE_TYPE = "schedule_type"
+    SCHEDULE_DESCRIPTION = "schedule_description"
+    SCHEDULE_TIME = "schedule_time"
+    SCHEDULE_PRIORITY = "schedule_priority"
+    # Learn Button (1.5)
+    LEARN_MODE = "learn_mode"
+    LEARN_INPUT = "learn_input"
+    LEARNING = "learning"
+    # System (1.6, 1.7)
+    RESTART_CONFIRM = "restart_confirm"
+    SHUTDOWN_CONFIRM = "shutdown_confirm"
+    # Help (1.8)
+    HELP_CATEGORY = "help_category"
+
+
+@dataclass
+class Message:
+    """Single message in conversation"""
+    role: str  # user, assistant, system
+    content: str
+    timestamp: datetime = field(default_factory=datetime.now)
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    def to_ollama_format(self) -> Dict[str, str]:
+        """Convert to Ollama message format"""
+        return {
+            "role": self.role,
+            "content": self.content
+        }
+
+
+# Called with (session, message) for every message added to any session
+_message_hooks: List[Callable[["UserSession", Message], None]] = []
+
+
+def on_message(hook: Callable[["UserSession", Message], None]):
+    """Register a hook run for every new message; it must not block"""
+    if hook not in _message_hooks:
+        _message_hooks.append(hook)
+
+
+@dataclass
+class UserSession:
+    """Everything the agent keeps about one user between messages"""
+    user_id: int
+    workflow_state: WorkflowState = WorkflowState.IDLE
+    workflow_data: Dict[str, Any] = field(default_factory=dict)
+    messages: deque = field(default_factory=lambda: deque(maxlen=50))
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    created_at: datetime = field(default_factory=datetime.now)
+    last_activity: datetime = field(default_factory=datetime.now)
+    # True while a workflow_sessions row exists for this user
+    persisted: bool = False
+
+    def add_message(self, role: str, content: str, metadata: Optional[Dict] = None):
+        """Add message to history"""
+        message = Message(role=role, content=content, metadata=metadata or {})
+        self.messages.append(message)
+        self.last_activity = datetime.now()
+        for hook in _message_hooks:
+            try:
+                hook(self, message)
+            except Exception as e:
+                logger.warning("message_hook_failed", user_id=self.user_id, error=str(e))
+
+    def get_recent_messages(self, count: int = 10) -> List[Message]:
+        """Get recent messages"""
+        if count >= len(self.messages):
+            return list(self.messages)
+        return list(self.messages)[-count:]
+
+    def clear(self):
+        """Clear conversation history"""
+        self.messages.clear()
+        self.last_activity = datetime.now()
+
+    def reset_workflow(self):
+        """Return to IDLE and drop wizard data"""
+        self.workflow_state = WorkflowState.IDLE
+        self.workflow_data = {}
+        self.metadata.clear()
+        self.last_activity = datetime.now()
+
+    @property
+    def is_idle(self) -> bool:
+        return self.workflow_state == WorkflowState.IDLE
+
+
+class SessionStore:
+    """
+    Per-user session registry
+
+    Expiry: a session idle for longer than ``timeout`` is reset on next access
+    (history cleared, workflow back to IDLE, persisted row removed); sessions
+    idle for twice that long are evicted by ``cleanup_expired``.
+    Persistence: only non-idle workflow state is written to workflow_sessions.
+    """
+
+    def __init__(
+        self,
+        timeout_minutes: int = 30,
+        max_messages: int = 50,
+        session_factory: Optional[Callable[[], Any]] = None
+    ):
+        self.timeout = timedelta(minutes=timeout_minutes)
+        self.max_messages = max_messages
+        self._session_factory = session_factory
+        self._sessions: Dict[int, UserSession] = {}
+
+        logger.info(
+            "session_store_initialized",
+            timeout_minutes=timeout_minutes,
+            max_messages=max_messages
+        )
+
+    def _db(self):
+        """Open a database session (lazy import keeps core free of DB setup)"""
+        if self._session_factory is None:
+            from app.db.session import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def _new_session(self, user_id: int) -> UserSession:
+        return UserSession(user_id=user_id, messages=deque(maxlen=self.max_messages))
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __iter__(self) -> Iterator[UserSession]:
+        return iter(list(self._sessions.values()))
+
+    def peek(self, user_id: int) -> Optional[UserSession]:
+        """Return the in-memory session without creating, loading or expiring it"""
+        return self._sessions.get(user_id)
+
+    def get(self, user_id: int) -> UserSession:
+        """Get or create the session for a user (memory first, then database; blocking, see get_async)"""
+        session = self._sessions.get(user_id)
+        if session is None:
+            return self._install(user_id, self._load(user_id))
+        if self._expire(session):
+            self._delete_row(session)
+        return session
+
+    async def get_async(self, user_id: int) -> UserSession:
+        """``get`` for the event loop: the database load and expiry delete run in a worker thread"""
+        session = self._sessions.get(user_id)
+        if session is None:
+            loaded = await asyncio.to_thread(self._load, user_id)
+            # Another caller may have created the session while this one was loading
+            session = self._sessions.get(user_id)
+            return session if session is not None else self._install(user_id, loaded)
+        if self._expire(session):
+            await asyncio.to_thread(self._delete_row, session)
+        return session
+
+    def _install(self, user_id: int, loaded: Optional[UserSession]) -> UserSession:
+        session = loaded or self._new_session(user_id)
+        self._sessions[user_id] = session
+        logger.debug("session_created", user_id=user_id, restored=session.persisted)
+        return session
+
+    def _load(self, user_id: int) -> Optional[UserSession]:
+        """Restore an unexpired workflow from the database"""
+        from app.models.database import WorkflowSession
+
+        db = self._db()
+        try:
+            row = db.query(WorkflowSession).filter(WorkflowSession.user_id == user_id).first()
+            if row is None:
+                return None
+            if row.expires_at and row.expires_at < datetime.utcnow():
+                db.delete(row)
+                db.commit()
+                return None
+            session = self._new_session(user_id)
+            session.workflow_state = WorkflowState(row.state)
+            session.workflow_data = dict(row.data or {})
+            session.created_at = row.created_at or session.created_at
+            session.persisted = True
+            return session
+        except Exception as e:
+            logger.error("session_load_failed", user_id=user_id, error=str(e))
+            db.rollback()
+            return None
+        finally:
+            db.close()
+
+    def _expire(self, session: UserSession) -> bool:
+        """Reset a session idle past the timeout; True if its database row must be deleted"""
+        if datetime.now() - session.last_activity <= self.timeout:
+            return False
+        logger.info("session_expired", user_id=session.user_id)
+        session.clear()
+        if not session.is_idle or session.persisted:
+            session.reset_workflow()
+            return True
+        return False
+
+    def persist(self, session: UserSession):
+        """
+        Write workflow state to the database
+        Idle sessions have nothing to resume, so their row is removed instead
+        """
+        if session.is_idle:
+            if session.persisted:
+                self._delete_row(session)
+            return
+
+        from app.models.database import WorkflowSession
+
+        now = datetime.utcnow()
+        values = {
+            "state": session.workflow_state.value,
+            "data": session.workflow_data,
+            "updated_at": now,
+            "expires_at": now + self.timeout,
+        }
+        db = self._db()
+        try:
+            # Known rows take a single UPDATE; new ones a single INSERT
+            updated = 0
+            if session.persisted:
+                updated = db.query(WorkflowSession).filter(
+                    WorkflowSession.user_id == session.user_id
+                ).update(values, synchronize_session=False)
+            if not updated:
+                db.add(WorkflowSession(user_id=session.user_id, created_at=now, **values))
+            db.commit()
+            session.persisted = True
+            logger.debug("session_persisted", user_id=session.user_id, state=values["state"])
+        except Exception as e:
+            logger.error("session_persist_failed", user_id=session.user_id, error=str(e))
+            db.rollback()
+        finally:
+            db.close()
+
+    def _delete_row(self, session: UserSession):
+        from app.models.database import WorkflowSession
+
+        db = self._db()
+        try:
+            db.query(WorkflowSession).filter(WorkflowSession.user_id == session.user_id).delete()
+            db.commit()
+            session.persisted = False
+        except Exception as e:
+            logger.error("session_delete_failed", user_id=session.user_id, error=str(e))
+            db.rollback()
+        finally:
+            db.close()
+
+    def reset(self, user_id: int):
+        """Reset a user's workflow (history is kept; blocking, see reset_async)"""
+        self._delete_row(self._reset_workflow(user_id))
+
+    async def reset_async(self, user_id: int):
+        """``reset`` for the event loop: the row is deleted in a worker thread"""
+        await asyncio.to_thread(self._delete_row, self._reset_workflow(user_id))
+
+    def _reset_workflow(self, user_id: int) -> UserSession:
+        session = self._sessions.get(user_id)
+        if session is None:
+            session = self._new_session(user_id)
+            session.persisted = True  # a stale row may exist from a previous run
+            self._sessions[user_id] = session
+        session.reset_workflow()
+        return session
+
+    def cleanup_expired(self) -> int:
+        """Evict sessions idle for more than twice the timeout"""
+        cutoff = datetime.now() - self.timeout * 2
+        expired = [uid for uid, s in self._sessions.items() if s.last_activity < cutoff]
+        for user_id in expired:
+            del self._sessions[user_id]
+        if expired:
+            logger.info("sessions_evicted", removed_count=len(expired))
+        return len(expired)
+
+
+# Global session store instance
+_session_store: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    """Get or create global session store"""
+    global _session_store
+    if _session_store is None:
+        from app.core.config import settings
+        _session_store = SessionStore(
+            timeout_minutes=settings.session_timeout_minutes,
+            max_messages=settings.session_max_messages
+        )
+    return _session_store
@@ -0,0 +1,277 @@
+"""
+Task Journal - Buffered JSONL log of autonomous task events
+Replaces synchronous TASKS.md appends: events are queued in memory, written
+in batches off the event loop, rotated and gzip-compressed by size, and
+indexed by task id. The markdown view is rendered on demand.
+
+The index lives in SQLite (index.sqlite), so a flush appends one row per
+record instead of rewriting the whole index. Rotated files are written as a
+series of gzip members of about GZIP_BLOCK_BYTES each, aligned to record
+boundaries, and the index keeps where each member starts; ``get`` on a
+rotated file decompresses only the member holding the record.
+"""
+
+import asyncio
+import gzip
+import json
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+ACTIVE_FILE = "tasks.jsonl"
+INDEX_FILE = "index.sqlite"
+# Uncompressed bytes per gzip member of a rotated file
+GZIP_BLOCK_BYTES = 64 * 1024
+
+
+class TaskJournal:
+    """
+    Append-only task event journal
+
+    Records are buffered until ``batch_size`` events are pending or
+    ``flush_interval`` seconds pass. The index maps task id to the
+    (file, offset) of each of its records; offsets are positions in the
+    uncompressed stream, so they stay valid after a file is gzipped, and
+    rotation only renames the file of the active rows.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        max_file_bytes: int = 5 * 1024 * 1024,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        keep_files: int = 10
+    ):
+        self.directory = Path(directory)
+        self.max_file_bytes = max_file_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.keep_files = keep_files
+
+        self._pending: List[Dict[str, Any]] = []
+        self._io_lock = threading.Lock()
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._index: Optional[sqlite3.Connection] = None
+
+    # ==================== Recording ====================
+
+    def record(self, task_id: str, event: str, **fields):
+        """Queue one event; never touches the disk"""
+        entry = {"ts": datetime.now().isoformat(), "task_id": task_id, "event": event}
+        entry.update({k: v for k, v in fields.items() if v is not None})
+        self._pending.append(entry)
+        if len(self._pending) >= self.batch_size and self._flush_requested is not None:
+            self._flush_requested.set()
+
+    async def start(self):
+        """Start the background flusher"""
+        if self._flusher is None:
+            self._flush_requested = asyncio.Event()
+            self._flusher = asyncio.create_task(self._run_flusher())
+
+    async def close(self):
+        """Stop the flusher and write everything still pending"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+            self._flush_requested = None
+        await self.flush()
+
+    async def _run_flusher(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("task_journal_flush_failed", error=str(e))
+
+    async def flush(self):
+        """Write pending records in one batch on a worker thread"""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        await asyncio.to_thread(self._write_batch, batch)
+
+    # ==================== File I/O (worker thread) ====================
+
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        with self._io_lock:
+            active = self.directory / ACTIVE_FILE
+            with open(active, "ab") as f:
+                offset = f.tell()
+                chunks = []
+                rows = []
+                for entry in batch:
+                    line = json.dumps(entry, separators=(",", ":"), default=str).encode() + b"\n"
+                    rows.append((entry["task_id"], ACTIVE_FILE, offset))
+                    offset += len(line)
+                    chunks.append(line)
+                f.write(b"".join(chunks))
+                size = offset
+
+            with self._db:
+                self._db.executemany("INSERT INTO records (task_id, file, pos) VALUES (?, ?, ?)", rows)
+            if size >= self.max_file_bytes:
+                self._rotate(active)
+
+    def _rotate(self, active: Path):
+        """Compress the active file as gzip members and re-point its index rows"""
+        rotated_name = f"tasks-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.jsonl.gz"
+        blocks = []
+        with open(active, "rb") as src, open(self.directory / rotated_name, "wb") as dst:
+            position = 0
+            while True:
+                data = src.read(GZIP_BLOCK_BYTES)
+                if not data:
+                    break
+                data += src.readline()  # a record never spans two members
+                blocks.append((rotated_name, position, dst.tell()))
+                dst.write(gzip.compress(data))
+                position += len(data)
+
+        with self._db:
+            self._db.executemany("INSERT INTO blocks (file, pos, compressed_pos) VALUES (?, ?, ?)", blocks)
+            self._db.execute("UPDATE records SET file = ? WHERE file = ?", (rotated_name, ACTIVE_FILE))
+        active.unlink()
+
+        rotated = sorted(self.directory.glob("tasks-*.jsonl.gz"))
+        expired = [p.name for p in rotated[:-self.keep_files]] if self.keep_files else []
+        for name in expired:
+            (self.directory / name).unlink(missing_ok=True)
+        if expired:
+            with self._db:
+                for table in ("records", "blocks"):
+                    self._db.executemany(f"DELETE FROM {table} WHERE file = ?", [(name,) for name in expired])
+
+        logger.info("task_journal_rotated", file=rotated_name, removed=len(expired))
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """Index connection, opened on first use (callers hold _io_lock)"""
+        if self._index is None:
+            self._index = self._open_index()
+        return self._index
+
+    def _open_index(self) -> sqlite3.Connection:
+        db = sqlite3.connect(str(self.directory / INDEX_FILE), check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        with db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS records (task_id TEXT NOT NULL, file TEXT NOT NULL, pos INTEGER NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS idx_records_task ON records(task_id)")
+            db.execute("CREATE INDEX IF NOT EXISTS idx_records_file ON records(file)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS blocks ("
+                "file TEXT NOT NULL, pos INTEGER NOT NULL, compressed_pos INTEGER NOT NULL, PRIMARY KEY (file, pos))"
+            )
+        return db
+
+    def _read_record(self, path: Path, offset: int) -> bytes:
+        """The line at an uncompressed offset, decompressing at most one gzip member"""
+        if path.suffix != ".gz":
+            with open(path, "rb") as f:
+                f.seek(offset)
+                return f.readline()
+
+        block = self._db.execute(
+            "SELECT pos, compressed_pos FROM blocks WHERE file = ? AND pos <= ? ORDER BY pos DESC LIMIT 1",
+            (path.name, offset)
+        ).fetchone()
+        start, compressed_pos = block
+        member = zlib.decompressobj(wbits=31)
+        parts = []
+        with open(path, "rb") as f:
+            f.seek(compressed_pos)
+            while not member.eof:
+                chunk = f.read(16384)
+                if not chunk:
+                    break
+                parts.append(member.decompress(chunk))
+        data = b"".join(parts)
+        end = data.find(b"\n", offset - start)
+        return data[offset - start:end + 1 if end >= 0 else len(data)]
+
+    @staticmethod
+    def _open(path: Path):
+        return gzip.open(path, "rb") if path.suffix == ".gz" else open(path, "rb")
+
+    # ==================== Queries ====================
+
+    def get(self, task_id: str) -> List[Dict[str, Any]]:
+        """All flushed records of one task, via the index"""
+        records = []
+        with self._io_lock:
+            rows = self._db.execute(
+                "SELECT file, pos FROM records WHERE task_id = ? ORDER BY rowid", (task_id,)
+            ).fetchall()
+            for name, offset in rows:
+                path = self.directory / name
+                if not path.exists():
+                    continue
+                records.append(json.loads(self._read_record(path, offset)))
+        records.extend(r for r in self._pending if r["task_id"] == task_id)
+        return records
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent records, oldest first (reads only as many files as needed)"""
+        records: List[Dict[str, Any]] = list(self._pending)
+        with self._io_lock:
+            files = [self.directory / ACTIVE_FILE] + sorted(self.directory.glob("tasks-*.jsonl.gz"), reverse=True)
+            for path in files:
+                if len(records) >= limit:
+                    break
+                if not path.exists():
+                    continue
+                with self._open(path) as f:
+                    lines = f.read().splitlines()
+                records = [json.loads(line) for line in lines] + records
+        return records[-limit:]
+
+    def render_markdown(self, limit: int = 50) -> str:
+        """Human-readable view in the format TASKS.md used to have"""
+        sections = ["# Autonomous Task Log\n"]
+        for entry in self.recent(limit):
+            if entry["event"] == "start":
+                sections.append(
+                    f"## Task Started: {entry['ts']}\n"
+                    f"ID: {entry['task_id']}\n"
+                    f"Type: {entry.get('type', 'unknown')}\n"
+                    f"Description: {entry.get('description', '')}\n"
+                    f"Source: {entry.get('source', 'unknown')}\n"
+                )
+            elif entry["event"] == "complete":
+                sections.append(
+                    f"## Task Completed: {entry['ts']}\n"
+                    f"ID: {entry['task_id']}\n"
+                    f"Success: {entry.get('success', False)}\n"
+                    f"Action: {entry.get('action', 'unknown')}\n"
+                    f"Result: {json.dumps(entry.get('output', {}), indent=2)}\n"
+                )
+            elif entry["event"] == "error":
+                sections.append(
+                    f"## Task Failed: {entry['ts']}\n"
+                    f"ID: {entry['task_id']}\n"
+                    f"Error: {entry.get('error', '')}\n"
+                )
+        return "\n".join(sections)
@@ -0,0 +1,278 @@
+"""
+Write-behind audit log
+
+Callers enqueue audit events in memory (a deque append, no I/O); a
+background task bulk-inserts them into audit_logs every
+``audit_flush_interval_ms`` or as soon as ``audit_batch_size`` events are
+waiting. Batches go through one executemany INSERT, or COPY when the async
+engine runs on asyncpg.
+
+The queue is bounded. ``record`` never waits: when the queue is full the
+event is dropped and counted. ``put`` applies backpressure instead, waiting
+for the flusher to make room, for events that must not be lost. Failed
+batches are put back at the front of the queue while there is room. ``stop``
+flushes whatever is still queued.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.models.database import AuditLog
+from app.monitoring.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+AUDIT_COLUMNS = (
+    "user_id", "action", "resource_type", "resource_id", "details",
+    "ip_address", "user_agent", "success", "error_message", "created_at",
+)
+
+
+def _event(
+    action: str,
+    resource_type: str,
+    resource_id: Optional[str] = None,
+    user_id: Optional[int] = None,
+    details: Optional[Dict[str, Any]] = None,
+    ip_address: Optional[str] = None,
+    user_agent: Optional[str] = None,
+    success: bool = True,
+    error_message: Optional[str] = None,
+) -> Dict[str, Any]:
+    return {
+        "user_id": user_id,
+        "action": action[:100],
+        "resource_type": resource_type[:100],
+        "resource_id": resource_id[:255] if resource_id else resource_id,
+        "details": details,
+        "ip_address": ip_address,
+        "user_agent": user_agent[:500] if user_agent else user_agent,
+        "success": success,
+        "error_message": error_message,
+        "created_at": datetime.utcnow(),
+    }
+
+
+class AuditSink:
+    """Bounded in-memory queue of audit events with a batching background writer"""
+
+    def __init__(
+        self,
+        engine=None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_queue: Optional[int] = None,
+    ):
+        self._engine = engine
+        self.batch_size = batch_size or settings.audit_batch_size
+        self.flush_interval = flush_interval if flush_interval is not None else settings.audit_flush_interval_ms / 1000
+        self.max_queue = max_queue or settings.audit_queue_size
+        self._queue: deque = deque()
+        self._wake = asyncio.Event()
+        self._space = asyncio.Condition()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from app.db.session import async_engine
+            self._engine = async_engine
+        return self._engine
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def record(self, action: str, resource_type: str, **fields) -> bool:
+        """
+        Enqueue an event without waiting; False if the queue was full and the
+        event was dropped. Call from the event loop thread.
+        """
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            get_metrics().record_audit_dropped("queue_full")
+            return False
+        self._queue.append(_event(action, resource_type, **fields))
+        if len(self._queue) >= self.batch_size:
+            self._wake.set()
+        return True
+
+    async def put(self, action: str, resource_type: str, timeout: Optional[float] = None, **fields) -> bool:
+        """Enqueue an event, waiting up to timeout (None: indefinitely) for room"""
+        if len(self._queue) >= self.max_queue and self._task is not None:
+            self._wake.set()
+            async with self._space:
+                try:
+                    await asyncio.wait_for(
+                        self._space.wait_for(lambda: len(self._queue) < self.max_queue), timeout
+                    )
+                except asyncio.TimeoutError:
+                    pass
+        return self.record(action, resource_type, **fields)
+
+    async def start(self):
+        """Start the background flusher"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="audit-flusher")
+
+    async def stop(self):
+        """Stop the flusher and write out everything still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._queue:
+            if not await self.flush():
+                break  # the database is down; what's left is lost
+        if self._queue:
+            self.dropped += len(self._queue)
+            get_metrics().record_audit_dropped("shutdown", len(self._queue))
+            self._queue.clear()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Audit flush failed: {e}")
+
+    async def flush(self) -> int:
+        """
+        Write the events queued when the flush starts, in batches; returns
+        how many were written. Events arriving meanwhile wait for the next
+        full batch or interval, so steady traffic never degrades into a
+        stream of one-row transactions.
+        """
+        written = 0
+        async with self._flush_lock:
+            remaining = len(self._queue)
+            while remaining > 0 and self._queue:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, remaining, len(self._queue)))]
+                remaining -= len(batch)
+                started = time.perf_counter()
+                try:
+                    await self._write(batch)
+                except Exception as e:
+                    self._requeue(batch)
+                    logger.warning(f"Audit batch of {len(batch)} not written: {e}")
+                    break
+                written += len(batch)
+                self.written += len(batch)
+                get_metrics().record_audit_flush(len(batch), time.perf_counter() - started, len(self._queue))
+                await self._notify_space()
+        return written
+
+    def _requeue(self, batch: List[Dict[str, Any]]):
+        room = max(self.max_queue - len(self._queue), 0)
+        kept = batch[:room]
+        self._queue.extendleft(reversed(kept))
+        lost = len(batch) - len(kept)
+        if lost:
+            self.dropped += lost
+            get_metrics().record_audit_dropped("write_error", lost)
+
+    async def _notify_space(self):
+        async with self._space:
+            self._space.notify_all()
+
+    async def _write(self, rows: List[Dict[str, Any]]):
+        async with self.engine.begin() as conn:
+            if conn.dialect.name == "postgresql" and conn.dialect.driver == "asyncpg":
+                raw = await conn.get_raw_connection()
+                await raw.driver_connection.copy_records_to_table(
+                    AuditLog.__tablename__,
+                    columns=AUDIT_COLUMNS,
+                    records=[
+                        tuple(json.dumps(row[c]) if c == "details" and row[c] is not None else row[c] for c in AUDIT_COLUMNS)
+                        for row in rows
+                    ],
+                )
+            else:
+                await conn.execute(insert(AuditLog.__table__), rows)
+
+
+def record_http_request(scope: Dict[str, Any], status_code: int, duration: float):
+    """Audit one HTTP request from its ASGI scope"""
+    route = scope.get("route")
+    client = scope.get("client")
+    user_agent = next((v.decode("latin-1") for k, v in scope.get("headers", ()) if k == b"user-agent"), None)
+    get_audit_sink().record(
+        f"{scope['method']} {getattr(route, 'path', scope['path'])}",
+        "api",
+        resource_id=scope["path"],
+        details={"status_code": status_code, "duration_ms": round(duration * 1000, 2)},
+        ip_address=client[0] if client else None,
+        user_agent=user_agent,
+        success=status_code < 400,
+    )
+
+
+class AuditMiddleware:
+    """
+    ASGI middleware queueing one audit event per HTTP request
+
+    Plain ASGI rather than @app.middleware("http"): the BaseHTTPMiddleware
+    wrapper costs more per request than the audit event itself.
+    """
+
+    def __init__(self, app, skip_prefixes: Tuple[str, ...] = ()):
+        self.app = app
+        self.skip_prefixes = tuple(skip_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.audit_enabled or scope["path"].startswith(self.skip_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            record_http_request(scope, status_code, time.perf_counter() - started)
+
+
+# Global audit sink
+_audit_sink: Optional[AuditSink] = None
+
+
+def get_audit_sink() -> AuditSink:
+    """Get or create the global audit sink"""
+    global _audit_sink
+    if _audit_sink is None:
+        _audit_sink = AuditSink()
+    return _audit_sink
+
+
+async def stop_audit_sink():
+    """Flush queued events on shutdown"""
+    global _audit_sink
+    if _audit_sink is not None:
+        await _audit_sink.stop()
+        _audit_sink = None
@@ -0,0 +1,301 @@
+"""
+Content-addressed blob store
+
+Generated code, build logs and analysed sources are kept out of the
+builds and code_analysis rows: each row stores the sha256 digest of its
+content, and the bytes live once on disk under ``blob_store_dir`` as
+``ab/cd/<digest>``, zstd-compressed. Storing content that is already there
+only touches the file, so identical code is kept once however many builds
+produce it.
+
+The blobs table counts references per digest. ``store_blob`` and
+``release_blob`` change the count in the caller's transaction, next to the
+row that gains or loses the reference (``release_blobs`` for bulk deletes).
+``collect_garbage`` removes blobs whose count has been zero for
+``blob_gc_grace_seconds``, and files that never got a row (a transaction
+that rolled back after the file was written) once they are as old.
+
+Reads stream through the decompressor, so a range (the tail of a build
+log, say) does not load the whole blob into memory.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple, Union
+
+import zstandard
+from sqlalchemy import bindparam, case, delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.database import Blob
+from app.monitoring.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+_READ_CHUNK = 1 << 16
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _as_bytes(data: Union[str, bytes]) -> bytes:
+    return data.encode("utf-8") if isinstance(data, str) else data
+
+
+class BlobStore:
+    """sha256-addressed, zstd-compressed files in two levels of shard directories"""
+
+    def __init__(self, root: Optional[Union[str, Path]] = None, level: Optional[int] = None):
+        self.root = Path(root or settings.blob_store_dir)
+        self.level = level if level is not None else settings.blob_zstd_level
+
+    def path(self, digest: str) -> Path:
+        """File of a digest; ValueError for anything that is not a sha256 hex digest"""
+        if not _DIGEST.match(digest):
+            raise ValueError(f"Invalid blob digest: {digest!r}")
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def exists(self, digest: str) -> bool:
+        return self.path(digest).exists()
+
+    def put(self, data: Union[str, bytes]) -> Tuple[str, int, int, bool]:
+        """
+        Store content: (digest, size, stored size, deduplicated). Content
+        already in the store is not written again; its mtime is refreshed so
+        garbage collection treats it as just referenced.
+        """
+        raw = _as_bytes(data)
+        digest = content_digest(raw)
+        path = self.path(digest)
+        try:
+            os.utime(path)
+            stored_size = path.stat().st_size
+            get_metrics().record_blob_write(True, len(raw), stored_size)
+            return digest, len(raw), stored_size, True
+        except FileNotFoundError:
+            pass
+
+        compressed = zstandard.ZstdCompressor(level=self.level, write_checksum=True).compress(raw)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write under a temporary name and rename, so a reader never sees a
+        # partial file and concurrent writers of the same content both succeed
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(compressed)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        get_metrics().record_blob_write(False, len(raw), len(compressed))
+        return digest, len(raw), len(compressed), False
+
+    def get(self, digest: str) -> bytes:
+        """Whole content of a blob; FileNotFoundError if it is not stored"""
+        return self.read_range(digest)
+
+    def read_range(self, digest: str, start: int = 0, length: Optional[int] = None) -> bytes:
+        """
+        length bytes (None: to the end) of the uncompressed content from
+        offset start. Only the part up to the end of the range is
+        decompressed, and only one chunk of it is held at a time.
+        """
+        if start < 0 or (length is not None and length < 0):
+            raise ValueError("Blob range must not be negative")
+        with open(self.path(digest), "rb") as f:
+            with zstandard.ZstdDecompressor().stream_reader(f) as reader:
+                # Forward seeks on a decompression stream read and discard
+                reader.seek(start)
+                if length is not None:
+                    return reader.read(length)
+                chunks = []
+                while chunk := reader.read(_READ_CHUNK):
+                    chunks.append(chunk)
+                return b"".join(chunks)
+
+    def delete(self, digest: str, older_than: Optional[float] = None) -> int:
+        """
+        Remove a blob's file, only if its mtime is before older_than when
+        given; returns the bytes freed (0 if nothing was removed)
+        """
+        path = self.path(digest)
+        try:
+            stat = path.stat()
+            if older_than is not None and stat.st_mtime >= older_than:
+                return 0
+            path.unlink()
+            return stat.st_size
+        except FileNotFoundError:
+            return 0
+
+    def iter_digests(self) -> Iterator[Tuple[str, float]]:
+        """(digest, mtime) of every stored file"""
+        if not self.root.exists():
+            return
+        for shard in self.root.iterdir():
+            if not shard.is_dir():
+                continue
+            for sub in shard.iterdir():
+                if not sub.is_dir():
+                    continue
+                for path in sub.iterdir():
+                    if _DIGEST.match(path.name):
+                        try:
+                            yield path.name, path.stat().st_mtime
+                        except FileNotFoundError:
+                            pass
+
+
+# Global blob store
+_blob_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    """Get or create the global blob store"""
+    global _blob_store
+    if _blob_store is None:
+        _blob_store = BlobStore()
+    return _blob_store
+
+
+# ==================== References ====================
+
+async def store_blob(db: AsyncSession, data: Optional[Union[str, bytes]]) -> Optional[str]:
+    """
+    Store content and take a reference to it in the caller's transaction;
+    returns the digest to put on the referencing row, or None for empty
+    content. The caller commits.
+    """
+    if not data:
+        return None
+    digest, size, stored_size, _ = await asyncio.to_thread(get_blob_store().put, data)
+
+    now = datetime.utcnow()
+    statement = (
+        update(Blob)
+        .where(Blob.digest == digest)
+        .values(refcount=Blob.refcount + 1, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    if (await db.execute(statement)).rowcount:
+        return digest
+    try:
+        async with db.begin_nested():
+            await db.execute(insert(Blob).values(
+                digest=digest, size=size, stored_size=stored_size, refcount=1, created_at=now, updated_at=now,
+            ))
+    except IntegrityError:
+        # Another transaction inserted the row first
+        await db.execute(statement)
+    return digest
+
+
+async def release_blob(db: AsyncSession, digest: Optional[str]):
+    """Drop one reference to a blob in the caller's transaction"""
+    if digest is None:
+        return
+    await db.execute(
+        update(Blob)
+        .where(Blob.digest == digest, Blob.refcount > 0)
+        .values(refcount=Blob.refcount - 1, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def load_blob(digest: Optional[str], start: int = 0, length: Optional[int] = None) -> Optional[bytes]:
+    """Content (or a range of it) of a stored blob; None for no digest"""
+    if digest is None:
+        return None
+    return await asyncio.to_thread(get_blob_store().read_range, digest, start, length)
+
+
+async def load_text(digest: Optional[str]) -> Optional[str]:
+    """Content of a stored blob decoded as UTF-8; None for no digest"""
+    data = await load_blob(digest)
+    return data.decode("utf-8") if data is not None else None
+
+
+def release_blobs(db: Session, digests: Iterable[Optional[str]]):
+    """
+    Drop one reference per digest (None entries ignored) in the caller's
+    synchronous transaction, one UPDATE per distinct digest; for bulk
+    deletes such as retention
+    """
+    counts = Counter(digest for digest in digests if digest is not None)
+    if not counts:
+        return
+    db.execute(
+        update(Blob.__table__)
+        .where(Blob.digest == bindparam("d"))
+        .values(
+            refcount=case((Blob.refcount > bindparam("n"), Blob.refcount - bindparam("n")), else_=0),
+            updated_at=datetime.utcnow(),
+        ),
+        [{"d": digest, "n": n} for digest, n in counts.items()],
+    )
+
+
+def collect_garbage(db: Session, grace_seconds: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Remove unreferenced blobs and orphaned files older than the grace
+    period: (blobs removed, bytes freed)
+
+    Rows are deleted first, each guarded by the zero count it was selected
+    with. A file is then removed only if it was not touched within the grace
+    period either, which covers content stored again after the row was
+    selected (``put`` refreshes the mtime before the reference is taken).
+    Blocking; run it from a worker thread or a maintenance task.
+    """
+    store = get_blob_store()
+    grace = grace_seconds if grace_seconds is not None else settings.blob_gc_grace_seconds
+    cutoff = datetime.utcnow() - timedelta(seconds=grace)
+    file_cutoff = time.time() - grace
+
+    unreferenced = list(db.execute(
+        select(Blob.digest).where(Blob.refcount <= 0, Blob.updated_at < cutoff)
+    ).scalars())
+    removed = []
+    for digest in unreferenced:
+        result = db.execute(
+            delete(Blob)
+            .where(Blob.digest == digest, Blob.refcount <= 0)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            removed.append(digest)
+    db.commit()
+
+    freed = sum(store.delete(digest, file_cutoff) for digest in removed)
+
+    # Files written by transactions that never committed their reference
+    known = set(db.execute(select(Blob.digest)).scalars())
+    orphans = 0
+    for digest, mtime in list(store.iter_digests()):
+        if mtime < file_cutoff and digest not in known:
+            size = store.delete(digest, file_cutoff)
+            if size:
+                orphans += 1
+                freed += size
+
+    if removed:
+        get_metrics().record_blob_gc("unreferenced", len(removed))
+    if orphans:
+        get_metrics().record_blob_gc("orphaned", orphans)
+    if removed or orphans:
+        logger.info(f"Blob GC removed {len(removed)} unreferenced and {orphans} orphaned blobs ({freed} bytes)")
+    return len(removed) + orphans, freed
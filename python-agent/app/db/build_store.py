@@ -0,0 +1,226 @@
+"""
+Build and code analysis records for the REST API
+
+Builds and analyses live in the builds and code_analysis tables; API
+subjects (the JWT "sub") map to users rows, created on first use. History
+pages walk idx_user_builds (user_id, created_at) with a keyset cursor, so a
+deep page costs the same as the first one. Status changes are single
+UPDATEs guarded by the status the caller expects, so a worker finishing late
+cannot overwrite a cancellation.
+
+The only in-memory state is the progress of running builds, which is
+dropped as soon as a build leaves the running state and capped in size.
+"""
+
+import base64
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.search import get_search_indexer
+from app.models.database import Build, BuildStatus, CodeAnalysis, User
+
+logger = logging.getLogger(__name__)
+
+# Statuses a build can still be cancelled from
+ACTIVE_STATUSES = (BuildStatus.PENDING, BuildStatus.RUNNING)
+
+# Pending builds are reported as "initializing", as the in-memory store did
+_API_STATUS = {BuildStatus.PENDING: "initializing"}
+
+
+def api_status(build_status: BuildStatus) -> str:
+    """Status string the build API reports for a stored status"""
+    return _API_STATUS.get(build_status, build_status.value)
+
+
+def api_username(subject: str) -> str:
+    """username of rows created for API subjects; Telegram handles cannot contain ':'"""
+    return f"api:{subject}"
+
+
+async def get_or_create_user_id(db: AsyncSession, subject: str) -> int:
+    """users.id for an API subject (matched on users.api_subject), creating a passwordless row on first use"""
+    statement = select(User.id).where(User.api_subject == subject)
+    user_id = (await db.execute(statement)).scalar()
+    if user_id is not None:
+        return user_id
+
+    user = User(
+        username=api_username(subject), api_subject=subject, email=f"{subject}@api.agent.local",
+        hashed_password="", is_active=True,
+    )
+    db.add(user)
+    try:
+        await db.flush()
+        return user.id
+    except IntegrityError:
+        # Another request created it first
+        await db.rollback()
+        return (await db.execute(statement)).scalar_one()
+
+
+# ==================== Builds ====================
+
+async def create_build(db: AsyncSession, build_id: str, subject: str, project_name: str, goal: str) -> Build:
+    """Insert a pending build owned by the subject"""
+    build = Build(
+        id=build_id,
+        user_id=await get_or_create_user_id(db, subject),
+        project_name=project_name,
+        requirements=goal,
+        status=BuildStatus.PENDING,
+    )
+    db.add(build)
+    await db.commit()
+    if settings.search_enabled:
+        get_search_indexer().index_build(build_id, build.user_id, project_name, goal)
+    return build
+
+
+async def get_build(db: AsyncSession, build_id: str) -> Optional[Tuple[Build, str]]:
+    """(build, owner API subject), or None; the subject is None for builds started from Telegram"""
+    row = (await db.execute(
+        select(Build, User.api_subject).join(User, Build.user_id == User.id).where(Build.id == build_id)
+    )).first()
+    return tuple(row) if row else None
+
+
+def encode_cursor(build: Build) -> str:
+    raw = f"{build.created_at.isoformat()}|{build.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """(created_at, id) of the last build on the previous page; ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, build_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), build_id
+    except Exception as e:
+        raise ValueError("Invalid history cursor") from e
+
+
+async def list_user_builds(
+    db: AsyncSession,
+    subject: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+) -> Tuple[int, List[Build], Optional[str]]:
+    """
+    One page of a subject's builds, newest first: (total, builds, next cursor)
+
+    With a cursor the page starts right after the build it names; offset is
+    only honoured without one, for clients that still page by offset.
+    """
+    user_id = (await db.execute(select(User.id).where(User.api_subject == subject))).scalar()
+    if user_id is None:
+        return 0, [], None
+
+    total = (await db.execute(
+        select(func.count()).select_from(Build).where(Build.user_id == user_id)
+    )).scalar_one()
+
+    statement = (
+        select(Build)
+        .where(Build.user_id == user_id)
+        .order_by(Build.created_at.desc(), Build.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        statement = statement.where(tuple_(Build.created_at, Build.id) < decode_cursor(cursor))
+    elif offset:
+        statement = statement.offset(offset)
+
+    builds = list((await db.execute(statement)).scalars())
+    next_cursor = encode_cursor(builds[limit - 1]) if len(builds) > limit else None
+    return total, builds[:limit], next_cursor
+
+
+async def set_build_status(
+    db: AsyncSession,
+    build_id: str,
+    status: BuildStatus,
+    expected: Iterable[BuildStatus] = ACTIVE_STATUSES,
+    **values,
+) -> bool:
+    """
+    Move a build to a new status if it is currently in one of the expected
+    ones, writing only the given columns. Returns False when it was not.
+    """
+    result = await db.execute(
+        update(Build)
+        .where(Build.id == build_id, Build.status.in_(list(expected)))
+        .values(status=status, updated_at=datetime.utcnow(), **values)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    if status not in ACTIVE_STATUSES:
+        get_build_progress().discard(build_id)
+    return result.rowcount > 0
+
+
+class BuildProgress:
+    """Progress (0-100) of running builds, bounded and dropped when they finish"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._progress: "OrderedDict[str, int]" = OrderedDict()
+
+    def set(self, build_id: str, progress: int):
+        self._progress[build_id] = progress
+        self._progress.move_to_end(build_id)
+        while len(self._progress) > self.max_entries:
+            evicted, _ = self._progress.popitem(last=False)
+            logger.debug(f"Evicted progress of build {evicted}")
+
+    def get(self, build_id: str, build_status: BuildStatus) -> int:
+        if build_status == BuildStatus.COMPLETED:
+            return 100
+        if build_status != BuildStatus.RUNNING:
+            return 0
+        return self._progress.get(build_id, 0)
+
+    def discard(self, build_id: str):
+        self._progress.pop(build_id, None)
+
+    def __len__(self) -> int:
+        return len(self._progress)
+
+
+_build_progress: Optional[BuildProgress] = None
+
+
+def get_build_progress() -> BuildProgress:
+    """Get or create the global build progress tracker"""
+    global _build_progress
+    if _build_progress is None:
+        _build_progress = BuildProgress()
+    return _build_progress
+
+
+# ==================== Code analyses ====================
+
+async def create_analysis(db: AsyncSession, analysis_id: str, subject: str, **values) -> CodeAnalysis:
+    """Insert a finished analysis owned by the subject"""
+    analysis = CodeAnalysis(id=analysis_id, user_id=await get_or_create_user_id(db, subject), **values)
+    db.add(analysis)
+    await db.commit()
+    return analysis
+
+
+async def get_analysis(db: AsyncSession, analysis_id: str) -> Optional[Tuple[CodeAnalysis, str]]:
+    """(analysis, owner API subject), or None"""
+    row = (await db.execute(
+        select(CodeAnalysis, User.api_subject)
+        .join(User, CodeAnalysis.user_id == User.id)
+        .where(CodeAnalysis.id == analysis_id)
+    )).first()
+    return tuple(row) if row else None
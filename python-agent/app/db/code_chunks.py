@@ -0,0 +1,136 @@
+"""
+Code splitting for vector ingestion
+Python files are split with ``ast`` at function and class level (large
+classes down to their methods), so each vector describes one unit of code.
+Other files, and Python that does not parse, are cut into size-bounded line
+windows with a small overlap. Every chunk carries its 1-based line range.
+"""
+
+import ast
+from dataclasses import dataclass
+from pathlib import PurePath
+from typing import List, Optional
+
+# Extension -> language name stored in chunk metadata
+LANGUAGES = {
+    ".py": "python", ".js": "javascript", ".jsx": "javascript", ".ts": "typescript",
+    ".tsx": "typescript", ".go": "go", ".rs": "rust", ".java": "java", ".rb": "ruby",
+    ".php": "php", ".c": "c", ".h": "c", ".cpp": "cpp", ".cs": "csharp", ".sh": "shell",
+    ".md": "markdown", ".json": "json", ".yaml": "yaml", ".yml": "yaml", ".toml": "toml",
+    ".html": "html", ".css": "css", ".sql": "sql",
+}
+
+
+@dataclass
+class CodeChunk:
+    """One indexed piece of a file"""
+    text: str
+    start_line: int
+    end_line: int
+    kind: str  # function, class, method, module, window
+    symbol: str = ""
+
+
+def language_for_path(path: str) -> str:
+    return LANGUAGES.get(PurePath(path).suffix.lower(), "text")
+
+
+def chunk_windows(source: str, max_chars: int = 1500, overlap_lines: int = 2, first_line: int = 1,
+                  kind: str = "window") -> List[CodeChunk]:
+    """Line windows of at most ``max_chars`` (a longer single line is its own window)"""
+    lines = source.splitlines()
+    chunks: List[CodeChunk] = []
+    start = 0
+    while start < len(lines):
+        size = 0
+        end = start
+        while end < len(lines) and (end == start or size + len(lines[end]) + 1 <= max_chars):
+            size += len(lines[end]) + 1
+            end += 1
+        last = end  # trailing blank lines are not part of the reported range
+        while last > start and not lines[last - 1].strip():
+            last -= 1
+        if last > start:
+            chunks.append(CodeChunk("\n".join(lines[start:last]), first_line + start, first_line + last - 1, kind))
+        if end >= len(lines):
+            break
+        start = max(end - overlap_lines, start + 1)
+    return chunks
+
+
+def _node_start(node: ast.AST) -> int:
+    decorators = getattr(node, "decorator_list", None) or []
+    return min([node.lineno] + [d.lineno for d in decorators])
+
+
+def chunk_python(source: str, max_chars: int = 1500) -> Optional[List[CodeChunk]]:
+    """AST chunks, or None if the source does not parse"""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+
+    lines = source.splitlines()
+    chunks: List[CodeChunk] = []
+
+    def module_code(first: int, last: int):
+        # Imports, constants and statements between definitions
+        if last >= first:
+            text = "\n".join(lines[first - 1:last])
+            chunks.extend(chunk_windows(text, max_chars, 0, first, "module"))
+
+    covered_until = 0
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        start, end = _node_start(node), node.end_lineno
+        module_code(covered_until + 1, start - 1)
+        text = "\n".join(lines[start - 1:end])
+        kind = "class" if isinstance(node, ast.ClassDef) else "function"
+        if len(text) <= max_chars:
+            chunks.append(CodeChunk(text, start, end, kind, node.name))
+        elif kind == "class":
+            chunks.extend(_split_class(node, lines, max_chars))
+        else:
+            chunks.extend(
+                CodeChunk(c.text, c.start_line, c.end_line, kind, node.name)
+                for c in chunk_windows(text, max_chars, 2, start)
+            )
+        covered_until = end
+    module_code(covered_until + 1, len(lines))
+    return chunks
+
+
+def _split_class(node: ast.ClassDef, lines: List[str], max_chars: int) -> List[CodeChunk]:
+    """A large class: its header/attributes as one chunk, then one chunk per method"""
+    chunks: List[CodeChunk] = []
+    methods = [n for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+    header_end = (_node_start(methods[0]) - 1) if methods else node.end_lineno
+    start = _node_start(node)
+    header = "\n".join(lines[start - 1:header_end])
+    if header.strip():
+        chunks.extend(
+            CodeChunk(c.text, c.start_line, c.end_line, "class", node.name)
+            for c in chunk_windows(header, max_chars, 0, start)
+        )
+    for method in methods:
+        m_start, m_end = _node_start(method), method.end_lineno
+        text = "\n".join(lines[m_start - 1:m_end])
+        symbol = f"{node.name}.{method.name}"
+        if len(text) > max_chars:
+            chunks.extend(
+                CodeChunk(c.text, c.start_line, c.end_line, "method", symbol)
+                for c in chunk_windows(text, max_chars, 2, m_start)
+            )
+        else:
+            chunks.append(CodeChunk(text, m_start, m_end, "method", symbol))
+    return chunks
+
+
+def chunk_file(source: str, language: str, max_chars: int = 1500) -> List[CodeChunk]:
+    """Split a file's source for indexing"""
+    if language == "python":
+        chunks = chunk_python(source, max_chars)
+        if chunks is not None:
+            return chunks
+    return chunk_windows(source, max_chars)
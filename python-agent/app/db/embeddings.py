@@ -0,0 +1,214 @@
+"""
+Embedding backends for the vector store
+VectorStore embeds every document and query itself through one backend, so
+the model can be swapped without touching Chroma's per-collection config:
+
+- ``ollama``: the Ollama embedding model (``settings.embedding_model``)
+- ``onnx``: Chroma's bundled all-MiniLM-L6-v2 (downloaded on first use)
+- ``hashed``: deterministic, CPU-only NumPy fallback. Character n-grams
+  are hashed into a fixed feature space, log-scaled and multiplied by a
+  fixed random projection, a whole batch at a time. It needs no model or
+  network and still ranks lexically similar code together.
+
+``select_embedding_backend`` probes the preferred backends in order and
+falls back to ``hashed``. VectorStore records the backend and model that
+wrote a collection in its metadata (``EmbeddingBackend.identity``); once a
+collection holds vectors, a backend with another identity or dimension is
+skipped, and if none matches selection fails instead of mixing vectors from
+two models in one space. Stores written before the identity was recorded are
+checked by dimension only; the hashed backend adopts the store's dimension.
+"""
+
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+import numpy as np
+
+from app.core.config import settings
+from app.monitoring.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+AUTO_ORDER = ("ollama", "onnx", "hashed")
+
+
+class EmbeddingBackend(ABC):
+    """Blocking text -> vector model; VectorStore calls it on its Chroma threads"""
+
+    name: str = "base"
+    model: str = ""
+    dimension: int = 0
+
+    @abstractmethod
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed a batch; returns a float32 array of shape (len(texts), dimension)"""
+
+    def probe(self):
+        """Raise if the backend cannot embed right now (sets ``dimension`` when discovered)"""
+        vectors = self.embed(["ping"])
+        self.dimension = int(vectors.shape[1])
+
+    def identity(self) -> Dict[str, Any]:
+        """Collection metadata naming what produced the vectors"""
+        return {"embedding_backend": self.name, "embedding_model": self.model}
+
+    def __call__(self, input: Sequence[str]) -> List[np.ndarray]:
+        return list(self.embed(list(input)))
+
+
+class HashedEmbeddingBackend(EmbeddingBackend):
+    """Hashed character n-grams through a fixed random projection"""
+
+    name = "hashed"
+    _FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+    _FNV_PRIME = np.uint64(0x100000001B3)
+
+    def __init__(self, dimension: int = 384, buckets: int = 8192,
+                 ngram_range: tuple = (3, 5), seed: int = 20240611):
+        if buckets & (buckets - 1):
+            raise ValueError("buckets must be a power of two")
+        self.dimension = dimension
+        self.buckets = buckets
+        self.ngram_range = ngram_range
+        self.model = f"ngram{ngram_range[0]}-{ngram_range[1]}/{buckets}/{seed}"
+        rng = np.random.default_rng(seed)
+        self.projection = (rng.standard_normal((buckets, dimension)) / np.sqrt(dimension)).astype(np.float32)
+
+    def probe(self):
+        pass
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        features = self._features(texts)
+        np.log1p(features, out=features)
+        vectors = features @ self.projection
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _features(self, texts: Sequence[str]) -> np.ndarray:
+        """(len(texts), buckets) n-gram counts, computed over the whole batch at once"""
+        rows = len(texts)
+        encoded = [text.lower().encode("utf-8", "replace") for text in texts]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=rows)
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+        row_of = np.repeat(np.arange(rows, dtype=np.int64), lengths)
+
+        indices = []
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            count = data.size - n + 1
+            if count <= 0:
+                continue
+            # FNV-1a over each window; the n-gram size is folded into the seed
+            hashed = np.full(count, self._FNV_OFFSET ^ np.uint64(n), dtype=np.uint64)
+            for k in range(n):
+                hashed ^= data[k:k + count]
+                hashed *= self._FNV_PRIME
+            inside = row_of[:count] == row_of[n - 1:n - 1 + count]  # does not span two texts
+            bucket = (hashed[inside] >> np.uint64(32)).astype(np.int64) & (self.buckets - 1)
+            indices.append(row_of[:count][inside] * self.buckets + bucket)
+
+        if not indices:
+            return np.zeros((rows, self.buckets), dtype=np.float32)
+        counts = np.bincount(np.concatenate(indices), minlength=rows * self.buckets)
+        return counts.reshape(rows, self.buckets).astype(np.float32)
+
+
+class OllamaEmbeddingBackend(EmbeddingBackend):
+    """Ollama ``/api/embed`` (batched)"""
+
+    name = "ollama"
+
+    def __init__(self, host: str, model: str, timeout: float):
+        self.host = host
+        self.model = model
+        self.timeout = timeout
+        self._client = httpx.Client(timeout=timeout)
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        response = self._client.post(f"{self.host}/api/embed", json={"model": self.model, "input": list(texts)})
+        response.raise_for_status()
+        vectors = np.asarray(response.json()["embeddings"], dtype=np.float32)
+        if vectors.shape[0] != len(texts):
+            raise ValueError(f"Ollama returned {vectors.shape[0]} embeddings for {len(texts)} texts")
+        return vectors
+
+
+class OnnxEmbeddingBackend(EmbeddingBackend):
+    """Chroma's default all-MiniLM-L6-v2 ONNX model"""
+
+    name = "onnx"
+    model = "all-MiniLM-L6-v2"
+    dimension = 384
+
+    def __init__(self):
+        from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+        self._function = DefaultEmbeddingFunction()
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return np.asarray(self._function(list(texts)), dtype=np.float32)
+
+
+def _create(name: str, dimension: Optional[int]) -> EmbeddingBackend:
+    if name == "ollama":
+        return OllamaEmbeddingBackend(settings.ollama_host, settings.embedding_model, settings.embedding_probe_timeout)
+    if name == "onnx":
+        return OnnxEmbeddingBackend()
+    if name == "hashed":
+        return HashedEmbeddingBackend(dimension or settings.embedding_dimension)
+    raise ValueError(f"Unknown embedding backend: {name}")
+
+
+def select_embedding_backend(
+    preference: str = "auto",
+    store_dimension: Optional[int] = None,
+    store_identity: Optional[Dict[str, Any]] = None,
+) -> EmbeddingBackend:
+    """
+    First usable backend (blocking: probes models over the network)
+
+    Args:
+        preference: a backend name, or "auto" for ollama, onnx, then hashed
+        store_dimension: dimension of vectors already in the store, if any
+        store_identity: ``identity()`` of the backend that wrote them, if recorded
+
+    Raises:
+        RuntimeError: no backend is usable, or none matches the stored vectors
+    """
+    order = AUTO_ORDER if preference == "auto" else (preference, "hashed")
+    for name in order:
+        try:
+            backend = _create(name, store_dimension)
+            if store_identity and backend.identity() != _identity_of(store_identity):
+                logger.warning(
+                    f"Embedding backend {name} ({backend.model}) differs from the one the store was indexed "
+                    f"with ({store_identity.get('embedding_backend')}, {store_identity.get('embedding_model')}); "
+                    "skipped (re-index to switch models)"
+                )
+                continue
+            backend.probe()
+        except Exception as e:
+            logger.warning(f"Embedding backend {name} unavailable: {e}")
+            continue
+        if store_dimension and backend.dimension != store_dimension:
+            logger.warning(
+                f"Embedding backend {name} produces {backend.dimension}-d vectors but the store "
+                f"holds {store_dimension}-d ones; skipped (re-index to switch models)"
+            )
+            continue
+        if name == "hashed" and preference != "hashed":
+            logger.warning("No embedding model reachable, using the hashed n-gram fallback (degraded recall)")
+        logger.info(f"Embedding backend: {name} ({backend.dimension} dimensions)")
+        get_metrics().record_embedding_backend(name, backend.dimension)
+        return backend
+    if store_identity:
+        raise RuntimeError(
+            f"The vector store was indexed with {store_identity.get('embedding_backend')} "
+            f"({store_identity.get('embedding_model')}), which is unavailable; "
+            "make it reachable or re-index to switch models"
+        )
+    raise RuntimeError("No embedding backend available")
+
+
+def _identity_of(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    return {"embedding_backend": metadata.get("embedding_backend"), "embedding_model": metadata.get("embedding_model")}
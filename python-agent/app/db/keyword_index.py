@@ -0,0 +1,180 @@
+"""
+In-memory BM25 keyword index over a Chroma collection
+Dense embeddings blur exact identifiers (function names, error codes), so
+every collection keeps a keyword index over the same documents. VectorStore
+applies its writes to the index after Chroma accepts them, and loads the
+index from the collection on first use. Since every write passes through
+here, ``version`` doubles as the collection's index version for caching.
+
+Tokens are identifiers and numbers, lowercased, plus the snake_case and
+camelCase parts of each identifier: ``parseJsonFile`` matches queries for
+``parsejsonfile``, ``json`` or ``file``.
+"""
+
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+_TOKEN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_PART = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens: List[str] = []
+    for match in _TOKEN.finditer(text):
+        word = match.group()
+        lowered = word.lower()
+        tokens.append(lowered)
+        parts = _PART.findall(word)
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts)
+    return tokens
+
+
+def matches(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate the subset of Chroma's ``where`` syntax VectorStore uses"""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches(metadata, c) for c in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(metadata, c) for c in condition):
+                return False
+        else:
+            value = metadata.get(key)
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, expected in condition.items():
+                if op == "$eq" and value != expected:
+                    return False
+                if op == "$ne" and value == expected:
+                    return False
+                if op == "$in" and value not in expected:
+                    return False
+                if op == "$nin" and value in expected:
+                    return False
+    return True
+
+
+class KeywordIndex:
+    """BM25 over (id, document, metadata) entries"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.loaded = False
+        self.version = 0  # bumped by every write
+        self._docs: Dict[str, Tuple[Counter, int, Dict[str, Any], str]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._total_length = 0
+        # While loading: ids and filters written meanwhile win over the snapshot
+        self._touched: Optional[Set[str]] = None
+        self._removed_where: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # ==================== Writes ====================
+
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Optional[Dict[str, Any]]],
+            replace: bool = True):
+        """Index documents; ``replace=False`` keeps existing ids (Chroma ``add`` semantics)"""
+        for doc_id, text, metadata in zip(ids, documents, metadatas):
+            if doc_id in self._docs:
+                if not replace:
+                    continue
+                self._remove(doc_id)
+            self._insert(doc_id, text or "", metadata or {})
+        self._touch(ids)
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        for doc_id, metadata in zip(ids, metadatas):
+            if doc_id in self._docs:
+                tf, length, _, text = self._docs[doc_id]
+                self._docs[doc_id] = (tf, length, metadata, text)
+        self._touch(ids)
+
+    def remove(self, ids: Iterable[str]):
+        ids = list(ids)
+        for doc_id in ids:
+            if doc_id in self._docs:
+                self._remove(doc_id)
+        self._touch(ids)
+
+    def remove_where(self, where: Dict[str, Any]):
+        self.remove([doc_id for doc_id, entry in self._docs.items() if matches(entry[2], where)])
+        if self._touched is not None:
+            self._removed_where.append(where)
+
+    def begin_load(self):
+        """Start taking a snapshot; writes from now on take precedence over it"""
+        self._touched = set()
+        self._removed_where = []
+
+    def finish_load(self, ids: List[str], documents: List[str], metadatas: List[Optional[Dict[str, Any]]]):
+        touched, removed_where = self._touched or set(), self._removed_where
+        self._touched, self._removed_where = None, []
+        for doc_id, text, metadata in zip(ids, documents, metadatas):
+            metadata = metadata or {}
+            if doc_id in touched or doc_id in self._docs:
+                continue
+            if any(matches(metadata, where) for where in removed_where):
+                continue
+            self._insert(doc_id, text or "", metadata)
+        self.loaded = True
+
+    def _touch(self, ids: Iterable[str]):
+        self.version += 1
+        if self._touched is not None:
+            self._touched.update(ids)
+
+    def _insert(self, doc_id: str, text: str, metadata: Dict[str, Any]):
+        tf = Counter(tokenize(text))
+        length = sum(tf.values())
+        self._docs[doc_id] = (tf, length, metadata, text)
+        self._total_length += length
+        for term in tf:
+            self._postings.setdefault(term, set()).add(doc_id)
+
+    def _remove(self, doc_id: str):
+        tf, length, _, _ = self._docs.pop(doc_id)
+        self._total_length -= length
+        for term in tf:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.discard(doc_id)
+                if not postings:
+                    del self._postings[term]
+
+    # ==================== Search ====================
+
+    def search(self, query: str, n_results: int = 10,
+               where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Top documents by BM25 score, best first"""
+        if not self._docs:
+            return []
+        total = len(self._docs)
+        average = self._total_length / total or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id in postings:
+                tf, length, _, _ = self._docs[doc_id]
+                freq = tf[term]
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (self.k1 + 1) / (
+                    freq + self.k1 * (1 - self.b + self.b * length / average)
+                )
+        if where:
+            scores = {d: s for d, s in scores.items() if matches(self._docs[d][2], where)}
+        best = heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
+        return [
+            {"id": doc_id, "document": self._docs[doc_id][3], "metadata": self._docs[doc_id][2], "score": score}
+            for doc_id, score in best
+        ]
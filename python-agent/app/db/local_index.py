@@ -0,0 +1,638 @@
+"""
+Built-in vector index engine (``vector_store_engine = "local"``)
+A single-node alternative to Chroma. It implements the subset of the Chroma
+client and collection API that VectorStore uses, so either engine sits
+behind the same VectorStore and they can be benchmarked against each other.
+
+Each collection is a directory holding:
+
+- ``vectors.<generation>.f16``: append-only float16 rows, memory-mapped for
+  search. Upserts and deletes never rewrite it; replaced and deleted rows
+  become tombstones in an in-memory bitmap.
+- ``meta.db`` (SQLite): id -> slot, document and JSON metadata. It is the
+  source of truth: slots it does not reference are dead, so a crash between
+  appending a vector and committing its row only leaves a dead slot.
+
+Search is exact, vectorized brute force over the mmap in blocks, in squared
+L2 distance like Chroma's default space. ``where`` filters run in SQLite
+first and only the matching rows are scanned. Past
+``local_index_ivf_min_rows`` live rows, an IVF coarse quantizer (k-means
+centroids) restricts unfiltered searches to the ``local_index_ivf_probes``
+nearest lists. Once tombstones reach ``local_index_compact_ratio`` of a file,
+a background thread copies the live rows into the next generation file and
+swaps it in with one SQLite transaction; training the quantizer also runs
+there.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+ROW_DTYPE = np.dtype("<f2")
+SCAN_BLOCK_ROWS = 65536
+COMPACT_MIN_DEAD = 1024
+IVF_SAMPLE_ROWS = 50000
+IVF_ITERATIONS = 10
+# Metadata keys VectorStore filters on, indexed so their filters skip the JSON scan
+INDEXED_KEYS = ("build_id", "file_path")
+
+_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{1,510}[A-Za-z0-9]$")
+_KEY = re.compile(r"^[A-Za-z0-9_.-]+$")
+_COMPARISONS = {"$eq": "=", "$ne": "IS NOT", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+def _json_field(key: str) -> str:
+    return f"json_extract(metadata, '$.\"{key}\"')"
+
+
+def where_sql(where: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """Translate a Chroma ``where`` filter into a condition on ``items.metadata``"""
+    clauses: List[str] = []
+    params: List[Any] = []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            parts = [where_sql(c) for c in condition]
+            if not parts:
+                clauses.append("1" if key == "$and" else "0")
+                continue
+            clauses.append("(" + (" AND " if key == "$and" else " OR ").join(p[0] for p in parts) + ")")
+            for _, part_params in parts:
+                params.extend(part_params)
+            continue
+        if not _KEY.match(key):
+            raise ValueError(f"Unsupported metadata key: {key!r}")
+        field = _json_field(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, expected in condition.items():
+            if op in _COMPARISONS:
+                clauses.append(f"{field} {_COMPARISONS[op]} ?")
+                params.append(expected)
+            elif op in ("$in", "$nin"):
+                marks = ",".join("?" * len(expected))
+                if op == "$in":
+                    clauses.append(f"{field} IN ({marks})" if expected else "0")
+                else:
+                    clauses.append(f"({field} IS NULL OR {field} NOT IN ({marks}))" if expected else "1")
+                params.extend(expected)
+            else:
+                raise ValueError(f"Unsupported filter operator: {op}")
+    return " AND ".join(clauses) or "1", params
+
+
+class IVFQuantizer:
+    """k-means coarse quantizer: each slot belongs to the list of its nearest centroid"""
+
+    def __init__(self, centroids: np.ndarray, assignments: np.ndarray, trained_rows: int):
+        self.centroids = centroids
+        self.assignments = assignments  # list per slot
+        self.trained_rows = trained_rows
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, live_slots: np.ndarray, seed: int = 0) -> "IVFQuantizer":
+        rng = np.random.default_rng(seed)
+        nlist = int(min(4096, max(16, round(math.sqrt(live_slots.size))), live_slots.size))
+        sample_slots = np.sort(rng.choice(live_slots, min(live_slots.size, IVF_SAMPLE_ROWS), replace=False))
+        sample = np.asarray(vectors[sample_slots], dtype=np.float32)
+        centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+        for _ in range(IVF_ITERATIONS):
+            labels = cls._nearest(sample, centroids)
+            order = np.argsort(labels, kind="stable")
+            present, starts = np.unique(labels[order], return_index=True)
+            sums = np.add.reduceat(sample[order], starts, axis=0)
+            counts = np.diff(np.append(starts, order.size))
+            centroids[present] = sums / counts[:, None]
+        quantizer = cls(centroids, np.zeros(0, dtype=np.int32), live_slots.size)
+        quantizer.assignments = quantizer.assign_rows(vectors, 0, vectors.shape[0])
+        return quantizer
+
+    @staticmethod
+    def _nearest(block: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        scores = block @ centroids.T
+        scores *= -2
+        scores += (centroids ** 2).sum(axis=1)
+        return scores.argmin(axis=1).astype(np.int32)
+
+    def assign_rows(self, vectors: np.ndarray, start: int, stop: int) -> np.ndarray:
+        labels = [
+            self._nearest(np.asarray(vectors[i:min(i + SCAN_BLOCK_ROWS, stop)], dtype=np.float32), self.centroids)
+            for i in range(start, stop, SCAN_BLOCK_ROWS)
+        ]
+        return np.concatenate(labels) if labels else np.zeros(0, dtype=np.int32)
+
+    def candidates(self, queries: np.ndarray, alive: np.ndarray, probes: int) -> np.ndarray:
+        """Live slots in the ``probes`` lists nearest to any of the queries"""
+        distances = (self.centroids ** 2).sum(axis=1) - 2 * queries @ self.centroids.T
+        probes = min(probes, self.centroids.shape[0])
+        nearest = np.argpartition(distances, probes - 1, axis=1)[:, :probes]
+        probed = np.zeros(self.centroids.shape[0], dtype=bool)
+        probed[nearest.ravel()] = True
+        rows = min(alive.size, self.assignments.size)
+        return np.flatnonzero(probed[self.assignments[:rows]] & alive[:rows])
+
+
+class LocalCollection:
+    """One collection: float16 vector file, tombstone bitmap and SQLite metadata"""
+
+    def __init__(self, root: str, name: str, metadata: Optional[Dict[str, Any]] = None,
+                 maintenance: Optional[ThreadPoolExecutor] = None):
+        self.name = name
+        self.path = os.path.join(root, name)
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._maintenance = maintenance
+        self._maintenance_pending = False
+
+        self._db = sqlite3.connect(os.path.join(self.path, "meta.db"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS items (id TEXT PRIMARY KEY, slot INTEGER NOT NULL, "
+                "document TEXT, metadata TEXT)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_items_slot ON items(slot)")
+            for key in INDEXED_KEYS:
+                self._db.execute(f"CREATE INDEX IF NOT EXISTS idx_items_{key} ON items({_json_field(key)})")
+            self._db.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)")
+        info = dict(self._db.execute("SELECT key, value FROM info"))
+        if "metadata" not in info and metadata:
+            self._set_info(metadata=json.dumps(metadata))
+        self.metadata = json.loads(info["metadata"]) if "metadata" in info else metadata
+        self.dimension: Optional[int] = int(info["dimension"]) if "dimension" in info else None
+        self.generation = int(info.get("generation", 0))
+        self._ivf: Optional[IVFQuantizer] = None
+        self._norms: Optional[np.ndarray] = None  # squared norms per slot, computed on first search
+        self._mapped: Optional[np.ndarray] = None
+        self._open_vectors()
+        with self._lock:
+            self._schedule_maintenance()  # train the quantizer of a reopened collection
+
+    def modify(self, name: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None):
+        """Replace the collection metadata (renaming is not supported)"""
+        if name is not None and name != self.name:
+            raise ValueError("The local index cannot rename collections")
+        if metadata is not None:
+            with self._lock:
+                self._set_info(metadata=json.dumps(metadata))
+                self.metadata = metadata
+
+    # ==================== Storage ====================
+
+    def _vector_path(self, generation: int) -> str:
+        return os.path.join(self.path, f"vectors.{generation}.f16")
+
+    def _set_info(self, **values):
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)", [(k, str(v)) for k, v in values.items()]
+            )
+
+    def _open_vectors(self):
+        current = os.path.basename(self._vector_path(self.generation))
+        for entry in os.listdir(self.path):
+            if entry.startswith("vectors.") and entry != current:
+                os.remove(os.path.join(self.path, entry))  # left by an interrupted compaction
+        self._file = open(self._vector_path(self.generation), "ab")
+        size = self._file.tell()
+        row_bytes = (self.dimension or 0) * ROW_DTYPE.itemsize
+        self._rows = size // row_bytes if row_bytes else 0
+        if row_bytes and size % row_bytes:
+            self._file.truncate(self._rows * row_bytes)  # torn final append
+
+        self._alive = np.zeros(self._rows, dtype=bool)
+        slots = np.fromiter((row[0] for row in self._db.execute("SELECT slot FROM items")), dtype=np.int64)
+        lost = slots[slots >= self._rows]
+        if lost.size:
+            logger.warning(f"Collection {self.name}: {lost.size} rows lost their vectors, dropping them")
+            with self._db:
+                self._db.executemany("DELETE FROM items WHERE slot = ?", [(int(s),) for s in lost])
+            slots = slots[slots < self._rows]
+        self._alive[slots] = True
+        self._live = int(slots.size)
+
+    def _vectors(self) -> np.ndarray:
+        """Read-only (rows, dimension) view of the vector file"""
+        if self._mapped is None or self._mapped.shape[0] != self._rows:
+            if self._rows == 0:
+                self._mapped = np.zeros((0, self.dimension or 0), dtype=ROW_DTYPE)
+            else:
+                # Plain ndarray view of the mapping: indexing skips memmap's subclass overhead
+                self._mapped = np.asarray(np.memmap(
+                    self._vector_path(self.generation), dtype=ROW_DTYPE, mode="r", shape=(self._rows, self.dimension)
+                ))
+        return self._mapped
+
+    def _ensure_norms(self) -> np.ndarray:
+        if self._norms is None or self._norms.size != self._rows:
+            vectors = self._vectors()
+            done = 0 if self._norms is None else self._norms.size
+            parts = [] if self._norms is None else [self._norms]
+            for start in range(done, self._rows, SCAN_BLOCK_ROWS):
+                block = np.asarray(vectors[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+                parts.append((block * block).sum(axis=1))
+            self._norms = np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+        return self._norms
+
+    def _embeddings(self, embeddings, count: int) -> np.ndarray:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != count:
+            raise ValueError(f"Expected {count} embeddings, got array of shape {vectors.shape}")
+        if self.dimension is None:
+            self.dimension = int(vectors.shape[1])
+            self._set_info(dimension=self.dimension)
+        elif vectors.shape[1] != self.dimension:
+            raise ValueError(
+                f"Embedding dimension {vectors.shape[1]} does not match collection dimensionality {self.dimension}"
+            )
+        return vectors
+
+    def _append(self, vectors: np.ndarray) -> np.ndarray:
+        """Write rows to the end of the file; they stay dead until their metadata commits"""
+        data = vectors.astype(ROW_DTYPE)
+        self._file.write(data.tobytes())
+        self._file.flush()
+        slots = np.arange(self._rows, self._rows + data.shape[0])
+        self._rows += data.shape[0]
+        self._alive = np.concatenate([self._alive, np.zeros(data.shape[0], dtype=bool)])
+        if self._norms is not None:
+            stored = data.astype(np.float32)
+            self._norms = np.concatenate([self._norms, (stored * stored).sum(axis=1)])
+        if self._ivf is not None:
+            self._ivf.assignments = np.concatenate([
+                self._ivf.assignments, IVFQuantizer._nearest(data.astype(np.float32), self._ivf.centroids)
+            ])
+        return slots
+
+    def _slots(self, condition: str, params: Sequence[Any]) -> List[int]:
+        return [row[0] for row in self._db.execute(f"SELECT slot FROM items WHERE {condition}", params)]
+
+    def _condition(self, ids: Optional[Sequence[str]], where: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        if ids is not None:
+            clauses.append(f"id IN ({','.join('?' * len(ids))})" if ids else "0")
+            params.extend(ids)
+        if where:
+            clause, where_params = where_sql(where)
+            clauses.append(clause)
+            params.extend(where_params)
+        return " AND ".join(clauses) or "1", params
+
+    # ==================== Writes ====================
+
+    def add(self, ids: Sequence[str], embeddings=None, documents: Optional[Sequence[str]] = None,
+            metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None):
+        """Insert new ids; ids already present are left unchanged (as in Chroma)"""
+        self._write(ids, embeddings, documents, metadatas, replace=False)
+
+    def upsert(self, ids: Sequence[str], embeddings=None, documents: Optional[Sequence[str]] = None,
+               metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None):
+        self._write(ids, embeddings, documents, metadatas, replace=True)
+
+    def _write(self, ids, embeddings, documents, metadatas, replace: bool):
+        ids = list(ids)
+        if not ids:
+            return
+        if len(set(ids)) != len(ids):
+            raise ValueError("Expected IDs to be unique")
+        if embeddings is None:
+            raise ValueError("The local index does not embed; pass embeddings")
+        documents = list(documents) if documents is not None else [None] * len(ids)
+        metadatas = list(metadatas) if metadatas is not None else [None] * len(ids)
+        with self._lock:
+            vectors = self._embeddings(embeddings, len(ids))
+            existing = dict(self._db.execute(
+                f"SELECT id, slot FROM items WHERE id IN ({','.join('?' * len(ids))})", ids
+            ))
+            keep = [i for i, doc_id in enumerate(ids) if replace or doc_id not in existing]
+            if not keep:
+                return
+            slots = self._append(vectors[keep])
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO items (id, slot, document, metadata) VALUES (?, ?, ?, ?)",
+                    [
+                        (ids[i], int(slot), documents[i], json.dumps(metadatas[i]) if metadatas[i] is not None else None)
+                        for i, slot in zip(keep, slots)
+                    ],
+                )
+            self._alive[slots] = True
+            replaced = [existing[ids[i]] for i in keep if ids[i] in existing]
+            self._alive[replaced] = False
+            self._live += len(keep) - len(replaced)
+            self._schedule_maintenance()
+
+    def update(self, ids: Sequence[str], metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+               documents: Optional[Sequence[str]] = None):
+        """Replace metadata and/or documents of existing ids (vectors are untouched)"""
+        ids = list(ids)
+        with self._lock, self._db:
+            if metadatas is not None:
+                self._db.executemany(
+                    "UPDATE items SET metadata = ? WHERE id = ?",
+                    [(json.dumps(m) if m is not None else None, i) for i, m in zip(ids, metadatas)],
+                )
+            if documents is not None:
+                self._db.executemany("UPDATE items SET document = ? WHERE id = ?", list(zip(documents, ids)))
+
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None):
+        if ids is None and not where:
+            return
+        condition, params = self._condition(list(ids) if ids is not None else None, where)
+        with self._lock:
+            slots = self._slots(condition, params)
+            if not slots:
+                return
+            with self._db:
+                self._db.execute(f"DELETE FROM items WHERE {condition}", params)
+            self._alive[slots] = False
+            self._live -= len(slots)
+            self._schedule_maintenance()
+
+    # ==================== Reads ====================
+
+    def count(self) -> int:
+        return self._live
+
+    def get(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Sequence[str] = ("metadatas", "documents")) -> Dict[str, Any]:
+        condition, params = self._condition(list(ids) if ids is not None else None, where)
+        sql = f"SELECT id, slot, document, metadata FROM items WHERE {condition} ORDER BY slot"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params = [*params, -1 if limit is None else limit, offset or 0]
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+            embeddings = None
+            if "embeddings" in include:
+                slots = np.array([row[1] for row in rows], dtype=np.int64)
+                embeddings = np.asarray(self._vectors()[slots], dtype=np.float32)
+        return {
+            "ids": [row[0] for row in rows],
+            "embeddings": embeddings,
+            "documents": [row[2] for row in rows] if "documents" in include else None,
+            "metadatas": [json.loads(row[3]) if row[3] else None for row in rows] if "metadatas" in include else None,
+            "included": list(include),
+        }
+
+    def peek(self, limit: int = 10) -> Dict[str, Any]:
+        return self.get(limit=limit, include=("embeddings", "documents", "metadatas"))
+
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[Dict[str, Any]] = None,
+              include: Sequence[str] = ("metadatas", "documents", "distances")) -> Dict[str, Any]:
+        """Nearest neighbours of each query embedding by squared L2 distance"""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        if self.dimension is not None and queries.shape[1] != self.dimension:
+            raise ValueError(
+                f"Query dimension {queries.shape[1]} does not match collection dimensionality {self.dimension}"
+            )
+        for _ in range(3):
+            with self._lock:
+                generation = self.generation
+                vectors, alive, norms = self._vectors(), self._alive, self._ensure_norms()
+                candidates = None
+                if where:
+                    candidates = np.array(self._slots(*where_sql(where)), dtype=np.int64)
+                elif self._ivf is not None:
+                    candidates = self._ivf.candidates(queries, alive, settings.local_index_ivf_probes)
+            # The scan runs unlocked: appends never change existing rows and
+            # compaction swaps in new arrays, so this snapshot stays valid
+            distances, slots = self._scan(queries, vectors, alive, norms, candidates, n_results)
+            with self._lock:
+                if self.generation != generation:
+                    continue  # compacted meanwhile: slot numbers changed
+                return self._results(distances, slots, include)
+        raise RuntimeError(f"Collection {self.name} kept compacting during a query")
+
+    def _scan(self, queries, vectors, alive, norms, candidates, k) -> Tuple[np.ndarray, np.ndarray]:
+        rows = alive.size
+        best_d = np.zeros((queries.shape[0], 0), dtype=np.float32)
+        best_s = np.zeros((queries.shape[0], 0), dtype=np.int64)
+        query_norms = (queries * queries).sum(axis=1)[:, None]
+        for slots, block in self._blocks(vectors, alive, rows, candidates):
+            distances = queries @ np.asarray(block, dtype=np.float32).T
+            distances *= -2
+            distances += query_norms
+            distances += norms[slots]
+            distances[:, ~alive[slots]] = np.inf
+            best_d = np.concatenate([best_d, distances], axis=1)
+            best_s = np.concatenate([best_s, np.broadcast_to(slots, distances.shape)], axis=1)
+            if best_d.shape[1] > k:
+                top = np.argpartition(best_d, k - 1, axis=1)[:, :k]
+                best_d = np.take_along_axis(best_d, top, axis=1)
+                best_s = np.take_along_axis(best_s, top, axis=1)
+        order = np.argsort(best_d, axis=1, kind="stable")
+        return np.take_along_axis(best_d, order, axis=1), np.take_along_axis(best_s, order, axis=1)
+
+    @staticmethod
+    def _blocks(vectors, alive, rows, candidates) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        if candidates is None:
+            for start in range(0, rows, SCAN_BLOCK_ROWS):
+                stop = min(start + SCAN_BLOCK_ROWS, rows)
+                yield np.arange(start, stop), vectors[start:stop]
+            return
+        candidates = candidates[candidates < rows]
+        candidates = candidates[alive[candidates]]
+        for start in range(0, candidates.size, SCAN_BLOCK_ROWS):
+            chunk = candidates[start:start + SCAN_BLOCK_ROWS]
+            yield chunk, vectors[chunk]
+
+    def _results(self, distances: np.ndarray, slots: np.ndarray, include: Sequence[str]) -> Dict[str, Any]:
+        wanted = sorted({int(s) for d_row, s_row in zip(distances, slots) for d, s in zip(d_row, s_row) if d != np.inf})
+        found = {}
+        for start in range(0, len(wanted), 500):
+            batch = wanted[start:start + 500]
+            for row in self._db.execute(
+                f"SELECT slot, id, document, metadata FROM items WHERE slot IN ({','.join('?' * len(batch))})", batch
+            ):
+                found[row[0]] = row
+        results: Dict[str, Any] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for d_row, s_row in zip(distances, slots):
+            hits = [(float(d), found[int(s)]) for d, s in zip(d_row, s_row) if d != np.inf and int(s) in found]
+            results["ids"].append([row[1] for _, row in hits])
+            results["documents"].append([row[2] for _, row in hits])
+            results["metadatas"].append([json.loads(row[3]) if row[3] else None for _, row in hits])
+            results["distances"].append([d for d, _ in hits])
+        for key in ("documents", "metadatas", "distances"):
+            if key not in include:
+                results[key] = None
+        results["embeddings"] = None
+        results["included"] = list(include)
+        return results
+
+    # ==================== Maintenance ====================
+
+    def _ivf_due(self) -> bool:
+        if self._live < settings.local_index_ivf_min_rows:
+            return False
+        return self._ivf is None or self._live > 2 * self._ivf.trained_rows
+
+    def _compaction_due(self) -> bool:
+        dead = self._rows - self._live
+        return dead >= COMPACT_MIN_DEAD and dead >= settings.local_index_compact_ratio * self._rows
+
+    def _schedule_maintenance(self):
+        if self._maintenance is None or self._maintenance_pending:
+            return
+        if self._compaction_due() or self._ivf_due():
+            self._maintenance_pending = True
+            self._maintenance.submit(self._maintain)
+
+    def _maintain(self):
+        try:
+            if self._compaction_due():
+                self.compact()
+            if self._ivf_due():
+                self.train_ivf()
+        except Exception as e:
+            logger.error(f"Maintenance of collection {self.name} failed: {e}")
+        finally:
+            self._maintenance_pending = False
+
+    def compact(self) -> int:
+        """Rewrite the live rows into a new vector file; returns the slots reclaimed"""
+        with self._lock:
+            rows, generation = self._rows, self.generation
+            if rows == self._live:
+                return 0
+            live = np.flatnonzero(self._alive[:rows])
+            source = self._vectors()
+            target_path = self._vector_path(generation + 1)
+
+        # Rows below ``rows`` never change, so the bulk copy needs no lock
+        with open(target_path, "wb") as target:
+            for start in range(0, live.size, SCAN_BLOCK_ROWS):
+                target.write(np.ascontiguousarray(source[live[start:start + SCAN_BLOCK_ROWS]]).tobytes())
+
+            with self._lock:
+                appended = np.arange(rows, self._rows)
+                current = self._vectors()
+                for start in range(0, appended.size, SCAN_BLOCK_ROWS):
+                    target.write(np.ascontiguousarray(current[appended[start:start + SCAN_BLOCK_ROWS]]).tobytes())
+                target.flush()
+                os.fsync(target.fileno())
+
+                keep = np.concatenate([live, appended])
+                renumber = np.full(self._rows, -1, dtype=np.int64)
+                renumber[keep] = np.arange(keep.size)
+                with self._db:
+                    moved = [
+                        (int(renumber[slot]), slot) for (slot,) in self._db.execute("SELECT slot FROM items ORDER BY slot")
+                        if renumber[slot] != slot
+                    ]
+                    # Slots only move down, so ascending updates never collide
+                    self._db.executemany("UPDATE items SET slot = ? WHERE slot = ?", moved)
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO info (key, value) VALUES ('generation', ?)", (str(generation + 1),)
+                    )
+
+                reclaimed = self._rows - keep.size
+                self._file.close()
+                old_path = self._vector_path(generation)
+                self.generation = generation + 1
+                self._file = open(target_path, "ab")
+                self._rows = int(keep.size)
+                self._alive = self._alive[keep]
+                self._mapped = None
+                if self._norms is not None:
+                    self._norms = self._norms[keep]
+                if self._ivf is not None:
+                    self._ivf.assignments = self._ivf.assignments[keep]
+                os.remove(old_path)
+
+        logger.info(f"Compacted collection {self.name}: {reclaimed} dead rows reclaimed")
+        return reclaimed
+
+    def train_ivf(self):
+        """(Re)train the coarse quantizer on the live rows"""
+        with self._lock:
+            generation, rows = self.generation, self._rows
+            vectors, live = self._vectors(), np.flatnonzero(self._alive)
+        if live.size == 0:
+            return
+        quantizer = IVFQuantizer.train(vectors, live)
+        with self._lock:
+            if self.generation != generation:
+                return  # compacted meanwhile; retrained on the next write
+            if self._rows > rows:
+                quantizer.assignments = np.concatenate(
+                    [quantizer.assignments, quantizer.assign_rows(self._vectors(), rows, self._rows)]
+                )
+            self._ivf = quantizer
+        logger.info(f"Trained IVF for collection {self.name}: {quantizer.centroids.shape[0]} lists")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+            self._db.close()
+            self._mapped = None
+
+
+class LocalIndexClient:
+    """Chroma-compatible client over LocalCollection directories"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._collections: Dict[str, LocalCollection] = {}
+        self._lock = threading.Lock()
+        self._maintenance = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-index")
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None,
+                                 embedding_function=None) -> LocalCollection:
+        if embedding_function is not None:
+            raise ValueError("The local index does not embed; pass embedding_function=None")
+        if not _NAME.match(name):
+            raise ValueError(f"Invalid collection name: {name!r}")
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = self._collections[name] = LocalCollection(self.path, name, metadata, self._maintenance)
+            return collection
+
+    def get_collection(self, name: str) -> LocalCollection:
+        if name not in self._collections and not os.path.isdir(os.path.join(self.path, name)):
+            raise ValueError(f"Collection {name} does not exist")
+        return self.get_or_create_collection(name)
+
+    def list_collections(self) -> List[LocalCollection]:
+        names = sorted(e for e in os.listdir(self.path) if os.path.isfile(os.path.join(self.path, e, "meta.db")))
+        return [self.get_or_create_collection(name) for name in names]
+
+    def delete_collection(self, name: str):
+        with self._lock:
+            collection = self._collections.pop(name, None)
+        if collection is not None:
+            collection.close()
+        directory = os.path.join(self.path, name)
+        if os.path.isdir(directory):
+            for entry in os.listdir(directory):
+                os.remove(os.path.join(directory, entry))
+            os.rmdir(directory)
+
+    def wait_for_maintenance(self):
+        """Block until compaction and IVF training queued so far have run"""
+        self._maintenance.submit(lambda: None).result()
+
+    def close(self):
+        """Wait for maintenance, then close every collection"""
+        self._maintenance.shutdown(wait=True)
+        with self._lock:
+            for collection in self._collections.values():
+                collection.close()
+            self._collections.clear()
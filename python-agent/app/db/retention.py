@@ -0,0 +1,266 @@
+"""
+Retention and compaction
+
+One run applies every retention policy, then compacts:
+
+- builds: finished builds older than ``retention_builds_days``, with their
+  analyses and vector memories; their blob references are released
+- code_analysis: standalone analyses older than ``retention_analyses_days``
+- audit_logs: entries older than ``retention_audit_days``
+- workflow_sessions, memory: rows past their ``expires_at``
+- search_documents: chat messages older than ``retention_conversations_days``
+  and the documents of deleted builds
+- blobs: whatever is left unreferenced, via blob_store.collect_garbage
+
+Deletes run in transactions of ``retention_batch_size`` rows with a short
+pause between them, so a large backlog never holds a long write lock.
+Afterwards SQLite returns freed pages with PRAGMA incremental_vacuum (for
+databases created with auto_vacuum=INCREMENTAL, which sqlite_pragmas sets
+on new files) and PostgreSQL refreshes planner statistics with ANALYZE.
+
+Runs are blocking: Celery beat schedules them as
+app.tasks.maintenance.cleanup_expired_builds, and the API process can run
+them in a worker thread through RetentionJob.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.blob_store import collect_garbage, release_blobs
+from app.db.search import delete_documents
+from app.models.database import (
+    AuditLog, Build, BuildStatus, CodeAnalysis, Memory, SearchDocument, VectorMemory, WorkflowSession,
+)
+from app.monitoring.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = (BuildStatus.COMPLETED, BuildStatus.FAILED, BuildStatus.CANCELLED)
+
+
+@dataclass
+class RetentionReport:
+    """What one retention run removed and how long it took"""
+    rows: Dict[str, int] = field(default_factory=dict)  # table -> rows deleted
+    blobs_removed: int = 0
+    database_bytes_reclaimed: int = 0
+    blob_bytes_reclaimed: int = 0
+    compaction: List[str] = field(default_factory=list)
+    duration: float = 0.0
+
+    @property
+    def rows_removed(self) -> int:
+        return sum(self.rows.values())
+
+    @property
+    def bytes_reclaimed(self) -> int:
+        return self.database_bytes_reclaimed + self.blob_bytes_reclaimed
+
+    def to_dict(self) -> Dict:
+        report = asdict(self)
+        report.update(rows_removed=self.rows_removed, bytes_reclaimed=self.bytes_reclaimed)
+        return report
+
+
+class Retention:
+    """A single retention pass over one database"""
+
+    def __init__(self, engine=None, now: Optional[datetime] = None):
+        if engine is None:
+            from app.db.session import engine as default_engine
+            engine = default_engine
+        self.engine = engine
+        self.now = now or datetime.utcnow()
+        self.batch_size = max(settings.retention_batch_size, 1)
+        self.pause = settings.retention_batch_pause_ms / 1000
+        self.report = RetentionReport()
+
+    def _count(self, table: str, rows: int):
+        self.report.rows[table] = self.report.rows.get(table, 0) + rows
+
+    def _delete_in_batches(
+        self,
+        db: Session,
+        model,
+        condition,
+        order_by,
+        before_delete: Optional[Callable[[Session, list], None]] = None,
+    ):
+        """Delete matching rows batch_size at a time, one transaction per batch"""
+        while True:
+            ids = list(db.execute(
+                select(model.id).where(condition).order_by(order_by).limit(self.batch_size)
+            ).scalars())
+            if not ids:
+                return
+            if before_delete is not None:
+                before_delete(db, ids)
+            db.execute(delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False))
+            db.commit()
+            self._count(model.__tablename__, len(ids))
+            if len(ids) < self.batch_size:
+                return
+            time.sleep(self.pause)
+
+    def _drop_build_dependents(self, db: Session, build_ids: list):
+        outputs = db.execute(
+            select(Build.generated_code_digest, Build.build_logs_digest).where(Build.id.in_(build_ids))
+        ).all()
+        analyses = db.execute(select(CodeAnalysis.code_digest).where(CodeAnalysis.build_id.in_(build_ids))).all()
+        release_blobs(db, [digest for row in outputs + analyses for digest in row])
+
+        for model in (CodeAnalysis, VectorMemory):
+            result = db.execute(
+                delete(model).where(model.build_id.in_(build_ids)).execution_options(synchronize_session=False)
+            )
+            self._count(model.__tablename__, result.rowcount)
+
+        removed = delete_documents(db, ("build", "build_log"), build_ids)
+        if removed:
+            self._count(SearchDocument.__tablename__, removed)
+
+    def _release_analysis_code(self, db: Session, analysis_ids: list):
+        release_blobs(db, db.execute(
+            select(CodeAnalysis.code_digest).where(CodeAnalysis.id.in_(analysis_ids))
+        ).scalars())
+
+    def _older_than(self, days: int) -> Optional[datetime]:
+        return self.now - timedelta(days=days) if days > 0 else None
+
+    def delete_expired(self, db: Session):
+        cutoff = self._older_than(settings.retention_builds_days)
+        if cutoff is not None:
+            self._delete_in_batches(
+                db, Build,
+                (Build.status.in_(FINISHED_STATUSES)) & (Build.created_at < cutoff),
+                Build.created_at,
+                self._drop_build_dependents,
+            )
+
+        cutoff = self._older_than(settings.retention_analyses_days)
+        if cutoff is not None:
+            self._delete_in_batches(
+                db, CodeAnalysis,
+                CodeAnalysis.build_id.is_(None) & (CodeAnalysis.created_at < cutoff),
+                CodeAnalysis.created_at,
+                self._release_analysis_code,
+            )
+
+        cutoff = self._older_than(settings.retention_audit_days)
+        if cutoff is not None:
+            self._delete_in_batches(db, AuditLog, AuditLog.created_at < cutoff, AuditLog.created_at)
+
+        cutoff = self._older_than(settings.retention_conversations_days)
+        if cutoff is not None:
+            self._delete_in_batches(
+                db, SearchDocument,
+                (SearchDocument.kind == "message") & (SearchDocument.created_at < cutoff),
+                SearchDocument.created_at,
+            )
+
+        self._delete_in_batches(db, WorkflowSession, WorkflowSession.expires_at < self.now, WorkflowSession.expires_at)
+        self._delete_in_batches(db, Memory, Memory.expires_at < self.now, Memory.expires_at)
+
+    def _sqlite_size(self, conn) -> int:
+        page_size = conn.exec_driver_sql("PRAGMA page_size").scalar()
+        return conn.exec_driver_sql("PRAGMA page_count").scalar() * page_size
+
+    def compact(self):
+        """Hand freed pages back (SQLite) or refresh statistics (PostgreSQL)"""
+        backend = self.engine.dialect.name
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            if backend == "sqlite":
+                before = self._sqlite_size(conn)
+                if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+                    # Each step of the pragma frees one page and execute() steps
+                    # once; executescript runs it to completion
+                    conn.connection.dbapi_connection.executescript("PRAGMA incremental_vacuum;")
+                    self.report.compaction.append("incremental_vacuum")
+                else:
+                    free = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+                    logger.warning(
+                        f"SQLite database has {free} free pages but auto_vacuum is not INCREMENTAL; "
+                        "run VACUUM once to enable incremental vacuum"
+                    )
+                if conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal":
+                    conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+                    self.report.compaction.append("wal_checkpoint")
+                conn.exec_driver_sql("PRAGMA optimize")
+                self.report.compaction.append("optimize")
+                self.report.database_bytes_reclaimed = max(before - self._sqlite_size(conn), 0)
+            elif backend == "postgresql":
+                for table in sorted(t for t, rows in self.report.rows.items() if rows):
+                    conn.exec_driver_sql(f'ANALYZE "{table}"')
+                    self.report.compaction.append(f"analyze {table}")
+
+    def run(self) -> RetentionReport:
+        started = time.perf_counter()
+        with Session(self.engine) as db:
+            self.delete_expired(db)
+            self.report.blobs_removed, self.report.blob_bytes_reclaimed = collect_garbage(db)
+        if self.report.rows_removed or self.report.blobs_removed:
+            self.compact()
+        self.report.duration = time.perf_counter() - started
+        get_metrics().record_retention_run(self.report)
+        logger.info(
+            f"Retention removed {self.report.rows_removed} rows and {self.report.blobs_removed} blobs, "
+            f"reclaimed {self.report.bytes_reclaimed} bytes in {self.report.duration:.2f}s"
+        )
+        return self.report
+
+
+def run_retention(engine=None, now: Optional[datetime] = None) -> RetentionReport:
+    """Apply all retention policies and compact; blocking"""
+    return Retention(engine, now).run()
+
+
+class RetentionJob:
+    """Runs retention in a worker thread every retention_interval_hours"""
+
+    def __init__(self, interval: Optional[float] = None, initial_delay: float = 60.0):
+        self.interval = interval if interval is not None else settings.retention_interval_hours * 3600
+        self.initial_delay = initial_delay
+        self.last_report: Optional[RetentionReport] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="retention")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        await asyncio.sleep(self.initial_delay)
+        while True:
+            try:
+                self.last_report = await asyncio.to_thread(run_retention)
+            except Exception as e:
+                logger.error(f"Retention run failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+# Global retention job
+_retention_job: Optional[RetentionJob] = None
+
+
+def get_retention_job() -> RetentionJob:
+    """Get or create the global retention job"""
+    global _retention_job
+    if _retention_job is None:
+        _retention_job = RetentionJob()
+    return _retention_job
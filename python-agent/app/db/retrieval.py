@@ -0,0 +1,151 @@
+"""
+Hybrid retrieval over the Chroma collections
+One query fans out to every requested collection at once, each searched two
+ways: dense (Chroma similarity) and keyword (BM25, see ``keyword_index``).
+All ranked lists are merged with reciprocal-rank fusion, so a chunk that
+names the exact identifier in the query surfaces even when its embedding is
+not the nearest, and results from different collections compete on rank
+rather than on incomparable scores. The fused list is then cut to a token
+budget. Each stage's latency goes to ``retrieval_stage_duration_seconds``.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+
+from app.core.config import settings
+from app.monitoring.metrics import get_metrics
+
+if TYPE_CHECKING:
+    from app.db.vector import VectorStore
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for code and English)"""
+    return max(1, len(text) // 4)
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> Dict[str, float]:
+    """score(d) = sum over rankings of 1 / (k + rank of d), ranks starting at 1"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+@dataclass
+class RetrievedChunk:
+    id: str
+    collection: str
+    document: str
+    metadata: Dict[str, Any]
+    score: float
+    distance: Optional[float] = None
+    sources: List[str] = field(default_factory=list)  # "dense", "keyword"
+    tokens: int = 0
+
+
+@dataclass
+class RetrievalResult:
+    chunks: List[RetrievedChunk]
+    tokens: int
+    dropped: int  # fused results left out by the token budget
+    timings: Dict[str, float]
+
+    def for_collection(self, name: str) -> List[RetrievedChunk]:
+        return [chunk for chunk in self.chunks if chunk.collection == name]
+
+
+class HybridRetriever:
+    """Dense + BM25 retrieval with rank fusion and a token budget"""
+
+    def __init__(self, store: "VectorStore"):
+        self.store = store
+
+    async def retrieve(
+        self,
+        query: str,
+        collections: Iterable[str],
+        n_results: int = 8,
+        filters: Optional[Dict[str, Dict[str, Any]]] = None,
+        token_budget: Optional[int] = None
+    ) -> RetrievalResult:
+        """
+        Search ``collections`` for ``query``
+
+        Args:
+            query: Natural-language question, code, or identifier
+            collections: Collection names to search
+            n_results: Maximum chunks returned (after fusion)
+            filters: Optional Chroma ``where`` filter per collection name
+            token_budget: Maximum estimated tokens of returned documents
+                (default ``settings.retrieval_token_budget``)
+        """
+        collections = list(collections)
+        filters = filters or {}
+        budget = settings.retrieval_token_budget if token_budget is None else token_budget
+        candidates = max(settings.retrieval_candidates, n_results)
+        timings: Dict[str, float] = {}
+
+        async def timed(stage: str, coro):
+            started = time.perf_counter()
+            try:
+                return await coro
+            finally:
+                timings[stage] = max(timings.get(stage, 0.0), time.perf_counter() - started)
+
+        # Dense and keyword searches of every collection run concurrently
+        searches = []
+        for name in collections:
+            where = filters.get(name)
+            searches.append(timed("dense", self.store.query_collection(name, query, candidates, where)))
+            searches.append(timed("keyword", self.store.keyword_search(name, query, candidates, where)))
+        started = time.perf_counter()
+        results = await asyncio.gather(*searches)
+        timings["search"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        found: Dict[str, RetrievedChunk] = {}
+        rankings: List[List[str]] = []
+        for i, hits in enumerate(results):
+            name, source = collections[i // 2], ("dense", "keyword")[i % 2]
+            ranking = []
+            for hit in hits:
+                key = f"{name}/{hit['id']}"
+                chunk = found.get(key)
+                if chunk is None:
+                    chunk = found[key] = RetrievedChunk(
+                        hit["id"], name, hit["document"] or "", hit["metadata"] or {}, 0.0
+                    )
+                if source == "dense":
+                    chunk.distance = hit.get("distance")
+                chunk.sources.append(source)
+                ranking.append(key)
+            rankings.append(ranking)
+        fused = reciprocal_rank_fusion(rankings, settings.retrieval_rrf_k)
+        ordered = sorted(found, key=lambda key: fused[key], reverse=True)
+        timings["fusion"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        chunks: List[RetrievedChunk] = []
+        used = dropped = 0
+        for key in ordered:
+            if len(chunks) >= n_results:
+                break
+            chunk = found[key]
+            chunk.score = fused[key]
+            chunk.tokens = estimate_tokens(chunk.document)
+            if used + chunk.tokens > budget:
+                dropped += 1  # a smaller, lower-ranked chunk may still fit
+                continue
+            used += chunk.tokens
+            chunks.append(chunk)
+        timings["budget"] = time.perf_counter() - started
+        timings["total"] = sum(timings[s] for s in ("search", "fusion", "budget"))
+
+        metrics = get_metrics()
+        for stage, seconds in timings.items():
+            metrics.record_retrieval_stage(stage, seconds)
+        return RetrievalResult(chunks, used, dropped, timings)
@@ -0,0 +1,103 @@
+"""
+In-memory LRU caches for RAG lookups
+A build's workflow asks the vector store the same (or a whitespace-variant)
+question several times. VectorStore keeps two caches:
+
+- query embeddings, keyed by the normalized query text (they only depend on
+  the embedding model);
+- search results, keyed by (collection, normalized query, filters, result
+  count, index version). Every write to a collection bumps its version, so
+  entries computed before a write are never served after it and simply age
+  out of the LRU.
+
+Both cache the pending computation itself, so concurrent identical lookups
+(one query fanned out to several collections) compute once. Hits and misses
+go to ``retrieval_cache_requests_total``.
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from app.monitoring.metrics import get_metrics
+
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace so reformatted copies of a query share entries"""
+    return " ".join(query.split())
+
+
+def filter_key(where: Optional[Dict[str, Any]]) -> str:
+    return json.dumps(where, sort_keys=True, default=str) if where else ""
+
+
+class LRUCache:
+    """Bounded mapping with least-recently-used eviction and optional TTL"""
+
+    def __init__(self, name: str, maxsize: int, ttl: Optional[float] = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> (monotonic deadline or None, value)
+        self._entries: "OrderedDict[Hashable, Tuple[Optional[float], Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """(found, value); values are shared, callers must not mutate them"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is not None and time.monotonic() > entry[0]:
+            del self._entries[key]
+            entry = None
+        hit = entry is not None
+        if hit:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+        get_metrics().record_cache_request(self.name, hit)
+        return (True, entry[1]) if hit else (False, None)
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store value; ttl shortens the cache-wide TTL for this entry only"""
+        if self.maxsize <= 0:
+            return
+        ttls = [t for t in (self.ttl, ttl) if t is not None]
+        self._entries[key] = (time.monotonic() + min(ttls) if ttls else None, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Cached value, computed once even for concurrent callers; failures are not cached"""
+        found, task = self.get(key)
+        if not found:
+            task = asyncio.ensure_future(compute())
+            self.put(key, task)
+            task.add_done_callback(lambda done: self._forget_failed(key, done))
+        # One caller giving up must not cancel the computation for the others
+        return await asyncio.shield(task)
+
+    def _forget_failed(self, key: Hashable, task: asyncio.Future):
+        if task.cancelled() or task.exception() is not None:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is task:
+                del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,415 @@
+"""
+Full-text search over conversations, builds and build logs
+
+Documents live in search_documents, one row per (kind, ref_id):
+
+- message: a chat message (user or assistant) from the session store
+- build: a build's project name and goal
+- build_log: a finished build's log
+
+Each row is owned by ``user:<users.id>`` or, for chat messages, by
+``tg:<telegram id>``; searches are limited to the owners of the caller
+(both keys once the Telegram account is linked), admins search everything.
+
+The index is backend-specific and created by ensure_search_schema: on
+SQLite an external-content FTS5 table kept in sync by triggers, ranked with
+bm25 and highlighted with snippet(); on PostgreSQL a generated, weighted
+tsvector column with a GIN index, ranked with ts_rank_cd and highlighted
+with ts_headline. Titles weigh more than bodies on both.
+
+Writers never touch the index directly: SearchIndexer queues documents in
+memory and upserts them in batches from a background task, so indexing
+adds no database round trip to a chat reply or a build. The time a
+document waits before it is searchable is exported as indexing lag.
+"""
+
+import asyncio
+import logging
+import re
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import bindparam, delete, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.session_store import Message, UserSession, on_message
+from app.models.database import SearchDocument, TelegramUser, User
+from app.monitoring.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("message", "build", "build_log")
+
+# Snippet highlight markers (private-use characters); see render_snippet
+HIGHLIGHT_START = "\ue000"
+HIGHLIGHT_END = "\ue001"
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+_SQLITE_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+    "title, body, content='search_documents', content_rowid='id', "
+    "tokenize='porter unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN "
+    "INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN "
+    "INSERT INTO search_fts(search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN "
+    "INSERT INTO search_fts(search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); "
+    "INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+)
+
+_POSTGRES_SCHEMA = (
+    "ALTER TABLE search_documents ADD COLUMN IF NOT EXISTS tsv tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', body), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS idx_search_tsv ON search_documents USING GIN (tsv)",
+)
+
+_SQLITE_QUERY = """
+SELECT d.kind, d.ref_id, d.title, d.created_at,
+       snippet(search_fts, -1, :hl_start, :hl_end, '…', 16) AS snippet,
+       -bm25(search_fts, 4.0, 1.0) AS score
+FROM search_fts JOIN search_documents d ON d.id = search_fts.rowid
+WHERE search_fts MATCH :query {filters}
+ORDER BY bm25(search_fts, 4.0, 1.0)
+LIMIT :limit OFFSET :offset
+"""
+
+_POSTGRES_QUERY = """
+SELECT d.kind, d.ref_id, d.title, d.created_at,
+       ts_headline('english', d.body, q, :headline) AS snippet,
+       ts_rank_cd(d.tsv, q) AS score
+FROM search_documents d, websearch_to_tsquery('english', :query) q
+WHERE d.tsv @@ q {filters}
+ORDER BY score DESC, d.id DESC
+LIMIT :limit OFFSET :offset
+"""
+
+
+def user_owner(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def telegram_owner(telegram_id: int) -> str:
+    return f"tg:{telegram_id}"
+
+
+def ensure_search_schema(conn):
+    """Create the backend's full-text index over search_documents (sync connection; idempotent)"""
+    if conn.dialect.name == "sqlite":
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_fts'"
+        ).first()
+        for statement in _SQLITE_SCHEMA:
+            conn.exec_driver_sql(statement)
+        if not exists:
+            # Index rows written before the FTS table existed
+            conn.exec_driver_sql("INSERT INTO search_fts(search_fts) VALUES ('rebuild')")
+    elif conn.dialect.name == "postgresql":
+        for statement in _POSTGRES_SCHEMA:
+            conn.exec_driver_sql(statement)
+
+
+def fts5_query(query: str) -> Optional[str]:
+    """
+    User input as an FTS5 query: every word must match, the last one as a
+    prefix. Words are quoted, so FTS5 operators in the input are plain text.
+    """
+    terms = _TERM.findall(query)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"' for term in terms) + "*"
+
+
+def render_snippet(snippet: str, start: str, end: str, escape=None) -> str:
+    """Replace the highlight markers, escaping the text in between (e.g. html.escape)"""
+    if escape is not None:
+        snippet = escape(snippet)
+    return snippet.replace(HIGHLIGHT_START, start).replace(HIGHLIGHT_END, end)
+
+
+@dataclass
+class SearchHit:
+    kind: str
+    ref_id: str
+    title: str
+    snippet: str  # matched terms between HIGHLIGHT_START and HIGHLIGHT_END
+    score: float
+    created_at: datetime
+
+
+@dataclass
+class SearchPage:
+    hits: List[SearchHit]
+    next_offset: Optional[int]
+
+
+async def owners_for_subject(db: AsyncSession, subject: str) -> List[str]:
+    """Owner keys an API user can search: their users row and linked Telegram accounts"""
+    user_id = (await db.execute(select(User.id).where(User.api_subject == subject))).scalar()
+    if user_id is None:
+        return []
+    telegram_ids = (await db.execute(
+        select(TelegramUser.telegram_id).where(TelegramUser.user_id == user_id)
+    )).scalars()
+    return [user_owner(user_id)] + [telegram_owner(t) for t in telegram_ids]
+
+
+async def owners_for_telegram(db: AsyncSession, telegram_id: int) -> List[str]:
+    """Owner keys a Telegram user can search: their chats and, once linked, their builds"""
+    user_id = (await db.execute(
+        select(TelegramUser.user_id).where(TelegramUser.telegram_id == telegram_id)
+    )).scalar()
+    owners = [telegram_owner(telegram_id)]
+    if user_id is not None:
+        owners.append(user_owner(user_id))
+    return owners
+
+
+async def search(
+    db: AsyncSession,
+    query: str,
+    owners: Optional[Sequence[str]],
+    kinds: Optional[Sequence[str]] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> SearchPage:
+    """
+    One page of documents matching query, best first. owners None searches
+    every owner (admins); kinds None searches every kind.
+    """
+    backend = db.get_bind().dialect.name
+    params: Dict[str, Any] = {"limit": limit + 1, "offset": offset}
+    filters = ""
+    if owners is not None:
+        if not owners:
+            return SearchPage([], None)
+        filters += " AND d.owner IN :owners"
+        params["owners"] = list(owners)
+    if kinds:
+        filters += " AND d.kind IN :kinds"
+        params["kinds"] = list(kinds)
+
+    if backend == "postgresql":
+        statement = _POSTGRES_QUERY
+        params["query"] = query
+        params["headline"] = (
+            f'StartSel="{HIGHLIGHT_START}", StopSel="{HIGHLIGHT_END}", MaxWords=24, MinWords=8, MaxFragments=2'
+        )
+    else:
+        statement = _SQLITE_QUERY
+        params["query"] = fts5_query(query)
+        params["hl_start"], params["hl_end"] = HIGHLIGHT_START, HIGHLIGHT_END
+        if params["query"] is None:
+            return SearchPage([], None)
+
+    compiled = text(statement.format(filters=filters))
+    if "owners" in params:
+        compiled = compiled.bindparams(bindparam("owners", expanding=True))
+    if "kinds" in params:
+        compiled = compiled.bindparams(bindparam("kinds", expanding=True))
+
+    started = time.perf_counter()
+    rows = (await db.execute(compiled, params)).all()
+    get_metrics().record_search_query(backend, time.perf_counter() - started)
+
+    hits = [
+        SearchHit(
+            kind=row.kind, ref_id=row.ref_id, title=row.title, snippet=row.snippet or "",
+            score=float(row.score),
+            created_at=row.created_at if isinstance(row.created_at, datetime) else datetime.fromisoformat(row.created_at),
+        )
+        for row in rows[:limit]
+    ]
+    return SearchPage(hits, offset + limit if len(rows) > limit else None)
+
+
+class SearchIndexer:
+    """Bounded queue of documents with a batching background writer"""
+
+    def __init__(
+        self,
+        engine=None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_queue: Optional[int] = None,
+    ):
+        self._engine = engine
+        self.batch_size = batch_size or settings.search_index_batch_size
+        self.flush_interval = (
+            flush_interval if flush_interval is not None else settings.search_index_interval_ms / 1000
+        )
+        self.max_queue = max_queue or settings.search_queue_size
+        self._queue: deque = deque()
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.indexed = 0
+        self.dropped = 0
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from app.db.session import async_engine
+            self._engine = async_engine
+        return self._engine
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def add(
+        self,
+        kind: str,
+        ref_id: str,
+        owner: str,
+        body: str,
+        title: str = "",
+        created_at: Optional[datetime] = None,
+    ) -> bool:
+        """
+        Queue a document (replacing any earlier one with the same kind and
+        ref_id) without waiting; False if the queue was full and it was
+        dropped. Call from the event loop thread.
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Unknown search document kind: {kind}")
+        if not body and not title:
+            return True
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            get_metrics().record_search_dropped()
+            return False
+        self._queue.append(({
+            "kind": kind,
+            "ref_id": ref_id,
+            "owner": owner,
+            "title": (title or "")[:255],
+            "body": (body or "")[:settings.search_max_body_chars],
+            "created_at": created_at or datetime.utcnow(),
+        }, time.monotonic()))
+        if len(self._queue) >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def index_message(self, session: UserSession, message: Message):
+        """Session store hook: index user and assistant chat messages"""
+        if message.role in ("user", "assistant"):
+            self.add("message", uuid.uuid4().hex, telegram_owner(session.user_id), message.content, title=message.role)
+
+    def index_build(self, build_id: str, user_id: int, project_name: str, goal: str):
+        self.add("build", build_id, user_owner(user_id), goal, title=project_name)
+
+    def index_build_log(self, build_id: str, user_id: int, project_name: str, log: str):
+        self.add("build_log", build_id, user_owner(user_id), log, title=project_name)
+
+    async def start(self):
+        """Start the background writer and subscribe to chat messages"""
+        on_message(self.index_message)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="search-indexer")
+
+    async def stop(self):
+        """Stop the writer and index everything still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._queue:
+            if not await self.flush():
+                break
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Search index flush failed: {e}")
+
+    async def flush(self) -> int:
+        """Upsert the documents queued when the flush starts, in batches; returns how many"""
+        indexed = 0
+        async with self._flush_lock:
+            remaining = len(self._queue)
+            while remaining > 0 and self._queue:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, remaining, len(self._queue)))]
+                remaining -= len(batch)
+                try:
+                    await self._write([document for document, _ in batch])
+                except Exception as e:
+                    # Put the batch back for the next flush
+                    self._queue.extendleft(reversed(batch))
+                    logger.warning(f"Search batch of {len(batch)} not indexed: {e}")
+                    break
+                now = time.monotonic()
+                indexed += len(batch)
+                self.indexed += len(batch)
+                get_metrics().record_search_indexed(
+                    [document["kind"] for document, _ in batch],
+                    [now - queued for _, queued in batch],
+                    len(self._queue),
+                )
+        return indexed
+
+    async def _write(self, documents: List[Dict[str, Any]]):
+        # A batch may hold several versions of one document; the last wins
+        latest = {(d["kind"], d["ref_id"]): d for d in documents}
+        async with self.engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            statement = insert(SearchDocument.__table__)
+            statement = statement.on_conflict_do_update(
+                index_elements=["kind", "ref_id"],
+                set_={
+                    "owner": statement.excluded.owner,
+                    "title": statement.excluded.title,
+                    "body": statement.excluded.body,
+                },
+            )
+            await conn.execute(statement, list(latest.values()))
+
+
+def delete_documents(db, kinds: Iterable[str], ref_ids: Sequence[str]) -> int:
+    """Remove documents of the given kinds for ref_ids (sync session, caller commits)"""
+    result = db.execute(
+        delete(SearchDocument)
+        .where(SearchDocument.kind.in_(list(kinds)), SearchDocument.ref_id.in_(list(ref_ids)))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+# Global search indexer
+_search_indexer: Optional[SearchIndexer] = None
+
+
+def get_search_indexer() -> SearchIndexer:
+    """Get or create the global search indexer"""
+    global _search_indexer
+    if _search_indexer is None:
+        _search_indexer = SearchIndexer()
+    return _search_indexer
+
+
+async def stop_search_indexer():
+    """Index queued documents on shutdown"""
+    global _search_indexer
+    if _search_indexer is not None:
+        await _search_indexer.stop()
+        _search_indexer = None
@@ -1,62 +1,134 @@
 """
 Database session and connection management
-Provides SQLAlchemy session factory and dependency injection
+Provides the SQLAlchemy engines, session factories and dependency injection
+
+Two engines share one database: an async one (aiosqlite / asyncpg) for the
+FastAPI routes, health checks and bot handlers, so DB I/O never blocks the
+event loop, and a sync one for Celery tasks, scripts and code that already
+runs in a worker thread. Both keep a connection pool in every environment
+and report how long callers wait for a pooled connection.
 """
 
-from sqlalchemy import create_engine, event, pool
-from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import NullPool, QueuePool
-from typing import Generator
 import logging
+import time
+from typing import AsyncGenerator
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
+
 from app.core.config import settings
+from app.monitoring.metrics import get_metrics
 
 logger = logging.getLogger(__name__)
 
+# Async driver used for each backend when DATABASE_URL names a sync one
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
 
 def get_database_url() -> str:
     """Get database URL from settings"""
     return settings.database_url.get_secret_value()
 
 
-# Create engine with appropriate pool configuration
-engine_kwargs = {
-    "echo": settings.db_echo,
-    "pool_pre_ping": True,  # Test connections before using
-}
+def get_async_database_url() -> str:
+    """DATABASE_URL with its driver swapped for the async one (sqlite+aiosqlite, postgresql+asyncpg)"""
+    url = make_url(get_database_url())
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend} databases")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
 
-# Only set connect_args for non-SQLite databases
-db_url = get_database_url()
-if "sqlite" not in db_url:
-    engine_kwargs["connect_args"] = {
-        "connect_timeout": 10,
+
+class _PoolWaitMixin:
+    """Time every checkout, so pool exhaustion shows up as wait time instead of slow queries"""
+
+    engine_label = "sync"
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            get_metrics().record_db_pool_timeout(self.engine_label)
+            raise
+        finally:
+            get_metrics().record_db_pool_wait(self.engine_label, time.perf_counter() - started)
+
+
+class TimedQueuePool(_PoolWaitMixin, QueuePool):
+    engine_label = "sync"
+
+
+class TimedAsyncQueuePool(_PoolWaitMixin, AsyncAdaptedQueuePool):
+    engine_label = "async"
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+
+def engine_options(url: str, pool_class) -> dict:
+    """Engine keyword arguments for a URL: pooling, timeouts and echo"""
+    options = {
+        "echo": settings.db_echo,
+        "pool_pre_ping": True,  # Test connections before using
     }
+    if _is_memory_sqlite(url):
+        # Every connection would get its own empty database; share one instead
+        options["poolclass"] = StaticPool
+        options["connect_args"] = {"check_same_thread": False}
+        return options
+
+    options.update(
+        poolclass=pool_class,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+    )
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+    elif backend == "postgresql":
+        # asyncpg names the connect timeout differently from libpq
+        key = "timeout" if "asyncpg" in make_url(url).drivername else "connect_timeout"
+        options["connect_args"] = {key: 10}
+    return options
+
+
+def sqlite_pragmas(dbapi_conn, connection_record):
+    """Per-connection SQLite tuning: WAL, relaxed fsync, memory-mapped reads and a larger page cache"""
+    cursor = dbapi_conn.cursor()
+    # Only takes effect on a database with no tables yet; lets retention
+    # hand freed pages back with PRAGMA incremental_vacuum
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.db_sqlite_busy_timeout_ms)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.db_sqlite_mmap_size)}")
+    cursor.execute(f"PRAGMA cache_size={int(settings.db_sqlite_cache_size)}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
 
-# Use different pool strategies based on environment
-if settings.environment == "production":
-    engine_kwargs["poolclass"] = QueuePool
-    engine_kwargs["pool_size"] = settings.db_pool_size
-    engine_kwargs["max_overflow"] = settings.db_max_overflow
-else:
-    engine_kwargs["poolclass"] = NullPool  # Create new connection for each request in dev
-
-engine = create_engine(
-    db_url,
-    **engine_kwargs
-)
 
-# Add connection event listeners for connection pool
-@event.listens_for(engine, "connect")
-def receive_connect(dbapi_conn, connection_record):
-    """Setup SQLite-specific pragmas if using SQLite"""
-    if "sqlite" in get_database_url():
-        cursor = dbapi_conn.cursor()
-        cursor.execute("PRAGMA foreign_keys=ON")
-        cursor.execute("PRAGMA journal_mode=WAL")
-        cursor.execute("PRAGMA synchronous=NORMAL")
-        cursor.close()
+db_url = get_database_url()
+engine = create_engine(db_url, **engine_options(db_url, TimedQueuePool))
+
+async_db_url = get_async_database_url()
+async_engine = create_async_engine(async_db_url, **engine_options(async_db_url, TimedAsyncQueuePool))
+
+if make_url(db_url).get_backend_name() == "sqlite":
+    event.listen(engine, "connect", sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", sqlite_pragmas)
 
 
-# Session factory
+# Session factories
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
@@ -64,26 +136,32 @@ SessionLocal = sessionmaker(
     expire_on_commit=False
 )
 
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False
+)
 
-def get_db() -> Generator[Session, None, None]:
+
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
-    Dependency injection for database session
-    Usage: @app.get("/items/") def get_items(db: Session = Depends(get_db))
+    Dependency injection for an async database session
+    Usage: @app.get("/items/") async def get_items(db: AsyncSession = Depends(get_db))
     """
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 async def init_db():
     """Initialize database and create tables"""
     try:
         from app.models.database import Base
-        
+        from app.db.search import ensure_search_schema
+
         logger.info("Creating database tables...")
-        Base.metadata.create_all(bind=engine)
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(ensure_search_schema)
         logger.info("Database initialization complete")
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
@@ -92,5 +170,6 @@ async def init_db():
 
 async def close_db():
     """Close database connections"""
+    await async_engine.dispose()
     engine.dispose()
     logger.info("Database connections closed")
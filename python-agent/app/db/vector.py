@@ -1,60 +1,305 @@
 """
 Chroma vector database integration for semantic search
 Manages embeddings, similarity search, and retrieval-augmented generation
+
+The Chroma client is synchronous, so VectorStore is an async facade over it:
+every call runs on a small dedicated thread pool (never the event loop, and
+never the default executor other code relies on), with an admission limit and
+per-operation timeouts. Adds and deletes that arrive within a few
+milliseconds of each other are merged into one Chroma call per collection.
+Whole workspaces go through ``add_code_snippets_bulk``, which chunks files
+(see ``code_chunks``), embeds in batches and writes with large upserts.
+Every write is mirrored into a per-collection BM25 index (``keyword_index``)
+that ``HybridRetriever`` fuses with dense results (``retrieval``). Dense
+searches and query embeddings are cached per index version
+(``retrieval_cache``).
+Documents and queries are embedded here, by the backend chosen at startup
+(``embeddings``), and handed to Chroma as vectors; the collections carry no
+embedding function of their own.
+With ``vector_store_engine = "local"`` the collections live in the built-in
+memory-mapped index (``local_index``) instead of Chroma; both engines expose
+the same collection API.
+Queue and execution time of each call go to ``vector_search_duration_seconds``.
 """
 
+import asyncio
 import os
 import logging
-from typing import List, Optional, Dict, Any
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 import chromadb
 from chromadb.config import Settings as ChromaSettings
 import numpy as np
 from app.core.config import settings
+from app.db.code_chunks import CodeChunk, chunk_file, language_for_path
+from app.db.embeddings import select_embedding_backend
+from app.db.local_index import LocalIndexClient
+from app.db.keyword_index import KeywordIndex
+from app.db.retrieval import HybridRetriever
+from app.db.retrieval_cache import LRUCache, filter_key, normalize_query
+from app.monitoring.metrics import get_metrics
 
 logger = logging.getLogger(__name__)
 
 
+class ChromaExecutor:
+    """Runs blocking Chroma calls on a bounded, dedicated thread pool"""
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chroma")
+        self._slots = asyncio.Semaphore(max(max_pending, max_workers))
+
+    async def run(
+        self,
+        collection: str,
+        operation: str,
+        func: Callable[..., Any],
+        *args,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> Any:
+        """
+        Run ``func(*args, **kwargs)`` on the pool; ``timeout`` covers waiting
+        for a slot, queueing and execution. A call that times out while still
+        queued never starts; one already running finishes in the background.
+        """
+        submitted = time.perf_counter()
+        timings: Dict[str, float] = {}
+
+        def call():
+            started = time.perf_counter()
+            timings["queue"] = started - submitted
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings["execute"] = time.perf_counter() - started
+
+        async def admitted():
+            async with self._slots:
+                future = self._pool.submit(call)
+                try:
+                    return await asyncio.wrap_future(future)
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+
+        try:
+            return await asyncio.wait_for(admitted(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Chroma {operation} on {collection} timed out after {timeout}s")
+            raise
+        finally:
+            if "execute" in timings:
+                get_metrics().record_vector_search(
+                    collection, timings["execute"], operation=operation, queue_time=timings["queue"]
+                )
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+class WriteBatcher:
+    """
+    Coalesces bursts of writes to one collection
+
+    Writes are applied in arrival order; consecutive writes of the same kind
+    (adds, or deletes by build id) become a single Chroma call. An id added
+    twice in one batch keeps its first document, as two separate adds would.
+    If a merged call fails its writes are retried one at a time, so a bad
+    write only fails its own caller. Each caller awaits its own write, so
+    read-after-write still holds.
+    """
+
+    def __init__(self, collection, executor: ChromaExecutor, batch_size: int, window: float, timeout: float,
+                 keyword_index: Optional[KeywordIndex] = None,
+                 embed: Optional[Callable[[List[str]], Awaitable[List[Any]]]] = None):
+        self.collection = collection
+        self.executor = executor
+        self.embed = embed
+        self.keyword_index = keyword_index
+        self.batch_size = batch_size
+        self.window = window
+        self.timeout = timeout
+        self._pending: List[Tuple[str, Any, asyncio.Future]] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.calls = 0
+
+    @property
+    def name(self) -> str:
+        return self.collection.name
+
+    async def add(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+        await self._submit("add", (ids, documents, metadatas))
+
+    async def delete_build(self, build_id: str):
+        await self._submit("delete_build", build_id)
+
+    async def _submit(self, kind: str, payload: Any):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((kind, payload, future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_soon())
+        await asyncio.wait_for(asyncio.shield(future), self.timeout)
+
+    async def _flush_soon(self):
+        # Let the burst accumulate unless a full batch is already waiting
+        deadline = time.perf_counter() + self.window
+        while len(self._pending) < self.batch_size and time.perf_counter() < deadline:
+            await asyncio.sleep(self.window / 4)
+        while self._pending:
+            await self.flush()
+
+    async def flush(self):
+        """Apply pending writes now (in order, one call per run of same-kind writes)"""
+        async with self._lock:
+            await self._drain()
+
+    async def _drain(self):
+        while self._pending:
+            kind = self._pending[0][0]
+            run = []
+            while self._pending and self._pending[0][0] == kind and len(run) < self.batch_size:
+                run.append(self._pending.pop(0))
+            try:
+                await self._apply(kind, [payload for _, payload, _ in run])
+            except Exception as e:
+                if len(run) == 1:
+                    self._settle(run[0][2], e)
+                    continue
+                logger.warning(f"Batched {kind} on {self.name} failed ({e}); retrying {len(run)} writes one by one")
+                for _, payload, future in run:
+                    try:
+                        await self._apply(kind, [payload])
+                    except Exception as single:
+                        self._settle(future, single)
+                    else:
+                        self._settle(future)
+            else:
+                for _, _, future in run:
+                    self._settle(future)
+
+    @staticmethod
+    def _settle(future: asyncio.Future, error: Optional[BaseException] = None):
+        if future.done():
+            return
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(error)
+
+    async def _apply(self, kind: str, payloads: List[Any]):
+        self.calls += 1
+        if kind == "add":
+            ids, documents, metadatas = [], [], []
+            seen = set()
+            for batch_ids, batch_docs, batch_metas in payloads:
+                for item_id, document, metadata in zip(batch_ids, batch_docs, batch_metas):
+                    if item_id in seen:
+                        continue  # Chroma rejects repeated ids in one add; the first one wins
+                    seen.add(item_id)
+                    ids.append(item_id)
+                    documents.append(document)
+                    metadatas.append(metadata)
+            embeddings = await self.embed(documents) if self.embed is not None else None
+            await self.executor.run(
+                self.name, "add", self.collection.add,
+                ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings,
+            )
+            if self.keyword_index is not None:
+                self.keyword_index.add(ids, documents, metadatas, replace=False)
+        else:
+            build_ids = sorted(set(payloads))
+            where = {"build_id": {"$eq": build_ids[0]}} if len(build_ids) == 1 else {"build_id": {"$in": build_ids}}
+            await self.executor.run(self.name, "delete", self.collection.delete, where=where)
+            if self.keyword_index is not None:
+                self.keyword_index.remove_where(where)
+
+
 class VectorStore:
     """Chroma vector database wrapper for semantic search"""
     
-    def __init__(self):
-        """Initialize Chroma client and collections"""
+    # Files split per worker-thread call during bulk ingestion, so chunking
+    # the next files overlaps with upserting the previous batch
+    CHUNK_FILES_PER_CALL = 16
+    
+    def __init__(self, client=None, embedding_function=None):
+        """Initialize Chroma client and collections (blocking; see get_vector_store)"""
         self.data_dir = os.path.join(settings.data_dir, "chroma")
         os.makedirs(self.data_dir, exist_ok=True)
         
-        # Initialize Chroma with persistent storage
-        chroma_settings = ChromaSettings(
-            chroma_db_impl="duckdb+parquet",
-            persist_directory=self.data_dir,
-            anonymized_telemetry=False,
-        )
-        
-        self.client = chromadb.Client(chroma_settings)
+        if client is None and settings.vector_store_engine == "local":
+            client = LocalIndexClient(os.path.join(settings.data_dir, "local_index"))
+        elif client is None:
+            # Persistent storage (Chroma >= 0.4 writes through, no persist() needed)
+            client = chromadb.PersistentClient(
+                path=self.data_dir,
+                settings=ChromaSettings(anonymized_telemetry=False),
+            )
+        self.client = client
         
         # Create or get collections
         self._init_collections()
+        
+        # Every document and query is embedded with this; by default the
+        # first reachable model, else the offline hashed backend
+        if embedding_function is None:
+            embedding_function = select_embedding_backend(
+                settings.embedding_backend, self._stored_dimension(), self._stored_identity()
+            )
+        self.embedding_function = embedding_function
+        self._record_identity()
+        
+        self.executor = ChromaExecutor(settings.vector_store_max_workers, settings.vector_store_max_pending)
+        self.query_timeout = settings.vector_query_timeout
+        window = settings.vector_write_batch_window_ms / 1000
+        self._collections = {
+            collection.name: collection
+            for collection in (
+                self.code_collection, self.documentation_collection,
+                self.conversation_collection, self.best_practices_collection,
+            )
+        }
+        self.keyword_indexes = {name: KeywordIndex() for name in self._collections}
+        self._keyword_loads: Dict[str, asyncio.Task] = {}
+        self._writers = {
+            name: WriteBatcher(
+                collection, self.executor, settings.vector_write_batch_size, window, settings.vector_write_timeout,
+                keyword_index=self.keyword_indexes[name],
+                embed=lambda documents, name=name: self._embed(documents, name),
+            )
+            for name, collection in self._collections.items()
+        }
+        self.retriever = HybridRetriever(self)
+        self.result_cache = LRUCache("retrieval", settings.retrieval_cache_size, settings.retrieval_cache_ttl)
+        self.embedding_cache = LRUCache("query_embedding", settings.retrieval_embedding_cache_size)
     
     def _init_collections(self):
         """Initialize collection structure"""
         try:
             self.code_collection = self.client.get_or_create_collection(
                 name="code_snippets",
-                metadata={"description": "Indexed code snippets for RAG"}
+                metadata={"description": "Indexed code snippets for RAG"},
+                embedding_function=None
             )
             
             self.documentation_collection = self.client.get_or_create_collection(
                 name="documentation",
-                metadata={"description": "Project documentation and API docs"}
+                metadata={"description": "Project documentation and API docs"},
+                embedding_function=None
             )
             
             self.conversation_collection = self.client.get_or_create_collection(
                 name="conversations",
-                metadata={"description": "Conversation history for context"}
+                metadata={"description": "Conversation history for context"},
+                embedding_function=None
             )
             
             self.best_practices_collection = self.client.get_or_create_collection(
                 name="best_practices",
-                metadata={"description": "Code patterns and best practices"}
+                metadata={"description": "Code patterns and best practices"},
+                embedding_function=None
             )
             
             logger.info("Chroma collections initialized successfully")
@@ -62,6 +307,44 @@ class VectorStore:
             logger.error(f"Failed to initialize Chroma collections: {e}")
             raise
     
+    def _stored_dimension(self) -> Optional[int]:
+        """Dimension of the vectors already persisted, if any collection has some"""
+        for collection in self._collections_list():
+            embeddings = collection.peek(1).get("embeddings")
+            if embeddings is not None and len(embeddings):
+                return len(embeddings[0])
+        return None
+    
+    def _stored_identity(self) -> Optional[Dict[str, Any]]:
+        """Embedding backend and model recorded on a collection that holds vectors"""
+        for collection in self._collections_list():
+            identity = {key: (collection.metadata or {}).get(key) for key in ("embedding_backend", "embedding_model")}
+            if identity["embedding_backend"] and collection.count():
+                return identity
+        return None
+    
+    def _record_identity(self):
+        """Record the embedding backend on every collection that has none or is still empty"""
+        identity = getattr(self.embedding_function, "identity", None)
+        if identity is None:
+            return
+        identity = identity()
+        for collection in self._collections_list():
+            metadata = dict(collection.metadata or {})
+            if all(metadata.get(key) == value for key, value in identity.items()):
+                continue
+            if metadata.get("embedding_backend") and collection.count():
+                logger.warning(f"Collection {collection.name} was indexed with another embedding model")
+                continue
+            metadata.update(identity)
+            collection.modify(metadata=metadata)
+    
+    def _collections_list(self) -> list:
+        return [
+            self.code_collection, self.documentation_collection,
+            self.conversation_collection, self.best_practices_collection,
+        ]
+    
     async def add_code_snippet(
         self,
         code: str,
@@ -95,11 +378,7 @@ class VectorStore:
             if metadata:
                 meta.update(metadata)
             
-            self.code_collection.add(
-                ids=[doc_id],
-                documents=[code],
-                metadatas=[meta]
-            )
+            await self._writers[self.code_collection.name].add([doc_id], [code], [meta])
             
             logger.debug(f"Added code snippet: {doc_id}")
             return doc_id
@@ -107,6 +386,176 @@ class VectorStore:
             logger.error(f"Failed to add code snippet: {e}")
             raise
     
+    async def add_code_snippets_bulk(
+        self,
+        files: List[Dict[str, Any]],
+        build_id: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Index many files at once, one vector per function/class/window
+        
+        Args:
+            files: Dicts with ``file_path`` and ``code``, optionally ``language``
+            build_id: Associated build ID
+            metadata: Additional metadata for every chunk
+            
+        Returns:
+            Counts of files and chunks, and the chunk IDs written
+        
+        Chunks previously indexed for these files under this build are
+        replaced. A path listed more than once is indexed from its last
+        entry. Embedding of the next batch overlaps with the upsert of the
+        previous one.
+        """
+        name = self.code_collection.name
+        # Repeated paths would repeat chunk ids within one upsert, which Chroma rejects
+        files = list({f["file_path"]: f for f in files}.values())
+        
+        # Pending single adds go first, then stale chunks of these files
+        await self._writers[name].flush()
+        paths = sorted({f["file_path"] for f in files})
+        if paths:
+            where = {"$and": [{"build_id": {"$eq": build_id}}, {"file_path": {"$in": paths}}]}
+            await self.executor.run(
+                name, "delete", self.code_collection.delete,
+                where=where, timeout=settings.vector_write_timeout,
+            )
+            self.keyword_indexes[name].remove_where(where)
+        
+        ids = await self._upsert_batches(self._chunk_batches(files, build_id, metadata or {}))
+        
+        logger.info(f"Indexed {len(files)} files as {len(ids)} chunks for build {build_id}")
+        return {"files": len(files), "chunks": len(ids), "ids": ids}
+    
+    async def upsert_code_chunks(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ) -> List[str]:
+        """Embed and upsert prepared chunks (see ``chunk_metadata``) in batches"""
+        
+        async def batches():
+            size = settings.vector_upsert_batch_size
+            for start in range(0, len(ids), size):
+                yield ids[start:start + size], documents[start:start + size], metadatas[start:start + size]
+        
+        return await self._upsert_batches(batches())
+    
+    async def update_code_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """Replace chunk metadata without re-embedding (e.g. shifted line ranges)"""
+        size = settings.vector_upsert_batch_size
+        for start in range(0, len(ids), size):
+            await self.executor.run(
+                self.code_collection.name, "update", self.code_collection.update,
+                ids=ids[start:start + size], metadatas=metadatas[start:start + size],
+                timeout=settings.vector_write_timeout,
+            )
+            self.keyword_indexes[self.code_collection.name].update_metadata(
+                ids[start:start + size], metadatas[start:start + size]
+            )
+    
+    async def delete_code_chunks(self, ids: List[str]):
+        """Delete chunks by ID"""
+        size = settings.vector_upsert_batch_size
+        for start in range(0, len(ids), size):
+            await self.executor.run(
+                self.code_collection.name, "delete", self.code_collection.delete,
+                ids=ids[start:start + size], timeout=settings.vector_write_timeout,
+            )
+            self.keyword_indexes[self.code_collection.name].remove(ids[start:start + size])
+    
+    async def _upsert_batches(
+        self, batches: AsyncIterator[Tuple[List[str], List[str], List[Dict[str, Any]]]]
+    ) -> List[str]:
+        """Upsert batches into the code collection, embedding the next while the last is written"""
+        ids: List[str] = []
+        pending: Optional[asyncio.Future] = None
+        try:
+            async for batch_ids, documents, metadatas in batches:
+                embeddings = await self._embed(documents)
+                if pending is not None:
+                    await pending
+                pending = asyncio.ensure_future(self._upsert(batch_ids, documents, metadatas, embeddings))
+                ids.extend(batch_ids)
+            if pending is not None:
+                await pending
+        except BaseException:
+            if pending is not None and not pending.done():
+                pending.cancel()
+            raise
+        return ids
+    
+    async def _upsert(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]], embeddings):
+        name = self.code_collection.name
+        await self.executor.run(
+            name, "upsert", self.code_collection.upsert,
+            ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings,
+            timeout=settings.vector_write_timeout,
+        )
+        self.keyword_indexes[name].add(ids, documents, metadatas)
+    
+    async def _chunk_batches(
+        self, files: List[Dict[str, Any]], build_id: str, metadata: Dict[str, Any]
+    ) -> AsyncIterator[Tuple[List[str], List[str], List[Dict[str, Any]]]]:
+        """Chunk a few files at a time off the loop, yielding upsert-sized batches"""
+        size = settings.vector_upsert_batch_size
+        ids: List[str] = []
+        documents: List[str] = []
+        metadatas: List[Dict[str, Any]] = []
+        for start in range(0, len(files), self.CHUNK_FILES_PER_CALL):
+            group = files[start:start + self.CHUNK_FILES_PER_CALL]
+            chunked = await asyncio.to_thread(self._chunk_files, group, build_id, metadata)
+            for collected, new in zip((ids, documents, metadatas), chunked):
+                collected.extend(new)
+            while len(ids) >= size:
+                yield ids[:size], documents[:size], metadatas[:size]
+                del ids[:size], documents[:size], metadatas[:size]
+        if ids:
+            yield ids, documents, metadatas
+    
+    @staticmethod
+    def _chunk_files(
+        files: List[Dict[str, Any]], build_id: str, metadata: Dict[str, Any]
+    ) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+        """Split files into (ids, documents, metadatas) for upsert"""
+        ids, documents, metadatas = [], [], []
+        for f in files:
+            file_path = f["file_path"]
+            language = f.get("language") or language_for_path(file_path)
+            for chunk in chunk_file(f["code"], language, settings.vector_chunk_max_chars):
+                ids.append(f"{build_id}_{file_path}#L{chunk.start_line}-{chunk.end_line}")
+                documents.append(chunk.text)
+                metadatas.append({**metadata, **VectorStore.chunk_metadata(build_id, file_path, language, chunk)})
+        return ids, documents, metadatas
+    
+    @staticmethod
+    def chunk_metadata(build_id: str, file_path: str, language: str, chunk: CodeChunk) -> Dict[str, Any]:
+        """Metadata stored with every code chunk"""
+        return {
+            "build_id": build_id,
+            "file_path": file_path,
+            "language": language,
+            "type": "code",
+            "chunk_kind": chunk.kind,
+            "symbol": chunk.symbol,
+            "start_line": chunk.start_line,
+            "end_line": chunk.end_line,
+        }
+    
+    async def _embed(self, documents: List[str], collection: Optional[str] = None) -> List[Any]:
+        """Embed documents in parallel batches on the Chroma threads"""
+        size = settings.vector_embed_batch_size
+        batches = await asyncio.gather(*(
+            self.executor.run(
+                collection or self.code_collection.name, "embed", self.embedding_function,
+                documents[i:i + size], timeout=settings.vector_write_timeout,
+            )
+            for i in range(0, len(documents), size)
+        ))
+        return [vector for batch in batches for vector in batch]
+    
     async def add_documentation(
         self,
         content: str,
@@ -126,11 +575,7 @@ class VectorStore:
             if metadata:
                 meta.update(metadata)
             
-            self.documentation_collection.add(
-                ids=[doc_id],
-                documents=[content],
-                metadatas=[meta]
-            )
+            await self._writers[self.documentation_collection.name].add([doc_id], [content], [meta])
             
             logger.debug(f"Added documentation: {doc_id}")
             return doc_id
@@ -138,6 +583,90 @@ class VectorStore:
             logger.error(f"Failed to add documentation: {e}")
             raise
     
+    async def query_collection(
+        self,
+        name: str,
+        query: str,
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Dense similarity search; hits have id, document, distance and metadata (cached)"""
+        text = normalize_query(query)
+        key = (name, text, filter_key(where), n_results, self.collection_version(name))
+        return await self.result_cache.get_or_compute(
+            key, lambda: self._dense_query(name, text, n_results, where)
+        )
+    
+    async def _dense_query(
+        self, name: str, text: str, n_results: int, where: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        embedding = await self.embedding_cache.get_or_compute(text, lambda: self._embed_query(text))
+        results = await self.executor.run(
+            name, "query", self._collections[name].query,
+            query_embeddings=[embedding],
+            n_results=n_results,
+            where=where,
+            timeout=self.query_timeout
+        )
+        if not results["ids"]:
+            return []
+        return [
+            {
+                "id": doc_id,
+                "document": results["documents"][0][idx],
+                "distance": results["distances"][0][idx],
+                "metadata": results["metadatas"][0][idx]
+            }
+            for idx, doc_id in enumerate(results["ids"][0])
+        ]
+    
+    async def _embed_query(self, text: str) -> Any:
+        embeddings = await self.executor.run(
+            "query", "embed", self.embedding_function, [text], timeout=self.query_timeout
+        )
+        return embeddings[0]
+    
+    def collection_version(self, name: str) -> int:
+        """Changes whenever a write to the collection is applied"""
+        return self.keyword_indexes[name].version
+    
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Size and hit rate of the retrieval and query-embedding caches"""
+        return {cache.name: cache.stats() for cache in (self.result_cache, self.embedding_cache)}
+    
+    async def keyword_search(
+        self,
+        name: str,
+        query: str,
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """BM25 search; hits have id, document, score and metadata"""
+        index = self.keyword_indexes[name]
+        if not index.loaded:
+            load = self._keyword_loads.get(name)
+            if load is None or (load.done() and load.exception() is not None):
+                load = self._keyword_loads[name] = asyncio.ensure_future(self._load_keyword_index(name))
+            await asyncio.shield(load)
+        return index.search(query, n_results, where)
+    
+    async def _load_keyword_index(self, name: str):
+        """Build a collection's keyword index from its stored documents"""
+        index = self.keyword_indexes[name]
+        index.begin_load()
+        try:
+            results = await self.executor.run(
+                name, "get", self._collections[name].get,
+                include=["documents", "metadatas"],
+                timeout=settings.vector_write_timeout
+            )
+        except BaseException:
+            index.finish_load([], [], [])
+            index.loaded = False
+            raise
+        index.finish_load(results["ids"], results["documents"], results["metadatas"])
+        logger.info(f"Keyword index for {name} loaded: {len(index)} documents")
+    
     async def search_similar_code(
         self,
         query: str,
@@ -160,24 +689,11 @@ class VectorStore:
             if build_id:
                 where_filter = {"build_id": {"$eq": build_id}}
             
-            results = self.code_collection.query(
-                query_texts=[query],
-                n_results=n_results,
-                where=where_filter
-            )
-            
-            # Format results
-            formatted_results = []
-            if results["ids"] and len(results["ids"]) > 0:
-                for idx, doc_id in enumerate(results["ids"][0]):
-                    formatted_results.append({
-                        "id": doc_id,
-                        "code": results["documents"][0][idx],
-                        "distance": results["distances"][0][idx],
-                        "metadata": results["metadatas"][0][idx]
-                    })
-            
-            return formatted_results
+            hits = await self.query_collection(self.code_collection.name, query, n_results, where_filter)
+            return [
+                {"id": hit["id"], "code": hit["document"], "distance": hit["distance"], "metadata": hit["metadata"]}
+                for hit in hits
+            ]
         except Exception as e:
             logger.error(f"Code search failed: {e}")
             raise
@@ -189,26 +705,44 @@ class VectorStore:
     ) -> List[Dict[str, Any]]:
         """Search documentation for relevant information"""
         try:
-            results = self.documentation_collection.query(
-                query_texts=[query],
-                n_results=n_results
-            )
-            
-            formatted_results = []
-            if results["ids"] and len(results["ids"]) > 0:
-                for idx, doc_id in enumerate(results["ids"][0]):
-                    formatted_results.append({
-                        "id": doc_id,
-                        "content": results["documents"][0][idx],
-                        "distance": results["distances"][0][idx],
-                        "metadata": results["metadatas"][0][idx]
-                    })
-            
-            return formatted_results
+            hits = await self.query_collection(self.documentation_collection.name, query, n_results)
+            return [
+                {"id": hit["id"], "content": hit["document"], "distance": hit["distance"], "metadata": hit["metadata"]}
+                for hit in hits
+            ]
         except Exception as e:
             logger.error(f"Documentation search failed: {e}")
             raise
     
+    async def hybrid_search(
+        self,
+        query: str,
+        n_results: int = 8,
+        build_id: Optional[str] = None,
+        token_budget: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Code and documentation relevant to ``query`` (dense + keyword, fused)
+        
+        Returns ``code_snippets`` and ``documentation`` in the shape of
+        search_similar_code / search_documentation (plus a fused ``score``),
+        at most ``n_results`` in total and within the token budget.
+        """
+        code, docs = self.code_collection.name, self.documentation_collection.name
+        filters = {code: {"build_id": {"$eq": build_id}}} if build_id else None
+        result = await self.retriever.retrieve(query, [code, docs], n_results, filters, token_budget)
+        return {
+            "code_snippets": [
+                {"id": c.id, "code": c.document, "distance": c.distance, "metadata": c.metadata, "score": c.score}
+                for c in result.for_collection(code)
+            ],
+            "documentation": [
+                {"id": c.id, "content": c.document, "distance": c.distance, "metadata": c.metadata, "score": c.score}
+                for c in result.for_collection(docs)
+            ],
+            "tokens": result.tokens,
+        }
+    
     async def get_build_context(
         self,
         build_id: str,
@@ -218,7 +752,9 @@ class VectorStore:
         """
         Get comprehensive context for a build
         
-        Returns code snippets, docs, and previous analysis
+        Returns code snippets, docs, and previous analysis. With a query,
+        code of this build and all documentation are searched together
+        (see hybrid_search) for up to ``n_snippets + 3`` results.
         """
         try:
             context = {
@@ -230,16 +766,16 @@ class VectorStore:
             
             # Get relevant code snippets
             if query:
-                context["code_snippets"] = await self.search_similar_code(
-                    query, n_results=n_snippets, build_id=build_id
-                )
-                context["documentation"] = await self.search_documentation(
-                    query, n_results=3
-                )
+                found = await self.hybrid_search(query, n_results=n_snippets + 3, build_id=build_id)
+                context["code_snippets"] = found["code_snippets"]
+                context["documentation"] = found["documentation"]
+                context["tokens"] = found["tokens"]
             else:
                 # Get all snippets for this build
-                results = self.code_collection.get(
-                    where={"build_id": {"$eq": build_id}}
+                results = await self.executor.run(
+                    self.code_collection.name, "get", self.code_collection.get,
+                    where={"build_id": {"$eq": build_id}},
+                    timeout=self.query_timeout
                 )
                 if results["ids"]:
                     context["code_snippets"] = [
@@ -259,14 +795,10 @@ class VectorStore:
     async def delete_build_vectors(self, build_id: str):
         """Clean up vectors when build is deleted"""
         try:
-            # Delete from code collection
-            self.code_collection.delete(
-                where={"build_id": {"$eq": build_id}}
-            )
-            
-            # Delete from documentation collection
-            self.documentation_collection.delete(
-                where={"build_id": {"$eq": build_id}}
+            # Delete from code and documentation collections
+            await asyncio.gather(
+                self._writers[self.code_collection.name].delete_build(build_id),
+                self._writers[self.documentation_collection.name].delete_build(build_id)
             )
             
             logger.info(f"Deleted vectors for build: {build_id}")
@@ -274,24 +806,45 @@ class VectorStore:
             logger.error(f"Failed to delete build vectors: {e}")
             raise
     
+    async def flush(self):
+        """Apply writes still waiting to be batched"""
+        await asyncio.gather(*(writer.flush() for writer in self._writers.values()))
+    
     async def persist(self):
-        """Persist Chroma data to disk"""
+        """Flush pending writes and persist Chroma data to disk"""
+        await self.flush()
+        persist = getattr(self.client, "persist", None)
+        if persist is None:
+            return  # persistent clients write through
         try:
-            self.client.persist()
+            await self.executor.run("all", "persist", persist, timeout=settings.vector_write_timeout)
             logger.info("Chroma data persisted")
         except Exception as e:
             logger.warning(f"Chroma persist failed: {e}")
+    
+    async def close(self):
+        """Flush, persist and stop the Chroma threads"""
+        await self.persist()
+        await asyncio.to_thread(self.executor.shutdown)
+        close = getattr(self.client, "close", None)
+        if close is not None:
+            await asyncio.to_thread(close)
 
 
 # Global vector store instance
 _vector_store: Optional[VectorStore] = None
+_vector_store_lock: Optional[asyncio.Lock] = None
 
 
 async def get_vector_store() -> VectorStore:
-    """Get or initialize global vector store"""
-    global _vector_store
+    """Get or initialize global vector store (client setup runs off the event loop)"""
+    global _vector_store, _vector_store_lock
     if _vector_store is None:
-        _vector_store = VectorStore()
+        if _vector_store_lock is None:
+            _vector_store_lock = asyncio.Lock()
+        async with _vector_store_lock:
+            if _vector_store is None:
+                _vector_store = await asyncio.to_thread(VectorStore)
     return _vector_store
 
 
@@ -310,7 +863,7 @@ async def close_vector_store():
     global _vector_store
     if _vector_store:
         try:
-            await _vector_store.persist()
+            await _vector_store.close()
             _vector_store = None
             logger.info("Vector store closed")
         except Exception as e:
@@ -0,0 +1,109 @@
+"""
+Binary packing for embeddings stored in SQL (``VectorMemory``)
+A vector is stored as raw little-endian bytes plus its dtype and length:
+
+- ``float32``: exact, 4 bytes per dimension
+- ``float16``: 2 bytes per dimension, ~3 significant digits
+- ``int8``: 1 byte per dimension, symmetric quantization with a per-row
+  scale (value = code * scale)
+
+Reading is ``np.frombuffer`` over the column bytes, so float32 and float16
+rows load without a copy, and a whole build's rows load as one (n, dim)
+matrix for similarity scans.
+"""
+
+from typing import TYPE_CHECKING, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
+DTYPES = {
+    "float32": np.dtype("<f4"),
+    "float16": np.dtype("<f2"),
+    "int8": np.dtype("i1"),
+}
+
+
+def encode_vector(vector, dtype: str = "float32") -> Tuple[bytes, int, Optional[float]]:
+    """Pack a 1-d vector; returns (bytes, dimension, int8 scale or None)"""
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    array = np.asarray(vector, dtype=np.float32).ravel()
+    if dtype != "int8":
+        return array.astype(DTYPES[dtype], copy=False).tobytes(), array.size, None
+    peak = float(np.abs(array).max()) if array.size else 0.0
+    scale = peak / 127 or 1.0
+    codes = np.clip(np.rint(array / scale), -127, 127).astype(DTYPES["int8"])
+    return codes.tobytes(), array.size, scale
+
+
+def decode_vector(blob: bytes, dtype: str = "float32", scale: Optional[float] = None) -> np.ndarray:
+    """
+    Unpack a stored vector
+
+    float32 and float16 come back as read-only views of ``blob``; int8 rows
+    are dequantized into a new float32 array.
+    """
+    array = np.frombuffer(blob, dtype=DTYPES[dtype])
+    if dtype == "int8":
+        return array.astype(np.float32) * np.float32(scale if scale is not None else 1.0)
+    return array
+
+
+def decode_matrix(blobs: Sequence[bytes], dtypes: Sequence[str], scales: Sequence[Optional[float]],
+                  dim: int) -> np.ndarray:
+    """
+    Stack stored vectors into one float32 (n, dim) matrix
+
+    Rows of a single dtype are joined and decoded with one ``frombuffer``;
+    a float32-only set is returned without further conversion.
+    """
+    n = len(blobs)
+    if n == 0:
+        return np.zeros((0, dim), dtype=np.float32)
+    kinds = set(dtypes)
+    if len(kinds) == 1:
+        dtype = dtypes[0]
+        matrix = np.frombuffer(b"".join(blobs), dtype=DTYPES[dtype]).reshape(n, dim)
+        if dtype == "float32":
+            return matrix
+        matrix = matrix.astype(np.float32)
+        if dtype == "int8":
+            matrix *= np.array([s if s is not None else 1.0 for s in scales], dtype=np.float32)[:, None]
+        return matrix
+    matrix = np.empty((n, dim), dtype=np.float32)
+    for kind in kinds:
+        rows = [i for i, d in enumerate(dtypes) if d == kind]
+        matrix[rows] = decode_matrix([blobs[i] for i in rows], [kind] * len(rows), [scales[i] for i in rows], dim)
+    return matrix
+
+
+def load_build_vectors(db: "Session", build_id: str,
+                       content_types: Optional[Iterable[str]] = None) -> Tuple[List[str], np.ndarray]:
+    """
+    All embeddings of a build as (row ids, float32 matrix), in insertion order
+
+    Selects only the vector columns, so no ORM objects or content text are built.
+    """
+    from sqlalchemy import select
+    from app.models.database import VectorMemory
+
+    query = select(
+        VectorMemory.id, VectorMemory.embedding, VectorMemory.embedding_dtype,
+        VectorMemory.embedding_dim, VectorMemory.embedding_scale,
+    ).where(VectorMemory.build_id == build_id).order_by(VectorMemory.created_at, VectorMemory.id)
+    if content_types is not None:
+        query = query.where(VectorMemory.content_type.in_(list(content_types)))
+    rows = db.execute(query).all()
+    if not rows:
+        return [], np.zeros((0, 0), dtype=np.float32)
+    dims = {row.embedding_dim for row in rows}
+    if len(dims) != 1:
+        raise ValueError(f"Build {build_id} mixes embedding dimensions {sorted(dims)}")
+    matrix = decode_matrix(
+        [row.embedding for row in rows], [row.embedding_dtype for row in rows],
+        [row.embedding_scale for row in rows], dims.pop(),
+    )
+    return [row.id for row in rows], matrix
@@ -0,0 +1,352 @@
+"""
+Incremental workspace indexing
+Keeps the ``code_snippets`` collection in sync with ``settings.workspace_dir``.
+
+A manifest (SQLite, next to the Chroma data) records each file's size, mtime
+and the chunks it was split into. Chunk IDs contain the hash of the chunk
+text, so after an edit only chunks with new content are embedded and
+upserted; unchanged chunks that moved get a metadata update with their new
+line range, and chunks that disappeared are deleted. Files whose size and
+mtime match the manifest are not even read.
+
+Changes are picked up with inotify (through ``watchfiles``, when installed)
+or by polling stat() results. The delay from a file's mtime until its vectors
+are written is exported as ``workspace_index_freshness_seconds``.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.db.code_chunks import LANGUAGES, chunk_file, language_for_path
+from app.db.vector import VectorStore, get_vector_store
+from app.monitoring.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+SKIP_DIRS = {
+    ".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv",
+    ".mypy_cache", ".pytest_cache", ".tox", "dist", "build", ".next",
+}
+
+
+@dataclass
+class FileEntry:
+    """Manifest record of one indexed file"""
+    size: int
+    mtime_ns: int
+    # chunk id -> (start_line, end_line)
+    chunks: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+
+
+class IndexManifest:
+    """Indexed files by workspace-relative path, persisted to SQLite"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.files: Dict[str, FileEntry] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS indexed_files ("
+                "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, chunks TEXT NOT NULL)"
+            )
+            for rel, size, mtime_ns, chunks in self._db.execute("SELECT * FROM indexed_files"):
+                self.files[rel] = FileEntry(size, mtime_ns, {k: tuple(v) for k, v in json.loads(chunks).items()})
+
+    def commit(self, updated: Dict[str, FileEntry], removed: Iterable[str]):
+        """Apply one indexer pass (only called once its vectors are written)"""
+        removed = list(removed)
+        for rel in removed:
+            self.files.pop(rel, None)
+        self.files.update(updated)
+        if self._db is None:
+            return
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany("DELETE FROM indexed_files WHERE path = ?", [(rel,) for rel in removed])
+            self._db.executemany(
+                "INSERT OR REPLACE INTO indexed_files VALUES (?, ?, ?, ?)",
+                [(rel, e.size, e.mtime_ns, json.dumps(e.chunks)) for rel, e in updated.items()],
+            )
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+@dataclass
+class IndexPlan:
+    """Vector writes and manifest changes for one pass"""
+    upsert_ids: List[str] = field(default_factory=list)
+    upsert_documents: List[str] = field(default_factory=list)
+    upsert_metadatas: List[Dict[str, Any]] = field(default_factory=list)
+    update_ids: List[str] = field(default_factory=list)
+    update_metadatas: List[Dict[str, Any]] = field(default_factory=list)
+    delete_ids: List[str] = field(default_factory=list)
+    updated: Dict[str, FileEntry] = field(default_factory=dict)
+    removed: List[str] = field(default_factory=list)
+    unchanged_chunks: int = 0
+    # mtimes (epoch seconds) of files whose vectors this pass writes
+    modified_at: List[float] = field(default_factory=list)
+
+    @property
+    def empty(self) -> bool:
+        return not (self.updated or self.removed)
+
+
+class WorkspaceIndexer:
+    """Watches a workspace directory and keeps its code chunks indexed"""
+
+    def __init__(
+        self,
+        root: Path,
+        store: Optional[VectorStore] = None,
+        manifest_path: Optional[Path] = None,
+        poll_interval: float = 2.0,
+        use_inotify: bool = True
+    ):
+        self.root = Path(root).resolve()
+        self.store = store
+        self.manifest = IndexManifest(manifest_path)
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self._lock = asyncio.Lock()
+        self._stop = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # A failed pass leaves the manifest behind; the next pass rescans everything
+        self._full_sync_needed = True
+
+    # ==================== Planning (worker thread) ====================
+
+    @staticmethod
+    def _wanted(path: Path) -> bool:
+        return path.suffix.lower() in LANGUAGES and not SKIP_DIRS.intersection(path.parts)
+
+    def _walk(self, top: Path) -> Dict[str, os.stat_result]:
+        found: Dict[str, os.stat_result] = {}
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+            for name in filenames:
+                path = Path(dirpath, name)
+                if not self._wanted(path):
+                    continue
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                if stat.st_size <= settings.workspace_index_max_file_bytes:
+                    found[path.relative_to(self.root).as_posix()] = stat
+        return found
+
+    def _scan(self, paths: Optional[Set[Path]]) -> Tuple[Dict[str, os.stat_result], Set[str]]:
+        """Current stats of the files in scope, and the manifest paths in scope"""
+        if paths is None:
+            return self._walk(self.root), set(self.manifest.files)
+
+        current: Dict[str, os.stat_result] = {}
+        in_scope: Set[str] = set()
+        for path in paths:
+            path = Path(path).resolve()
+            try:
+                rel = path.relative_to(self.root).as_posix()
+            except ValueError:
+                continue
+            prefix = "" if rel == "." else rel + "/"
+            in_scope.update(p for p in self.manifest.files if p == rel or p.startswith(prefix))
+            if path.is_dir():
+                current.update(self._walk(path))
+            elif path.is_file() and self._wanted(path):
+                stat = path.stat()
+                if stat.st_size <= settings.workspace_index_max_file_bytes:
+                    current[rel] = stat
+        return current, in_scope
+
+    def _plan(self, paths: Optional[Set[Path]] = None) -> IndexPlan:
+        plan = IndexPlan()
+        current, in_scope = self._scan(paths)
+
+        for rel in sorted(in_scope - set(current)):
+            plan.removed.append(rel)
+            plan.delete_ids.extend(self.manifest.files[rel].chunks)
+
+        for rel, stat in current.items():
+            old = self.manifest.files.get(rel)
+            if old is not None and (old.size, old.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            try:
+                source = (self.root / rel).read_text(encoding="utf-8", errors="replace")
+            except OSError as e:
+                logger.warning(f"Workspace file unreadable, skipped: {rel} ({e})")
+                continue
+            self._plan_file(plan, rel, stat, source, old)
+        return plan
+
+    def _plan_file(self, plan: IndexPlan, rel: str, stat: os.stat_result, source: str, old: Optional[FileEntry]):
+        project = rel.split("/", 1)[0] if "/" in rel else ""
+        build_id = f"workspace:{project}"
+        language = language_for_path(rel)
+        previous = old.chunks if old else {}
+        entry = FileEntry(stat.st_size, stat.st_mtime_ns)
+        written = False
+
+        for chunk in chunk_file(source, language, settings.vector_chunk_max_chars):
+            digest = hashlib.blake2b(chunk.text.encode(), digest_size=8).hexdigest()
+            chunk_id = f"{build_id}_{rel}#{digest}"
+            n = 1
+            while chunk_id in entry.chunks:  # identical chunks within one file
+                n += 1
+                chunk_id = f"{build_id}_{rel}#{digest}.{n}"
+            lines = (chunk.start_line, chunk.end_line)
+            entry.chunks[chunk_id] = lines
+
+            if chunk_id in previous and tuple(previous[chunk_id]) == lines:
+                plan.unchanged_chunks += 1
+                continue
+            meta = VectorStore.chunk_metadata(build_id, rel, language, chunk)
+            meta["content_hash"] = digest
+            if chunk_id in previous:
+                plan.update_ids.append(chunk_id)
+                plan.update_metadatas.append(meta)
+            else:
+                plan.upsert_ids.append(chunk_id)
+                plan.upsert_documents.append(chunk.text)
+                plan.upsert_metadatas.append(meta)
+            written = True
+
+        stale = [chunk_id for chunk_id in previous if chunk_id not in entry.chunks]
+        plan.delete_ids.extend(stale)
+        plan.updated[rel] = entry
+        if written or stale:
+            plan.modified_at.append(stat.st_mtime_ns / 1e9)
+
+    # ==================== Sync ====================
+
+    async def sync(self, paths: Optional[Iterable[Path]] = None) -> Dict[str, int]:
+        """
+        Bring the index up to date for ``paths`` (files or directories), or
+        for the whole workspace when None
+
+        Returns:
+            Chunk counts per action plus the number of files changed/removed
+        """
+        async with self._lock:
+            if self._full_sync_needed:
+                paths = None
+            plan = await asyncio.to_thread(self._plan, None if paths is None else set(paths))
+            counts = {
+                "embedded": len(plan.upsert_ids),
+                "moved": len(plan.update_ids),
+                "deleted": len(plan.delete_ids),
+                "unchanged": plan.unchanged_chunks,
+            }
+            if plan.empty:
+                self._full_sync_needed = False
+                return {**counts, "files": 0, "removed": 0}
+
+            try:
+                store = self.store or await get_vector_store()
+                if plan.upsert_ids:
+                    await store.upsert_code_chunks(plan.upsert_ids, plan.upsert_documents, plan.upsert_metadatas)
+                if plan.update_ids:
+                    await store.update_code_metadata(plan.update_ids, plan.update_metadatas)
+                if plan.delete_ids:
+                    await store.delete_code_chunks(plan.delete_ids)
+                await asyncio.to_thread(self.manifest.commit, plan.updated, plan.removed)
+            except BaseException:
+                self._full_sync_needed = True
+                raise
+            self._full_sync_needed = False
+
+            now = time.time()
+            get_metrics().record_workspace_index(counts, [now - mtime for mtime in plan.modified_at])
+            logger.info(
+                f"Workspace index updated: {len(plan.updated)} files changed, {len(plan.removed)} removed, "
+                f"{counts['embedded']} chunks embedded, {counts['moved']} moved, {counts['deleted']} deleted"
+            )
+            return {**counts, "files": len(plan.updated), "removed": len(plan.removed)}
+
+    async def _sync_logged(self, paths: Optional[Set[Path]] = None):
+        try:
+            await self.sync(paths)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Workspace indexing failed: {e}")
+
+    # ==================== Watching ====================
+
+    async def start(self):
+        """Index the workspace, then follow changes in the background"""
+        if self._task is None or self._task.done():
+            self.root.mkdir(parents=True, exist_ok=True)
+            self._stop.clear()
+            self._task = asyncio.create_task(self._run(), name="workspace-indexer")
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.manifest.close()
+
+    async def _run(self):
+        await self._sync_logged()
+        awatch = None
+        if self.use_inotify:
+            try:
+                from watchfiles import awatch
+            except ImportError:
+                logger.info("watchfiles not installed, polling the workspace instead")
+        if awatch is not None:
+            logger.info(f"Watching {self.root} for changes (inotify)")
+            async for changes in awatch(self.root, stop_event=self._stop, recursive=True):
+                await self._sync_logged({Path(path) for _, path in changes})
+            return
+
+        logger.info(f"Polling {self.root} for changes every {self.poll_interval}s")
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                await self._sync_logged()
+
+
+# Global workspace indexer instance
+_workspace_indexer: Optional[WorkspaceIndexer] = None
+
+
+def get_workspace_indexer() -> WorkspaceIndexer:
+    """Get or create the indexer for ``settings.workspace_dir``"""
+    global _workspace_indexer
+    if _workspace_indexer is None:
+        _workspace_indexer = WorkspaceIndexer(
+            Path(settings.workspace_dir),
+            manifest_path=Path(settings.data_dir) / "chroma" / "workspace_manifest.db",
+            poll_interval=settings.workspace_index_poll_interval,
+            use_inotify=settings.workspace_index_use_inotify,
+        )
+    return _workspace_indexer
+
+
+async def stop_workspace_indexer():
+    """Stop watching on shutdown"""
+    global _workspace_indexer
+    if _workspace_indexer is not None:
+        await _workspace_indexer.stop()
+        _workspace_indexer = None
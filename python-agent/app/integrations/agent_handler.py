@@ -6,18 +6,16 @@ Handles conversation context, skill routing, and response formatting
 import json
 import logging
 import asyncio
-from typing import Dict, Any, List, Optional, TypedDict
-from datetime import datetime
-from enum import Enum
+from typing import Dict, Any, Optional
 from app.core.config import settings
 from app.integrations.ollama import get_ollama_client
 from app.skills.registry import get_skill_registry
 from app.core.error_handler import get_error_handler, ErrorCategory
+from app.core.cancellation import OperationCancelled, get_cancellation_registry
 from app.core.memory_manager import get_memory_manager
+from app.core.session_store import WorkflowState, UserSession, get_session_store
 from app.monitoring.analytics import get_analytics_tracker
 from app.integrations.browser_controller import get_browser_controller
-from app.db.session import SessionLocal
-from app.models.database import WorkflowSession
 import time
 import structlog
 import subprocess
@@ -28,41 +26,18 @@ from app.core.workflow_logger import WorkflowLogger
 logger = structlog.get_logger(__name__)
 
 
-class WorkflowState(Enum):
-    IDLE = "idle"
-    # Project Wizard (1.2)
-    PROJECT_NAME = "project_name"
-    PROJECT_GOAL = "project_goal"
-    PROJECT_DETAILS = "project_details"
-    PROJECT_TECH = "project_tech"
-    PROJECT_LANG = "project_lang"
-    # Social Wizard (1.3)
-    SOCIAL_TYPE = "social_type"
-    SOCIAL_PLATFORM = "social_platform"
-    SOCIAL_CONTENT = "social_content"
-    # Schedule Wizard (1.4)
-    SCHEDULE_TYPE = "schedule_type"
-    SCHEDULE_DESCRIPTION = "schedule_description"
-    SCHEDULE_TIME = "schedule_time"
-    SCHEDULE_PRIORITY = "schedule_priority"
-    # Learn Button (1.5)
-    LEARN_MODE = "learn_mode"
-    LEARN_INPUT = "learn_input"
-    LEARNING = "learning"
-    # System (1.6, 1.7)
-    RESTART_CONFIRM = "restart_confirm"
-    SHUTDOWN_CONFIRM = "shutdown_confirm"
-    # Help (1.8)
-    HELP_CATEGORY = "help_category"
-
-
-class ConversationContext(TypedDict):
-    user_id: int
-    workflow_state: WorkflowState
-    workflow_data: Dict[str, Any]
-    conversation_history: List[Dict[str, str]]
-    created_at: datetime
-    updated_at: datetime
+# Workflow state and chat history share one per-user session object
+ConversationContext = UserSession
+
+
+def reply_format(skill_used: Optional[str]) -> str:
+    """
+    Markup of a reply: menu and workflow templates are written as HTML;
+    everything else (chat, routed skills) is model output and Markdown
+    """
+    if skill_used == "menu_nav" or (skill_used or "").startswith("workflow_"):
+        return "html"
+    return "markdown"
 
 
 class AgentHandler:
@@ -74,7 +49,7 @@ class AgentHandler:
     def __init__(self):
         self.ollama = get_ollama_client()
         self.skill_registry = get_skill_registry()
-        self.contexts: Dict[int, ConversationContext] = {}
+        self.sessions = get_session_store()
         self.system_prompt = """You are the Ultimate Coding Agent, an advanced AI assistant specialized in:
 - Software development and architecture
 - Code generation and analysis
@@ -94,81 +69,23 @@ When responding to Telegram users:
     
     def get_context(self, user_id: int) -> ConversationContext:
         """Get or create conversation context for user (Phase 4.1 Persistence)"""
-        # 1. Check in-memory cache
-        if user_id in self.contexts:
-            return self.contexts[user_id]
-        
-        # 2. Check Database
-        db = SessionLocal()
-        try:
-            session = db.query(WorkflowSession).filter(WorkflowSession.user_id == user_id).first()
-            if session:
-                # Convert DB model to dict
-                workflow_state = WorkflowState(session.state)
-                context: ConversationContext = {
-                    "user_id": user_id,
-                    "workflow_state": workflow_state,
-                    "workflow_data": session.data,
-                    "conversation_history": [], # We don't persist full history in workflow_sessions
-                    "created_at": session.created_at,
-                    "updated_at": session.updated_at,
-                }
-                self.contexts[user_id] = context
-                return context
-        finally:
-            db.close()
-            
-        # 3. Create New
-        context: ConversationContext = {
-            "user_id": user_id,
-            "workflow_state": WorkflowState.IDLE,
-            "workflow_data": {},
-            "conversation_history": [],
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow(),
-        }
-        self.contexts[user_id] = context
-        return context
+        return self.sessions.get(user_id)
 
     def save_context(self, user_id: int):
         """Persist current context to database (Phase 4.1)"""
-        if user_id not in self.contexts:
-            return
-            
-        context = self.contexts[user_id]
-        db = SessionLocal()
-        try:
-            session = db.query(WorkflowSession).filter(WorkflowSession.user_id == user_id).first()
-            if not session:
-                session = WorkflowSession(user_id=user_id)
-                db.add(session)
-            
-            session.state = context["workflow_state"].value
-            session.data = context["workflow_data"]
-            session.updated_at = datetime.utcnow()
-            db.commit()
-            logger.debug("Persisted workflow context", user_id=user_id, state=session.state)
-        except Exception as e:
-            logger.error(f"Failed to persist workflow context: {e}")
-            db.rollback()
-        finally:
-            db.close()
+        context = self.sessions.peek(user_id)
+        if context is not None:
+            self.sessions.persist(context)
 
     def clear_context(self, user_id: int):
-        """Clear context from memory and database"""
-        if user_id in self.contexts:
-            del self.contexts[user_id]
-            
-        db = SessionLocal()
-        try:
-            db.query(WorkflowSession).filter(WorkflowSession.user_id == user_id).delete()
-            db.commit()
-            logger.debug("Cleared persisted workflow context", user_id=user_id)
-        except Exception as e:
-            logger.error(f"Failed to clear persisted workflow context: {e}")
-            db.rollback()
-        finally:
-            db.close()
+        """Reset workflow state in memory and database"""
+        self.sessions.reset(user_id)
+        logger.debug("Cleared workflow context", user_id=user_id)
+
+    async def clear_context_async(self, user_id: int):
+        """clear_context with the database delete off the event loop"""
+        await self.sessions.reset_async(user_id)
+        logger.debug("Cleared workflow context", user_id=user_id)
     
     async def process_message(
         self,
@@ -178,21 +95,44 @@ When responding to Telegram users:
     ) -> Dict[str, Any]:
         """
         Process incoming message with full error handling, memory, and analytics
+
+        Runs as the user's cancellable operation: a newer message (or an
+        explicit cancel) stops it, including any model call in flight, and
+        the result comes back with ``cancelled`` set and no text to send.
         """
+        try:
+            return await get_cancellation_registry().run(
+                f"agent:{user_id}",
+                self._process_message(user_id, message, context_type),
+                operation="agent_message"
+            )
+        except OperationCancelled as e:
+            logger.info("Message processing cancelled", user_id=user_id, reason=e.reason)
+            return {"text": "", "success": False, "cancelled": True, "reason": e.reason}
+
+    def cancel_processing(self, user_id: int, reason: str = "cancelled") -> bool:
+        """Stop the reply currently being produced for a user"""
+        return get_cancellation_registry().cancel(f"agent:{user_id}", reason=reason)
+
+    async def _process_message(
+        self,
+        user_id: int,
+        message: str,
+        context_type: str
+    ) -> Dict[str, Any]:
         start_time = time.time()
         error_handler = get_error_handler()
         memory_manager = get_memory_manager()
         analytics = get_analytics_tracker()
         
         try:
-            # Add user message to memory
-            memory_manager.add_user_message(user_id, message)
+            # Single session lookup for the whole message (later get_context calls hit memory)
+            context = await self.sessions.get_async(user_id)
+            context.add_message("user", message)
             
             # 1. ALWAYS Check for general commands/buttons first (Home, Back, Exit)
             general_result = await self._handle_general_message(user_id, message)
             
-            context = self.get_context(user_id)
-            
             if general_result:
                 response_text = general_result.get("text")
                 workflow_buttons = general_result.get("buttons")
@@ -200,11 +140,11 @@ When responding to Telegram users:
                 TerminalActionLogger.log_action("Menu Navigation", f"Target: {response_text[:30]}...")
             
             # 2. Otherwise handle active workflow
-            elif context["workflow_state"] != WorkflowState.IDLE:
-                TerminalActionLogger.log_workflow(user_id, context["workflow_state"].value, message)
+            elif context.workflow_state != WorkflowState.IDLE:
+                skill_used = "workflow_" + str(context.workflow_state.value)
+                TerminalActionLogger.log_workflow(user_id, context.workflow_state.value, message)
                 workflow_result = await self._handle_workflow(user_id, message)
                 response_text = workflow_result.get("text", "Done!")
-                skill_used = "workflow_" + str(context["workflow_state"].value)
                 workflow_buttons = workflow_result.get("buttons")
                 
             # 3. Otherwise detect skill or chat
@@ -241,7 +181,7 @@ When responding to Telegram users:
                     WorkflowLogger.log_success(f"AI Response received ({len(response_text)} chars)")
             
             # Add assistant response to memory
-            memory_manager.add_assistant_message(user_id, response_text)
+            context.add_message("assistant", response_text)
             
             # Record analytics
             response_time_ms = (time.time() - start_time) * 1000
@@ -261,12 +201,12 @@ When responding to Telegram users:
                 "success": True,
                 "response_time_ms": response_time_ms,
                 "buttons": workflow_buttons,
-                "workflow_state": context["workflow_state"].value
+                "workflow_state": context.workflow_state.value,
+                "format": reply_format(skill_used)
             }
             
-            # Persist state if active
-            if context["workflow_state"] != WorkflowState.IDLE:
-                self.save_context(user_id)
+            # Persist workflow state (idle sessions drop their stored row) off the event loop
+            await asyncio.to_thread(self.sessions.persist, context)
             
             return result
             
@@ -294,8 +234,8 @@ When responding to Telegram users:
     async def _handle_workflow(self, user_id: int, message: str) -> Dict[str, Any]:
         """Handle multi-step workflows (Phases 1.2 - 1.8)"""
         context = self.get_context(user_id)
-        state = context["workflow_state"]
-        data = context["workflow_data"]
+        state = context.workflow_state
+        data = context.workflow_data
         msg_lower = message.lower().strip()
         
         # Global Navigation (1.9)
@@ -305,17 +245,17 @@ When responding to Telegram users:
         # --- PROJECT WIZARD (1.2) ---
         if state == WorkflowState.PROJECT_NAME:
             data["project_name"] = message.strip()
-            context["workflow_state"] = WorkflowState.PROJECT_GOAL
+            context.workflow_state = WorkflowState.PROJECT_GOAL
             return {"text": "🎯 <b>Project Goal</b>\n\nWhat is the main goal or purpose of this project?"}
         
         elif state == WorkflowState.PROJECT_GOAL:
             data["goal"] = message.strip()
-            context["workflow_state"] = WorkflowState.PROJECT_DETAILS
+            context.workflow_state = WorkflowState.PROJECT_DETAILS
             return {"text": "📝 <b>Project Details</b>\n\nPlease provide detailed requirements or features for the project:"}
         
         elif state == WorkflowState.PROJECT_DETAILS:
             data["details"] = message.strip()
-            context["workflow_state"] = WorkflowState.PROJECT_TECH
+            context.workflow_state = WorkflowState.PROJECT_TECH
             return {
                 "text": "🛠️ <b>Tech Stack</b>\n\nSelect the primary technology stack:",
                 "buttons": [
@@ -327,7 +267,7 @@ When responding to Telegram users:
         
         elif state == WorkflowState.PROJECT_TECH:
             data["tech_stack"] = message.replace("tech_", "").capitalize()
-            context["workflow_state"] = WorkflowState.PROJECT_LANG
+            context.workflow_state = WorkflowState.PROJECT_LANG
             return {
                 "text": "🌐 <b>Language</b>\n\nSelect the primary programming language:",
                 "buttons": [
@@ -354,7 +294,7 @@ When responding to Telegram users:
             }
             content_type = type_map.get(message, message.lower())
             data["content_type"] = content_type
-            context["workflow_state"] = WorkflowState.SOCIAL_PLATFORM
+            context.workflow_state = WorkflowState.SOCIAL_PLATFORM
 
             # Use SocialMediaManager to get platform suggestions
             from app.skills.social_media_manager import SocialMediaManager
@@ -419,17 +359,17 @@ When responding to Telegram users:
         elif state == WorkflowState.SOCIAL_CONTENT:
             # Auto-detect content type from message
             # Check if context has media info (set by Telegram handler)
-            has_photo = context.get("has_photo", False)
-            has_video = context.get("has_video", False)
+            has_photo = context.metadata.get("has_photo", False)
+            has_video = context.metadata.get("has_video", False)
 
             if has_photo:
                 content_type = "image"
                 data["content_type"] = content_type
-                data["media_path"] = context.get("media_path")
+                data["media_path"] = context.metadata.get("media_path")
             elif has_video:
                 content_type = "video"
                 data["content_type"] = content_type
-                data["media_path"] = context.get("media_path")
+                data["media_path"] = context.metadata.get("media_path")
             else:
                 content_type = "text"
                 data["content_type"] = content_type
@@ -462,7 +402,7 @@ When responding to Telegram users:
                     [{"text": "📱 All", "callback": "plat_all"}, {"text": "⬅️ Back", "callback": "back"}]
                 ]
 
-            context["workflow_state"] = WorkflowState.SOCIAL_PLATFORM
+            context.workflow_state = WorkflowState.SOCIAL_PLATFORM
             return {
                 "text": result.output,
                 "buttons": platforms
@@ -471,17 +411,17 @@ When responding to Telegram users:
         # --- SCHEDULE WIZARD (1.4) ---
         elif state == WorkflowState.SCHEDULE_TYPE:
             data["schedule_type"] = message.strip()
-            context["workflow_state"] = WorkflowState.SCHEDULE_DESCRIPTION
+            context.workflow_state = WorkflowState.SCHEDULE_DESCRIPTION
             return {"text": "📝 <b>Task Description</b>\n\nWhat is the task you want to schedule?"}
         
         elif state == WorkflowState.SCHEDULE_DESCRIPTION:
             data["task_description"] = message.strip()
-            context["workflow_state"] = WorkflowState.SCHEDULE_TIME
+            context.workflow_state = WorkflowState.SCHEDULE_TIME
             return {"text": "📅 <b>Date/Time</b>\n\nWhen should this task run? (e.g., 'every day at 9am', '2026-02-15 10:00')"}
         
         elif state == WorkflowState.SCHEDULE_TIME:
             data["time"] = message.strip()
-            context["workflow_state"] = WorkflowState.SCHEDULE_PRIORITY
+            context.workflow_state = WorkflowState.SCHEDULE_PRIORITY
             return {
                 "text": "🚦 <b>Priority</b>\n\nSelect the priority level:",
                 "buttons": [
@@ -503,12 +443,12 @@ When responding to Telegram users:
             # Use lower() and strip emojis to match button text/callback more robustly
             msg_clean = message.lower().replace("🚀", "").replace("🔄", "").strip()
             if "update skills" in msg_clean or "self-improve" in msg_clean or "learn_skills" in message or "learn_improve" in message:
-                context["workflow_state"] = WorkflowState.LEARNING
+                context.workflow_state = WorkflowState.LEARNING
                 WorkflowLogger.log_transition("LEARN_MODE", "LEARNING", message)
                 asyncio.create_task(self._perform_learning(user_id))
                 return {"text": "🧠 <b>Autonomous Learning Started</b>\n\nI am now analyzing system state and optimizing my routines. I will notify you when complete."}
             else:
-                context["workflow_state"] = WorkflowState.LEARN_INPUT
+                context.workflow_state = WorkflowState.LEARN_INPUT
                 WorkflowLogger.log_transition("LEARN_MODE", "LEARN_INPUT", message)
                 return {"text": f"📖 <b>{message}</b>\n\nPlease provide the URL or code snippet to analyze:"}
         
@@ -527,7 +467,7 @@ When responding to Telegram users:
                 asyncio.create_task(self._perform_restart())
                 return {"text": "🔄 <b>Restarting agent...</b>\n\nPlease wait a moment."}
             else:
-                self.clear_context(user_id)
+                await self.clear_context_async(user_id)
                 return {"text": "❌ Restart cancelled."}
 
         elif state == WorkflowState.SHUTDOWN_CONFIRM:
@@ -535,7 +475,7 @@ When responding to Telegram users:
                 asyncio.create_task(self._perform_shutdown())
                 return {"text": "⚡ <b>System shutting down...</b>\n\nGoodbye!"}
             else:
-                self.clear_context(user_id)
+                await self.clear_context_async(user_id)
                 return {"text": "❌ Shutdown cancelled."}
 
         return {"text": "Workflow completed or cancelled."}
@@ -552,7 +492,7 @@ When responding to Telegram users:
         if any(x in msg_lower for x in ["🏗️", "project", "build", "create project", "new project"]):
             # Only trigger if it's a clear command or short phrase
             if len(msg_lower) < 30:
-                context["workflow_state"] = WorkflowState.PROJECT_NAME
+                context.workflow_state = WorkflowState.PROJECT_NAME
                 TerminalActionLogger.log_action("Workflow Started", "Project Creation Wizard")
                 return {
                     "text": "🏗️ <b>Create New Project</b>\n\nWhat is the name of your project?",
@@ -561,7 +501,7 @@ When responding to Telegram users:
         
         if any(x in msg_lower for x in ["📱", "social", "post", "share", "tweet"]):
             if len(msg_lower) < 20 or msg_lower == "social":
-                context["workflow_state"] = WorkflowState.SOCIAL_CONTENT
+                context.workflow_state = WorkflowState.SOCIAL_CONTENT
                 TerminalActionLogger.log_action("Workflow Started", "Social Media Manager")
                 return {
                     "text": "📱 <b>Social Media Posting</b>\n\n" \
@@ -576,7 +516,7 @@ When responding to Telegram users:
         
         if any(x in msg_lower for x in ["📅", "schedule", "reminder", "set task"]):
             if len(msg_lower) < 30:
-                context["workflow_state"] = WorkflowState.SCHEDULE_TYPE
+                context.workflow_state = WorkflowState.SCHEDULE_TYPE
                 TerminalActionLogger.log_action("Workflow Started", "Schedule Wizard")
                 return {
                     "text": "📅 <b>Schedule Task</b>\n\nSelect the task type:",
@@ -589,7 +529,7 @@ When responding to Telegram users:
 
         if any(x in msg_lower for x in ["🧠", "learn", "study"]):
             if len(msg_lower) < 20:
-                context["workflow_state"] = WorkflowState.LEARN_MODE
+                context.workflow_state = WorkflowState.LEARN_MODE
                 TerminalActionLogger.log_action("Workflow Started", "Learning Machine")
                 return {
                     "text": "🧠 <b>Autonomous Learning</b>\n\nSelect learning mode:",
@@ -601,10 +541,10 @@ When responding to Telegram users:
                     "workflow_state": WorkflowState.LEARN_MODE.value
                 }
         
-        if context["workflow_state"] != WorkflowState.RESTART_CONFIRM and any(x in msg_lower for x in ["🔄", "restart"]):
+        if context.workflow_state != WorkflowState.RESTART_CONFIRM and any(x in msg_lower for x in ["🔄", "restart"]):
             # Only trigger if it's the specific command
             if len(msg_lower) < 20 or "agent" in msg_lower:
-                context["workflow_state"] = WorkflowState.RESTART_CONFIRM
+                context.workflow_state = WorkflowState.RESTART_CONFIRM
                 TerminalActionLogger.log_action("Action Prompted", "Restart Agent Confirmation")
                 return {
                     "text": "🔄 <b>Confirm Restart</b>\n\nAre you sure you want to restart the agent? (Reply 'restart' or 'yes' to confirm)",
@@ -613,7 +553,7 @@ When responding to Telegram users:
                 }
         
         if any(x in msg_lower for x in ["⚡", "shutdown"]):
-            context["workflow_state"] = WorkflowState.SHUTDOWN_CONFIRM
+            context.workflow_state = WorkflowState.SHUTDOWN_CONFIRM
             return {
                 "text": "⚠️ <b>CONFIRM SYSTEM SHUTDOWN</b>\n\nThis will SHUT DOWN the host machine! (Reply 'shutdown' or 'yes' to confirm)",
                 "workflow_state": WorkflowState.SHUTDOWN_CONFIRM.value,
@@ -621,7 +561,7 @@ When responding to Telegram users:
             }
         
         if any(x in msg_lower for x in ["❓", "help"]):
-            context["workflow_state"] = WorkflowState.HELP_CATEGORY
+            context.workflow_state = WorkflowState.HELP_CATEGORY
             return {
                 "text": "❓ <b>Help Center</b>\n\nSelect a category for assistance:",
                 "buttons": [
@@ -650,11 +590,11 @@ When responding to Telegram users:
     ) -> Dict[str, Any]:
         """Send message to Ollama AI and get response - FIXED"""
         try:
-            history = context["conversation_history"][-10:]
+            history = context.get_recent_messages(10)
             
             messages = []
             messages.append({"role": "system", "content": self.system_prompt})
-            messages.extend(history)
+            messages.extend(msg.to_ollama_format() for msg in history)
             messages.append({"role": "user", "content": message})
             
             # Call Ollama chat (returns string directly)
@@ -668,11 +608,7 @@ When responding to Telegram users:
                 response_text = "I didn't get a response. Please try again."
             
             # Add to history
-            context["conversation_history"].append({
-                "role": "assistant",
-                "content": response_text,
-                "timestamp": datetime.utcnow().isoformat()
-            })
+            context.add_message("assistant", response_text)
             
             logger.info(
                 "AI response generated",
@@ -735,7 +671,7 @@ Generate the complete project structure with all necessary files."""
             )
             
             data["generated_code"] = result
-            context["workflow_state"] = WorkflowState.IDLE
+            context.workflow_state = WorkflowState.IDLE
             
             return {
                 "text": f"✅ <b>Project Created: {project_name}</b>\n\n"
@@ -782,7 +718,7 @@ Optimized version:"""
             browser = get_browser_controller()
             await browser.create_social_post(platform, result)
             
-            context["workflow_state"] = WorkflowState.IDLE
+            context.workflow_state = WorkflowState.IDLE
             
             return {
                 "text": f"📱 <b>Post for {platform.capitalize()}</b>\n\n"
@@ -828,7 +764,7 @@ Optimized version:"""
                 "media_path": media_path
             })
 
-            context["workflow_state"] = WorkflowState.IDLE
+            context.workflow_state = WorkflowState.IDLE
 
             content_preview = content[:100] + "..." if len(content) > 100 else content
 
@@ -887,7 +823,7 @@ Optimized version:"""
         else:
             response_text = "❌ Scheduler skill not found."
         
-        context["workflow_state"] = WorkflowState.IDLE
+        context.workflow_state = WorkflowState.IDLE
         
         return {
             "text": f"📅 <b>Task Scheduled</b>\n\n"
@@ -992,12 +928,12 @@ Just type naturally to chat with me!
 
     async def _handle_back(self, user_id: int) -> Dict[str, Any]:
         """Handle back navigation (1.9)"""
-        self.clear_context(user_id)
+        await self.clear_context_async(user_id)
         return await self._send_main_menu(user_id)
 
     async def _handle_help_category(self, user_id: int, category: str) -> Dict[str, Any]:
         """Handle specific help category display (1.8)"""
-        self.clear_context(user_id)
+        await self.clear_context_async(user_id)
         help_content = {
             "help_cmds": "📟 <b>Command Reference</b>\n\n/start - Main menu\n/help - Help center\n/status - System status\n/build - New project wizard",
             "help_feats": "🏗️ <b>Core Features</b>\n\n• Project scaffold generation\n• Multi-platform social posting\n• Advanced task scheduling\n• Autonomous learning",
@@ -1010,7 +946,7 @@ Just type naturally to chat with me!
 
     async def _execute_learning_process(self, user_id: int, data: Dict) -> Dict[str, Any]:
         """Execute focused learning from input (1.5)"""
-        self.clear_context(user_id)
+        await self.clear_context_async(user_id)
         input_text = data.get("input", "")
         # Simulating analysis
         return {
@@ -1031,7 +967,7 @@ Just type naturally to chat with me!
         memory.add_assistant_message(user_id, success_msg)
         
         # CLEAR CONTEXT AFTER COMPLETION (Step 2.1)
-        self.clear_context(user_id)
+        await self.clear_context_async(user_id)
         WorkflowLogger.log_success("Learning complete. State reset to IDLE.")
         
         # Notify user (if we had a way to push messages, otherwise they see it next time)
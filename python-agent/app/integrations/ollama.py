@@ -35,15 +35,23 @@ class OllamaClient:
             logger.info(f"📱 Ollama Local mode (Host: {self.local_host}, Model: {self.local_model})")
     
     async def _call_ollama(self, host: str, data: Dict, headers: Dict = None) -> Dict:
-        """Make request to Ollama API"""
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{host}/api/chat",
-                json=data,
-                headers=headers or {}
-            )
-            response.raise_for_status()
-            return response.json()
+        """
+        Make request to Ollama API
+        Cancelling the awaiting task closes the connection, which makes
+        Ollama abandon the generation instead of finishing it for nobody.
+        """
+        try:
+            async with httpx.AsyncClient(timeout=self.timeout) as client:
+                response = await client.post(
+                    f"{host}/api/chat",
+                    json=data,
+                    headers=headers or {}
+                )
+                response.raise_for_status()
+                return response.json()
+        except asyncio.CancelledError:
+            logger.info("Ollama request cancelled, connection closed", host=host, model=data.get("model"))
+            raise
     
     async def generate(
         self,
@@ -251,7 +259,7 @@ class OllamaClient:
     
     async def embeddings(self, text: str, model: Optional[str] = None) -> List[float]:
         """Generate embeddings"""
-        local_model = model or settings.get("embedding_model", "nomic-embed-text")
+        local_model = model or settings.embedding_model
         
         try:
             async with httpx.AsyncClient(timeout=self.timeout) as client:
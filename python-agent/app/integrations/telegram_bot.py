@@ -4,17 +4,27 @@ Interactive bot with skills, filesystem, and social media capabilities
 Unified command handler consolidates all Node.js telegram.ts functionality
 """
 
+import hmac
+import html
+import json
 import logging
+import uuid
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton
-from telegram.ext import CommandHandler, MessageHandler, CallbackQueryHandler, filters, ContextTypes, ApplicationBuilder
+from telegram.ext import (
+    ApplicationBuilder, ApplicationHandlerStop, CallbackQueryHandler, CommandHandler,
+    ContextTypes, MessageHandler, TypeHandler, filters,
+)
 from telegram.request import HTTPXRequest
 import structlog
+from sqlalchemy import select
 
 from app.core.config import settings
 from app.models.database import User, TelegramUser, Build, BuildStatus
-from app.db.session import SessionLocal
+from app.db.session import AsyncSessionLocal
+from app.db.audit import get_audit_sink
+from app.db.search import get_search_indexer, owners_for_telegram, render_snippet, search
 from app.skills.registry import get_skill_registry
 from app.agents.full_workflow import get_agent_workflow
 from app.integrations.ollama import get_ollama_client
@@ -22,6 +32,10 @@ from app.integrations.file_manager import get_file_manager
 from app.integrations.browser_controller import get_browser_controller
 from app.integrations.agent_handler import get_agent_handler
 from app.integrations.unified_commands import get_command_handler
+from app.integrations.telegram_outbox import get_telegram_outbox, queue_reply
+from app.integrations.telegram_updates import ChatOrderedUpdateProcessor
+from app.core.cancellation import get_cancellation_registry
+from app.integrations.telegram_dedup import get_update_deduplicator, update_keys
 
 logger = structlog.get_logger(__name__)
 
@@ -158,6 +172,37 @@ class TelegramBotManager:
             self.token = settings.telegram_bot_token.get_secret_value()
         else:
             logger.warning("Telegram bot token not configured")
+        
+        # Telegram echoes this in X-Telegram-Bot-Api-Secret-Token on every webhook call
+        self.webhook_secret: Optional[str] = None
+        if settings.telegram_webhook_secret:
+            self.webhook_secret = settings.telegram_webhook_secret.get_secret_value()
+    
+    @property
+    def mode(self) -> str:
+        """'webhook' or 'polling' ('auto' picks webhook when a public URL is set)"""
+        if settings.telegram_mode == "auto":
+            return "webhook" if settings.telegram_webhook_url else "polling"
+        return settings.telegram_mode
+    
+    def build_application(self):
+        """Application with the per-chat ordered concurrent update processor"""
+        request = HTTPXRequest(connection_pool_size=max(8, settings.telegram_update_concurrency))
+        builder = (
+            ApplicationBuilder()
+            .token(self.token)
+            .request(request)
+            .concurrent_updates(ChatOrderedUpdateProcessor(
+                settings.telegram_update_concurrency,
+                settings.telegram_max_pending_updates,
+                on_chat_busy=self.supersede_in_flight if settings.telegram_supersede_in_flight else None
+            ))
+        )
+        if settings.telegram_api_base_url:
+            # Self-hosted Bot API server
+            base_url = settings.telegram_api_base_url.rstrip("/")
+            builder = builder.base_url(f"{base_url}/bot").base_file_url(f"{base_url}/file/bot")
+        return builder.build()
     
     async def initialize(self):
         """Initialize bot"""
@@ -166,15 +211,10 @@ class TelegramBotManager:
             return
         
         try:
-            request = HTTPXRequest(connection_pool_size=8)
-            self.application = (
-                ApplicationBuilder()
-                .token(self.token)
-                .request(request)
-                .build()
-            )
+            self.application = self.build_application()
             self._register_handlers()
             await self.application.initialize()
+            get_telegram_outbox().start(self.application.bot)
             logger.info("Telegram bot initialized")
         except Exception as e:
             logger.error(f"Bot initialization failed: {e}")
@@ -184,6 +224,9 @@ class TelegramBotManager:
         """Register command handlers - simplified and unified"""
         command_handler = get_command_handler()
         
+        # Runs before every other handler: drops re-delivered updates
+        self.application.add_handler(TypeHandler(Update, self.drop_duplicate_updates), group=-1)
+        
         # Command handlers - preferably from unified_commands (Inline UI)
         self.application.add_handler(CommandHandler("start", command_handler.handle_start))
         self.application.add_handler(CommandHandler("help", command_handler.handle_help))
@@ -198,6 +241,7 @@ class TelegramBotManager:
         self.application.add_handler(CommandHandler("file", self.handle_file))
         self.application.add_handler(CommandHandler("open", self.handle_open_url))
         self.application.add_handler(CommandHandler("link", self.handle_link))
+        self.application.add_handler(CommandHandler("search", self.handle_search))
         
         # Note: /schedule is handled by the natural language bridge or menu buttons
         
@@ -206,6 +250,55 @@ class TelegramBotManager:
         
         # Message handler for text
         self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_text))
+        
+        # Runs after the handlers above: queues an audit event (written in batches)
+        if settings.audit_enabled:
+            self.application.add_handler(TypeHandler(Update, self.audit_update), group=1)
+    
+    async def drop_duplicate_updates(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Stop processing of updates Telegram already delivered once"""
+        dedup = get_update_deduplicator()
+        duplicate = dedup.check(update_keys(update))
+        if duplicate is None:
+            return
+        
+        cached = dedup.replayable_response(duplicate)
+        if cached:
+            await self.send_message(cached["chat_id"], cached["text"], parse_mode=cached["parse_mode"],
+                                    reply_markup=self.MAIN_KEYBOARD)
+        logger.info("Duplicate Telegram update dropped", key=duplicate, replayed=bool(cached))
+        raise ApplicationHandlerStop
+    
+    async def audit_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Audit commands, button presses and messages (message text is not recorded)"""
+        if update.effective_user is None:
+            return
+        if update.callback_query is not None:
+            action, resource_id = "telegram_callback", (update.callback_query.data or "")[:64]
+        elif update.message is not None and update.message.text and update.message.text.startswith("/"):
+            action, resource_id = "telegram_command", update.message.text.split()[0][1:].split("@")[0]
+        elif update.message is not None:
+            action, resource_id = "telegram_message", None
+        else:
+            return
+        get_audit_sink().record(
+            action,
+            "telegram",
+            resource_id=resource_id,
+            details={"telegram_id": update.effective_user.id, "update_id": update.update_id},
+        )
+    
+    def supersede_in_flight(self, update: object):
+        """A new message or button press cancels the reply still being generated for the chat"""
+        if not isinstance(update, Update) or update.effective_chat is None:
+            return
+        if update.message is None and update.callback_query is None:
+            return
+        if get_update_deduplicator().seen(update_keys(update)):
+            return  # a redelivery must not cancel the original's reply
+        # The bridge runs agent work under the chat id
+        if get_cancellation_registry().cancel(f"agent:{update.effective_chat.id}", reason="superseded"):
+            logger.info("In-flight reply superseded", chat_id=update.effective_chat.id)
     
     async def handle_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command"""
@@ -235,7 +328,7 @@ class TelegramBotManager:
 <i>Select an option below!</i>
 """
             
-            await update.message.reply_text(welcome, reply_markup=self.MAIN_KEYBOARD, parse_mode="HTML")
+            await queue_reply(update, welcome, reply_markup=self.MAIN_KEYBOARD, parse_mode="HTML")
             logger.info("User started bot", user_id=user.id)
             
         except Exception as e:
@@ -254,6 +347,7 @@ class TelegramBotManager:
 /file [operation] [path] - File operations
 /post [platform] [text] - Social posting
 /open [url] - Open URL in browser
+/search [words] - Search chats, builds and logs
 /status - System status
 /health - Check AI connection
 
@@ -271,7 +365,7 @@ class TelegramBotManager:
 /open https://google.com
 """
         
-        await update.message.reply_text(help_text, reply_markup=self.MAIN_KEYBOARD, parse_mode="HTML")
+        await queue_reply(update, help_text, reply_markup=self.MAIN_KEYBOARD, parse_mode="HTML")
     
     async def handle_build(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /build command"""
@@ -280,7 +374,7 @@ class TelegramBotManager:
             args = context.args
             
             if not args:
-                await update.message.reply_text(
+                await queue_reply(update, 
                     "📦 <b>Create New Project</b>\n\nUsage: /build [name] [description]\n\nExample: /build my_api A REST API",
                     reply_markup=self.MAIN_KEYBOARD,
                     parse_mode="HTML"
@@ -290,25 +384,28 @@ class TelegramBotManager:
             project_name = args[0]
             description = " ".join(args[1:]) if len(args) > 1 else project_name
             
-            db = SessionLocal()
-            tg_user = db.query(TelegramUser).filter_by(telegram_id=user.id).first()
-            
-            if not tg_user:
-                db.close()
-                await update.message.reply_text("❌ Please link your account first!", reply_markup=self.MAIN_KEYBOARD)
-                return
-            
-            build = Build(
-                project_name=project_name,
-                language="python",
-                status=BuildStatus.PENDING,
-                user_id=tg_user.user_id,
-            )
-            db.add(build)
-            db.commit()
-            db.close()
+            async with AsyncSessionLocal() as db:
+                tg_user = (await db.execute(
+                    select(TelegramUser).filter_by(telegram_id=user.id)
+                )).scalars().first()
+                
+                if not tg_user:
+                    await queue_reply(update, "❌ Please link your account first!", reply_markup=self.MAIN_KEYBOARD)
+                    return
+                
+                build = Build(
+                    id=str(uuid.uuid4()),
+                    project_name=project_name,
+                    requirements=description,
+                    status=BuildStatus.PENDING,
+                    user_id=tg_user.user_id,
+                )
+                db.add(build)
+                await db.commit()
+            if settings.search_enabled:
+                get_search_indexer().index_build(build.id, tg_user.user_id, project_name, description)
             
-            await update.message.reply_text(
+            await queue_reply(update, 
                 f"🚀 <b>Building {project_name}</b>...\n\n⏳ Generating with Qwen3-coder...",
                 parse_mode="HTML"
             )
@@ -323,24 +420,24 @@ class TelegramBotManager:
             
             if result.get("status") == "completed":
                 code_preview = (result.get("generated_code", "") or "")[:300]
-                await update.message.reply_text(
+                await queue_reply(update, 
                     f"✅ <b>Build Complete!</b>\n\n📦 {project_name}\n🆔 <code>{build.id[:8]}</code>\n\n<code>{code_preview}...</code>",
                     reply_markup=self.MAIN_KEYBOARD,
                     parse_mode="HTML",
                 )
             else:
-                await update.message.reply_text(
+                await queue_reply(update, 
                     f"❌ Build failed: {result.get('error', 'Unknown')}",
                     reply_markup=self.MAIN_KEYBOARD
                 )
             
         except Exception as e:
             logger.error(f"Build failed: {e}")
-            await update.message.reply_text(f"❌ Error: {e}")
+            await queue_reply(update, f"❌ Error: {e}")
     
     async def handle_skill(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /skill command"""
-        await update.message.reply_text(
+        await queue_reply(update, 
             "💡 <b>Select a Skill Category:</b>",
             reply_markup=self.SKILL_CATEGORIES,
             parse_mode="HTML"
@@ -367,15 +464,15 @@ class TelegramBotManager:
             
             status += f"\n🎯 Primary: {health.get('primary', 'none').upper()}"
             
-            await update.message.reply_text(status, reply_markup=self.MAIN_KEYBOARD, parse_mode="HTML")
+            await queue_reply(update, status, reply_markup=self.MAIN_KEYBOARD, parse_mode="HTML")
         except Exception as e:
-            await update.message.reply_text(f"❌ Error: {e}")
+            await queue_reply(update, f"❌ Error: {e}")
     
     async def handle_health(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /health command - check AI"""
         try:
             ollama = get_ollama_client()
-            await update.message.reply_text("🔄 Checking AI connection...", reply_markup=self.MAIN_KEYBOARD)
+            await queue_reply(update, "🔄 Checking AI connection...", reply_markup=self.MAIN_KEYBOARD)
             
             health = await ollama.health_check()
             
@@ -386,16 +483,16 @@ class TelegramBotManager:
             else:
                 msg = "❌ <b>No AI connection!</b>\n\nCheck Ollama configuration."
             
-            await update.message.reply_text(msg, reply_markup=self.MAIN_KEYBOARD, parse_mode="HTML")
+            await queue_reply(update, msg, reply_markup=self.MAIN_KEYBOARD, parse_mode="HTML")
         except Exception as e:
-            await update.message.reply_text(f"❌ Error: {e}")
+            await queue_reply(update, f"❌ Error: {e}")
     
     async def handle_file(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /file command"""
         args = context.args
         
         if not args:
-            await update.message.reply_text(
+            await queue_reply(update, 
                 "📁 <b>File Operations</b>\n\n"
                 "Commands:\n"
                 "/file create [path] [content]\n"
@@ -408,14 +505,14 @@ class TelegramBotManager:
             )
             return
         
-        await update.message.reply_text("📁 Use the file menu buttons!", reply_markup=self.FILE_KEYBOARD)
+        await queue_reply(update, "📁 Use the file menu buttons!", reply_markup=self.FILE_KEYBOARD)
     
     async def handle_post(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /post command"""
         args = context.args
         
         if not args:
-            await update.message.reply_text(
+            await queue_reply(update, 
                 "📱 <b>Social Media Posting</b>\n\n"
                 "Commands:\n"
                 "/post twitter [message]\n"
@@ -435,7 +532,7 @@ class TelegramBotManager:
         browser = get_browser_controller()
         result = await browser.create_social_post(platform, text)
         
-        await update.message.reply_text(
+        await queue_reply(update, 
             result.message,
             reply_markup=self.SOCIAL_KEYBOARD,
             parse_mode="HTML" if "<b>" in result.message else None
@@ -446,14 +543,14 @@ class TelegramBotManager:
         args = context.args
         
         if not args:
-            await update.message.reply_text("🌐 Usage: /open [URL]", reply_markup=self.BROWSER_KEYBOARD)
+            await queue_reply(update, "🌐 Usage: /open [URL]", reply_markup=self.BROWSER_KEYBOARD)
             return
         
         url = args[0]
         browser = get_browser_controller()
         result = await browser.open_url(url)
         
-        await update.message.reply_text(result.message, reply_markup=self.BROWSER_KEYBOARD)
+        await queue_reply(update, result.message, reply_markup=self.BROWSER_KEYBOARD)
     
     async def handle_link(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /link command"""
@@ -463,7 +560,7 @@ class TelegramBotManager:
             
             await self._ensure_user_linked(user.id, user.username, chat_id)
             
-            await update.message.reply_text(
+            await queue_reply(update, 
                 "✅ <b>Account Linked!</b>",
                 reply_markup=self.MAIN_KEYBOARD,
                 parse_mode="HTML"
@@ -471,6 +568,45 @@ class TelegramBotManager:
         except Exception as e:
             logger.error(f"Link failed: {e}")
     
+    SEARCH_ICONS = {"message": "💬", "build": "📦", "build_log": "📜"}
+
+    async def handle_search(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /search command - your chats, and once linked your builds and their logs"""
+        try:
+            query = " ".join(context.args or [])
+            if not query:
+                await queue_reply(update,
+                    "🔎 <b>Search</b>\n\nUsage: /search [words]\n\nExample: /search login bug",
+                    reply_markup=self.MAIN_KEYBOARD,
+                    parse_mode="HTML"
+                )
+                return
+            
+            async with AsyncSessionLocal() as db:
+                owners = await owners_for_telegram(db, update.effective_user.id)
+                page = await search(db, query, owners, limit=5)
+            
+            if not page.hits:
+                await queue_reply(update, f"🔎 No results for <b>{html.escape(query)}</b>",
+                                  reply_markup=self.MAIN_KEYBOARD, parse_mode="HTML")
+                return
+            
+            lines = [f"🔎 <b>Results for</b> {html.escape(query)}"]
+            for hit in page.hits:
+                header = f"{self.SEARCH_ICONS.get(hit.kind, '•')} <b>{html.escape(hit.title)}</b>"
+                if hit.kind != "message":
+                    header += f" <code>{hit.ref_id[:8]}</code>"
+                lines.append(
+                    f"\n{header} · {hit.created_at:%Y-%m-%d}\n"
+                    f"{render_snippet(hit.snippet, '<b>', '</b>', html.escape)}"
+                )
+            if page.next_offset is not None:
+                lines.append("\n<i>More results: add words to narrow the search</i>")
+            await queue_reply(update, "\n".join(lines), reply_markup=self.MAIN_KEYBOARD, parse_mode="HTML")
+        except Exception as e:
+            logger.error(f"Search failed: {e}")
+            await queue_reply(update, f"❌ Error: {e}")
+    
     async def handle_text(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle all text messages - BRIDGED to Agent AI Brain"""
         try:
@@ -484,12 +620,15 @@ class TelegramBotManager:
             bridge = get_telegram_bridge()
 
             result = await bridge.process_telegram_message(chat_id, text)
+            if result.get("cancelled"):
+                return
 
             # Use inline keyboard if available (for callbacks), otherwise reply keyboard
             reply_markup = result.get("inline_keyboard") or result.get("keyboard") or self.MAIN_KEYBOARD
             parse_mode = result.get("parse_mode")
+            get_update_deduplicator().remember_response(update.update_id, chat_id, result["text"], parse_mode)
 
-            await update.message.reply_text(
+            await queue_reply(update, 
                 text=result["text"],
                 reply_markup=reply_markup,
                 parse_mode=parse_mode
@@ -503,31 +642,38 @@ class TelegramBotManager:
                 
         except Exception as e:
             logger.error(f"Text handling failed: {e}", exc_info=True)
-            await update.message.reply_text(
+            await queue_reply(update, 
                 f"❌ <b>Error</b>\n\n{str(e)}",
                 reply_markup=self.MAIN_KEYBOARD,
                 parse_mode="HTML"
             )
     
+    async def send_message(self, chat_id: int, text: str, parse_mode: Optional[str] = None, **kwargs):
+        """Queue a message for rate-limited delivery (returns before it is sent)"""
+        outbox = get_telegram_outbox()
+        if outbox.running:
+            outbox.send(chat_id, text, parse_mode=parse_mode, **kwargs)
+        elif self.application:
+            await self.application.bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode, **kwargs)
+        else:
+            logger.warning("Telegram bot not initialized, message dropped", chat_id=chat_id)
+    
     async def _send_response(self, chat_id: int, result: Dict, buttons=None):
         """Send response with optional buttons"""
         text = result.get("text", "No response")
         reply_markup = buttons or self.MAIN_KEYBOARD
         
-        try:
-            await self.application.bot.send_message(
-                chat_id=chat_id,
-                text=text,
-                reply_markup=reply_markup,
-                parse_mode="HTML"
-            )
-        except Exception as e:
-            logger.error(f"Failed to send message: {e}")
+        await self.send_message(
+            chat_id=chat_id,
+            text=text,
+            reply_markup=reply_markup,
+            parse_mode="HTML"
+        )
     
     # Menu methods
     async def _main_menu(self, chat_id: int):
         """Show main menu"""
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="🏠 <b>Main Menu</b>",
             reply_markup=self.MAIN_KEYBOARD,
@@ -536,7 +682,7 @@ class TelegramBotManager:
     
     async def _new_project(self, chat_id: int):
         """New project menu"""
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="📦 <b>Create New Project</b>\n\nSend: /build [name] [description]\n\nExample: /build my_api REST API for users",
             reply_markup=self.MAIN_KEYBOARD,
@@ -545,7 +691,7 @@ class TelegramBotManager:
     
     async def _skill_menu(self, chat_id: int):
         """Skill categories menu"""
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="💡 <b>Select Skill Category:</b>",
             reply_markup=self.SKILL_CATEGORIES,
@@ -554,7 +700,7 @@ class TelegramBotManager:
     
     async def _file_menu(self, chat_id: int):
         """File operations menu"""
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="📁 <b>File Operations</b>\n\nSelect an operation:",
             reply_markup=self.FILE_KEYBOARD,
@@ -563,7 +709,7 @@ class TelegramBotManager:
     
     async def _browser_menu(self, chat_id: int):
         """Browser menu"""
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="🌐 <b>Browser Control</b>\n\nSelect an operation:",
             reply_markup=self.BROWSER_KEYBOARD,
@@ -572,7 +718,7 @@ class TelegramBotManager:
     
     async def _social_menu(self, chat_id: int):
         """Social media menu"""
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="📱 <b>Social Media</b>\n\nSelect a platform:",
             reply_markup=self.SOCIAL_KEYBOARD,
@@ -581,7 +727,7 @@ class TelegramBotManager:
     
     async def _code_skills(self, chat_id: int):
         """Code skills menu"""
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="💻 <b>Code Generation Skills</b>",
             reply_markup=self.CODE_KEYBOARD,
@@ -590,7 +736,7 @@ class TelegramBotManager:
     
     async def _analysis_skills(self, chat_id: int):
         """Analysis skills menu"""
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="🔍 <b>Analysis Skills</b>",
             reply_markup=self.ANALYSIS_KEYBOARD,
@@ -599,7 +745,7 @@ class TelegramBotManager:
     
     async def _devops_skills(self, chat_id: int):
         """DevOps skills menu"""
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="🛠️ <b>DevOps Skills</b>",
             reply_markup=self.DEVOPS_KEYBOARD,
@@ -608,7 +754,7 @@ class TelegramBotManager:
     
     async def _docs_skills(self, chat_id: int):
         """Docs skills"""
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="📝 <b>Documentation Skills</b>\n\nComing soon!",
             reply_markup=self.SKILL_CATEGORIES,
@@ -617,7 +763,7 @@ class TelegramBotManager:
     
     async def _testing_skills(self, chat_id: int):
         """Testing skills"""
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="🧪 <b>Testing Skills</b>\n\nComing soon!",
             reply_markup=self.SKILL_CATEGORIES,
@@ -627,7 +773,7 @@ class TelegramBotManager:
     # NEW 7-Button Menu Methods
     async def _project_menu(self, chat_id: int):
         """Project creation menu"""
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="🏗️ <b>Create New Project</b>\n\nSelect programming language:",
             reply_markup=self.PROJECT_KEYBOARD,
@@ -636,7 +782,7 @@ class TelegramBotManager:
     
     async def _schedule_menu(self, chat_id: int):
         """Schedule menu"""
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="📅 <b>Task Scheduler</b>\n\nSelect an operation:",
             reply_markup=self.SCHEDULE_KEYBOARD,
@@ -645,7 +791,7 @@ class TelegramBotManager:
     
     async def _restart_agent(self, chat_id: int):
         """Restart agent confirmation"""
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="🔄 <b>Restart Agent</b>\n\nThe agent will restart and be back online in a few seconds.",
             reply_markup=self.MAIN_KEYBOARD,
@@ -654,7 +800,7 @@ class TelegramBotManager:
     
     async def _shutdown_agent(self, chat_id: int):
         """Shutdown agent confirmation"""
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="⚡ <b>⚠️ SHUTDOWN AGENT ⚠️</b>\n\nThis will stop the agent completely!\n\nTo restart, run: systemctl start ultimate-agent",
             reply_markup=self.MAIN_KEYBOARD,
@@ -663,7 +809,7 @@ class TelegramBotManager:
     
     async def _help_menu(self, chat_id: int):
         """Help menu"""
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="❓ <b>Help & Commands</b>\n\nSelect a topic:",
             reply_markup=self.HELP_KEYBOARD,
@@ -672,7 +818,7 @@ class TelegramBotManager:
     
     async def _analysis_menu(self, chat_id: int):
         """Analysis skills menu"""
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="🔍 <b>Analysis Skills</b>",
             reply_markup=self.ANALYSIS_KEYBOARD,
@@ -683,7 +829,7 @@ class TelegramBotManager:
     async def _create_file_input(self, chat_id: int):
         """Request file creation"""
         self.user_sessions[chat_id] = {"action": "create_file"}
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="📄 <b>Create File</b>\n\nSend in format:\n<code>filename.txt:content here</code>",
             parse_mode="HTML",
@@ -693,7 +839,7 @@ class TelegramBotManager:
     async def _read_file_input(self, chat_id: int):
         """Request file read"""
         self.user_sessions[chat_id] = {"action": "read_file"}
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="📖 <b>Read File</b>\n\nSend the file path:",
             parse_mode="HTML",
@@ -703,7 +849,7 @@ class TelegramBotManager:
     async def _edit_file_input(self, chat_id: int):
         """Request file edit"""
         self.user_sessions[chat_id] = {"action": "edit_file"}
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="✏️ <b>Edit File</b>\n\nSend: <code>path:old_text:new_text</code>",
             parse_mode="HTML",
@@ -713,7 +859,7 @@ class TelegramBotManager:
     async def _delete_file_input(self, chat_id: int):
         """Request file delete"""
         self.user_sessions[chat_id] = {"action": "delete_file"}
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="🗑️ <b>Delete File</b>\n\nSend the file path:",
             parse_mode="HTML",
@@ -723,7 +869,7 @@ class TelegramBotManager:
     async def _create_folder_input(self, chat_id: int):
         """Request folder create"""
         self.user_sessions[chat_id] = {"action": "create_folder"}
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="📁 <b>Create Folder</b>\n\nSend the folder path:",
             parse_mode="HTML",
@@ -733,7 +879,7 @@ class TelegramBotManager:
     async def _list_folder_input(self, chat_id: int):
         """Request folder list"""
         self.user_sessions[chat_id] = {"action": "list_folder"}
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="📂 <b>List Folder</b>\n\nSend the folder path (or 'workspace'):",
             parse_mode="HTML",
@@ -744,7 +890,7 @@ class TelegramBotManager:
     async def _open_url_input(self, chat_id: int):
         """Request URL to open"""
         self.user_sessions[chat_id] = {"action": "open_url"}
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="🌐 <b>Open URL</b>\n\nSend the URL to open:",
             parse_mode="HTML",
@@ -755,7 +901,7 @@ class TelegramBotManager:
         """Take screenshot"""
         browser = get_browser_controller()
         result = await browser.take_screenshot()
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text=result.message,
             reply_markup=self.BROWSER_KEYBOARD
@@ -765,7 +911,7 @@ class TelegramBotManager:
         """Check available browsers"""
         browser = get_browser_controller()
         result = await browser.list_browsers()
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text=result.message,
             reply_markup=self.BROWSER_KEYBOARD
@@ -775,7 +921,7 @@ class TelegramBotManager:
     async def _tweet_input(self, chat_id: int):
         """Request tweet text"""
         self.user_sessions[chat_id] = {"action": "tweet"}
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="🐦 <b>Post Tweet</b>\n\nSend your tweet (max 280 chars):",
             parse_mode="HTML",
@@ -785,7 +931,7 @@ class TelegramBotManager:
     async def _linkedin_input(self, chat_id: int):
         """Request LinkedIn post"""
         self.user_sessions[chat_id] = {"action": "linkedin"}
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="📘 <b>Post to LinkedIn</b>\n\nSend your post:",
             parse_mode="HTML",
@@ -795,7 +941,7 @@ class TelegramBotManager:
     async def _facebook_input(self, chat_id: int):
         """Request Facebook post"""
         self.user_sessions[chat_id] = {"action": "facebook"}
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="📕 <b>Post to Facebook</b>\n\nSend your post:",
             parse_mode="HTML",
@@ -805,7 +951,7 @@ class TelegramBotManager:
     async def _instagram_input(self, chat_id: int):
         """Instagram"""
         self.user_sessions[chat_id] = {"action": "instagram"}
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="📷 <b>Instagram</b>\n\nOpening Instagram web...",
             parse_mode="HTML",
@@ -817,7 +963,7 @@ class TelegramBotManager:
     async def _reddit_input(self, chat_id: int):
         """Request Reddit post"""
         self.user_sessions[chat_id] = {"action": "reddit"}
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="🤖 <b>Post to Reddit</b>\n\nSend: <code>title:r/subreddit</code>",
             parse_mode="HTML",
@@ -827,7 +973,7 @@ class TelegramBotManager:
     async def _medium_input(self, chat_id: int):
         """Medium post"""
         self.user_sessions[chat_id] = {"action": "medium"}
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="📝 <b>Post to Medium</b>\n\nSend: <code>title:content</code>",
             parse_mode="HTML",
@@ -837,7 +983,7 @@ class TelegramBotManager:
     async def _announcement_input(self, chat_id: int):
         """Announcement"""
         self.user_sessions[chat_id] = {"action": "announcement"}
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text="📢 <b>Post Announcement</b>\n\nSend your announcement (will post to Twitter & LinkedIn):",
             parse_mode="HTML",
@@ -847,7 +993,7 @@ class TelegramBotManager:
     # Execute skills
     async def _execute_skill(self, chat_id: int, skill_slug: str, params: Dict):
         """Execute a skill"""
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text=f"⚡ Executing <b>{skill_slug}</b>...",
             parse_mode="HTML"
@@ -857,14 +1003,14 @@ class TelegramBotManager:
         
         if result.success:
             output = result.output[:3500]
-            await self.application.bot.send_message(
+            await self.send_message(
                 chat_id=chat_id,
                 text=f"✅ <b>Done!</b>\n\n⏱️ {result.duration_ms:.0f}ms\n\n{output}",
                 reply_markup=self.SKILL_CATEGORIES,
                 parse_mode="HTML"
             )
         else:
-            await self.application.bot.send_message(
+            await self.send_message(
                 chat_id=chat_id,
                 text=f"❌ Failed: {result.error}",
                 reply_markup=self.SKILL_CATEGORIES
@@ -873,7 +1019,7 @@ class TelegramBotManager:
     async def _request_code(self, chat_id: int, skill: str, prompt: str):
         """Request code for analysis"""
         self.user_sessions[chat_id] = {"action": "analyze_code", "skill": skill}
-        await self.application.bot.send_message(
+        await self.send_message(
             chat_id=chat_id,
             text=f"📝 {prompt}\n\nSend code in a code block (```language ... ```)",
             parse_mode="HTML",
@@ -886,7 +1032,7 @@ class TelegramBotManager:
         action = session.get("action")
         
         if not action:
-            await self.application.bot.send_message(
+            await self.send_message(
                 chat_id=user_id,
                 text="🤔 Use the menu buttons or /help!",
                 reply_markup=self.MAIN_KEYBOARD
@@ -975,7 +1121,7 @@ class TelegramBotManager:
                 session.get("skill", "security-audit"),
                 {"code": code, "language": language}
             )
-            await self.application.bot.send_message(
+            await self.send_message(
                 chat_id=user_id,
                 text=f"✅ Analysis complete!\n\n{result.output[:2000] if result.output else result.error}",
                 reply_markup=self.ANALYSIS_KEYBOARD,
@@ -987,7 +1133,7 @@ class TelegramBotManager:
             result = None
         
         if result:
-            await self.application.bot.send_message(
+            await self.send_message(
                 chat_id=user_id,
                 text=result.message,
                 reply_markup=self.MAIN_KEYBOARD
@@ -995,19 +1141,22 @@ class TelegramBotManager:
     
     async def _my_builds(self, chat_id: int, user_id: int):
         """Show user's builds"""
-        db = SessionLocal()
-        tg_user = db.query(TelegramUser).filter_by(telegram_id=user_id).first()
+        async with AsyncSessionLocal() as db:
+            tg_user = (await db.execute(
+                select(TelegramUser).filter_by(telegram_id=user_id)
+            )).scalars().first()
+            builds = []
+            if tg_user:
+                builds = (await db.execute(
+                    select(Build).filter_by(user_id=tg_user.user_id).order_by(Build.created_at.desc()).limit(5)
+                )).scalars().all()
         
         if not tg_user:
-            db.close()
-            await self.application.bot.send_message(chat_id=chat_id, text="❌ Please link your account first!", reply_markup=self.MAIN_KEYBOARD)
+            await self.send_message(chat_id=chat_id, text="❌ Please link your account first!", reply_markup=self.MAIN_KEYBOARD)
             return
         
-        builds = db.query(Build).filter_by(user_id=tg_user.user_id).order_by(Build.created_at.desc()).limit(5).all()
-        db.close()
-        
         if not builds:
-            await self.application.bot.send_message(
+            await self.send_message(
                 chat_id=chat_id,
                 text="📊 <b>No builds yet!</b>\n\nUse /build to create one!",
                 reply_markup=self.MAIN_KEYBOARD,
@@ -1020,7 +1169,7 @@ class TelegramBotManager:
             icon = {"completed": "✅", "running": "⏳", "failed": "❌", "pending": "📝"}.get(build.status.value, "❓")
             text += f"{icon} <b>{build.project_name}</b>\n   📅 {build.created_at.strftime('%Y-%m-%d')}\n\n"
         
-        await self.application.bot.send_message(chat_id=chat_id, text=text, reply_markup=self.MAIN_KEYBOARD, parse_mode="HTML")
+        await self.send_message(chat_id=chat_id, text=text, reply_markup=self.MAIN_KEYBOARD, parse_mode="HTML")
     
     async def _history(self, chat_id: int, user_id: int):
         """Show history"""
@@ -1029,37 +1178,37 @@ class TelegramBotManager:
     async def _link_account(self, chat_id: int, user):
         """Link account"""
         await self._ensure_user_linked(user.id, user.username, chat_id)
-        await self.application.bot.send_message(chat_id=chat_id, text="✅ <b>Account Linked!</b>", parse_mode="HTML", reply_markup=self.MAIN_KEYBOARD)
+        await self.send_message(chat_id=chat_id, text="✅ <b>Account Linked!</b>", parse_mode="HTML", reply_markup=self.MAIN_KEYBOARD)
     
     async def _ensure_user_linked(self, telegram_id: int, username: Optional[str], chat_id: int):
         """Ensure user is linked"""
-        db = SessionLocal()
-        tg_user = db.query(TelegramUser).filter_by(telegram_id=telegram_id).first()
-        
-        if not tg_user:
-            user = User(
-                username=username or f"telegram_{telegram_id}",
-                email=f"telegram_{telegram_id}@agent.local",
-                hashed_password="",
-                role="user",
-                is_active=True,
-                is_verified=True,
-            )
-            db.add(user)
-            db.flush()
+        async with AsyncSessionLocal() as db:
+            tg_user = (await db.execute(
+                select(TelegramUser).filter_by(telegram_id=telegram_id)
+            )).scalars().first()
             
-            tg_user = TelegramUser(
-                user_id=user.id,
-                telegram_id=telegram_id,
-                telegram_username=username,
-                chat_id=chat_id,
-                is_active=True,
-            )
-            db.add(tg_user)
-            db.commit()
-            logger.info("User linked", telegram_id=telegram_id)
-        
-        db.close()
+            if not tg_user:
+                user = User(
+                    username=username or f"telegram_{telegram_id}",
+                    email=f"telegram_{telegram_id}@agent.local",
+                    hashed_password="",
+                    role="user",
+                    is_active=True,
+                    is_verified=True,
+                )
+                db.add(user)
+                await db.flush()
+                
+                tg_user = TelegramUser(
+                    user_id=user.id,
+                    telegram_id=telegram_id,
+                    telegram_username=username,
+                    chat_id=chat_id,
+                    is_active=True,
+                )
+                db.add(tg_user)
+                await db.commit()
+                logger.info("User linked", telegram_id=telegram_id)
     
     async def start(self):
         """Start bot"""
@@ -1068,13 +1217,21 @@ class TelegramBotManager:
             return
         
         try:
-            webhook_url = f"{settings.telegram_webhook_url}/telegram/webhook" if settings.telegram_webhook_url else None
-            
-            # Components must be started first
+            # Components must be started first (this also starts the update fetcher)
             await self.application.start()
             
-            if webhook_url:
-                await self.application.bot.set_webhook(webhook_url)
+            if self.mode == "webhook":
+                if not settings.telegram_webhook_url:
+                    raise ValueError("TELEGRAM_MODE=webhook requires TELEGRAM_WEBHOOK_URL")
+                if not self.webhook_secret:
+                    raise ValueError("TELEGRAM_MODE=webhook requires TELEGRAM_WEBHOOK_SECRET")
+                webhook_url = f"{settings.telegram_webhook_url.rstrip('/')}/telegram/webhook"
+                await self.application.bot.set_webhook(
+                    webhook_url,
+                    secret_token=self.webhook_secret,
+                    allowed_updates=Update.ALL_TYPES,
+                    max_connections=settings.telegram_update_concurrency,
+                )
                 logger.info(f"Webhook set to {webhook_url}")
             else:
                 # Local development - use polling
@@ -1087,6 +1244,15 @@ class TelegramBotManager:
             logger.error(f"Bot start failed: {e}")
             raise
     
+    def verify_webhook_secret(self, token: Optional[str]) -> bool:
+        """Constant-time check of the webhook secret header"""
+        return bool(token and self.webhook_secret) and hmac.compare_digest(token, self.webhook_secret)
+    
+    async def feed_webhook_update(self, body: bytes):
+        """Decode a webhook payload and hand it to the update processor"""
+        update = Update.de_json(json.loads(body), self.application.bot)
+        await self.application.update_queue.put(update)
+    
     async def stop(self):
         """Stop bot"""
         if self.application:
@@ -1094,6 +1260,10 @@ class TelegramBotManager:
                 if self.application.updater and self.application.updater.running:
                     await self.application.updater.stop()
                 
+                # Deliver what is still queued while the bot can still send
+                await get_telegram_outbox().close()
+                get_update_deduplicator().close()
+                
                 await self.application.stop()
                 await self.application.shutdown()
                 logger.info("Telegram bot stopped")
@@ -1163,7 +1333,7 @@ Commands:
 /skill - Open skills menu
 """
                 
-                await bot.application.bot.send_message(chat_id=admin_id, text=msg, reply_markup=bot.MAIN_KEYBOARD, parse_mode="HTML")
+                await bot.send_message(chat_id=admin_id, text=msg, reply_markup=bot.MAIN_KEYBOARD, parse_mode="HTML")
                 logger.info(f"Startup notification sent to admin {admin_id}")
     except Exception as e:
         logger.warning(f"Failed to send admin notification: {e}")
@@ -10,6 +10,7 @@ from telegram import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup,
 from telegram.constants import ParseMode
 from app.integrations.agent_handler import get_agent_handler
 from app.core.workflow_logger import WorkflowLogger
+from app.integrations.telegram_format import markdown_to_telegram_html
 import structlog
 import traceback
 
@@ -68,17 +69,21 @@ class TelegramAgentBridge:
                     "action": None
                 }
             
+            if agent_response.get("cancelled"):
+                # Superseded by a newer message; nothing to send
+                return {"text": None, "cancelled": True, "keyboard": None, "parse_mode": None, "action": None}
+            
             # Extract and format text
             text = agent_response.get("text", "No response")
             if not text:
                 text = "No response from agent"
             
-            # Ensure HTML formatting
-            if not self._has_html_tags(text):
+            # HTML templates pass through; model Markdown (or untagged text) is
+            # rendered and escaped so Telegram never rejects the entities
+            text_format = agent_response.get("format")
+            if text_format == "markdown" or (text_format != "html" and not self._has_html_tags(text)):
                 text = self._format_plain_text(text)
-            
-            # Determine parse mode
-            parse_mode = ParseMode.HTML if self._has_html_tags(text) else None
+            parse_mode = ParseMode.HTML
 
             # Build keyboard from buttons if present
             keyboard = None
@@ -124,27 +129,8 @@ class TelegramAgentBridge:
         return any(tag in text for tag in html_tags)
     
     def _format_plain_text(self, text: str) -> str:
-        """Add basic HTML formatting to plain text"""
-        lines = text.split("\n")
-        
-        # Bold first line if it's short (likely a header)
-        if lines and len(lines[0]) < 80:
-            lines[0] = f"<b>{lines[0]}</b>"
-        
-        # Format code blocks with triple backticks
-        formatted = []
-        in_code_block = False
-        for line in lines:
-            if line.strip().startswith("```"):
-                in_code_block = not in_code_block
-                if in_code_block:
-                    formatted.append("<code>")
-                else:
-                    formatted.append("</code>")
-            else:
-                formatted.append(line)
-        
-        return "\n".join(formatted)
+        """Render Markdown/plain text as Telegram-safe HTML"""
+        return markdown_to_telegram_html(text)
     
     def _has_callbacks(self, buttons: List[List[Dict]]) -> bool:
         """Check if buttons have callback data (for inline keyboard)"""
@@ -0,0 +1,236 @@
+"""
+Telegram update idempotency
+Telegram re-delivers updates after a slow webhook response or when polling
+restarts before the offset was confirmed. Every update is checked against a
+TTL set of seen update ids (and callback query ids) before any handler runs,
+so a redelivery never repeats LLM calls or side effects.
+
+The set can spill to SQLite so it survives restarts. The last response for
+each update is kept as well: a duplicate that arrives after a restart is
+answered from it instantly, since the process that computed the reply may
+have died before sending it. Duplicates within one process are dropped (the
+original reply is already sent or on its way).
+
+Spill writes never run on the event loop: ``check`` and ``remember_response``
+queue them in memory and a writer thread commits each batch in one
+transaction every ``flush_interval`` seconds, deleting expired rows at most
+once a minute. An update seen less than ``flush_interval`` before a crash
+may therefore be processed again after the restart.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger(__name__)
+
+
+def update_keys(update) -> List[Hashable]:
+    """Idempotency keys of an update: its id, plus the callback query id if any"""
+    keys: List[Hashable] = [update.update_id]
+    if getattr(update, "callback_query", None) is not None:
+        keys.append(f"cb:{update.callback_query.id}")
+    return keys
+
+
+class UpdateDeduplicator:
+    """TTL set of seen updates with an optional SQLite spill"""
+
+    # Seconds between deletes of expired spill rows
+    PURGE_INTERVAL = 60.0
+
+    def __init__(
+        self,
+        ttl_seconds: float = 86400,
+        max_entries: int = 200_000,
+        max_responses: int = 1000,
+        spill_path: Optional[Path] = None,
+        flush_interval: float = 0.5
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.flush_interval = flush_interval
+        self.max_entries = max_entries
+        self.max_responses = max_responses
+        # key -> expiry; insertion order is expiry order because the TTL is fixed
+        self._seen: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._responses: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        # Keys loaded from the spill, i.e. first seen by a previous process
+        self._restored: set = set()
+        self.stats = {"checked": 0, "duplicates": 0, "replayed": 0}
+
+        self._db: Optional[sqlite3.Connection] = None
+        # Spill writes waiting for the writer thread
+        self._pending_seen: List[Tuple[str, float]] = []
+        self._pending_responses: Dict[str, str] = {}
+        self._pending_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._last_purge = 0.0
+        if spill_path is not None:
+            self._open_spill(Path(spill_path))
+            self._writer = threading.Thread(target=self._write_loop, name="telegram-dedup-spill", daemon=True)
+            self._writer.start()
+
+    # ==================== Spill ====================
+
+    def _open_spill(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS seen_updates ("
+            "key TEXT PRIMARY KEY, expires REAL NOT NULL, response TEXT)"
+        )
+        now = self._last_purge = time.time()
+        self._db.execute("DELETE FROM seen_updates WHERE expires < ?", (now,))
+
+        rows = self._db.execute(
+            "SELECT key, expires, response FROM seen_updates ORDER BY expires"
+        ).fetchall()
+        for raw_key, expires, response in rows:
+            key = self._decode_key(raw_key)
+            self._seen[key] = expires
+            self._restored.add(key)
+            if response:
+                self._responses[key] = json.loads(response)
+        logger.info("Update dedup spill loaded", entries=len(rows), path=str(path))
+
+    @staticmethod
+    def _encode_key(key: Hashable) -> str:
+        return str(key)
+
+    @staticmethod
+    def _decode_key(raw: str) -> Hashable:
+        return int(raw) if raw.lstrip("-").isdigit() else raw
+
+    def _write_loop(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Commit queued spill writes in one transaction and purge expired rows (blocking)"""
+        with self._pending_lock:
+            seen, self._pending_seen = self._pending_seen, []
+            responses, self._pending_responses = self._pending_responses, {}
+        now = time.time()
+        purge = now - self._last_purge >= self.PURGE_INTERVAL
+        if self._db is None or not (seen or responses or purge):
+            return
+        try:
+            self._db.execute("BEGIN")
+            if seen:
+                self._db.executemany("INSERT OR REPLACE INTO seen_updates (key, expires) VALUES (?, ?)", seen)
+            if responses:
+                self._db.executemany(
+                    "UPDATE seen_updates SET response = ? WHERE key = ?",
+                    [(response, key) for key, response in responses.items()]
+                )
+            if purge:
+                self._db.execute("DELETE FROM seen_updates WHERE expires < ?", (now,))
+                self._last_purge = now
+            self._db.execute("COMMIT")
+        except sqlite3.Error as e:
+            logger.warning(f"Update dedup spill write failed: {e}")
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+
+    def close(self):
+        """Stop the writer thread, write what is queued and close the spill"""
+        if self._writer is not None:
+            self._stopped.set()
+            self._writer.join()
+            self._writer = None
+        if self._db is not None:
+            self.flush()
+            self._db.close()
+            self._db = None
+
+    # ==================== Checks ====================
+
+    def _expire(self, now: float):
+        while self._seen:
+            key, expires = next(iter(self._seen.items()))
+            if expires > now and len(self._seen) <= self.max_entries:
+                break
+            self._seen.popitem(last=False)
+            self._responses.pop(key, None)
+            self._restored.discard(key)
+
+    def check(self, keys: List[Hashable]) -> Optional[Hashable]:
+        """
+        Record ``keys`` as seen; return the first key already seen (duplicate)
+        or None when the update is new
+        """
+        now = time.time()
+        self._expire(now)
+        self.stats["checked"] += 1
+
+        for key in keys:
+            if key in self._seen:
+                self.stats["duplicates"] += 1
+                return key
+
+        expires = now + self.ttl_seconds
+        for key in keys:
+            self._seen[key] = expires
+        if self._db is not None:
+            with self._pending_lock:
+                self._pending_seen.extend((self._encode_key(k), expires) for k in keys)
+        return None
+
+    def seen(self, keys: List[Hashable]) -> bool:
+        """Whether any key was already recorded (does not record anything)"""
+        now = time.time()
+        return any(self._seen.get(key, 0) > now for key in keys)
+
+    def remember_response(self, key: Hashable, chat_id: int, text: str, parse_mode: Optional[str] = None):
+        """Keep the reply to an update so a post-restart duplicate can be answered"""
+        response = {"chat_id": chat_id, "text": text, "parse_mode": parse_mode}
+        self._responses[key] = response
+        self._responses.move_to_end(key)
+        while len(self._responses) > self.max_responses:
+            self._responses.popitem(last=False)
+        if self._db is not None:
+            with self._pending_lock:
+                self._pending_responses[self._encode_key(key)] = json.dumps(response)
+
+    def replayable_response(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """Cached reply for a duplicate first seen by a previous process"""
+        if key not in self._restored:
+            return None
+        response = self._responses.get(key)
+        if response is not None:
+            # Replay once; later copies are ordinary in-process duplicates
+            self._restored.discard(key)
+            self.stats["replayed"] += 1
+        return response
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+
+# Global deduplicator instance
+_deduplicator: Optional[UpdateDeduplicator] = None
+
+
+def get_update_deduplicator() -> UpdateDeduplicator:
+    """Get or create the deduplicator"""
+    global _deduplicator
+    if _deduplicator is None:
+        spill = settings.telegram_dedup_spill_path
+        _deduplicator = UpdateDeduplicator(
+            ttl_seconds=settings.telegram_dedup_ttl_seconds,
+            max_entries=settings.telegram_dedup_max_entries,
+            spill_path=Path(spill) if spill else None,
+            flush_interval=settings.telegram_dedup_flush_seconds,
+        )
+    return _deduplicator
@@ -0,0 +1,146 @@
+"""
+Markdown to Telegram HTML
+Single-pass, incremental renderer for model output: code fences, inline
+code, bold/italic/strikethrough, links, headings and lists become the HTML
+subset Telegram accepts, and everything else is escaped. Text can be fed in
+arbitrary chunks (e.g. a streamed reply); completed lines are rendered as
+soon as they arrive and every emitted line is balanced, except an open code
+block, which ``pending_close`` closes.
+"""
+
+import re
+from html import escape
+from typing import List
+
+# One alternation, scanned left to right: code spans first so their contents
+# are never treated as emphasis
+_INLINE = re.compile(
+    r"`(?P<code>[^`\n]+)`"
+    r"|\*\*(?P<bold>(?=\S).+?(?<=\S))\*\*"
+    r"|__(?P<bold2>(?=\S).+?(?<=\S))__"
+    r"|~~(?P<strike>(?=\S).+?(?<=\S))~~"
+    r"|(?<![\w*])\*(?P<italic>(?=[^\s*])[^*\n]+?(?<=[^\s*]))\*(?![\w*])"
+    r"|\[(?P<label>[^\]\n]+)\]\((?P<url>https?://[^)\s]+)\)"
+)
+# Lines without any of these characters need escaping only
+_MARKERS = re.compile(r"[`*_~\[]")
+_FENCE = re.compile(r"^\s*(```|~~~)\s*([\w+#.-]*)")
+_HEADING = re.compile(r"^#{1,6}\s+(.*?)\s*#*\s*$")
+_BULLET = re.compile(r"^(\s*)[-*+]\s+(.*)$")
+_ORDERED = re.compile(r"^(\s*)(\d{1,9})[.)]\s+(.*)$")
+_RULE = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+
+
+def render_inline(text: str) -> str:
+    """Escape a line and convert inline Markdown"""
+    if not _MARKERS.search(text):
+        return escape(text, quote=False)
+    out: List[str] = []
+    pos = 0
+    for match in _INLINE.finditer(text):
+        out.append(escape(text[pos:match.start()], quote=False))
+        kind = match.lastgroup
+        if kind == "code":
+            out.append(f"<code>{escape(match.group('code'), quote=False)}</code>")
+        elif kind in ("bold", "bold2"):
+            out.append(f"<b>{render_inline(match.group(kind))}</b>")
+        elif kind == "strike":
+            out.append(f"<s>{render_inline(match.group('strike'))}</s>")
+        elif kind == "italic":
+            out.append(f"<i>{render_inline(match.group('italic'))}</i>")
+        else:
+            url = escape(match.group("url"), quote=True)
+            out.append(f'<a href="{url}">{render_inline(match.group("label"))}</a>')
+        pos = match.end()
+    out.append(escape(text[pos:], quote=False))
+    return "".join(out)
+
+
+class TelegramHTMLRenderer:
+    """
+    Incremental Markdown -> Telegram HTML
+
+    ``feed`` returns the HTML for every line completed by the chunk;
+    ``close`` flushes the last partial line and closes an open code block.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._in_code = False
+        self._fence = ""
+        self._code_started = False
+        self._started = False
+
+    @property
+    def pending_close(self) -> str:
+        """Tags that would make the HTML emitted so far well-formed"""
+        return "</code></pre>" if self._in_code else ""
+
+    def feed(self, chunk: str) -> str:
+        cut = chunk.rfind("\n")
+        if cut < 0:
+            self._buffer += chunk
+            return ""
+        lines = (self._buffer + chunk[:cut]).split("\n")
+        self._buffer = chunk[cut + 1:]
+        return "".join(self._line(line) for line in lines)
+
+    def close(self) -> str:
+        out = self._line(self._buffer) if self._buffer else ""
+        self._buffer = ""
+        if self._in_code:
+            out += "</code></pre>"
+            self._in_code = False
+        return out
+
+    def _sep(self) -> str:
+        if self._started:
+            return "\n"
+        self._started = True
+        return ""
+
+    def _line(self, line: str) -> str:
+        line = line.rstrip("\r")
+        # Block syntax is decided by the first non-blank character, so most
+        # lines are tested against at most one block pattern
+        lead = line.lstrip()[:1]
+        fence = _FENCE.match(line) if lead in ("`", "~") else None
+
+        if self._in_code:
+            if fence and fence.group(1) == self._fence and not line.strip()[3:].strip():
+                self._in_code = False
+                return "</code></pre>"
+            prefix = "\n" if self._code_started else ""
+            self._code_started = True
+            return prefix + escape(line, quote=False)
+
+        if fence:
+            self._in_code = True
+            self._fence = fence.group(1)
+            self._code_started = False
+            lang = fence.group(2)
+            opener = f'<pre><code class="language-{escape(lang, quote=True)}">' if lang else "<pre><code>"
+            return self._sep() + opener
+
+        sep = self._sep()
+        if lead == "#":
+            heading = _HEADING.match(line)
+            if heading:
+                return f"{sep}<b>{render_inline(heading.group(1))}</b>"
+        elif lead in ("-", "*", "_", "+"):
+            if _RULE.match(line):
+                return f"{sep}──────────"
+            bullet = _BULLET.match(line)
+            if bullet:
+                return f"{sep}{bullet.group(1)}• {render_inline(bullet.group(2))}"
+        elif lead.isdigit():
+            ordered = _ORDERED.match(line)
+            if ordered:
+                return f"{sep}{ordered.group(1)}{ordered.group(2)}. {render_inline(ordered.group(3))}"
+        return sep + render_inline(line)
+
+
+def markdown_to_telegram_html(text: str) -> str:
+    """Render a complete Markdown document"""
+    renderer = TelegramHTMLRenderer()
+    return renderer.feed(text) + renderer.close()
@@ -0,0 +1,369 @@
+"""
+Telegram outbound delivery queue
+Senders enqueue and return immediately. One worker per chat delivers that
+chat's messages in order under a global and a per-chat token bucket, retries
+on RetryAfter and network errors, and splits messages over Telegram's
+4096-character limit without breaking code blocks or HTML formatting.
+Notification bursts are merged into periodic digests.
+"""
+
+import asyncio
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import structlog
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+from app.core.config import settings
+
+logger = structlog.get_logger(__name__)
+
+MAX_MESSAGE_LENGTH = 4096
+# Room kept in each chunk for closing an open code block or tags
+_CLOSER_RESERVE = 16
+
+_HTML_TAG = re.compile(r"<(/?)([a-zA-Z][\w-]*)[^>]*>")
+_MD_FENCE = re.compile(r"^```.*$", re.MULTILINE)
+
+
+# ==================== Message splitting ====================
+
+def _find_cut(text: str, budget: int) -> Tuple[int, int]:
+    """(end of this chunk, start of the next) preferring paragraph/line/word breaks"""
+    window = text[:budget]
+    for sep in ("\n\n", "\n", " "):
+        idx = window.rfind(sep)
+        if idx >= budget // 2:
+            return idx, idx + len(sep)
+    return budget, budget
+
+
+def _safe_html_cut(text: str, cut: int) -> int:
+    """Move a cut back so it doesn't land inside a tag or an entity"""
+    lt, gt = text.rfind("<", 0, cut), text.rfind(">", 0, cut)
+    if lt > gt:
+        cut = lt
+    amp, semi = text.rfind("&", 0, cut), text.rfind(";", 0, cut)
+    if amp > semi and cut - amp < 10:
+        cut = amp
+    return cut
+
+
+def _open_tags(body: str) -> List[Tuple[str, str]]:
+    """(name, opening tag) of the HTML elements left open at the end of ``body``, outermost first"""
+    stack: List[Tuple[str, str]] = []
+    for match in _HTML_TAG.finditer(body):
+        name = match.group(2).lower()
+        if not match.group(1):
+            stack.append((name, match.group()))
+            continue
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i][0] == name:
+                del stack[i:]
+                break
+    return stack
+
+
+def _open_fence(body: str) -> str:
+    """Opening fence of a Markdown code block left open at the end of ``body``"""
+    opener = ""
+    for match in _MD_FENCE.finditer(body):
+        opener = "" if opener else match.group()
+    return opener
+
+
+def _balance(body: str, html: bool) -> Tuple[str, str]:
+    """(closer for the end of this chunk, opener for the start of the next)"""
+    if html:
+        tags = _open_tags(body)
+        return "".join(f"</{name}>" for name, _ in reversed(tags)), "".join(opener for _, opener in tags)
+    opener = _open_fence(body)
+    return ("\n```", opener + "\n") if opener else ("", "")
+
+
+def split_message(text: str, limit: int = MAX_MESSAGE_LENGTH, parse_mode: Optional[str] = None) -> List[str]:
+    """
+    Split text into chunks of at most ``limit`` characters
+
+    A ``` code block cut in the middle is closed at the end of one chunk and
+    reopened, with the same language tag, at the start of the next. With
+    HTML parse mode every element open at a cut (<b>, <a href>, <pre><code>,
+    ...) is closed the same way and reopened with its attributes, so each
+    chunk is valid markup on its own.
+    """
+    if len(text) <= limit:
+        return [text]
+
+    html = (parse_mode or "").upper() == "HTML"
+    chunks = []
+    reopen = ""
+    while len(reopen) + len(text) > limit:
+        budget = limit - len(reopen) - _CLOSER_RESERVE
+        while True:
+            end, resume = _find_cut(text, budget)
+            if html:
+                safe = _safe_html_cut(text, end)
+                if 0 < safe < end:
+                    end = resume = safe
+            body = reopen + text[:end]
+            closer, next_reopen = _balance(body, html)
+            overflow = len(body) + len(closer) - limit
+            if overflow <= 0 or budget <= overflow:
+                break
+            budget -= overflow  # deeply nested tags: make room for their closers
+        chunks.append(body + closer)
+        reopen = next_reopen
+        text = text[resume:]
+
+    chunks.append(reopen + text)
+    return chunks
+
+
+# ==================== Rate limiting ====================
+
+class TokenBucket:
+    """Token bucket for a single event loop (no locking needed)"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> float:
+        """Take a token; if none is available return the seconds until one is"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold off the next token for ``seconds`` (server asked us to slow down)"""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+# ==================== Delivery queue ====================
+
+@dataclass
+class OutboundMessage:
+    """One chunk waiting to be sent"""
+    chat_id: int
+    text: str
+    parse_mode: Optional[str] = None
+    options: Dict[str, Any] = field(default_factory=dict)
+    attempts: int = 0
+
+
+def _retry_seconds(retry_after) -> float:
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class TelegramOutbox:
+    """Rate-limited, ordered, retrying delivery of outbound messages"""
+
+    def __init__(
+        self,
+        global_rate: float = 25.0,
+        chat_rate: float = 1.0,
+        chat_burst: int = 3,
+        max_retries: int = 3,
+        digest_interval: float = 60.0
+    ):
+        self.bot = None
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.digest_interval = digest_interval
+
+        self._global = TokenBucket(global_rate, max(1.0, global_rate))
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._queues: Dict[int, Deque[OutboundMessage]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._digests: Dict[int, List[str]] = {}
+        self._digest_timers: Dict[int, asyncio.Task] = {}
+        self.stats = {"sent": 0, "retried": 0, "failed": 0, "digested": 0}
+
+    @property
+    def running(self) -> bool:
+        return self.bot is not None
+
+    def start(self, bot):
+        """Deliver through ``bot`` (a telegram.Bot)"""
+        self.bot = bot
+        logger.info("Telegram outbox started")
+
+    async def close(self, timeout: float = 10.0):
+        """Flush digests and give queued messages up to ``timeout`` to go out"""
+        for chat_id, timer in list(self._digest_timers.items()):
+            timer.cancel()
+            self._digest_timers.pop(chat_id, None)
+            self._flush_digest(chat_id)
+
+        workers = list(self._workers.values())
+        if workers:
+            done, pending = await asyncio.wait(workers, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                logger.warning("Telegram outbox closed with undelivered messages", chats=len(pending))
+        self.bot = None
+
+    def pending(self, chat_id: Optional[int] = None) -> int:
+        """Messages still queued (for one chat or all)"""
+        if chat_id is not None:
+            return len(self._queues.get(chat_id, ()))
+        return sum(len(q) for q in self._queues.values())
+
+    def send(self, chat_id: int, text: str, parse_mode: Optional[str] = None, **options):
+        """Queue a message for delivery and return immediately"""
+        if not self.running:
+            logger.warning("Telegram outbox not running, message dropped", chat_id=chat_id)
+            return
+
+        chunks = split_message(text, MAX_MESSAGE_LENGTH, parse_mode)
+        # Keyboards belong under the last part of a split message
+        leading = {k: v for k, v in options.items() if k != "reply_markup"}
+        queue = self._queues.setdefault(chat_id, deque())
+        for i, chunk in enumerate(chunks):
+            queue.append(OutboundMessage(
+                chat_id, chunk, parse_mode, options if i == len(chunks) - 1 else leading
+            ))
+
+        if chat_id not in self._workers:
+            self._workers[chat_id] = asyncio.create_task(self._drain(chat_id))
+
+    def notify(self, chat_id: int, text: str):
+        """Queue a notification; bursts within digest_interval become one message"""
+        self._digests.setdefault(chat_id, []).append(text)
+        if chat_id not in self._digest_timers:
+            self._digest_timers[chat_id] = asyncio.create_task(self._flush_digest_later(chat_id))
+
+    async def _flush_digest_later(self, chat_id: int):
+        try:
+            await asyncio.sleep(self.digest_interval)
+        except asyncio.CancelledError:
+            return
+        self._digest_timers.pop(chat_id, None)
+        self._flush_digest(chat_id)
+
+    def _flush_digest(self, chat_id: int):
+        items = self._digests.pop(chat_id, [])
+        if not items:
+            return
+        if len(items) == 1:
+            text = items[0]
+        else:
+            text = f"📋 {len(items)} updates\n\n" + "\n\n".join(items)
+            self.stats["digested"] += len(items)
+        self.send(chat_id, text)
+
+    async def _drain(self, chat_id: int):
+        """Deliver one chat's queue in order"""
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        queue = self._queues[chat_id]
+        try:
+            while queue:
+                message = queue[0]
+                await bucket.acquire()
+                await self._global.acquire()
+                if await self._deliver(message, bucket):
+                    queue.popleft()
+        finally:
+            self._workers.pop(chat_id, None)
+            if not queue:
+                self._queues.pop(chat_id, None)
+
+    async def _deliver(self, message: OutboundMessage, bucket: TokenBucket) -> bool:
+        """Send one chunk; False means it should be retried"""
+        try:
+            await self.bot.send_message(
+                chat_id=message.chat_id,
+                text=message.text,
+                parse_mode=message.parse_mode,
+                **message.options
+            )
+            self.stats["sent"] += 1
+            return True
+        except RetryAfter as e:
+            delay = _retry_seconds(e.retry_after)
+            # The flood limit is per bot as well, so every chat waits it out
+            bucket.pause(delay)
+            self._global.pause(delay)
+            return self._retry_or_give_up(message, f"rate limited for {delay}s")
+        except BadRequest as e:
+            if message.parse_mode and "parse" in str(e).lower():
+                # Malformed markup: deliver the text rather than nothing
+                logger.warning("Telegram rejected markup, resending as plain text", chat_id=message.chat_id)
+                message.parse_mode = None
+                return False
+            self.stats["failed"] += 1
+            logger.error(f"Telegram rejected message: {e}", chat_id=message.chat_id)
+            return True
+        except NetworkError as e:
+            if self._retry_or_give_up(message, str(e)):
+                return True
+            await asyncio.sleep(min(2 ** message.attempts, 30))
+            return False
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.error(f"Failed to send message: {e}", chat_id=message.chat_id)
+            return True
+
+    def _retry_or_give_up(self, message: OutboundMessage, reason: str) -> bool:
+        message.attempts += 1
+        if message.attempts > self.max_retries:
+            self.stats["failed"] += 1
+            logger.error("Giving up on Telegram message", chat_id=message.chat_id, reason=reason)
+            return True
+        self.stats["retried"] += 1
+        logger.warning("Retrying Telegram message", chat_id=message.chat_id, reason=reason, attempt=message.attempts)
+        return False
+
+
+async def queue_reply(update, text: str, **options):
+    """Reply to an update through the outbox, or directly when it isn't running"""
+    outbox = get_telegram_outbox()
+    if outbox.running:
+        outbox.send(update.effective_chat.id, text, **options)
+    else:
+        await update.message.reply_text(text, **options)
+
+
+# Global outbox instance
+_outbox: Optional[TelegramOutbox] = None
+
+
+def get_telegram_outbox() -> TelegramOutbox:
+    """Get or create the outbox"""
+    global _outbox
+    if _outbox is None:
+        _outbox = TelegramOutbox(
+            global_rate=settings.telegram_global_rate,
+            chat_rate=settings.telegram_chat_rate,
+            chat_burst=settings.telegram_chat_burst,
+            max_retries=settings.telegram_max_retries,
+            digest_interval=settings.telegram_digest_interval,
+        )
+    return _outbox
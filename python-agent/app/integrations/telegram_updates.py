@@ -0,0 +1,87 @@
+"""
+Concurrent Telegram update processing with per-chat ordering
+Updates from different chats are handled in parallel (up to a limit), while
+updates from the same chat run one at a time in arrival order, so a user's
+messages are never answered out of sequence. An update that finds its chat
+busy can trigger ``on_chat_busy`` (used to supersede the reply in flight).
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+import structlog
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = structlog.get_logger(__name__)
+
+
+def update_chat_key(update: object) -> Optional[Hashable]:
+    """Key updates must be serialized on (chat, else user); None = unordered"""
+    if isinstance(update, Update):
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        if update.effective_user is not None:
+            return ("user", update.effective_user.id)
+    return None
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Update processor for ``ApplicationBuilder.concurrent_updates``
+
+    The base class semaphore caps updates admitted (running or waiting for
+    their chat); ``max_active_updates`` caps how many handlers actually run.
+    Waiting on a busy chat happens before taking an active slot, so one
+    chatty user cannot occupy every worker.
+    """
+
+    def __init__(
+        self,
+        max_active_updates: int,
+        max_pending_updates: int = 1024,
+        on_chat_busy: Optional[Callable[[object], None]] = None
+    ):
+        super().__init__(max(max_pending_updates, max_active_updates))
+        self.max_active_updates = max_active_updates
+        self.on_chat_busy = on_chat_busy
+        self._active = asyncio.Semaphore(max_active_updates)
+        # chat key -> [lock, number of updates holding or waiting for it]
+        self._chat_locks: Dict[Hashable, List[Any]] = {}
+        self.processed = 0
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = update_chat_key(update)
+        if key is None:
+            async with self._active:
+                await self._run(coroutine)
+            return
+
+        entry = self._chat_locks.get(key)
+        if entry is None:
+            entry = self._chat_locks[key] = [asyncio.Lock(), 0]
+        elif self.on_chat_busy is not None:
+            self.on_chat_busy(update)
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._active:
+                    await self._run(coroutine)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chat_locks[key]
+
+    async def _run(self, coroutine: Awaitable[Any]):
+        try:
+            await coroutine
+        finally:
+            self.processed += 1
+
+    async def initialize(self) -> None:
+        logger.info("Update processor ready", max_active=self.max_active_updates,
+                    max_pending=self.max_concurrent_updates)
+
+    async def shutdown(self) -> None:
+        if self._chat_locks:
+            logger.warning("Update processor shut down with chats in flight", chats=len(self._chat_locks))
@@ -12,6 +12,7 @@ from app.integrations.menu_system import MenuManager, SmartResponseHooks, format
 from app.agents.full_workflow import get_agent_workflow
 from app.integrations.agent_handler import get_agent_handler
 from app.integrations.ollama import get_ollama_client
+from app.integrations.telegram_outbox import queue_reply
 
 logger = logging.getLogger(__name__)
 
@@ -58,7 +59,7 @@ Select an option below to begin!"""
         buttons = self.menu_manager.get_main_menu_buttons()
         keyboard = self._build_keyboard(buttons)
         
-        await update.message.reply_text(
+        await queue_reply(update, 
             welcome_text,
             reply_markup=InlineKeyboardMarkup(keyboard),
             parse_mode="HTML"
@@ -93,7 +94,7 @@ Use buttons below to navigate menus
         
         back_button = [[InlineKeyboardButton("🏠 Main Menu", callback_data="main_menu")]]
         
-        await update.message.reply_text(
+        await queue_reply(update, 
             help_text,
             reply_markup=InlineKeyboardMarkup(back_button),
             parse_mode="HTML"
@@ -132,13 +133,13 @@ Polling: Active
             
             back_button = [[InlineKeyboardButton("🏠 Main Menu", callback_data="main_menu")]]
             
-            await update.message.reply_text(
+            await queue_reply(update, 
                 status_text,
                 reply_markup=InlineKeyboardMarkup(back_button),
                 parse_mode="HTML"
             )
         except Exception as e:
-            await update.message.reply_text(f"⚠️ Error getting status: {str(e)}")
+            await queue_reply(update, f"⚠️ Error getting status: {str(e)}")
     
     async def handle_build_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle build project command"""
@@ -147,20 +148,20 @@ Polling: Active
             project_buttons = self.menu_manager.get_project_menu_buttons()
             keyboard = self._build_keyboard(project_buttons)
             
-            await update.message.reply_text(
+            await queue_reply(update, 
                 "🏗️ <b>What type of project would you like to create?</b>",
                 reply_markup=InlineKeyboardMarkup(keyboard),
                 parse_mode="HTML"
             )
         except Exception as e:
             logger.error(f"Build command error: {e}")
-            await update.message.reply_text(f"❌ Error: {str(e)}")
+            await queue_reply(update, f"❌ Error: {str(e)}")
     
     async def handle_code_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle code generation command"""
         try:
             if not context.args:
-                await update.message.reply_text(
+                await queue_reply(update, 
                     "💻 <b>Code Generation</b>\n\n"
                     "Usage: /code [description]\n\n"
                     "Example: /code create a hello world API",
@@ -179,7 +180,7 @@ Polling: Active
             # Show response with smart message
             smart_msg = SmartResponseHooks.get_response('code', success=True)
             
-            await update.message.reply_text(
+            await queue_reply(update, 
                 f"{smart_msg}\n\n```\n{response}\n```",
                 parse_mode="Markdown",
                 reply_markup=InlineKeyboardMarkup([
@@ -187,13 +188,13 @@ Polling: Active
                 ])
             )
         except Exception as e:
-            await update.message.reply_text(f"❌ Error: {str(e)}")
+            await queue_reply(update, f"❌ Error: {str(e)}")
     
     async def handle_fix_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle bug fix command"""
         try:
             if not context.args:
-                await update.message.reply_text(
+                await queue_reply(update, 
                     "🔧 <b>Bug Fix Assistant</b>\n\n"
                     "Usage: /fix [code or issue description]\n\n"
                     "Paste your code or describe the issue to fix",
@@ -210,7 +211,7 @@ Polling: Active
             
             smart_msg = SmartResponseHooks.get_response('fix', success=True)
             
-            await update.message.reply_text(
+            await queue_reply(update, 
                 f"{smart_msg}\n\n{response}",
                 parse_mode="HTML",
                 reply_markup=InlineKeyboardMarkup([
@@ -219,7 +220,7 @@ Polling: Active
                 ])
             )
         except Exception as e:
-            await update.message.reply_text(f"❌ Error: {str(e)}")
+            await queue_reply(update, f"❌ Error: {str(e)}")
     
     async def handle_post_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle social media posting"""
@@ -236,14 +237,14 @@ Polling: Active
                 [InlineKeyboardButton("🏠 Main Menu", callback_data="main_menu")]
             ]
             
-            await update.message.reply_text(
+            await queue_reply(update, 
                 "📱 <b>Social Media Posting</b>\n\n"
                 "Select a platform to post to:",
                 reply_markup=InlineKeyboardMarkup(social_buttons),
                 parse_mode="HTML"
             )
         except Exception as e:
-            await update.message.reply_text(f"❌ Error: {str(e)}")
+            await queue_reply(update, f"❌ Error: {str(e)}")
     
     async def handle_skills_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle skills menu"""
@@ -260,14 +261,14 @@ Polling: Active
                 [InlineKeyboardButton("🏠 Main Menu", callback_data="main_menu")]
             ]
             
-            await update.message.reply_text(
+            await queue_reply(update, 
                 "💡 <b>Available Skills</b>\n\n"
                 "Select a category to see skills:",
                 reply_markup=InlineKeyboardMarkup(skill_categories),
                 parse_mode="HTML"
             )
         except Exception as e:
-            await update.message.reply_text(f"❌ Error: {str(e)}")
+            await queue_reply(update, f"❌ Error: {str(e)}")
     
     async def handle_callback_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle inline button callbacks"""
@@ -45,7 +45,7 @@ root_logger.addHandler(file_handler)
 root_logger.setLevel(logging.DEBUG)
 
 from fastapi import FastAPI, Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.exceptions import RequestValidationError
@@ -58,13 +58,20 @@ import asyncio
 
 from app.core.config import settings
 from app.models.schemas import ErrorResponse
-from app.api import build_router, analysis_router, health_router, websocket_router, memory_router
+from app.api import build_router, analysis_router, health_router, websocket_router, memory_router, telegram_router, search_router
 from app.db.session import init_db, close_db
+from app.db.audit import AuditMiddleware, get_audit_sink, stop_audit_sink
+from app.db.retention import get_retention_job
+from app.db.search import get_search_indexer, stop_search_indexer
+from app.db.vector import close_vector_store
 from app.memory import init_memory_system, shutdown_memory_system
 from app.integrations.telegram_bot import init_telegram_bot, start_telegram_bot, stop_telegram_bot, notify_admin_on_startup
 from app.agents.autonomous import AutonomousWorker
 from app.agents.brain import AgentBrain
 from app.mcp.manager import MCPServerManager
+from app.monitoring.telemetry import get_telemetry_sampler, stop_telemetry_sampler
+from app.skills.task_scheduler import get_task_scheduler
+from app.db.workspace_indexer import get_workspace_indexer, stop_workspace_indexer
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -80,6 +87,7 @@ app.state.limiter = limiter
 
 # Global instances for autonomous operation
 autonomous_worker: Optional[AutonomousWorker] = None
+autonomous_task: Optional[asyncio.Task] = None
 agent_brain: Optional[AgentBrain] = None
 mcp_manager: Optional[MCPServerManager] = None
 
@@ -101,6 +109,16 @@ app.add_middleware(
     allowed_hosts=["localhost", "127.0.0.1", "*.yourdomain.com"],
 )
 
+# Audit middleware: one queued audit event per request, written in batches
+# (probes, scrapes and docs are skipped, and so are Telegram webhook calls,
+# which the bot audits per update)
+app.add_middleware(
+    AuditMiddleware,
+    skip_prefixes=(
+        "/health", "/api/health", "/metrics", "/docs", "/redoc", "/openapi.json", "/telegram/webhook",
+    ),
+)
+
 
 # ==================== Exception Handlers ====================
 
@@ -226,29 +244,8 @@ async def health_check():
 
 
 # ==================== Telegram Integration ====================
-# The Unified Python Agent handles all Telegram interactions (Phase 2.0)
-# 
-# @app.post("/telegram/webhook", tags=["Telegram"])
-# async def telegram_webhook(request: Request):
-#     """Handle Telegram webhook updates"""
-#     from telegram import Update
-#     from app.integrations.telegram_bot import get_telegram_bot
-#     
-#     bot = get_telegram_bot()
-#     if not bot.application:
-#         return {"status": "ok", "message": "Bot not initialized"}
-#     
-#     try:
-#         data = await request.json()
-#         update = Update.de_json(data, bot.application.bot)
-#         await bot.application.process_update(update)
-#     except KeyError as e:
-#         # Handle missing fields in test data
-#         logger.warning(f"Telegram webhook missing field: {e}")
-#     except Exception as e:
-#         logger.error(f"Telegram webhook error: {e}")
-#     
-#     return {"status": "ok"}
+# The Unified Python Agent handles all Telegram interactions (Phase 2.0).
+# In webhook mode updates arrive on /telegram/webhook (app/api/telegram.py).
 
 
 # ==================== Ready for Route Imports ====================
@@ -258,6 +255,8 @@ app.include_router(analysis_router)
 app.include_router(health_router)
 app.include_router(websocket_router)
 app.include_router(memory_router)
+app.include_router(telegram_router)
+app.include_router(search_router)
 
 logger.info("FastAPI application initialized", app=settings.app_name, version=settings.app_version)
 
@@ -271,18 +270,43 @@ async def get_autonomous_status():
         return autonomous_worker.get_status()
     return {"running": False, "message": "Autonomous mode not enabled"}
 
+@app.get("/autonomous/tasks", tags=["Autonomous"], response_class=PlainTextResponse)
+async def get_autonomous_task_log(limit: int = 50):
+    """Recent autonomous task events rendered as markdown"""
+    if not autonomous_worker:
+        return "Autonomous mode not enabled"
+    return await asyncio.to_thread(autonomous_worker.render_task_log, limit)
+
+@app.get("/autonomous/tasks/{task_id}", tags=["Autonomous"])
+async def get_autonomous_task(task_id: str):
+    """Journal records of a single autonomous task"""
+    if not autonomous_worker:
+        return {"error": "Autonomous mode not enabled"}
+    return {"task_id": task_id, "events": await asyncio.to_thread(autonomous_worker.journal.get, task_id)}
+
+async def stop_autonomous_worker():
+    """Stop the worker and wait for its loop task to finish"""
+    global autonomous_worker, autonomous_task
+
+    await autonomous_worker.stop()
+    if autonomous_task is not None:
+        # Only has an effect if the loop never got to run
+        autonomous_task.cancel()
+        await asyncio.gather(autonomous_task, return_exceptions=True)
+    autonomous_worker = None
+    autonomous_task = None
+
 @app.post("/autonomous/toggle", tags=["Autonomous"])
 async def toggle_autonomous(enabled: bool):
     """Toggle autonomous mode"""
-    global autonomous_worker
+    global autonomous_worker, autonomous_task
 
     if enabled and not autonomous_worker:
         autonomous_worker = AutonomousWorker()
-        asyncio.create_task(autonomous_worker.start())
+        autonomous_task = asyncio.create_task(autonomous_worker.start())
         return {"autonomous_mode": True, "message": "Autonomous mode activated"}
     elif not enabled and autonomous_worker:
-        autonomous_worker.stop()
-        autonomous_worker = None
+        await stop_autonomous_worker()
         return {"autonomous_mode": False, "message": "Autonomous mode deactivated"}
 
     return {"autonomous_mode": enabled, "message": "No change"}
@@ -348,10 +372,34 @@ async def startup_event():
         await init_db()
         logger.info("Database initialization successful")
         
+        # Audit events are queued in memory and written in batches
+        if settings.audit_enabled:
+            await get_audit_sink().start()
+        
+        # Chat messages, builds and build logs are indexed in batches for search
+        if settings.search_enabled:
+            await get_search_indexer().start()
+        
         # Initialize persistent memory system
         init_memory_system()
         logger.info("Persistent memory system initialized")
         
+        # Start background telemetry sampler (status/alerts read from its buffer)
+        get_telemetry_sampler()
+        logger.info("Telemetry sampler started", interval=settings.telemetry_sample_interval)
+        
+        # Rehydrate persisted scheduled tasks
+        await get_task_scheduler().start_scheduler()
+        
+        # Apply retention policies periodically (unless Celery beat does)
+        if settings.retention_in_process:
+            await get_retention_job().start()
+        
+        # Keep code_snippets in sync with the workspace (indexes in the background)
+        if settings.workspace_index_enabled:
+            await get_workspace_indexer().start()
+            logger.info("Workspace indexer started", root=settings.workspace_dir)
+        
         # Test Ollama connection
         try:
             from app.integrations.ollama import get_ollama_client
@@ -392,10 +440,10 @@ async def startup_event():
 
         # Start Autonomous Worker (if enabled)
         if settings.autonomous_mode:
-            global autonomous_worker
+            global autonomous_worker, autonomous_task
             autonomous_worker = AutonomousWorker()
             # Start in background
-            asyncio.create_task(autonomous_worker.start())
+            autonomous_task = asyncio.create_task(autonomous_worker.start())
             logger.info(f"🤖 Autonomous Worker started (check interval: {settings.check_interval}s)")
 
         logger.info("=" * 60)
@@ -415,18 +463,35 @@ async def shutdown_event():
     try:
         # Stop autonomous worker
         if autonomous_worker:
-            autonomous_worker.stop()
+            await stop_autonomous_worker()
             logger.info("Autonomous worker stopped")
 
         # Stop Telegram bot
         await stop_telegram_bot()
         logger.info("Telegram bot stopped")
 
+        # Stop telemetry sampler
+        stop_telemetry_sampler()
+
+        # Stop scheduled tasks (jobs stay in the job store)
+        await get_task_scheduler().stop_scheduler()
+
+        # Stop the workspace indexer
+        await stop_workspace_indexer()
+
+        # Write queued vector batches and stop the vector store's worker threads
+        await close_vector_store()
+
+        # Stop retention between runs
+        await get_retention_job().stop()
+
         # Shutdown memory system (consolidates memory)
         shutdown_memory_system()
         logger.info("Memory system shutdown complete")
 
-        # Close database connections
+        # Index queued documents and write out queued audit events, then close database connections
+        await stop_search_indexer()
+        await stop_audit_sink()
         await close_db()
         logger.info("Database connections closed")
     except Exception as e:
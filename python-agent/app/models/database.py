@@ -5,9 +5,11 @@ Provides ORM layer for PostgreSQL persistence with audit trails
 
 from datetime import datetime
 from typing import Optional, List
-from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, JSON, ForeignKey, Text, Enum, Index
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy import BigInteger, Column, String, Integer, Float, Boolean, DateTime, JSON, ForeignKey, Text, Enum, Index, LargeBinary
+from sqlalchemy.orm import declarative_base, relationship, validates
 import enum
+import numpy as np
+from app.db.vector_codec import decode_vector, encode_vector
 
 Base = declarative_base()
 
@@ -34,11 +36,16 @@ class User(Base):
     __table_args__ = (
         Index('idx_username', 'username', unique=True),
         Index('idx_email', 'email', unique=True),
+        Index('idx_api_subject', 'api_subject', unique=True),
     )
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(255), unique=True, nullable=False, index=True)
     email = Column(String(255), unique=True, nullable=False, index=True)
+    # Subject (JWT "sub") of the REST API principal this row belongs to. API
+    # identities never match on username, which Telegram linking fills with
+    # a user-chosen handle.
+    api_subject = Column(String(255), nullable=True)
     full_name = Column(String(255), nullable=True)
     hashed_password = Column(String(255), nullable=False)
     role = Column(Enum(UserRole), default=UserRole.USER, nullable=False)
@@ -83,6 +90,21 @@ class APIKey(Base):
     user = relationship("User", back_populates="api_keys")
 
 
+class Blob(Base):
+    """Reference count and sizes of a blob in the content-addressed store"""
+    __tablename__ = "blobs"
+    __table_args__ = (
+        Index('idx_blob_unreferenced', 'refcount', 'updated_at'),
+    )
+
+    digest = Column(String(64), primary_key=True)  # sha256 of the uncompressed content
+    size = Column(BigInteger, nullable=False)
+    stored_size = Column(BigInteger, nullable=False)  # zstd-compressed size on disk
+    refcount = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # last refcount change
+
+
 class Build(Base):
     """Build execution record with task tracking"""
     __tablename__ = "builds"
@@ -105,10 +127,10 @@ class Build(Base):
     completed_at = Column(DateTime, nullable=True)
     duration_seconds = Column(Float, nullable=True)
     
-    # Output
-    generated_code = Column(Text, nullable=True)
+    # Output (code and logs live in the blob store, see app.db.blob_store)
+    generated_code_digest = Column(String(64), ForeignKey("blobs.digest"), nullable=True)
     test_results = Column(JSON, nullable=True)
-    build_logs = Column(Text, nullable=True)
+    build_logs_digest = Column(String(64), ForeignKey("blobs.digest"), nullable=True)
     error_message = Column(Text, nullable=True)
     
     # Metadata
@@ -135,9 +157,10 @@ class CodeAnalysis(Base):
     id = Column(String(36), primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     build_id = Column(String(36), ForeignKey("builds.id"), nullable=True, index=True)
+    project_name = Column(String(255), nullable=True)
     
-    # Analysis Results
-    code_to_analyze = Column(Text, nullable=False)
+    # Analysis Results (the analysed source lives in the blob store)
+    code_digest = Column(String(64), ForeignKey("blobs.digest"), nullable=True)
     quality_score = Column(Float, default=0.0, nullable=False)
     security_score = Column(Float, default=0.0, nullable=False)
     maintainability_index = Column(Float, default=0.0, nullable=False)
@@ -184,8 +207,12 @@ class VectorMemory(Base):
     source_file = Column(String(255), nullable=True)
     language = Column(String(50), nullable=True)  # "python", "javascript", etc.
     
-    # Vector embedding (stored as list in JSON)
-    embedding = Column(JSON, nullable=False)  # 768-dim vector from embedding model
+    # Vector embedding, packed bytes (see app.db.vector_codec); assigning a
+    # list or array packs it as float32, set_vector() picks the dtype
+    embedding = Column(LargeBinary, nullable=False)
+    embedding_dtype = Column(String(8), nullable=False, default="float32")  # "float32", "float16", "int8"
+    embedding_dim = Column(Integer, nullable=False)  # e.g. 768 from the embedding model
+    embedding_scale = Column(Float, nullable=True)  # int8 only: value = code * scale
     
     # Similarity tracking
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -193,6 +220,25 @@ class VectorMemory(Base):
     # Relationships
     build = relationship("Build", back_populates="memory_vector")
 
+    @validates("embedding")
+    def _pack_embedding(self, key, value):
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value)
+        blob, self.embedding_dim, self.embedding_scale = encode_vector(value, "float32")
+        self.embedding_dtype = "float32"
+        return blob
+
+    def set_vector(self, vector, dtype: str = "float32"):
+        """Store ``vector`` as float32, float16 or int8 (quantized with a per-row scale)"""
+        blob, dim, scale = encode_vector(vector, dtype)
+        self.embedding = blob
+        self.embedding_dtype, self.embedding_dim, self.embedding_scale = dtype, dim, scale
+
+    @property
+    def vector(self) -> np.ndarray:
+        """The embedding as a NumPy array (a read-only view for float32/float16)"""
+        return decode_vector(self.embedding, self.embedding_dtype, self.embedding_scale)
+
 
 class Memory(Base):
     """Long-term memory and conversation history"""
@@ -200,6 +246,7 @@ class Memory(Base):
     __table_args__ = (
         Index('idx_user_memory', 'user_id', 'created_at'),
         Index('idx_memory_type', 'memory_type'),
+        Index('idx_memory_expires', 'expires_at'),
     )
 
     id = Column(String(36), primary_key=True, index=True)
@@ -277,12 +324,30 @@ class AuditLog(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
 
 
+class SearchDocument(Base):
+    """Text indexed for full-text search; the index itself is backend-specific (see app.db.search)"""
+    __tablename__ = "search_documents"
+    __table_args__ = (
+        Index('idx_search_ref', 'kind', 'ref_id', unique=True),
+        Index('idx_search_owner', 'owner', 'created_at'),
+    )
+
+    id = Column(Integer, primary_key=True)  # rowid of the SQLite FTS5 index
+    kind = Column(String(20), nullable=False)  # "message", "build", "build_log"
+    ref_id = Column(String(64), nullable=False)  # build id for builds and logs
+    owner = Column(String(64), nullable=False)  # "user:<users.id>" or "tg:<telegram id>"
+    title = Column(String(255), nullable=False, default="")
+    body = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
 class WorkflowSession(Base):
     """Persistence for interactive wizards and workflow states (Phase 4.1)"""
     __tablename__ = "workflow_sessions"
     __table_args__ = (
         Index('idx_workflow_user', 'user_id'),
         Index('idx_workflow_status', 'state'),
+        Index('idx_workflow_expires', 'expires_at'),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -112,9 +112,10 @@ class BuildStatus(BaseModel):
 
 class CodeAnalysisRequest(BaseModel):
     """Request for code analysis"""
-    code: Annotated[str, StringConstraints(min_length=10, max_length=50000)]
-    language: Annotated[str, StringConstraints(pattern=r'^(python|javascript|typescript|java|go|rust)$')]
-    analysis_type: Annotated[str, StringConstraints(pattern=r'^(security|performance|style|complexity)$')]
+    project_name: Annotated[str, StringConstraints(min_length=1, max_length=255)]
+    analysis_types: List[Annotated[str, StringConstraints(pattern=r'^(quality|security|types|performance|style|complexity)$')]] = ["quality"]
+    code: Optional[Annotated[str, StringConstraints(max_length=50000)]] = None
+    language: Optional[Annotated[str, StringConstraints(pattern=r'^(python|javascript|typescript|java|go|rust)$')]] = None
 
 
 class CodeIssue(BaseModel):
@@ -128,10 +129,16 @@ class CodeIssue(BaseModel):
 
 class CodeAnalysisResponse(BaseModel):
     """Response from code analysis"""
-    language: str
-    issues: List[CodeIssue]
-    score: float  # 0-100
-    summary: str
+    analysis_id: str
+    project_name: Optional[str] = None
+    timestamp: datetime
+    performed_by: str
+    quality_score: float
+    security_issues: List[Dict[str, Any]] = []
+    code_smells: int = 0
+    type_errors: int = 0
+    coverage_percent: float = 0.0
+    recommendations: List[str] = []
 
 
 # ==================== Memory & Learning Models ====================
@@ -263,17 +270,41 @@ class BuildStatus(BaseModel):
 class BuildStatusResponse(BaseModel):
     """Response for build status query"""
     task_id: str
+    project_name: str
     status: str
-    progress: int
-    output: Optional[str] = None
+    progress: int = Field(default=0, ge=0, le=100)
+    created_at: datetime
+    created_by: str
+    goal: str
+    results: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
-    timestamp: datetime
 
 
 class BuildHistoryResponse(BaseModel):
-    """Build history entry"""
-    task_id: str
-    status: str
+    """One page of a user's builds, newest first"""
+    total: int
+    limit: int
+    offset: int = 0
+    next_cursor: Optional[str] = None  # pass as ?cursor= for the next page
+    builds: List[BuildStatusResponse]
+
+
+# ==================== Search Models ====================
+
+class SearchHit(BaseModel):
+    """One full-text search result"""
+    kind: str  # "message", "build", "build_log"
+    ref_id: str  # build id for builds and build logs
+    title: str
+    snippet: str  # matched terms wrapped in **
+    score: float
     created_at: datetime
-    updated_at: datetime
-    result: Optional[Dict[str, Any]] = None
+
+
+class SearchResponse(BaseModel):
+    """One page of search results, best match first"""
+    query: str
+    limit: int
+    offset: int = 0
+    next_offset: Optional[int] = None  # pass as ?offset= for the next page
+    hits: List[SearchHit]
@@ -5,7 +5,7 @@ Prometheus metrics, structured logging, and performance tracking
 
 import time
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from contextlib import contextmanager
 from prometheus_client import Counter, Histogram, Gauge, CollectorRegistry
 from prometheus_client.core import REGISTRY
@@ -81,7 +81,106 @@ class MetricsRegistry:
             ['operation'],
             buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1.0)
         )
-        
+
+        self.db_pool_wait_seconds = Histogram(
+            'db_pool_wait_seconds',
+            'Time spent waiting for a pooled database connection',
+            ['engine'],
+            buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+        )
+
+        self.db_pool_timeouts_total = Counter(
+            'db_pool_timeouts_total',
+            'Checkouts that gave up after db_pool_timeout',
+            ['engine']
+        )
+
+        # Audit Log Metrics
+        self.audit_events_total = Counter(
+            'audit_events_total',
+            'Audit events written, or dropped (queue_full, write_error, shutdown)',
+            ['outcome']
+        )
+
+        self.audit_flush_duration_seconds = Histogram(
+            'audit_flush_duration_seconds',
+            'Time to write one batch of audit events',
+            buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+        )
+
+        self.audit_queue_depth = Gauge(
+            'audit_queue_depth',
+            'Audit events waiting to be written'
+        )
+
+        # Blob Store Metrics
+        self.blob_writes_total = Counter(
+            'blob_writes_total',
+            'Blobs written to the content-addressed store, or found already stored',
+            ['result']
+        )
+
+        self.blob_bytes_total = Counter(
+            'blob_bytes_total',
+            'Bytes of newly stored blobs, before (raw) and after (stored) compression',
+            ['stage']
+        )
+
+        self.blob_gc_removed_total = Counter(
+            'blob_gc_removed_total',
+            'Blobs removed by garbage collection (unreferenced or orphaned files)',
+            ['reason']
+        )
+
+        # Retention Metrics
+        self.retention_rows_deleted_total = Counter(
+            'retention_rows_deleted_total',
+            'Rows deleted by retention policies',
+            ['table']
+        )
+
+        self.retention_bytes_reclaimed_total = Counter(
+            'retention_bytes_reclaimed_total',
+            'Bytes reclaimed by retention runs, from the database file or the blob store',
+            ['source']
+        )
+
+        self.retention_run_duration_seconds = Histogram(
+            'retention_run_duration_seconds',
+            'Duration of a retention run including compaction',
+            buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0)
+        )
+
+        # Search Metrics
+        self.search_documents_indexed_total = Counter(
+            'search_documents_indexed_total',
+            'Documents written to the full-text index',
+            ['kind']
+        )
+
+        self.search_documents_dropped_total = Counter(
+            'search_documents_dropped_total',
+            'Documents dropped because the indexing queue was full'
+        )
+
+        self.search_index_lag_seconds = Histogram(
+            'search_index_lag_seconds',
+            'Time from queueing a document to it being searchable',
+            buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+        )
+
+        self.search_index_queue_depth = Gauge(
+            'search_index_queue_depth',
+            'Documents waiting to be indexed'
+        )
+
+        self.search_query_duration_seconds = Histogram(
+            'search_query_duration_seconds',
+            'Full-text search query time',
+            ['backend'],
+            buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+        )
+
         # Vector Store Metrics
         self.vector_store_operations_total = Counter(
             'vector_store_operations_total',
@@ -91,9 +190,28 @@ class MetricsRegistry:
         
         self.vector_search_duration_seconds = Histogram(
             'vector_search_duration_seconds',
-            'Vector search duration',
-            ['collection'],
-            buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0)
+            'Vector store call duration, split into time queued for a Chroma thread and execution',
+            ['collection', 'operation', 'phase'],
+            buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0)
+        )
+        
+        self.retrieval_stage_duration_seconds = Histogram(
+            'retrieval_stage_duration_seconds',
+            'Hybrid retrieval latency per stage (dense, keyword, search, fusion, budget, total)',
+            ['stage'],
+            buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+        )
+        
+        self.retrieval_cache_requests_total = Counter(
+            'retrieval_cache_requests_total',
+            'Retrieval and query-embedding cache lookups',
+            ['cache', 'result']
+        )
+        
+        self.embedding_backend_info = Gauge(
+            'embedding_backend_info',
+            'Embedding backend in use (1); hashed means no model was reachable',
+            ['backend', 'dimension']
         )
         
         # Agent Metrics
@@ -110,6 +228,66 @@ class MetricsRegistry:
             buckets=(10, 30, 60, 120, 300, 600, 1800)
         )
         
+        # Autonomous Worker Metrics
+        self.autonomous_schedule_lag_seconds = Histogram(
+            'autonomous_schedule_lag_seconds',
+            'Delay between a task\'s scheduled time and its start',
+            ['source'],
+            buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 60.0, 300.0)
+        )
+        
+        self.autonomous_task_duration_seconds = Histogram(
+            'autonomous_task_duration_seconds',
+            'Autonomous task execution duration',
+            ['task_type', 'status'],
+            buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300)
+        )
+        
+        self.autonomous_tasks_running = Gauge(
+            'autonomous_tasks_running',
+            'Autonomous tasks currently executing',
+        )
+        
+        # Task Scheduler Metrics
+        self.scheduler_job_lag_seconds = Histogram(
+            'scheduler_job_lag_seconds',
+            'Delay between a scheduled job\'s fire time and its submission',
+            buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 60.0, 300.0)
+        )
+        
+        self.scheduler_job_events_total = Counter(
+            'scheduler_job_events_total',
+            'Scheduled job events (submitted, executed, error, missed, overlap)',
+            ['event']
+        )
+        
+        # Cancellation Metrics
+        self.cancellations_total = Counter(
+            'cancellations_total',
+            'In-flight operations cancelled',
+            ['operation', 'reason']
+        )
+        
+        self.cancellation_release_seconds = Histogram(
+            'cancellation_release_seconds',
+            'Time from a cancel request until the operation released its resources',
+            ['operation'],
+            buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+        )
+        
+        # Workspace Indexer Metrics
+        self.workspace_index_freshness_seconds = Histogram(
+            'workspace_index_freshness_seconds',
+            'Time from a workspace file\'s modification until its vectors are written',
+            buckets=(0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+        )
+        
+        self.workspace_index_chunks_total = Counter(
+            'workspace_index_chunks_total',
+            'Workspace chunks handled by the indexer (embedded, moved, deleted, unchanged)',
+            ['action']
+        )
+        
         # System Metrics
         self.system_health = Gauge(
             'system_health',
@@ -164,17 +342,127 @@ class MetricsRegistry:
         self.db_query_duration_seconds.labels(
             operation=operation
         ).observe(duration)
-    
-    def record_vector_search(self, collection: str, duration: float):
-        """Record vector search metrics"""
+
+    def record_db_pool_wait(self, engine: str, wait: float):
+        """Record how long a checkout waited for a pooled connection"""
+        self.db_pool_wait_seconds.labels(engine=engine).observe(wait)
+
+    def record_db_pool_timeout(self, engine: str):
+        """Record a checkout that timed out waiting for the pool"""
+        self.db_pool_timeouts_total.labels(engine=engine).inc()
+
+    def record_audit_flush(self, events: int, duration: float, queue_depth: int):
+        """Record one written batch of audit events"""
+        self.audit_events_total.labels(outcome="written").inc(events)
+        self.audit_flush_duration_seconds.observe(duration)
+        self.audit_queue_depth.set(queue_depth)
+
+    def record_audit_dropped(self, reason: str, events: int = 1):
+        """Record audit events that were dropped"""
+        self.audit_events_total.labels(outcome=reason).inc(events)
+
+    def record_blob_write(self, deduplicated: bool, size: int, stored_size: int):
+        """Record one blob put; only new content adds to the byte counters"""
+        if deduplicated:
+            self.blob_writes_total.labels(result="deduplicated").inc()
+            return
+        self.blob_writes_total.labels(result="stored").inc()
+        self.blob_bytes_total.labels(stage="raw").inc(size)
+        self.blob_bytes_total.labels(stage="stored").inc(stored_size)
+
+    def record_blob_gc(self, reason: str, blobs: int):
+        """Record blobs removed by garbage collection"""
+        self.blob_gc_removed_total.labels(reason=reason).inc(blobs)
+
+    def record_retention_run(self, report):
+        """Record a RetentionReport"""
+        for table, rows in report.rows.items():
+            self.retention_rows_deleted_total.labels(table=table).inc(rows)
+        self.retention_bytes_reclaimed_total.labels(source="database").inc(report.database_bytes_reclaimed)
+        self.retention_bytes_reclaimed_total.labels(source="blobs").inc(report.blob_bytes_reclaimed)
+        self.retention_run_duration_seconds.observe(report.duration)
+
+    def record_search_indexed(self, kinds: List[str], lags: List[float], queue_depth: int):
+        """Record one indexed batch: document kinds, per-document lag and what is still queued"""
+        for kind in kinds:
+            self.search_documents_indexed_total.labels(kind=kind).inc()
+        for lag in lags:
+            self.search_index_lag_seconds.observe(lag)
+        self.search_index_queue_depth.set(queue_depth)
+
+    def record_search_dropped(self):
+        """Record a document dropped from a full indexing queue"""
+        self.search_documents_dropped_total.inc()
+
+    def record_search_query(self, backend: str, duration: float):
+        """Record full-text search query time"""
+        self.search_query_duration_seconds.labels(backend=backend).observe(duration)
+
+    def record_vector_search(
+        self,
+        collection: str,
+        duration: float,
+        operation: str = "search",
+        queue_time: Optional[float] = None
+    ):
+        """Record vector store call metrics (execution time, plus queue time when known)"""
         self.vector_store_operations_total.labels(
-            operation="search",
+            operation=operation,
             collection=collection
         ).inc()
         
         self.vector_search_duration_seconds.labels(
-            collection=collection
+            collection=collection, operation=operation, phase="execute"
         ).observe(duration)
+        if queue_time is not None:
+            self.vector_search_duration_seconds.labels(
+                collection=collection, operation=operation, phase="queue"
+            ).observe(queue_time)
+
+    
+    def record_autonomous_task(self, task_type: str, source: str, status: str, lag: float, duration: float):
+        """Record autonomous task scheduling lag and execution time"""
+        self.autonomous_schedule_lag_seconds.labels(
+            source=source
+        ).observe(max(lag, 0.0))
+        
+        self.autonomous_task_duration_seconds.labels(
+            task_type=task_type,
+            status=status
+        ).observe(duration)
+
+    
+    def record_scheduler_job(self, event: str, lag: Optional[float] = None):
+        """Record a scheduled job event and, on submission, its lag"""
+        self.scheduler_job_events_total.labels(event=event).inc()
+        if lag is not None:
+            self.scheduler_job_lag_seconds.observe(max(lag, 0.0))
+
+    def record_cancellation(self, operation: str, reason: str, release_seconds: float):
+        """Record a cancelled operation"""
+        self.cancellations_total.labels(operation=operation, reason=reason).inc()
+        self.cancellation_release_seconds.labels(operation=operation).observe(max(release_seconds, 0.0))
+
+    def record_retrieval_stage(self, stage: str, duration: float):
+        """Record the latency of one hybrid retrieval stage"""
+        self.retrieval_stage_duration_seconds.labels(stage=stage).observe(duration)
+
+    def record_cache_request(self, cache: str, hit: bool):
+        """Record a cache lookup"""
+        self.retrieval_cache_requests_total.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+    def record_embedding_backend(self, backend: str, dimension: int):
+        """Record the embedding backend selected at startup"""
+        self.embedding_backend_info.clear()
+        self.embedding_backend_info.labels(backend=backend, dimension=str(dimension)).set(1)
+
+    def record_workspace_index(self, chunks: Dict[str, int], freshness: List[float]):
+        """Record one indexer pass: chunk counts per action and per-file freshness"""
+        for action, count in chunks.items():
+            if count:
+                self.workspace_index_chunks_total.labels(action=action).inc(count)
+        for seconds in freshness:
+            self.workspace_index_freshness_seconds.observe(max(seconds, 0.0))
 
 
 # Global metrics registry
@@ -242,10 +530,10 @@ class HealthCheck:
     async def check_database(self) -> bool:
         """Check database connectivity"""
         try:
-            from app.db.session import SessionLocal
-            db = SessionLocal()
-            db.execute("SELECT 1")
-            db.close()
+            from sqlalchemy import text
+            from app.db.session import AsyncSessionLocal
+            async with AsyncSessionLocal() as db:
+                await db.execute(text("SELECT 1"))
             logger.debug("Database health: OK")
             return True
         except Exception as e:
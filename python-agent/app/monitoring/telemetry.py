@@ -0,0 +1,212 @@
+"""
+Background system telemetry sampler
+Collects CPU, memory, disk, network and agent-process stats on a daemon
+thread into a fixed-size NumPy ring buffer, so async code never has to call
+psutil (and never blocks on cpu_percent(interval=...)).
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+FIELDS: Tuple[str, ...] = (
+    "timestamp",
+    "cpu_percent",
+    "memory_percent",
+    "disk_percent",
+    "net_sent_bps",
+    "net_recv_bps",
+    "process_rss_mb",
+    "process_cpu_percent",
+    "process_threads",
+)
+_INDEX = {name: i for i, name in enumerate(FIELDS)}
+
+
+class TelemetryBuffer:
+    """
+    Ring buffer of samples with running totals
+
+    ``latest`` and ``window_mean`` are O(1): each slot also stores the
+    cumulative sum up to that sample, so the mean over the last ``n`` samples
+    is a single subtraction.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._samples = np.zeros((capacity, len(FIELDS)), dtype=np.float64)
+        # One extra slot keeps "cumulative sum before the oldest sample"
+        self._cumulative = np.zeros((capacity + 1, len(FIELDS)), dtype=np.float64)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    def append(self, sample: np.ndarray):
+        with self._lock:
+            slot = self._count % self.capacity
+            previous = self._cumulative[self._count % (self.capacity + 1)]
+            self._samples[slot] = sample
+            self._cumulative[(self._count + 1) % (self.capacity + 1)] = previous + sample
+            self._count += 1
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        with self._lock:
+            if self._count == 0:
+                return None
+            row = self._samples[(self._count - 1) % self.capacity].copy()
+        return dict(zip(FIELDS, row.tolist()))
+
+    def window_mean(self, samples: int) -> Optional[Dict[str, float]]:
+        """Mean of the last ``samples`` samples"""
+        with self._lock:
+            if self._count == 0:
+                return None
+            n = max(1, min(samples, self._count, self.capacity))
+            end = self._cumulative[self._count % (self.capacity + 1)]
+            start = self._cumulative[(self._count - n) % (self.capacity + 1)]
+            mean = (end - start) / n
+        result = dict(zip(FIELDS, mean.tolist()))
+        result["samples"] = n
+        return result
+
+    def window(self, samples: int) -> np.ndarray:
+        """Copy of the last ``samples`` rows, oldest first"""
+        with self._lock:
+            n = max(0, min(samples, self._count, self.capacity))
+            end = self._count % self.capacity
+            idx = (np.arange(end - n, end)) % self.capacity
+            return self._samples[idx].copy()
+
+
+class TelemetrySampler:
+    """Daemon thread feeding a TelemetryBuffer at a fixed rate"""
+
+    def __init__(self, interval: float = 2.0, capacity: int = 1800, disk_path: str = "/"):
+        self.interval = interval
+        self.disk_path = disk_path
+        self.buffer = TelemetryBuffer(capacity)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_net: Optional[Tuple[float, int, int]] = None
+        self._psutil = None
+        self._process = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> bool:
+        """Start sampling; returns False when psutil is unavailable"""
+        if self.running:
+            return True
+        try:
+            import psutil
+        except ImportError:
+            logger.warning("telemetry_unavailable", reason="psutil not installed")
+            return False
+
+        self._psutil = psutil
+        self._process = psutil.Process(os.getpid())
+        # Prime the counters so the first real sample has a reference point
+        psutil.cpu_percent(interval=None)
+        self._process.cpu_percent(interval=None)
+        self.sample_once()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="telemetry-sampler", daemon=True)
+        self._thread.start()
+        logger.info("telemetry_sampler_started", interval=self.interval, capacity=self.buffer.capacity)
+        return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+            logger.info("telemetry_sampler_stopped")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample_once()
+            except Exception as e:
+                logger.error("telemetry_sample_failed", error=str(e))
+
+    def sample_once(self):
+        """Collect one sample (non-blocking psutil calls only)"""
+        psutil = self._psutil
+        now = time.time()
+        net = psutil.net_io_counters()
+        sent_bps = recv_bps = 0.0
+        if self._last_net is not None:
+            elapsed = max(now - self._last_net[0], 1e-6)
+            sent_bps = (net.bytes_sent - self._last_net[1]) / elapsed
+            recv_bps = (net.bytes_recv - self._last_net[2]) / elapsed
+        self._last_net = (now, net.bytes_sent, net.bytes_recv)
+
+        with self._process.oneshot():
+            rss_mb = self._process.memory_info().rss / (1024 * 1024)
+            process_cpu = self._process.cpu_percent(interval=None)
+            threads = self._process.num_threads()
+
+        self.buffer.append(np.array([
+            now,
+            psutil.cpu_percent(interval=None),
+            psutil.virtual_memory().percent,
+            psutil.disk_usage(self.disk_path).percent,
+            sent_bps,
+            recv_bps,
+            rss_mb,
+            process_cpu,
+            threads,
+        ], dtype=np.float64))
+
+    def _samples_for(self, seconds: float) -> int:
+        return max(1, int(round(seconds / self.interval)))
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        """Most recent sample"""
+        return self.buffer.latest()
+
+    def aggregate(self, seconds: float = 60.0) -> Optional[Dict[str, float]]:
+        """Mean of every field over roughly the last ``seconds``"""
+        return self.buffer.window_mean(self._samples_for(seconds))
+
+    def peak(self, field: str, seconds: float = 60.0) -> Optional[float]:
+        """Maximum of one field over roughly the last ``seconds``"""
+        rows = self.buffer.window(self._samples_for(seconds))
+        if len(rows) == 0:
+            return None
+        return float(rows[:, _INDEX[field]].max())
+
+
+# Global sampler instance
+_sampler: Optional[TelemetrySampler] = None
+
+
+def get_telemetry_sampler() -> TelemetrySampler:
+    """Get the global sampler, starting it on first use"""
+    global _sampler
+    if _sampler is None:
+        from app.core.config import settings
+        _sampler = TelemetrySampler(
+            interval=settings.telemetry_sample_interval,
+            capacity=settings.telemetry_buffer_size,
+        )
+    if not _sampler.running:
+        _sampler.start()
+    return _sampler
+
+
+def stop_telemetry_sampler():
+    """Stop the global sampler (application shutdown)"""
+    if _sampler is not None:
+        _sampler.stop()
@@ -1,8 +1,28 @@
 """
 Authentication & Authorization Layer
 JWT-based authentication with role-based access control
+
+Fast paths:
+- Verified JWTs are kept in a bounded LRU keyed by the token's sha256, so a
+  client reusing its token skips decoding and signature checks until the
+  token's exp (or auth_token_cache_ttl_seconds, whichever comes first).
+- API keys are stored as HMAC-SHA256 digests under a server secret. A key is
+  found with one query on the unique key_hash index and confirmed with a
+  constant-time compare; the keys are random, so a slow hash adds nothing.
+  Keys stored as bcrypt hashes by earlier versions cannot be converted
+  without the key itself: they are refused unless api_key_legacy_bcrypt is
+  set, and then only when sent as ``<api_keys.id>.<key>``, so a request
+  costs at most one bcrypt check; a match is rewritten to the HMAC form, and
+  the bare key works from then on.
+- bcrypt (passwords, legacy API keys) runs on a small dedicated thread pool
+  via the *_async helpers, so it never stalls the event loop.
 """
 
+import asyncio
+import hashlib
+import hmac
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any
 from fastapi import Depends, HTTPException, status, Header
@@ -11,8 +31,12 @@ from typing import Optional as TypingOptional
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 import secrets
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
+from app.db.retrieval_cache import LRUCache
+from app.models.database import APIKey, User
 
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -20,6 +44,20 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # HTTP Bearer scheme for FastAPI
 security = HTTPBearer()
 
+# Verified token payloads by sha256 of the token
+_token_cache = LRUCache("auth_token", settings.auth_token_cache_size, settings.auth_token_cache_ttl_seconds)
+
+# bcrypt work, off the event loop
+_hash_pool: Optional[ThreadPoolExecutor] = None
+
+
+async def run_hash(func, *args):
+    """Run a blocking hash function on the auth thread pool"""
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ThreadPoolExecutor(max_workers=settings.auth_hash_workers, thread_name_prefix="auth-hash")
+    return await asyncio.get_running_loop().run_in_executor(_hash_pool, func, *args)
+
 
 class TokenManager:
     """Manages JWT token creation and validation"""
@@ -50,7 +88,24 @@ class TokenManager:
 
     @staticmethod
     def verify_token(token: str) -> Dict[str, Any]:
-        """Verify and decode JWT token"""
+        """Verify and decode JWT token; tokens verified before come from the cache until they expire"""
+        key = hashlib.sha256(token.encode()).digest()
+        found, payload = _token_cache.get(key)
+        if found:
+            return dict(payload)
+
+        payload = TokenManager._decode(token)
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            remaining = exp - time.time()
+            if remaining > 0:
+                _token_cache.put(key, payload, remaining)
+        else:
+            _token_cache.put(key, payload)
+        return dict(payload)
+
+    @staticmethod
+    def _decode(token: str) -> Dict[str, Any]:
         try:
             payload = jwt.decode(
                 token,
@@ -92,6 +147,16 @@ class PasswordManager:
         """Verify plain password against hash"""
         return pwd_context.verify(plain_password, hashed_password)
 
+    @staticmethod
+    async def hash_password_async(password: str) -> str:
+        """hash_password on the auth thread pool"""
+        return await run_hash(PasswordManager.hash_password, password)
+
+    @staticmethod
+    async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+        """verify_password on the auth thread pool"""
+        return await run_hash(PasswordManager.verify_password, plain_password, hashed_password)
+
 
 class APIKeyManager:
     """Manages API key generation and validation"""
@@ -103,13 +168,77 @@ class APIKeyManager:
 
     @staticmethod
     def hash_api_key(api_key: str) -> str:
-        """Hash API key for storage"""
-        return pwd_context.hash(api_key)
+        """Hash API key for storage: HMAC-SHA256 under api_key_hmac_secret (or jwt_secret), hex"""
+        secret = settings.api_key_hmac_secret or settings.jwt_secret
+        return hmac.new(secret.get_secret_value().encode(), api_key.encode(), hashlib.sha256).hexdigest()
+
+    @staticmethod
+    def is_legacy_hash(hashed_key: str) -> bool:
+        """True for keys stored as bcrypt hashes"""
+        return hashed_key.startswith("$2")
 
     @staticmethod
     def verify_api_key(plain_key: str, hashed_key: str) -> bool:
-        """Verify API key"""
-        return pwd_context.verify(plain_key, hashed_key)
+        """Verify API key (constant-time; bcrypt for legacy hashes, which blocks)"""
+        if APIKeyManager.is_legacy_hash(hashed_key):
+            return pwd_context.verify(plain_key, hashed_key)
+        return hmac.compare_digest(APIKeyManager.hash_api_key(plain_key), hashed_key)
+
+    @staticmethod
+    async def create_api_key(
+        db: AsyncSession, user_id: int, name: str, expires_at: Optional[datetime] = None
+    ) -> str:
+        """Store a new key for a user; returns the key, which is not kept anywhere"""
+        api_key = APIKeyManager.generate_api_key()
+        db.add(APIKey(user_id=user_id, name=name, key_hash=APIKeyManager.hash_api_key(api_key), expires_at=expires_at))
+        await db.commit()
+        return api_key
+
+    @staticmethod
+    async def authenticate(db: AsyncSession, plain_key: str) -> Optional[User]:
+        """
+        Owner of an active, unexpired API key, or None. One query on the
+        key_hash index plus a constant-time compare; see _authenticate_legacy
+        for bcrypt-hashed keys.
+        """
+        digest = APIKeyManager.hash_api_key(plain_key)
+        row = (await db.execute(
+            select(APIKey.key_hash, User).join(User, APIKey.user_id == User.id)
+            .where(APIKey.key_hash == digest, *APIKeyManager._usable())
+        )).first()
+        if row is not None and hmac.compare_digest(row.key_hash, digest):
+            return row.User
+        if settings.api_key_legacy_bcrypt:
+            return await APIKeyManager._authenticate_legacy(db, plain_key)
+        return None
+
+    @staticmethod
+    def _usable() -> tuple:
+        return (
+            APIKey.is_active.is_(True),
+            (APIKey.expires_at.is_(None)) | (APIKey.expires_at > datetime.utcnow()),
+            User.is_active.is_(True),
+        )
+
+    @staticmethod
+    async def _authenticate_legacy(db: AsyncSession, plain_key: str) -> Optional[User]:
+        """
+        A bcrypt-hashed key sent as ``<api_keys.id>.<key>``: the id selects
+        the one row to check, so a request never costs more than one bcrypt
+        verification (on the auth thread pool). A match is rehashed to HMAC.
+        """
+        key_id, separator, key = plain_key.partition(".")
+        if not separator or not key_id.isdigit() or not key:
+            return None
+        row = (await db.execute(
+            select(APIKey, User).join(User, APIKey.user_id == User.id)
+            .where(APIKey.id == int(key_id), APIKey.key_hash.like("$2%"), *APIKeyManager._usable())
+        )).first()
+        if row is None or not await run_hash(pwd_context.verify, key, row.APIKey.key_hash):
+            return None
+        row.APIKey.key_hash = APIKeyManager.hash_api_key(key)
+        await db.commit()
+        return row.User
 
 
 async def get_current_user(
@@ -126,12 +255,37 @@ async def get_current_user(
 
 async def get_current_user_or_default(
     authorization: TypingOptional[str] = Header(None),
+    x_api_key: TypingOptional[str] = Header(None),
 ) -> Dict[str, Any]:
     """
-    Optional authentication - returns default user in development mode or with valid token
+    Optional authentication - returns default user in development mode or with valid token or API key
     """
     from app.core.config import settings
     
+    # Try the API key from the X-API-Key header
+    if x_api_key:
+        from app.db.session import AsyncSessionLocal
+
+        async with AsyncSessionLocal() as db:
+            user = await APIKeyManager.authenticate(db, x_api_key)
+            if user is None:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid API key",
+                )
+            if user.api_subject is None:
+                # First API use of an account created elsewhere (e.g. Telegram):
+                # give it an API identity that no chosen username can equal
+                user.api_subject = f"user:{user.id}"
+                await db.commit()
+        role = user.role.value
+        return {
+            "sub": user.api_subject,
+            "role": role,
+            "permissions": RBAC.get_permissions_for_role(role),
+            "type": "api_key",
+        }
+    
     # Try to verify token from Authorization header
     if authorization:
         try:
@@ -3,15 +3,19 @@ Secure command execution with sandboxing
 Prevents command injection and unauthorized execution
 """
 
+import asyncio
 import subprocess
 import shlex
 import os
+import signal
+import time
 from pathlib import Path
 from typing import Dict, Optional, Tuple
 from dataclasses import dataclass
 import logging
 
 from app.core.config import settings
+from app.monitoring.metrics import get_metrics
 from app.security.validators import SecurityValidator
 
 logger = logging.getLogger(__name__)
@@ -49,6 +53,9 @@ class SecureCommandExecutor:
     # Maximum execution timeout in seconds
     MAX_TIMEOUT = 300
 
+    # Seconds a cancelled process gets between SIGTERM and SIGKILL
+    TERMINATE_GRACE = 2.0
+
     @classmethod
     def validate_command(cls, command: str) -> Tuple[str, bool]:
         """
@@ -176,14 +183,98 @@ class SecureCommandExecutor:
             raise ValueError(f"Command execution failed: {str(e)}")
 
     @classmethod
-    def execute_git_command(
+    async def execute_async(
+        cls,
+        command: str,
+        cwd: Optional[Path] = None,
+        timeout: int = 30,
+    ) -> CommandResult:
+        """
+        Execute a command securely without blocking the event loop
+
+        Same validation and limits as ``execute``. If the awaiting task is
+        cancelled (build cancelled, message superseded) the whole process
+        group is terminated, then killed after ``TERMINATE_GRACE`` seconds,
+        and the cancellation propagates.
+        """
+        _, is_valid = cls.validate_command(command)
+        if not is_valid:
+            raise ValueError(f"Invalid command: {command}")
+
+        if cwd:
+            try:
+                cwd = SecurityValidator.sanitize_path(cwd, base_dir=Path(settings.workspace_dir))
+                cwd.mkdir(parents=True, exist_ok=True)
+            except ValueError as e:
+                raise ValueError(f"Invalid working directory: {e}")
+
+        timeout = min(timeout, cls.MAX_TIMEOUT)
+        args = shlex.split(command)
+        logger.info(f"Executing command: {args[0]} (in {cwd})")
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *args,
+                cwd=cwd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env=cls._create_safe_env(),
+                start_new_session=True,  # own process group, so children die with it
+            )
+        except OSError as e:
+            logger.error(f"Command execution failed: {e}")
+            raise ValueError(f"Command execution failed: {str(e)}")
+
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            await cls._terminate(process)
+            logger.error(f"Command timeout: {command}")
+            raise ValueError(f"Command execution exceeded timeout of {timeout}s")
+        except asyncio.CancelledError:
+            started = time.perf_counter()
+            await asyncio.shield(cls._terminate(process))
+            get_metrics().record_cancellation("command", "cancelled", time.perf_counter() - started)
+            logger.info(f"Command cancelled: {args[0]} (pid {process.pid})")
+            raise
+
+        success = process.returncode == 0
+        logger.info(
+            f"Command completed: {args[0]} - "
+            f"returncode={process.returncode}, success={success}"
+        )
+        return CommandResult(
+            returncode=process.returncode,
+            stdout=stdout.decode(errors="replace")[:10000] if stdout else "",
+            stderr=stderr.decode(errors="replace")[:10000] if stderr else "",
+            success=success,
+        )
+
+    @classmethod
+    async def _terminate(cls, process: asyncio.subprocess.Process):
+        """SIGTERM the process group, SIGKILL it if it does not exit in time"""
+        if process.returncode is not None:
+            return
+        for sig, wait in ((signal.SIGTERM, cls.TERMINATE_GRACE), (signal.SIGKILL, None)):
+            try:
+                os.killpg(process.pid, sig)
+            except ProcessLookupError:
+                return
+            try:
+                await asyncio.wait_for(process.wait(), timeout=wait)
+                return
+            except asyncio.TimeoutError:
+                continue
+
+    @classmethod
+    async def execute_git_command(
         cls,
         git_command: str,
         repo_path: Path,
         timeout: int = 60,
     ) -> CommandResult:
         """
-        Execute a git command with extra validation
+        Execute a git command with extra validation (cancellable, see execute_async)
         """
         # Validate repository path
         try:
@@ -205,18 +296,17 @@ class SecureCommandExecutor:
             if dangerous in command_str:
                 raise ValueError(f"Dangerous git command: {dangerous}")
 
-        full_command = f"git {git_command}"
-        return cls.execute(full_command, cwd=repo_path, timeout=timeout)
+        return await cls.execute_async(git_command, cwd=str(repo_path), timeout=timeout)
 
     @classmethod
-    def execute_npm_command(
+    async def execute_npm_command(
         cls,
         npm_command: str,
         project_path: Path,
         timeout: int = 120,
     ) -> CommandResult:
         """
-        Execute an npm command safely
+        Execute an npm command safely (cancellable, see execute_async)
         """
         # Validate project path
         try:
@@ -236,4 +326,4 @@ class SecureCommandExecutor:
         if not any(cmd in npm_command for cmd in allowed_npm_commands):
             raise ValueError(f"npm command not allowed: {npm_command}")
 
-        return cls.execute(npm_command, cwd=project_path, timeout=timeout)
+        return await cls.execute_async(npm_command, cwd=str(project_path), timeout=timeout)
@@ -8,6 +8,7 @@ import signal
 import subprocess
 from typing import Dict, Any
 from app.skills.base_skill import BaseSkill, SkillResult
+from app.monitoring.telemetry import get_telemetry_sampler
 import structlog
 
 logger = structlog.get_logger(__name__)
@@ -87,26 +88,33 @@ class SystemControllerSkill(BaseSkill):
             )
     
     def _get_status(self) -> SkillResult:
-        """Get system status"""
+        """Get system status from the background telemetry sampler"""
         try:
-            import psutil
-            
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
-            cpu_percent = psutil.cpu_percent(interval=1)
+            sampler = get_telemetry_sampler()
+            sample = sampler.latest()
+            if sample is None:
+                return SkillResult(
+                    success=True,
+                    output="📊 <b>System Status</b>\n\n✅ Agent: Running\n\n(Detailed stats unavailable)",
+                    data={"running": True}
+                )
             
+            minute = sampler.aggregate(60)
             status = {
-                "cpu_percent": cpu_percent,
-                "memory_percent": memory.percent,
-                "disk_percent": disk.percent,
+                "cpu_percent": sample["cpu_percent"],
+                "cpu_percent_1m": round(minute["cpu_percent"], 1),
+                "memory_percent": sample["memory_percent"],
+                "disk_percent": sample["disk_percent"],
+                "agent_rss_mb": round(sample["process_rss_mb"], 1),
                 "running": True,
             }
             
             output = f"""📊 <b>System Status</b>
 
-🖥️ CPU: {cpu_percent}%
-💾 Memory: {memory.percent}%
-💿 Disk: {disk.percent}%
+🖥️ CPU: {status['cpu_percent']}% (1m avg {status['cpu_percent_1m']}%)
+💾 Memory: {status['memory_percent']}%
+💿 Disk: {status['disk_percent']}%
+🤖 Agent RSS: {status['agent_rss_mb']} MB
 
 ✅ Agent: Running"""
 
@@ -116,12 +124,6 @@ class SystemControllerSkill(BaseSkill):
                 data=status
             )
             
-        except ImportError:
-            return SkillResult(
-                success=True,
-                output="📊 <b>System Status</b>\n\n✅ Agent: Running\n\n(Detailed stats unavailable)",
-                data={"running": True}
-            )
         except Exception as e:
             logger.error(f"Status check failed: {e}")
             return SkillResult(
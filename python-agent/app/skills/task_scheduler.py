@@ -5,17 +5,50 @@ Schedules and manages recurring tasks
 
 import json
 import asyncio
+import uuid
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
+from apscheduler.events import (
+    EVENT_JOB_ERROR,
+    EVENT_JOB_EXECUTED,
+    EVENT_JOB_MAX_INSTANCES,
+    EVENT_JOB_MISSED,
+    EVENT_JOB_SUBMITTED,
+)
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
+from sqlalchemy.engine import make_url
+from app.core.config import settings
+from app.monitoring.metrics import get_metrics
 from app.skills.base_skill import BaseSkill, SkillResult
 import structlog
 
 logger = structlog.get_logger(__name__)
 
+# Scheduler whose event loop runs persisted jobs (set by start_scheduler)
+_active_scheduler: Optional["TaskSchedulerSkill"] = None
+
+
+def run_scheduled_task(task_id: str):
+    """
+    Job entry point
+
+    Module-level so the job store can persist a reference to it. Runs on an
+    executor thread and blocks it until the task finishes on the event loop,
+    so the pool size bounds how many scheduled tasks run at once.
+    """
+    scheduler = _active_scheduler
+    if scheduler is None or scheduler._loop is None:
+        logger.warning("Scheduled task fired without an active scheduler", task_id=task_id)
+        return None
+    future = asyncio.run_coroutine_threadsafe(scheduler._run_task(task_id), scheduler._loop)
+    return future.result()
+
 
 class TaskSchedulerSkill(BaseSkill):
     """Schedule and manage tasks"""
@@ -24,12 +57,72 @@ class TaskSchedulerSkill(BaseSkill):
     description = "Schedule tasks with cron expressions or intervals"
     category = "automation"
     
-    def __init__(self):
+    def __init__(self, tasks_file: Optional[Path] = None, jobstore_url: Optional[str] = None):
         super().__init__()
-        self.scheduler = AsyncIOScheduler()
-        self.tasks_file = Path("./data/scheduled_tasks.json")
+        self.tasks_file = tasks_file or Path("./data/scheduled_tasks.json")
+        self.jobstore_url = jobstore_url or settings.scheduler_jobstore_url
+        self.scheduler = self._create_scheduler()
+        self.metrics = get_metrics()
         self.tasks: Dict[str, Dict] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
         self._load_tasks()
+
+    def _create_scheduler(self) -> AsyncIOScheduler:
+        """Scheduler with a persistent job store and a bounded executor pool"""
+        url = make_url(self.jobstore_url)
+        if url.get_backend_name() == "sqlite" and url.database and url.database != ":memory:":
+            Path(url.database).parent.mkdir(parents=True, exist_ok=True)
+
+        scheduler = AsyncIOScheduler(
+            jobstores={"default": SQLAlchemyJobStore(url=self.jobstore_url)},
+            executors={"default": ThreadPoolExecutor(settings.scheduler_max_workers)},
+            job_defaults={
+                "misfire_grace_time": settings.scheduler_misfire_grace_seconds,
+                "coalesce": True,
+                "max_instances": 1,
+            },
+        )
+        scheduler.add_listener(
+            self._on_job_event,
+            EVENT_JOB_SUBMITTED | EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED
+            | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR
+        )
+        return scheduler
+
+    def _on_job_event(self, event):
+        """Record lag, overlaps and misfires (called from scheduler/executor threads)"""
+        if event.code == EVENT_JOB_SUBMITTED:
+            for run_time in event.scheduled_run_times:
+                lag = (datetime.now(run_time.tzinfo) - run_time).total_seconds()
+                self.metrics.record_scheduler_job("submitted", lag=lag)
+        elif event.code == EVENT_JOB_MAX_INSTANCES:
+            logger.warning("Skipped overlapping run of scheduled job", job_id=event.job_id)
+            self.metrics.record_scheduler_job("overlap")
+        elif event.code == EVENT_JOB_MISSED:
+            logger.warning("Scheduled job missed its misfire grace time", job_id=event.job_id)
+            self.metrics.record_scheduler_job("missed")
+        elif event.code == EVENT_JOB_ERROR:
+            self.metrics.record_scheduler_job("error")
+        else:
+            self.metrics.record_scheduler_job("executed")
+
+    @staticmethod
+    def _job_id(task_id: str) -> str:
+        return f"scheduled_{task_id}"
+
+    def _add_job(self, task_id: str, task_name: str, trigger):
+        return self.scheduler.add_job(
+            run_scheduled_task,
+            trigger=trigger,
+            id=self._job_id(task_id),
+            name=task_name,
+            replace_existing=True,
+            kwargs={"task_id": task_id}
+        )
+
+    def _next_run(self, task_id: str) -> Optional[str]:
+        job = self.scheduler.get_job(self._job_id(task_id)) if self.scheduler.running else None
+        return str(job.next_run_time) if job and job.next_run_time else None
     
     async def _execute(self, params: Dict[str, Any]) -> SkillResult:
         """Execute task scheduling"""
@@ -72,7 +165,7 @@ class TaskSchedulerSkill(BaseSkill):
                 error=f"Invalid schedule: {schedule}"
             )
         
-        task_id = f"task_{len(self.tasks) + 1}"
+        task_id = f"task_{uuid.uuid4().hex[:8]}"
         
         task_data = {
             "id": task_id,
@@ -87,22 +180,12 @@ class TaskSchedulerSkill(BaseSkill):
         }
         
         try:
-            job_id = f"scheduled_{task_id}"
-            
-            self.scheduler.add_job(
-                self._run_skill,
-                trigger=trigger,
-                id=job_id,
-                name=task_name,
-                replace_existing=True,
-                kwargs={"skill": skill, "params": skill_params}
-            )
-            
-            if not self.scheduler.running:
-                self.scheduler.start()
-            
-            task_data["next_run"] = str(self.scheduler.get_job(job_id).next_run_time)
+            # Metadata first: the job looks its task up when it fires
             self.tasks[task_id] = task_data
+            await self.start_scheduler()
+            self._add_job(task_id, task_name, trigger)
+            
+            task_data["next_run"] = self._next_run(task_id)
             self._save_tasks()
             
             logger.info(f"Task scheduled: {task_name}")
@@ -118,6 +201,7 @@ class TaskSchedulerSkill(BaseSkill):
             )
             
         except Exception as e:
+            self.tasks.pop(task_id, None)
             logger.error(f"Task scheduling failed: {e}")
             return SkillResult(
                 success=False,
@@ -170,8 +254,8 @@ class TaskSchedulerSkill(BaseSkill):
         task_list = []
         for task_id, task in self.tasks.items():
             status = "✅" if task.get("enabled", True) else "❌"
-            last_run = task.get("last_run", "Never")
-            next_run = task.get("next_run", "Unknown")
+            last_run = task.get("last_run") or "Never"
+            next_run = self._next_run(task_id) or task.get("next_run") or "Unknown"
             
             task_list.append(
                 f"{status} <b>{task['name']}</b>\n"
@@ -207,8 +291,10 @@ class TaskSchedulerSkill(BaseSkill):
             )
         
         try:
-            job_id = f"scheduled_{task_id}"
-            self.scheduler.remove_job(job_id)
+            try:
+                self.scheduler.remove_job(self._job_id(task_id))
+            except JobLookupError:
+                pass
             
             del self.tasks[task_id]
             self._save_tasks()
@@ -253,6 +339,20 @@ class TaskSchedulerSkill(BaseSkill):
         
         return result
     
+    async def _run_task(self, task_id: str):
+        """Run a persisted task by id (scheduled path)"""
+        task = self.tasks.get(task_id)
+        if not task or not task.get("enabled", True):
+            logger.warning("Scheduled task has no metadata, skipping", task_id=task_id)
+            return None
+        
+        result = await self._run_skill(task["skill"], task.get("params", {}))
+        
+        task["last_run"] = datetime.utcnow().isoformat()
+        task["next_run"] = self._next_run(task_id)
+        self._save_tasks()
+        return result
+    
     async def _run_skill(self, skill: str, params: Dict[str, Any]):
         """Run a skill as part of scheduled task"""
         from app.skills.registry import get_skill_registry
@@ -300,13 +400,62 @@ class TaskSchedulerSkill(BaseSkill):
             logger.error(f"Failed to save tasks: {e}")
     
     async def start_scheduler(self):
-        """Start the scheduler"""
+        """Start the scheduler, rehydrating persisted jobs"""
+        global _active_scheduler
+        _active_scheduler = self
+        self._loop = asyncio.get_running_loop()
+        
         if not self.scheduler.running:
             self.scheduler.start()
-            logger.info("Task scheduler started")
+            self._reconcile_jobs()
+            logger.info(
+                "Task scheduler started",
+                jobs=len(self.scheduler.get_jobs()),
+                max_workers=settings.scheduler_max_workers
+            )
+    
+    def _reconcile_jobs(self):
+        """Make the job store and task metadata agree after a restart"""
+        known_jobs = {job.id for job in self.scheduler.get_jobs()}
+        
+        # Tasks saved before jobs were persisted (or whose job was lost)
+        for task_id, task in self.tasks.items():
+            if not task.get("enabled", True) or self._job_id(task_id) in known_jobs:
+                continue
+            trigger = self._parse_schedule(task["schedule"])
+            if trigger is None:
+                logger.warning("Cannot restore scheduled task", task_id=task_id, schedule=task["schedule"])
+                continue
+            self._add_job(task_id, task["name"], trigger)
+            logger.info("Restored scheduled task", task_id=task_id)
+        
+        # Jobs whose task metadata was deleted
+        for job_id in known_jobs:
+            if job_id.startswith("scheduled_") and job_id[len("scheduled_"):] not in self.tasks:
+                self.scheduler.remove_job(job_id)
+        
+        for task_id, task in self.tasks.items():
+            task["next_run"] = self._next_run(task_id)
+        self._save_tasks()
     
     async def stop_scheduler(self):
         """Stop the scheduler"""
+        global _active_scheduler
         if self.scheduler.running:
-            self.scheduler.shutdown()
+            # Executor threads wait on this event loop, so don't block it
+            self.scheduler.shutdown(wait=False)
             logger.info("Task scheduler stopped")
+        if _active_scheduler is self:
+            _active_scheduler = None
+
+
+# Global scheduler instance
+_task_scheduler: Optional[TaskSchedulerSkill] = None
+
+
+def get_task_scheduler() -> TaskSchedulerSkill:
+    """Get or create the task scheduler"""
+    global _task_scheduler
+    if _task_scheduler is None:
+        _task_scheduler = TaskSchedulerSkill()
+    return _task_scheduler
@@ -13,6 +13,7 @@ Currently using FastAPI BackgroundTasks for MVP.
 
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import after_task_publish
 import logging
 from app.core.config import settings
 
@@ -171,38 +172,6 @@ def analyze_code_task(self, analysis_id: str, project_name: str):
         raise self.retry(exc=exc, countdown=2 ** self.request.retries)
 
 
-@celery_app.task
-def cleanup_expired_builds():
-    """
-    Periodic task: Clean up expired build records.
-    
-    Runs every 6 hours.
-    Removes builds older than 30 days.
-    """
-    try:
-        logger.info("Cleanup task: removing expired builds")
-        # Phase 2: Implement database cleanup
-        return {"cleaned": 0}
-    except Exception as e:
-        logger.error("Cleanup task failed", extra={"error": str(e)})
-
-
-@celery_app.task
-def health_check():
-    """
-    Periodic task: Monitor system health.
-    
-    Runs every 5 minutes.
-    Checks database, cache, and service status.
-    """
-    try:
-        logger.info("Health check running")
-        # Phase 2: Implement health checks
-        return {"status": "healthy"}
-    except Exception as e:
-        logger.error("Health check failed", extra={"error": str(e)})
-
-
 # Task monitoring and metrics
 class TaskMetrics:
     """Track task execution metrics."""
@@ -239,8 +208,12 @@ class TaskMetrics:
 
 
 # Register signal handlers
-celery_app.on_after_task_publish.connect(
+after_task_publish.connect(
     lambda sender, body, exchange, routing_key, **kwargs: logger.info(
         "Task published", extra={"routing_key": routing_key}
     )
 )
+
+
+# Maintenance tasks live in app.tasks.maintenance (the names beat_schedule uses)
+from app.tasks import maintenance  # noqa: E402,F401
@@ -0,0 +1,58 @@
+"""
+Periodic maintenance tasks, scheduled by celery_app.conf.beat_schedule
+and routed to the maintenance queue.
+"""
+
+import logging
+
+from app.db.retention import run_retention
+from app.tasks import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task
+def cleanup_expired_builds():
+    """
+    Periodic task: Apply the retention policies.
+
+    Runs every 6 hours.
+    Removes finished builds older than retention_builds_days (with their
+    analyses, vectors and unreferenced blobs), old standalone analyses and
+    audit entries, and expired sessions and memories, then compacts the
+    database.
+
+    Returns:
+        Rows removed per table, bytes reclaimed and duration
+    """
+    try:
+        logger.info("Cleanup task: applying retention policies")
+        report = run_retention().to_dict()
+        logger.info(
+            "Cleanup task finished",
+            extra={
+                "rows_removed": report["rows_removed"],
+                "bytes_reclaimed": report["bytes_reclaimed"],
+                "duration": report["duration"],
+            },
+        )
+        return report
+    except Exception as e:
+        logger.error("Cleanup task failed", extra={"error": str(e)})
+        raise
+
+
+@celery_app.task
+def health_check():
+    """
+    Periodic task: Monitor system health.
+
+    Runs every 5 minutes.
+    Checks database, cache, and service status.
+    """
+    try:
+        logger.info("Health check running")
+        # Phase 2: Implement health checks
+        return {"status": "healthy"}
+    except Exception as e:
+        logger.error("Health check failed", extra={"error": str(e)})
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-request cost of audit logging
+
+Serves N requests to a one-route FastAPI app through httpx's ASGI transport
+in three configurations: no auditing, the write-behind sink (the middleware
+is AuditMiddleware, as in app.main), and one synchronous INSERT per
+request (what writing audit rows inline would cost). Reports mean and p99
+request latency and the overhead over the unaudited app, then the raw cost
+of AuditSink.record and how fast the flusher drains a backlog into SQLite.
+
+Usage: python benchmarks/bench_audit.py [--requests 3000] [--events 100000] [--batch 500]
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+import numpy as np
+import structlog
+from fastapi import FastAPI
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import app.db.audit as audit
+from app.db.audit import AuditMiddleware, AuditSink, _event
+from app.db.session import sqlite_pragmas
+from app.models.database import AuditLog, Base
+
+
+class InlineAudit:
+    """The alternative: one INSERT per request before the response is finished"""
+
+    def __init__(self, app, engine):
+        self.app = app
+        self.engine = engine
+
+    async def __call__(self, scope, receive, send):
+        await self.app(scope, receive, send)
+        if scope["type"] == "http":
+            async with self.engine.begin() as conn:
+                await conn.execute(insert(AuditLog.__table__), [_event(f"GET {scope['path']}", "api")])
+
+
+def make_app(mode: str, engine) -> FastAPI:
+    api = FastAPI()
+
+    @api.get("/api/build/{task_id}")
+    async def status(task_id: str):
+        return {"task_id": task_id, "status": "running"}
+
+    if mode == "write-behind":
+        api.add_middleware(AuditMiddleware)
+    elif mode == "inline":
+        api.add_middleware(InlineAudit, engine=engine)
+
+    return api
+
+
+async def serve(api: FastAPI, count: int):
+    latencies = []
+    transport = httpx.ASGITransport(app=api)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(200):  # warm up
+            await client.get(f"/api/build/w{i}")
+        for i in range(count):
+            started = time.perf_counter()
+            await client.get(f"/api/build/t{i}")
+            latencies.append(time.perf_counter() - started)
+            # The in-memory transport never suspends; a real server yields on
+            # socket I/O between requests, which is when the flusher runs
+            await asyncio.sleep(0)
+    return np.array(latencies) * 1e6
+
+
+async def run(args, tmp: str):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp}/audit.db")
+    event.listen(engine.sync_engine, "connect", sqlite_pragmas)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    sink = AuditSink(engine, batch_size=args.batch, flush_interval=0.5, max_queue=args.events * 2)
+    audit._audit_sink = sink
+    await sink.start()
+
+    print(f"{args.requests} requests, one route\n")
+    print(f"{'mode':<14} {'mean us':>9} {'p99 us':>9} {'overhead':>9}")
+    baseline = None
+    for mode in ("none", "write-behind", "inline"):
+        latencies = await serve(make_app(mode, engine), args.requests)
+        mean = latencies.mean()
+        baseline = baseline if baseline is not None else mean
+        print(f"{mode:<14} {mean:>9.1f} {np.percentile(latencies, 99):>9.1f} {mean - baseline:>+9.1f}")
+    await sink.stop()
+
+    sink = AuditSink(engine, batch_size=args.batch, flush_interval=0.5, max_queue=args.events * 2)
+    started = time.perf_counter()
+    for i in range(args.events):
+        sink.record("GET /api/build/{task_id}", "api", resource_id=f"/api/build/{i}", details={"status_code": 200})
+    per_record = (time.perf_counter() - started) / args.events * 1e9
+
+    started = time.perf_counter()
+    await sink.flush()
+    drain = args.events / (time.perf_counter() - started)
+    print(f"\nAuditSink.record: {per_record:.0f} ns/event; flusher drains {drain:,.0f} events/s "
+          f"to SQLite in batches of {args.batch}")
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(args, tmp))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark: indexing a workspace into the code collection
+
+Compares add_code_snippets_bulk (AST/window chunks, batched embedding on
+the Chroma threads, large upserts) with the single-snippet path, once with
+one add_code_snippet per whole file and once per chunk, on a sample
+workspace, by default this service's own app/ package. Runs on an in-memory
+Chroma client with the hashed n-gram backend so no model download or network
+is involved; set --model to let the store pick a model (embedding_backend).
+
+Usage: python benchmarks/bench_code_ingest.py [--workspace DIR] [--repeat N] [--model]
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import chromadb
+from chromadb.config import Settings as ChromaSettings
+import structlog
+
+from app.core.config import settings
+from app.db.code_chunks import LANGUAGES, language_for_path
+from app.db.embeddings import HashedEmbeddingBackend
+from app.db.vector import VectorStore
+
+
+def load_workspace(root: Path, repeat: int):
+    files = []
+    for path in sorted(root.rglob("*")):
+        if path.is_file() and path.suffix in LANGUAGES and "__pycache__" not in path.parts:
+            code = path.read_text(errors="replace")
+            for n in range(repeat):
+                files.append({"file_path": f"copy{n}/{path.relative_to(root)}", "code": code})
+    return files
+
+
+async def per_file(store: VectorStore, files):
+    await asyncio.gather(*(
+        store.add_code_snippet(f["code"], "bench", f["file_path"], language_for_path(f["file_path"]))
+        for f in files
+    ))
+    return len(files)
+
+
+async def per_chunk(store: VectorStore, files):
+    ids, documents, metadatas = VectorStore._chunk_files(files, "bench", {})
+    await asyncio.gather(*(
+        store.add_code_snippet(doc, "bench", meta["file_path"] + chunk_id[chunk_id.index("#"):],
+                               meta["language"], meta)
+        for chunk_id, doc, meta in zip(ids, documents, metadatas)
+    ))
+    return len(ids)
+
+
+async def bulk(store: VectorStore, files):
+    result = await store.add_code_snippets_bulk(files, "bench")
+    return result["chunks"]
+
+
+async def run(label, ingest, files, embedding):
+    client = chromadb.EphemeralClient(settings=ChromaSettings(anonymized_telemetry=False))  # shared in-process: start from empty collections
+    for collection in client.list_collections():
+        client.delete_collection(collection.name)
+    store = VectorStore(client=client, embedding_function=embedding)
+
+    started = time.perf_counter()
+    vectors = await ingest(store, files)
+    elapsed = time.perf_counter() - started
+    assert store.code_collection.count() == vectors
+    await store.close()
+    print(f"{label:<24} {elapsed:>8.2f} {len(files) / elapsed:>9.0f} {vectors / elapsed:>10.0f} {vectors:>8}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workspace", type=Path, default=Path(__file__).parent.parent / "app")
+    parser.add_argument("--repeat", type=int, default=3, help="copies of the workspace to index")
+    parser.add_argument("--model", action="store_true", help="use the configured embedding backend")
+    args = parser.parse_args()
+
+    embedding = None if args.model else HashedEmbeddingBackend()
+    files = load_workspace(args.workspace, args.repeat)
+    size = sum(len(f["code"]) for f in files)
+    print(f"workspace: {len(files)} files, {size / 1024:.0f} KB\n")
+    print(f"{'ingestion':<24} {'seconds':>8} {'files/s':>9} {'vectors/s':>10} {'vectors':>8}")
+    await run("per-file add", per_file, files, embedding)
+    await run("per-chunk add", per_chunk, files, embedding)
+    await run("bulk chunked upsert", bulk, files, embedding)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.data_dir = tmp
+        asyncio.run(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark: embedding backend throughput
+
+Embeds the code chunks of a sample workspace (by default this service's own
+app/ package) at several batch sizes and reports texts/s and input MB/s. The
+hashed backend always runs; --backend adds a model backend (ollama or onnx)
+for comparison, skipped when it is not reachable.
+
+Usage: python benchmarks/bench_embeddings.py [--workspace DIR] [--batch-sizes 1,16,64,256] [--backend onnx]
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import structlog
+
+from app.core.config import settings
+from app.db.code_chunks import LANGUAGES, chunk_file, language_for_path
+from app.db.embeddings import HashedEmbeddingBackend, _create
+
+
+def load_chunks(root: Path):
+    chunks = []
+    for path in sorted(root.rglob("*")):
+        if path.is_file() and path.suffix in LANGUAGES and "__pycache__" not in path.parts:
+            code = path.read_text(errors="replace")
+            chunks.extend(c.text for c in chunk_file(code, language_for_path(str(path)), settings.vector_chunk_max_chars))
+    return chunks
+
+
+def run(backend, texts, batch_size: int, min_seconds: float):
+    size = sum(len(t.encode()) for t in texts)
+    passes = 0
+    started = time.perf_counter()
+    while True:
+        for i in range(0, len(texts), batch_size):
+            backend.embed(texts[i:i + batch_size])
+        passes += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            break
+    rate = passes * len(texts) / elapsed
+    mb = passes * size / elapsed / 1e6
+    print(f"{backend.name:<8} {backend.dimension:>5} {batch_size:>6} {rate:>10.0f} {mb:>8.2f} {elapsed / passes * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workspace", type=Path, default=Path(__file__).parent.parent / "app")
+    parser.add_argument("--batch-sizes", default="1,16,64,256")
+    parser.add_argument("--backend", choices=("ollama", "onnx"), help="also measure a model backend")
+    parser.add_argument("--min-seconds", type=float, default=1.0, help="minimum time per measurement")
+    args = parser.parse_args()
+
+    texts = load_chunks(args.workspace)
+    print(f"workspace: {len(texts)} chunks, {sum(map(len, texts)) / 1024:.0f} KB\n")
+
+    backends = [HashedEmbeddingBackend()]
+    if args.backend:
+        try:
+            model = _create(args.backend, None)
+            model.probe()
+            backends.append(model)
+        except Exception as e:
+            print(f"{args.backend} unavailable, skipped: {e}\n")
+
+    print(f"{'backend':<8} {'dim':>5} {'batch':>6} {'texts/s':>10} {'MB/s':>8} {'ms/pass':>10}")
+    for backend in backends:
+        for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+            run(backend, texts, batch_size, args.min_seconds)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    main()
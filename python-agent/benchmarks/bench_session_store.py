@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Benchmark: unified SessionStore vs the previous two-context layout
+
+The legacy side reproduces what every message used to cost: a MemoryManager
+context lookup for each of the user/assistant messages, a separate
+AgentHandler dict context (with its unused conversation_history) and a
+SELECT + UPDATE per message while a workflow is active.
+
+Usage: python benchmarks/bench_session_store.py [--users N] [--messages M]
+"""
+
+import argparse
+import logging
+import sys
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import structlog
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.session_store import Message, SessionStore, WorkflowState
+from app.models.database import Base, WorkflowSession
+
+
+def make_session_factory():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine, expire_on_commit=False)
+
+
+class LegacyContexts:
+    """Two independent per-user structures, as before the unified store"""
+
+    def __init__(self, session_factory, timeout_minutes: int = 30):
+        self.session_factory = session_factory
+        self.timeout = timedelta(minutes=timeout_minutes)
+        self.memory_contexts = {}
+        self.handler_contexts = {}
+
+    def memory_context(self, user_id):
+        if user_id not in self.memory_contexts:
+            self.memory_contexts[user_id] = {
+                "user_id": user_id,
+                "messages": deque(maxlen=50),
+                "last_activity": datetime.now(),
+                "metadata": {},
+            }
+        context = self.memory_contexts[user_id]
+        if datetime.now() - context["last_activity"] > self.timeout:
+            context["messages"].clear()
+        return context
+
+    def add_message(self, user_id, role, content):
+        context = self.memory_context(user_id)
+        context["messages"].append(Message(role=role, content=content))
+        context["last_activity"] = datetime.now()
+
+    def handler_context(self, user_id):
+        if user_id in self.handler_contexts:
+            return self.handler_contexts[user_id]
+        db = self.session_factory()
+        try:
+            row = db.query(WorkflowSession).filter(WorkflowSession.user_id == user_id).first()
+        finally:
+            db.close()
+        context = {
+            "user_id": user_id,
+            "workflow_state": WorkflowState(row.state) if row else WorkflowState.IDLE,
+            "workflow_data": dict(row.data) if row else {},
+            "conversation_history": [],
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow(),
+        }
+        self.handler_contexts[user_id] = context
+        return context
+
+    def save(self, user_id):
+        context = self.handler_contexts[user_id]
+        db = self.session_factory()
+        try:
+            row = db.query(WorkflowSession).filter(WorkflowSession.user_id == user_id).first()
+            if not row:
+                row = WorkflowSession(user_id=user_id)
+                db.add(row)
+            row.state = context["workflow_state"].value
+            row.data = context["workflow_data"]
+            row.updated_at = datetime.utcnow()
+            db.commit()
+        finally:
+            db.close()
+
+    def handle(self, user_id, text, active):
+        self.add_message(user_id, "user", text)
+        context = self.handler_context(user_id)
+        context["workflow_state"] = WorkflowState.PROJECT_GOAL if active else WorkflowState.IDLE
+        self.add_message(user_id, "assistant", text)
+        if context["workflow_state"] != WorkflowState.IDLE:
+            self.save(user_id)
+
+
+class UnifiedContexts:
+    def __init__(self, session_factory):
+        self.store = SessionStore(session_factory=session_factory)
+
+    def handle(self, user_id, text, active):
+        session = self.store.get(user_id)
+        session.add_message("user", text)
+        session.workflow_state = WorkflowState.PROJECT_GOAL if active else WorkflowState.IDLE
+        session.add_message("assistant", text)
+        self.store.persist(session)
+
+
+def run(impl, users: int, messages: int, active: bool) -> float:
+    start = time.perf_counter()
+    for i in range(messages):
+        impl.handle(i % users, f"message {i}", active)
+    return (time.perf_counter() - start) / messages * 1e6
+
+
+def measure_memory(factory_cls, users: int, messages_per_user: int) -> float:
+    tracemalloc.start()
+    impl = factory_cls(make_session_factory())
+    before = tracemalloc.take_snapshot()
+    for user_id in range(users):
+        for i in range(messages_per_user):
+            impl.handle(user_id, f"message {i}", False)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return total / users
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=5000)
+    args = parser.parse_args()
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    print(f"users={args.users} messages={args.messages}")
+    for label, active in (("idle chat", False), ("active workflow", True)):
+        legacy = run(LegacyContexts(make_session_factory()), args.users, args.messages, active)
+        unified = run(UnifiedContexts(make_session_factory()), args.users, args.messages, active)
+        print(f"{label:>16}: legacy {legacy:8.1f} us/msg | unified {unified:8.1f} us/msg "
+              f"| {legacy / unified:5.2f}x")
+
+    legacy_mem = measure_memory(LegacyContexts, args.users, 4)
+    unified_mem = measure_memory(UnifiedContexts, args.users, 4)
+    print(f"{'memory/user':>16}: legacy {legacy_mem:8.0f} B      | unified {unified_mem:8.0f} B      "
+          f"| saved {legacy_mem - unified_mem:.0f} B")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark: formatting model output for Telegram
+
+Compares the previous bridge formatting (two _has_html_tags scans plus the
+line-based _format_plain_text pass, which produced unescaped HTML) against
+the single-pass renderer on ~100 KB Markdown replies, both one-shot and fed
+in small chunks as a streamed reply would arrive.
+
+Usage: python benchmarks/bench_telegram_format.py [--kb N] [--rounds R] [--chunk C]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.integrations.telegram_format import TelegramHTMLRenderer, markdown_to_telegram_html
+
+BLOCK = """## Step {n}
+
+The function `parse<T>(data)` returns **typed** results; see [docs](https://example.com/?page={n}&v=2).
+
+- check that *input* is valid & non-empty
+- handle `a < b` edge cases
+1. run the tests
+
+```python
+def step_{n}(items):
+    return [x for x in items if x < {n} and x > 0]
+```
+
+"""
+
+
+def make_document(kb: int) -> str:
+    parts, size, n = [], 0, 0
+    while size < kb * 1024:
+        block = BLOCK.format(n=n)
+        parts.append(block)
+        size += len(block)
+        n += 1
+    return "".join(parts)
+
+
+def legacy_format(text: str) -> str:
+    """Bridge formatting before the renderer, kept for comparison"""
+    html_tags = ["<b>", "<i>", "<code>", "<pre>", "<u>", "<s>"]
+    if not any(tag in text for tag in html_tags):
+        lines = text.split("\n")
+        if lines and len(lines[0]) < 80:
+            lines[0] = f"<b>{lines[0]}</b>"
+        formatted = []
+        in_code_block = False
+        for line in lines:
+            if line.strip().startswith("```"):
+                in_code_block = not in_code_block
+                formatted.append("<code>" if in_code_block else "</code>")
+            else:
+                formatted.append(line)
+        text = "\n".join(formatted)
+    any(tag in text for tag in html_tags)
+    return text
+
+
+def chunked(text: str, size: int) -> str:
+    renderer = TelegramHTMLRenderer()
+    out = [renderer.feed(text[i:i + size]) for i in range(0, len(text), size)]
+    out.append(renderer.close())
+    return "".join(out)
+
+
+def bench(label, fn, doc, rounds):
+    fn(doc)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(doc)
+    per_call = (time.perf_counter() - start) / rounds
+    print(f"{label:<28} {per_call * 1000:>9.2f} {len(doc) / per_call / 1e6:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kb", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--chunk", type=int, default=64, help="streamed chunk size in characters")
+    args = parser.parse_args()
+
+    doc = make_document(args.kb)
+    assert chunked(doc, args.chunk) == markdown_to_telegram_html(doc)
+    print(f"document: {len(doc) / 1024:.0f} KB, {doc.count(chr(10))} lines\n")
+    print(f"{'formatter':<28} {'ms/call':>9} {'MB/s':>8}")
+    bench("legacy (unescaped)", legacy_format, doc, args.rounds)
+    bench("renderer one-shot", markdown_to_telegram_html, doc, args.rounds)
+    bench(f"renderer {args.chunk}-char chunks", lambda d: chunked(d, args.chunk), doc, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Telegram update ingress, long polling vs webhook
+
+A local stand-in Bot API server (FastAPI + uvicorn, separate process) serves
+getMe/getUpdates and accepts sendMessage. The bot is built by
+TelegramBotManager (same ChatOrderedUpdateProcessor as production) with a
+handler that simulates I/O-bound work and replies. Polling pulls the
+preloaded updates through getUpdates; in webhook mode another process plays
+Telegram and POSTs them, over parallel connections, to an endpoint that uses
+the same verify/decode/queue path as /telegram/webhook.
+
+Throughput is measured from the first update handled to the last.
+
+Usage: python benchmarks/bench_telegram_ingress.py [--updates N] [--chats C]
+       [--work-ms W] [--concurrency K]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import socket
+import sys
+import time
+from pathlib import Path
+from urllib.parse import parse_qs
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+import structlog
+import uvicorn
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import JSONResponse
+from pydantic import SecretStr
+
+TOKEN = "123456:BENCHMARK"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_update(update_id: int, chat_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "bench"},
+            "text": f"message {update_id}",
+        },
+    }
+
+
+# ==================== Processes playing Telegram ====================
+
+def run_stand_in_api(port: int):
+    """Just enough of the Bot API for getUpdates-based polling and replies"""
+    app = FastAPI()
+    state = {"pending": [], "sent": 0}
+
+    @app.post("/control/load")
+    async def load(request: Request):
+        state["pending"] = await request.json()
+        return {"ok": True}
+
+    @app.post("/bot{token}/{method}")
+    async def handle(token: str, method: str, request: Request):
+        params = {k: v[0] for k, v in parse_qs((await request.body()).decode()).items()}
+
+        if method == "getMe":
+            result = {"id": 123456, "is_bot": True, "first_name": "Bench", "username": "bench_bot",
+                      "can_join_groups": True, "can_read_all_group_messages": False,
+                      "supports_inline_queries": False}
+        elif method == "getUpdates":
+            offset = int(params.get("offset") or 0)
+            limit = int(params.get("limit") or 100)
+            state["pending"] = [u for u in state["pending"] if u["update_id"] >= offset]
+            result = state["pending"][:limit]
+            if not result:
+                await asyncio.sleep(0.05)
+        elif method == "sendMessage":
+            state["sent"] += 1
+            result = {"message_id": state["sent"], "date": int(time.time()),
+                      "chat": {"id": int(params["chat_id"]), "type": "private"}, "text": params.get("text", "")}
+        else:
+            result = True
+        return JSONResponse({"ok": True, "result": result})
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="error", lifespan="off")
+
+
+def push_updates(port: int, secret: str, updates: list, connections: int):
+    """
+    POST updates like Telegram does (up to ``connections`` keep-alive
+    connections in flight). Raw HTTP/1.1 keeps the client side cheap so it
+    doesn't cap the measured throughput.
+    """
+    async def deliver(queue):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        while not queue.empty():
+            body = queue.get_nowait()
+            writer.write(
+                b"POST /telegram/webhook HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+                b"Content-Type: application/json\r\n"
+                + f"X-Telegram-Bot-Api-Secret-Token: {secret}\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+                + body
+            )
+            headers = await reader.readuntil(b"\r\n\r\n")
+            length = int(headers.lower().split(b"content-length:")[1].split(b"\r\n")[0])
+            await reader.readexactly(length)
+        writer.close()
+
+    async def run():
+        queue = asyncio.Queue()
+        for update in updates:
+            queue.put_nowait(json.dumps(update).encode())
+        await asyncio.gather(*(deliver(queue) for _ in range(connections)))
+
+    asyncio.run(run())
+
+
+async def wait_for_port(port: int):
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.05)
+
+
+# ==================== Bot side ====================
+
+async def build_bot(api_port, concurrency, work_ms, expected):
+    from app.core.config import settings
+    from app.integrations.telegram_bot import TelegramBotManager
+    from telegram.ext import MessageHandler, filters
+
+    settings.telegram_bot_token = SecretStr(TOKEN)
+    settings.telegram_api_base_url = f"http://127.0.0.1:{api_port}"
+    settings.telegram_update_concurrency = concurrency
+    manager = TelegramBotManager()
+    manager.application = manager.build_application()
+
+    done = asyncio.Event()
+    window = {"first": None, "last": None, "handled": 0}
+
+    async def handler(update, context):
+        if window["first"] is None:
+            window["first"] = time.perf_counter()
+        await asyncio.sleep(work_ms / 1000)  # LLM/DB latency stand-in
+        await context.bot.send_message(update.effective_chat.id, "ok")
+        window["handled"] += 1
+        if window["handled"] == expected:
+            window["last"] = time.perf_counter()
+            done.set()
+
+    manager.application.add_handler(MessageHandler(filters.ALL, handler))
+    await manager.application.initialize()
+    await manager.application.start()
+    return manager, done, window
+
+
+async def run_polling(api_port, updates, concurrency, work_ms):
+    async with httpx.AsyncClient() as client:
+        await client.post(f"http://127.0.0.1:{api_port}/control/load", json=updates)
+
+    manager, done, window = await build_bot(api_port, concurrency, work_ms, len(updates))
+    await manager.application.updater.start_polling(poll_interval=0.0, timeout=1)
+    await done.wait()
+    await manager.application.updater.stop()
+    await manager.application.stop()
+    await manager.application.shutdown()
+    return window["last"] - window["first"]
+
+
+async def run_webhook(api_port, updates, concurrency, work_ms, connections, ctx):
+    manager, done, window = await build_bot(api_port, concurrency, work_ms, len(updates))
+
+    webhook_app = FastAPI()
+
+    @webhook_app.post("/telegram/webhook")
+    async def webhook(request: Request, x_telegram_bot_api_secret_token: str = Header(default=None)):
+        if not manager.verify_webhook_secret(x_telegram_bot_api_secret_token):
+            return JSONResponse({"ok": False}, status_code=403)
+        await manager.feed_webhook_update(await request.body())
+        return {"status": "ok"}
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(webhook_app, host="127.0.0.1", port=port, log_level="error", lifespan="off"))
+    serve_task = asyncio.create_task(server.serve())
+    await wait_for_port(port)
+
+    pusher = ctx.Process(
+        target=push_updates,
+        args=(port, manager.webhook_secret, updates, connections),
+    )
+    pusher.start()
+    await done.wait()
+    await asyncio.to_thread(pusher.join)
+
+    server.should_exit = True
+    await serve_task
+    await manager.application.stop()
+    await manager.application.shutdown()
+    return window["last"] - window["first"]
+
+
+async def main_async(args, ctx):
+    api_port = free_port()
+    api = ctx.Process(target=run_stand_in_api, args=(api_port,), daemon=True)
+    api.start()
+    await wait_for_port(api_port)
+
+    updates = [make_update(i + 1, 1000 + i % args.chats) for i in range(args.updates)]
+    print(f"{args.updates} updates from {args.chats} chats, {args.work_ms} ms simulated work per update\n")
+    print(f"{'mode':<10} {'concurrency':>11} {'seconds':>9} {'updates/s':>10}")
+
+    try:
+        for concurrency in (1, args.concurrency):
+            polling = await run_polling(api_port, updates, concurrency, args.work_ms)
+            print(f"{'polling':<10} {concurrency:>11} {polling:>9.2f} {args.updates / polling:>10.0f}")
+            webhook = await run_webhook(api_port, updates, concurrency, args.work_ms, 40, ctx)
+            print(f"{'webhook':<10} {concurrency:>11} {webhook:>9.2f} {args.updates / webhook:>10.0f}")
+    finally:
+        api.terminate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=500)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--work-ms", type=float, default=20.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    asyncio.run(main_async(args, multiprocessing.get_context("spawn")))
+
+
+if __name__ == "__main__":
+    main()
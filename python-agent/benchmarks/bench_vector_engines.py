@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Chroma vs the built-in local index behind VectorStore
+
+Each engine runs in its own process (so startup time and peak RSS are its
+own) against a fresh data directory: open an empty store, ingest N code
+chunks with upsert_code_chunks, time unfiltered top-10 queries (with recall
+against exact search) and build-filtered ones, delete a third of the chunks, then reopen the store. Embeddings come
+from the hashed backend, so the embedding cost is the same for both engines.
+
+Usage: python benchmarks/bench_vector_engines.py [--chunks 20000] [--queries 200] [--engine both|chroma|local]
+"""
+
+import argparse
+import asyncio
+import logging
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+import structlog
+
+from app.core.config import settings
+from app.db.code_chunks import LANGUAGES, chunk_file, language_for_path
+from app.db.embeddings import HashedEmbeddingBackend
+from app.db.vector import VectorStore
+
+COLUMNS = ("open", "ingest/s", "q p50 ms", "q p95 ms", "recall@10", "filt p50", "reopen", "peak MB")
+
+
+def load_chunks(root: Path, count: int):
+    texts = []
+    for path in sorted(root.rglob("*")):
+        if path.is_file() and path.suffix in LANGUAGES and "__pycache__" not in path.parts:
+            code = path.read_text(errors="replace")
+            texts.extend(c.text for c in chunk_file(code, language_for_path(str(path)), settings.vector_chunk_max_chars))
+    return [f"{texts[i % len(texts)]}\n# copy {i // len(texts)}" for i in range(count)]
+
+
+async def timed_queries(store: VectorStore, vectors, where=None):
+    """(p50 ms, p95 ms, result ids per query)"""
+    collection = store.code_collection
+    latencies, found = [], []
+    for vector in vectors:
+        started = time.perf_counter()
+        result = await store.executor.run(
+            collection.name, "query", collection.query,
+            query_embeddings=[vector], n_results=10, where=where,
+        )
+        latencies.append(time.perf_counter() - started)
+        found.append(result["ids"][0])
+    return np.percentile(latencies, 50) * 1000, np.percentile(latencies, 95) * 1000, found
+
+
+def exact_top10(embedding, texts, queries):
+    vectors = np.concatenate([embedding.embed(texts[i:i + 1024]) for i in range(0, len(texts), 1024)])
+    distances = (vectors ** 2).sum(axis=1)[None, :] - 2 * queries @ vectors.T
+    return [{f"chunk{i}" for i in row} for row in np.argsort(distances, axis=1)[:, :10]]
+
+
+async def run_engine(args):
+    embedding = HashedEmbeddingBackend()
+    texts = load_chunks(Path(__file__).parent.parent / "app", args.chunks)
+    ids = [f"chunk{i}" for i in range(len(texts))]
+    metadatas = [{"build_id": f"b{i % 10}", "file_path": f"f{i}.py", "type": "code"} for i in range(len(texts))]
+    queries = embedding.embed([f"{text} (query)" for text in texts[::max(1, len(texts) // args.queries)][:args.queries]])
+    exact = exact_top10(embedding, texts, queries)
+
+    started = time.perf_counter()
+    store = await asyncio.to_thread(VectorStore, None, embedding)
+    opened = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await store.upsert_code_chunks(ids, texts, metadatas)
+    ingest = len(texts) / (time.perf_counter() - started)
+    settle = getattr(store.client, "wait_for_maintenance", None)
+    if settle is not None:
+        await asyncio.to_thread(settle)  # IVF training runs in the background
+
+    p50, p95, found = await timed_queries(store, queries)
+    recall = np.mean([len(expected & set(ids)) / 10 for expected, ids in zip(exact, found)])
+    filtered, _, _ = await timed_queries(store, queries, where={"build_id": {"$eq": "b3"}})
+
+    await store.delete_code_chunks(ids[::3])
+    await store.close()
+    started = time.perf_counter()
+    store = await asyncio.to_thread(VectorStore, None, embedding)
+    await timed_queries(store, queries[:1])
+    reopened = time.perf_counter() - started
+    await store.close()
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    values = (opened, ingest, p50, p95, recall, filtered, reopened, peak)
+    print(f"{settings.vector_store_engine:<8} " + " ".join(f"{v:>9.2f}" for v in values), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--engine", choices=("both", "chroma", "local"), default="both")
+    args = parser.parse_args()
+
+    if args.engine == "both":
+        print(f"{args.chunks} chunks, {args.queries} queries, top 10\n")
+        print(f"{'engine':<8} " + " ".join(f"{c:>9}" for c in COLUMNS), flush=True)
+        for engine in ("chroma", "local"):
+            subprocess.run(
+                [sys.executable, __file__, "--engine", engine, "--chunks", str(args.chunks), "--queries", str(args.queries)],
+                check=True,
+            )
+        return
+
+    settings.vector_store_engine = args.engine
+    settings.retrieval_cache_size = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.data_dir = tmp
+        asyncio.run(run_engine(args))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    main()
@@ -262,15 +262,16 @@ def test_cancel_completed_build(user_token, build_request):
     headers = {"Authorization": f"Bearer {user_token}"}
 
     # Create and complete build
-    from app.api.build import _build_tasks
+    from app.db.session import SessionLocal
+    from app.models.database import Build, BuildStatus
 
     create_response = client.post("/api/build/", json=build_request, headers=headers)
     task_id = create_response.json()["task_id"]
 
     # Simulate completion
-    task = _build_tasks[task_id]
-    task.status = "completed"
-    task.progress = 100
+    with SessionLocal() as db:
+        db.query(Build).filter(Build.id == task_id).update({"status": BuildStatus.COMPLETED})
+        db.commit()
 
     # Try to cancel
     response = client.delete(f"/api/build/{task_id}", headers=headers)
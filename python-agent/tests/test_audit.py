@@ -0,0 +1,125 @@
+"""
+Tests for the write-behind audit sink: batching, early flush, backpressure,
+drops, retry after a failed write and flush on shutdown
+"""
+
+import asyncio
+
+import pytest
+import pytest_asyncio
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import app.db.audit as audit
+from app.db.audit import AuditSink, record_http_request
+from app.models.database import Base
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'audit.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+async def stored(engine):
+    async with engine.connect() as conn:
+        return (await conn.execute(text("SELECT action, resource_id, details, success FROM audit_logs ORDER BY id"))).all()
+
+
+def dropped(reason):
+    return REGISTRY.get_sample_value("audit_events_total", {"outcome": reason}) or 0.0
+
+
+class TestAuditSink:
+    """Test queueing and batched writes"""
+
+    @pytest.mark.asyncio
+    async def test_events_written_in_batches(self, engine):
+        sink = AuditSink(engine, batch_size=4, flush_interval=60, max_queue=100)
+        for i in range(10):
+            assert sink.record("build.create", "build", resource_id=f"b{i}", details={"n": i})
+        assert sink.pending == 10
+
+        assert await sink.flush() == 10
+        rows = await stored(engine)
+        assert [r.resource_id for r in rows] == [f"b{i}" for i in range(10)]
+        assert rows[3].details == '{"n": 3}' and rows[0].success == 1
+
+    @pytest.mark.asyncio
+    async def test_full_batch_flushes_before_interval(self, engine):
+        sink = AuditSink(engine, batch_size=5, flush_interval=60, max_queue=100)
+        await sink.start()
+        try:
+            for i in range(5):
+                sink.record("cmd", "telegram", resource_id=str(i))
+            for _ in range(100):
+                if sink.written == 5:
+                    break
+                await asyncio.sleep(0.01)
+            assert sink.written == 5 and len(await stored(engine)) == 5
+        finally:
+            await sink.stop()
+
+    @pytest.mark.asyncio
+    async def test_drop_when_full_and_backpressure(self, engine):
+        sink = AuditSink(engine, batch_size=2, flush_interval=60, max_queue=3)
+        before = dropped("queue_full")
+        assert all(sink.record("a", "api") for _ in range(3))
+        assert not sink.record("a", "api")
+        assert sink.dropped == 1 and dropped("queue_full") == before + 1
+
+        # put waits for the flusher to make room instead of dropping
+        await sink.start()
+        try:
+            assert await asyncio.wait_for(sink.put("critical", "auth", timeout=5), 5)
+        finally:
+            await sink.stop()
+        assert [r.action for r in await stored(engine)][-1] == "critical"
+        assert sink.dropped == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_write_is_retried(self, tmp_path):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'late.db'}")
+        sink = AuditSink(engine, batch_size=10, flush_interval=60, max_queue=100)
+        try:
+            sink.record("a", "api", resource_id="kept")
+            assert await sink.flush() == 0  # no table yet
+            assert sink.pending == 1 and sink.dropped == 0
+
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            assert await sink.flush() == 1
+            assert [r.resource_id for r in await stored(engine)] == ["kept"]
+        finally:
+            await engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_stop_flushes_queue(self, engine):
+        sink = AuditSink(engine, batch_size=100, flush_interval=60, max_queue=1000)
+        await sink.start()
+        for i in range(250):
+            sink.record("a", "api", resource_id=str(i))
+        await sink.stop()
+        assert sink.pending == 0 and len(await stored(engine)) == 250
+
+
+class TestHttpAudit:
+    """Test the event recorded for an API request"""
+
+    def test_record_http_request(self, monkeypatch):
+        sink = AuditSink(engine=object(), batch_size=10, flush_interval=60, max_queue=10)
+        monkeypatch.setattr(audit, "_audit_sink", sink)
+        scope = {
+            "type": "http", "method": "DELETE", "path": "/api/build/abc", "query_string": b"",
+            "headers": [(b"user-agent", b"pytest")], "client": ("10.0.0.1", 5000),
+        }
+        record_http_request(scope, 409, 0.0123)
+
+        event = sink._queue[0]
+        assert event["action"] == "DELETE /api/build/abc" and event["resource_type"] == "api"
+        assert event["ip_address"] == "10.0.0.1" and event["user_agent"] == "pytest"
+        assert event["success"] is False and event["details"] == {"status_code": 409, "duration_ms": 12.3}
@@ -0,0 +1,142 @@
+"""
+Tests for the authentication fast paths: the verified-token cache, the
+HMAC API key index and bcrypt off the event loop
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import app.db.retrieval_cache as retrieval_cache
+import app.db.session as db_session
+import app.security.auth as auth
+from app.db.retrieval_cache import LRUCache
+from app.models.database import APIKey, Base, User, UserRole
+from app.security.auth import APIKeyManager, TokenManager, get_current_user_or_default, run_hash
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    monkeypatch.setattr(auth, "_token_cache", LRUCache("auth_token", 100, 300))
+    calls = []
+    decode = TokenManager._decode
+
+    def counting(token):
+        calls.append(token)
+        return decode(token)
+
+    monkeypatch.setattr(TokenManager, "_decode", staticmethod(counting))
+    return calls
+
+
+class TestTokenCache:
+    """Test reuse of verified tokens"""
+
+    def test_verified_token_is_cached_until_exp(self, decodes, monkeypatch):
+        token = TokenManager.create_access_token("alice", ["build"], timedelta(seconds=30))
+        first = TokenManager.verify_token(token)
+        first["permissions"].append("admin")  # callers get their own copy
+        assert TokenManager.verify_token(token)["sub"] == "alice"
+        assert len(decodes) == 1
+
+        # Past exp the entry is gone and the token is verified again
+        later = time.monotonic() + 31
+        monkeypatch.setattr(retrieval_cache.time, "monotonic", lambda: later)
+        TokenManager.verify_token(token)
+        assert len(decodes) == 2
+
+    def test_invalid_tokens_are_not_cached(self, decodes):
+        token = TokenManager.create_access_token("alice")
+        tampered = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+        for _ in range(2):
+            with pytest.raises(HTTPException) as e:
+                TokenManager.verify_token(tampered)
+            assert e.value.status_code == 401
+        assert len(decodes) == 2 and len(auth._token_cache) == 0
+
+
+@pytest_asyncio.fixture
+async def sessions(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'auth.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+    monkeypatch.setattr(db_session, "AsyncSessionLocal", factory)
+    yield factory
+    await engine.dispose()
+
+
+async def add_user(db, username, role=UserRole.USER, active=True):
+    user = User(username=username, email=f"{username}@test", hashed_password="", role=role, is_active=active)
+    db.add(user)
+    await db.commit()
+    return user
+
+
+class TestAPIKeys:
+    """Test API key storage and lookup"""
+
+    @pytest.mark.asyncio
+    async def test_hmac_keys(self, sessions):
+        async with sessions() as db:
+            alice = await add_user(db, "alice", UserRole.ADMIN)
+            bob = await add_user(db, "bob", active=False)
+            key = await APIKeyManager.create_api_key(db, alice.id, "ci")
+            expired = await APIKeyManager.create_api_key(db, alice.id, "old", datetime.utcnow() - timedelta(days=1))
+            disabled = await APIKeyManager.create_api_key(db, bob.id, "bob")
+
+            stored = (await db.execute(select(APIKey.key_hash).where(APIKey.name == "ci"))).scalar()
+            assert key not in stored and len(stored) == 64
+            assert APIKeyManager.verify_api_key(key, stored) and not APIKeyManager.verify_api_key(expired, stored)
+
+            assert (await APIKeyManager.authenticate(db, key)).username == "alice"
+            for rejected in (expired, disabled, "not-a-key"):
+                assert await APIKeyManager.authenticate(db, rejected) is None
+
+        user = await get_current_user_or_default(authorization=None, x_api_key=key)
+        assert user["sub"] == f"user:{alice.id}" and "admin" in user["permissions"] and user["type"] == "api_key"
+        with pytest.raises(HTTPException) as e:
+            await get_current_user_or_default(authorization=None, x_api_key="not-a-key")
+        assert e.value.status_code == 401
+
+    @pytest.mark.asyncio
+    async def test_legacy_bcrypt_keys_cost_one_check(self, sessions, monkeypatch):
+        checks = []
+
+        def verify(key, hashed):
+            checks.append(hashed)
+            return hashed == f"$2b$legacy-{key}"
+
+        monkeypatch.setattr(auth.pwd_context, "verify", verify)
+        async with sessions() as db:
+            alice = await add_user(db, "alice")
+            rows = [APIKey(user_id=alice.id, name=f"legacy{i}", key_hash=f"$2b$legacy-key{i}") for i in range(5)]
+            db.add_all(rows)
+            await db.commit()
+
+            # Off by default: no bcrypt for anything that is not an HMAC key
+            assert await APIKeyManager.authenticate(db, f"{rows[3].id}.key3") is None
+            assert checks == []
+
+            monkeypatch.setattr(auth.settings, "api_key_legacy_bcrypt", True)
+            for guess in ("key3", f"{rows[3].id}.wrong", f"{rows[3].id}.", "x.key3"):
+                assert await APIKeyManager.authenticate(db, guess) is None
+            assert len(checks) == 1
+
+            assert (await APIKeyManager.authenticate(db, f"{rows[3].id}.key3")).username == "alice"
+            assert len(checks) == 2
+            # Rehashed: the bare key now takes the HMAC path
+            assert (await APIKeyManager.authenticate(db, "key3")).username == "alice"
+            assert len(checks) == 2
+
+
+@pytest.mark.asyncio
+async def test_hashing_runs_on_the_auth_pool():
+    assert await run_hash(lambda: threading.current_thread().name) != threading.current_thread().name
+    assert (await run_hash(lambda: threading.current_thread().name)).startswith("auth-hash")
@@ -0,0 +1,310 @@
+"""
+Tests for the autonomous worker: schedule heap and concurrent dispatch
+"""
+
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.agents.schedule import ScheduleHeap, ScheduledJob
+
+
+def write_schedules(path, entries):
+    path.write_text(json.dumps(entries))
+    # Make sure the change is visible even on coarse mtime filesystems
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+class TestScheduleHeap:
+    """Test next-fire ordering and reloads"""
+
+    def test_interval_jobs_ordered_by_next_fire(self, tmp_path):
+        schedules = tmp_path / "schedules.json"
+        recent = (datetime.now() - timedelta(minutes=5)).isoformat()
+        write_schedules(schedules, [
+            {"id": "later", "type": "report", "description": "r", "interval_minutes": 60, "last_run": recent},
+            {"id": "never_run", "type": "backup", "description": "b", "interval_minutes": 10},
+        ])
+
+        heap = ScheduleHeap(schedules)
+        assert heap.reload_if_changed()
+
+        due = heap.pop_due(time.time())
+        assert [job.key for job, _ in due] == ["never_run"]
+        # Rescheduled one interval ahead, behind the other job
+        assert heap.jobs["never_run"].next_run > heap.jobs["later"].next_run - 3600
+        assert heap.next_fire_time() == pytest.approx(heap.jobs["never_run"].next_run)
+
+    def test_cron_next_fire(self):
+        job = ScheduledJob.from_dict({"type": "t", "cron": "*/5 * * * *"}, 0)
+        fire = datetime.fromtimestamp(job.next_run, job.cron.timezone)
+        assert fire.minute % 5 == 0 and fire.second == 0
+        assert 0 < job.next_run - time.time() <= 300
+
+    def test_non_positive_interval_rejected(self, tmp_path):
+        for interval in (0, -5, "nan"):
+            with pytest.raises(ValueError):
+                ScheduledJob.from_dict({"type": "t", "interval_minutes": interval}, 0)
+
+        schedules = tmp_path / "schedules.json"
+        write_schedules(schedules, [
+            {"id": "zero", "type": "t", "description": "", "interval_minutes": 0},
+            {"id": "ok", "type": "t", "description": "", "interval_minutes": 1},
+        ])
+        heap = ScheduleHeap(schedules)
+        heap.reload_if_changed()
+        assert set(heap.jobs) == {"ok"}
+        # Each job fires once per call, however far behind the heap is
+        assert [job.key for job, _ in heap.pop_due(time.time() + 3600)] == ["ok"]
+
+    def test_intervals_keep_their_phase(self):
+        start = time.time()
+        job = ScheduledJob.from_dict({"id": "a", "type": "t", "interval_minutes": 10}, 0)
+        heap = ScheduleHeap(None)
+        heap.jobs = {"a": job}
+        job.next_run = start
+        heap._push(job)
+
+        # Popped 7 s late: the next run is still 600 s after the slot
+        [(_, fired)] = heap.pop_due(start + 7)
+        assert fired == start and job.next_run == pytest.approx(start + 600)
+
+        # Popped after missing two slots: the next one on the original grid
+        [(_, fired)] = heap.pop_due(start + 1900)
+        assert fired == pytest.approx(start + 600) and job.next_run == pytest.approx(start + 2400)
+
+    def test_stale_cron_runs_once(self):
+        now = time.time()
+        stale = datetime.fromtimestamp(now - 2 * 3600).isoformat()
+        job = ScheduledJob.from_dict({"id": "c", "type": "t", "cron": "*/5 * * * *", "last_run": stale}, 0)
+        heap = ScheduleHeap(None)
+        heap.jobs = {"c": job}
+        heap._push(job)
+
+        # Two hours of missed */5 slots come back as a single catch-up run
+        assert len(heap.pop_due(now)) == 1
+        assert now < job.next_run <= now + 300
+        assert heap.pop_due(now) == []
+
+    def test_reload_only_when_file_changes(self, tmp_path):
+        schedules = tmp_path / "schedules.json"
+        write_schedules(schedules, [{"id": "a", "type": "t", "description": "", "interval_minutes": 1}])
+
+        heap = ScheduleHeap(schedules)
+        assert heap.reload_if_changed()
+        assert not heap.reload_if_changed()
+
+        write_schedules(schedules, [
+            {"id": "a", "type": "t", "description": "", "interval_minutes": 1},
+            {"id": "b", "type": "t", "description": "", "interval_minutes": 1, "enabled": False},
+            {"id": "c", "type": "t", "description": "", "cron": "not a cron"},
+        ])
+        assert heap.reload_if_changed()
+        assert set(heap.jobs) == {"a"}
+
+    def test_last_run_written_back(self, tmp_path):
+        schedules = tmp_path / "schedules.json"
+        write_schedules(schedules, [{"id": "a", "type": "t", "description": "", "interval_minutes": 30}])
+
+        heap = ScheduleHeap(schedules)
+        heap.reload_if_changed()
+        heap.pop_due(time.time())
+        heap.save_last_runs()
+
+        assert json.loads(schedules.read_text())[0]["last_run"]
+        # Our own write must not trigger a reload
+        assert not heap.reload_if_changed()
+
+
+class TestAutonomousDispatch:
+    """Test concurrent execution under the semaphore"""
+
+    @pytest.mark.asyncio
+    async def test_due_tasks_run_concurrently_up_to_limit(self, tmp_path):
+        from app.agents.autonomous import AutonomousWorker
+
+        worker = AutonomousWorker()
+        worker.schedule = ScheduleHeap(tmp_path / "schedules.json")
+        worker._semaphore = asyncio.Semaphore(2)
+
+        active = 0
+        peak = 0
+
+        async def fake_execute(task):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.05)
+            active -= 1
+            return True
+
+        worker._execute_task = fake_execute
+        for i in range(5):
+            worker._dispatch({"type": "t", "description": str(i), "source": "test"}, time.time())
+
+        started = time.perf_counter()
+        await asyncio.gather(*list(worker._inflight))
+
+        assert peak == 2
+        # 5 tasks, 2 at a time -> 3 waves instead of 5 sequential runs
+        assert time.perf_counter() - started < 0.2
+        assert worker.running_tasks == {}
+
+    @pytest.mark.asyncio
+    async def test_overlapping_schedule_is_skipped(self, tmp_path):
+        from app.agents.autonomous import AutonomousWorker
+
+        worker = AutonomousWorker()
+        worker._semaphore = asyncio.Semaphore(3)
+        release = asyncio.Event()
+
+        async def fake_execute(task):
+            await release.wait()
+            return True
+
+        worker._execute_task = fake_execute
+        task = {"type": "t", "description": "", "source": "scheduled", "schedule_key": "a"}
+        # Dispatched back to back, before either task has started
+        worker._dispatch(dict(task), time.time())
+        worker._dispatch(dict(task), time.time())
+        await asyncio.sleep(0)
+        worker._dispatch(dict(task), time.time())
+
+        assert len(worker._inflight) == 1
+        release.set()
+        await asyncio.gather(*list(worker._inflight))
+        assert worker._inflight_keys == set()
+
+        # Queued behind the concurrency limit still counts as in flight
+        worker._semaphore = asyncio.Semaphore(0)
+        worker._dispatch(dict(task), time.time())
+        await asyncio.sleep(0)
+        worker._dispatch(dict(task), time.time())
+        assert len(worker._inflight) == 1
+        for job in list(worker._inflight):
+            job.cancel()
+        await asyncio.gather(*list(worker._inflight), return_exceptions=True)
+        assert worker._inflight_keys == set()
+
+    @pytest.mark.asyncio
+    async def test_stop_waits_for_loop_and_tasks(self, tmp_path):
+        from app.agents.autonomous import AutonomousWorker
+        from app.core.task_journal import TaskJournal
+
+        worker = AutonomousWorker()
+        worker.journal = TaskJournal(tmp_path)
+        worker.schedule = ScheduleHeap(tmp_path / "schedules.json")
+        worker._next_proactive = time.time() + 3600
+        worker.STOP_GRACE = 0.05
+        finished = []
+
+        async def fake_execute(task):
+            worker.journal.record(task["description"], "start")
+            await asyncio.sleep(0 if task["description"] == "quick" else 10)
+            finished.append(task["description"])
+            return True
+
+        worker._execute_task = fake_execute
+        loop_task = asyncio.create_task(worker.start())
+        await asyncio.sleep(0)
+        worker._dispatch({"type": "t", "description": "quick", "source": "test"}, time.time())
+        worker._dispatch({"type": "t", "description": "slow", "source": "test"}, time.time())
+
+        await asyncio.wait_for(worker.stop(), timeout=1)
+        assert loop_task.done()
+        # The quick task finished within the grace period, the slow one was cancelled
+        assert finished == ["quick"] and not worker._inflight
+        assert len((tmp_path / "tasks.jsonl").read_text().splitlines()) == 2
+
+
+class TestTaskJournal:
+    """Test buffered journal writes, rotation and the task index"""
+
+    @pytest.mark.asyncio
+    async def test_records_buffered_until_flush(self, tmp_path):
+        from app.core.task_journal import TaskJournal
+
+        journal = TaskJournal(tmp_path)
+        journal.record("t1", "start", type="report", description="d", source="test")
+        assert not (tmp_path / "tasks.jsonl").exists()
+        # Pending records are still visible to readers
+        assert journal.get("t1")[0]["event"] == "start"
+
+        journal.record("t1", "complete", success=True, output={"ok": 1})
+        await journal.flush()
+
+        lines = (tmp_path / "tasks.jsonl").read_text().splitlines()
+        assert len(lines) == 2
+        assert [r["event"] for r in journal.get("t1")] == ["start", "complete"]
+
+    @pytest.mark.asyncio
+    async def test_rotation_keeps_index_valid(self, tmp_path):
+        from app.core.task_journal import TaskJournal
+
+        journal = TaskJournal(tmp_path, max_file_bytes=512, keep_files=2)
+        for i in range(40):
+            journal.record(f"t{i}", "error", error="x" * 40)
+            await journal.flush()
+
+        rotated = sorted(tmp_path.glob("tasks-*.jsonl.gz"))
+        assert len(rotated) == 2
+        # Offsets survive gzip compression; expired files drop out of the index
+        assert journal.get("t0") == []
+        assert journal.get("t39")[0]["task_id"] == "t39"
+        compressed = [task_id for task_id, in journal._db.execute("SELECT task_id FROM records WHERE file LIKE '%.gz'")]
+        assert compressed
+        assert all(journal.get(task_id)[0]["error"] == "x" * 40 for task_id in compressed)
+
+        # Index is reloaded from disk
+        assert TaskJournal(tmp_path).get("t39")[0]["event"] == "error"
+
+    @pytest.mark.asyncio
+    async def test_rotated_file_read_by_member(self, tmp_path, monkeypatch):
+        import gzip
+
+        from app.core import task_journal
+        from app.core.task_journal import TaskJournal
+
+        monkeypatch.setattr(task_journal, "GZIP_BLOCK_BYTES", 256)
+        journal = TaskJournal(tmp_path, max_file_bytes=4096)
+        for i in range(60):
+            journal.record(f"t{i}", "error", error=f"e{i}" * 10)
+        await journal.flush()
+
+        rotated, = tmp_path.glob("tasks-*.jsonl.gz")
+        members = journal._db.execute("SELECT COUNT(*) FROM blocks WHERE file = ?", (rotated.name,)).fetchone()[0]
+        assert members > 10
+        with gzip.open(rotated) as f:  # still one valid gzip stream
+            assert len(f.read().splitlines()) == 60
+        assert all(journal.get(f"t{i}")[0]["error"] == f"e{i}" * 10 for i in range(60))
+
+    @pytest.mark.asyncio
+    async def test_worker_writes_journal_and_renders_markdown(self, tmp_path):
+        from app.agents.autonomous import AutonomousWorker
+        from app.core.task_journal import TaskJournal
+
+        worker = AutonomousWorker()
+        worker.journal = TaskJournal(tmp_path)
+
+        async def fake_ollama(task):
+            return {"success": True, "action": "report", "output": {"lines": 3}}
+
+        async def no_notify(task, result):
+            pass
+
+        worker._execute_with_ollama = fake_ollama
+        worker._notify_completion = no_notify
+
+        task = {"type": "report", "description": "daily", "source": "test"}
+        assert await worker._execute_task(task)
+        await worker.journal.close()
+
+        events = worker.journal.get(task["id"])
+        assert [e["event"] for e in events] == ["start", "complete"]
+        markdown = worker.render_task_log()
+        assert "## Task Started" in markdown and "Action: report" in markdown
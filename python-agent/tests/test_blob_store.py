@@ -0,0 +1,198 @@
+"""
+Tests for the content-addressed blob store: deduplication, range reads,
+reference counting, garbage collection and the migration of Text columns
+"""
+
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import create_engine, inspect, select, text, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+
+import app.db.blob_store as blob_store
+from app.core.config import settings
+from app.db.blob_store import (
+    BlobStore, collect_garbage, content_digest, load_text, release_blob, release_blobs, store_blob,
+)
+from app.models.database import Base, Blob, Build, User
+
+ROOT = Path(__file__).parent.parent
+
+CODE = "def handler(event):\n    return {'status': 200}\n" * 200
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = BlobStore(tmp_path / "blobs")
+    monkeypatch.setattr(blob_store, "_blob_store", store)
+    return store
+
+
+@pytest_asyncio.fixture
+async def db(tmp_path, store):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'blobs.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(bind=engine, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+
+@pytest.fixture
+def sync_db(tmp_path, db):
+    engine = create_engine(f"sqlite:///{tmp_path / 'blobs.db'}")
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+async def refcount(db, digest):
+    return (await db.execute(select(Blob.refcount).where(Blob.digest == digest))).scalar()
+
+
+class TestBlobStore:
+    """Test the files on disk"""
+
+    def test_put_deduplicates_and_compresses(self, store):
+        digest, size, stored_size, deduplicated = store.put(CODE)
+        assert digest == content_digest(CODE.encode()) and size == len(CODE) and not deduplicated
+        assert stored_size < size / 10
+        assert store.path(digest) == store.root / digest[:2] / digest[2:4] / digest
+
+        assert store.put(CODE.encode()) == (digest, size, stored_size, True)
+        assert [d for d, _ in store.iter_digests()] == [digest]
+        assert store.get(digest).decode() == CODE
+
+    def test_read_range(self, store):
+        data = bytes(range(256)) * 4096  # 1 MiB, several decompression chunks
+        digest = store.put(data)[0]
+        assert store.read_range(digest, 1000, 10) == data[1000:1010]
+        assert store.read_range(digest, len(data) - 5) == data[-5:]
+        assert store.read_range(digest, len(data) + 10, 10) == b""
+        with pytest.raises(ValueError):
+            store.read_range(digest, -1)
+
+    def test_rejects_paths_that_are_not_digests(self, store):
+        with pytest.raises(ValueError):
+            store.path("../../etc/passwd")
+        with pytest.raises(FileNotFoundError):
+            store.get("0" * 64)
+
+
+class TestReferences:
+    """Test reference counting and garbage collection"""
+
+    @pytest.mark.asyncio
+    async def test_identical_content_is_shared(self, db, store):
+        user = User(username="alice", email="alice@test", hashed_password="")
+        db.add(user)
+        await db.flush()
+        for i in range(3):
+            digest = await store_blob(db, CODE)
+            db.add(Build(id=f"b{i}", user_id=user.id, project_name="p", requirements="r", generated_code_digest=digest))
+        await db.commit()
+
+        assert await refcount(db, digest) == 3
+        assert await load_text(digest) == CODE
+        assert await store_blob(db, "") is None and await load_text(None) is None
+        assert len(list(store.iter_digests())) == 1
+
+    @pytest.mark.asyncio
+    async def test_gc_removes_only_unreferenced_blobs(self, db, sync_db, store):
+        kept = await store_blob(db, "still used")
+        dropped = await store_blob(db, "no longer used")
+        await db.commit()
+        await release_blob(db, dropped)
+        await db.commit()
+        release_blobs(sync_db, [dropped, None])  # never below zero
+        sync_db.commit()
+        assert await refcount(db, dropped) == 0
+
+        # Within the grace period nothing goes
+        assert collect_garbage(sync_db, grace_seconds=3600) == (0, 0)
+
+        sync_db.execute(update(Blob).values(updated_at=datetime.utcnow() - timedelta(hours=2)))
+        sync_db.commit()
+        past = time.time() - 7200
+        for digest in (kept, dropped):
+            os.utime(store.path(digest), (past, past))
+
+        removed, freed = collect_garbage(sync_db, grace_seconds=3600)
+        assert removed == 1 and freed > 0
+        assert not store.exists(dropped) and await refcount(db, dropped) is None
+        assert store.exists(kept) and await refcount(db, kept) == 1
+
+    def test_release_blobs_counts_duplicates(self, sync_db, store):
+        digest = store.put("shared")[0]
+        sync_db.add(Blob(digest=digest, size=6, stored_size=15, refcount=3))
+        sync_db.commit()
+        release_blobs(sync_db, [digest, digest])
+        sync_db.commit()
+        assert sync_db.get(Blob, digest).refcount == 1
+
+    def test_gc_removes_old_orphaned_files(self, sync_db, store):
+        orphan = store.put("written by a rolled back transaction")[0]
+        fresh = store.put("being referenced right now")[0]
+        past = time.time() - 7200
+        os.utime(store.path(orphan), (past, past))
+
+        removed, freed = collect_garbage(sync_db, grace_seconds=3600)
+        assert removed == 1 and freed > 0
+        assert not store.exists(orphan) and store.exists(fresh)
+
+
+class TestMigration:
+    """Test moving Text columns into the store and back"""
+
+    def test_upgrade_and_downgrade(self, tmp_path, monkeypatch):
+        pytest.importorskip("alembic")
+        from alembic import command
+        from alembic.config import Config
+
+        monkeypatch.setattr(settings, "blob_store_dir", str(tmp_path / "blobs"))
+        url = f"sqlite:///{tmp_path / 'legacy.db'}"
+        engine = create_engine(url)
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE builds (id VARCHAR(36) PRIMARY KEY, user_id INTEGER NOT NULL, "
+                "project_name VARCHAR(255) NOT NULL, requirements TEXT NOT NULL, "
+                "generated_code TEXT, build_logs TEXT)"
+            ))
+            conn.execute(text(
+                "CREATE TABLE code_analysis (id VARCHAR(36) PRIMARY KEY, user_id INTEGER NOT NULL, "
+                "code_to_analyze TEXT NOT NULL)"
+            ))
+            for i in range(3):
+                conn.execute(
+                    text("INSERT INTO builds VALUES (:id, 1, 'p', 'r', :code, :logs)"),
+                    {"id": f"b{i}", "code": CODE, "logs": f"log {i}" if i else None},
+                )
+            conn.execute(text("INSERT INTO code_analysis VALUES ('a0', 1, :code)"), {"code": CODE})
+
+        config = Config(str(ROOT / "alembic.ini"))
+        config.set_main_option("script_location", str(ROOT / "alembic"))
+        config.set_main_option("sqlalchemy.url", url)
+        config.attributes["configure_logger"] = False
+        command.upgrade(config, "head")
+
+        store = BlobStore(tmp_path / "blobs")
+        digest = content_digest(CODE.encode())
+        with engine.connect() as conn:
+            builds = conn.execute(text("SELECT generated_code_digest, build_logs_digest FROM builds ORDER BY id")).all()
+            blobs = dict(conn.execute(text("SELECT digest, refcount FROM blobs")).all())
+            analysis = conn.execute(text("SELECT code_digest FROM code_analysis")).scalar()
+        assert [b[0] for b in builds] == [digest] * 3 and analysis == digest
+        assert builds[0][1] is None and store.get(builds[2][1]) == b"log 2"
+        assert blobs[digest] == 4 and len(blobs) == 3
+
+        command.downgrade(config, "0002")
+        with engine.connect() as conn:
+            restored = conn.execute(text("SELECT generated_code, build_logs FROM builds WHERE id = 'b1'")).one()
+            columns = [c["name"] for c in inspect(conn).get_columns("builds")]
+        assert restored == (CODE, "log 1") and "generated_code_digest" not in columns
+        engine.dispose()
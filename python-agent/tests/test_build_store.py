@@ -0,0 +1,131 @@
+"""
+Tests for the database-backed build and analysis stores: keyset history
+pages, guarded status updates, progress eviction and analysis records
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db import build_store
+from app.db.build_store import BuildProgress, decode_cursor, get_build_progress
+from app.models.database import Base, Build, BuildStatus
+
+
+@pytest_asyncio.fixture
+async def db(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'builds.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(bind=engine, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+
+async def seed(db, subject, count, start=datetime(2026, 1, 1)):
+    ids = []
+    for i in range(count):
+        build = await build_store.create_build(db, f"{subject}-{i:03d}", subject, f"p{i}", f"goal {i}")
+        # Two builds per timestamp, so the id tie-breaker matters
+        await db.execute(update(Build).where(Build.id == build.id).values(created_at=start + timedelta(minutes=i // 2)))
+        ids.append(build.id)
+    await db.commit()
+    return ids
+
+
+class TestHistory:
+    """Test keyset pagination of a user's builds"""
+
+    @pytest.mark.asyncio
+    async def test_cursor_pages_cover_history_once(self, db):
+        ids = await seed(db, "alice", 25)
+        await seed(db, "bob", 3)
+        expected = sorted(ids, key=lambda i: (i[-3:]), reverse=True)
+
+        seen, cursor = [], None
+        while True:
+            total, builds, cursor = await build_store.list_user_builds(db, "alice", 10, cursor=cursor)
+            assert total == 25
+            seen.extend(b.id for b in builds)
+            if cursor is None:
+                break
+        assert seen == expected
+
+        _, by_offset, _ = await build_store.list_user_builds(db, "alice", 10, offset=10)
+        assert [b.id for b in by_offset] == expected[10:20]
+
+    @pytest.mark.asyncio
+    async def test_cursor_is_stable_under_new_builds(self, db):
+        await seed(db, "alice", 6)
+        _, first, cursor = await build_store.list_user_builds(db, "alice", 3)
+        await build_store.create_build(db, "alice-new", "alice", "p", "g")
+        _, second, _ = await build_store.list_user_builds(db, "alice", 3, cursor=cursor)
+        assert {b.id for b in first} | {b.id for b in second} == {f"alice-{i:03d}" for i in range(6)}
+
+    @pytest.mark.asyncio
+    async def test_unknown_user_and_bad_cursor(self, db):
+        assert await build_store.list_user_builds(db, "nobody", 10) == (0, [], None)
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor")
+
+    @pytest.mark.asyncio
+    async def test_history_uses_user_index(self, db):
+        await seed(db, "alice", 3)
+        plan = (await db.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM builds WHERE user_id = 1 "
+            "AND (created_at, id) < ('2026-02-01', 'z') ORDER BY created_at DESC, id DESC LIMIT 11"
+        ))).all()
+        assert "idx_user_builds" in " ".join(str(row) for row in plan)
+
+
+class TestStatus:
+    """Test guarded partial status updates and progress tracking"""
+
+    @pytest.mark.asyncio
+    async def test_late_completion_does_not_overwrite_cancel(self, db):
+        await build_store.create_build(db, "b1", "alice", "p", "g")
+        assert await build_store.set_build_status(db, "b1", BuildStatus.CANCELLED)
+        assert not await build_store.set_build_status(db, "b1", BuildStatus.RUNNING, expected=[BuildStatus.PENDING])
+        assert not await build_store.set_build_status(db, "b1", BuildStatus.COMPLETED, expected=[BuildStatus.RUNNING])
+
+        build, owner = await build_store.get_build(db, "b1")
+        await db.refresh(build)
+        assert owner == "alice" and build.status == BuildStatus.CANCELLED
+        assert build_store.api_status(BuildStatus.PENDING) == "initializing"
+
+    @pytest.mark.asyncio
+    async def test_progress_dropped_when_build_finishes(self, db):
+        await build_store.create_build(db, "b2", "alice", "p", "g")
+        await build_store.set_build_status(db, "b2", BuildStatus.RUNNING, expected=[BuildStatus.PENDING])
+        get_build_progress().set("b2", 50)
+        assert get_build_progress().get("b2", BuildStatus.RUNNING) == 50
+
+        await build_store.set_build_status(db, "b2", BuildStatus.COMPLETED, test_results={"ok": True})
+        assert get_build_progress().get("b2", BuildStatus.COMPLETED) == 100
+        assert "b2" not in get_build_progress()._progress
+
+    def test_progress_is_bounded(self):
+        progress = BuildProgress(max_entries=3)
+        for i in range(5):
+            progress.set(f"b{i}", i)
+        assert len(progress) == 3
+        assert progress.get("b0", BuildStatus.RUNNING) == 0
+        assert progress.get("b4", BuildStatus.RUNNING) == 4
+
+
+class TestAnalyses:
+    """Test analysis records"""
+
+    @pytest.mark.asyncio
+    async def test_create_and_get(self, db):
+        await build_store.create_analysis(
+            db, "a1", "alice", project_name="proj", quality_score=8.5,
+            code_smells=["long method"], recommendations=["split it"],
+        )
+        analysis, owner = await build_store.get_analysis(db, "a1")
+        assert owner == "alice" and analysis.project_name == "proj"
+        assert analysis.code_smells == ["long method"] and analysis.type_errors == []
+        assert await build_store.get_analysis(db, "missing") is None
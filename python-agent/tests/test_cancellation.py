@@ -0,0 +1,218 @@
+"""
+Tests for cooperative cancellation: scopes, supersession, subprocesses and
+the agent / workflow / Telegram wiring
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import psutil
+import pytest
+
+from app.core.cancellation import CancellationRegistry, OperationCancelled, checkpoint
+from app.monitoring.metrics import get_metrics
+
+
+def cancellation_count(operation: str, reason: str) -> float:
+    return get_metrics().cancellations_total.labels(operation=operation, reason=reason)._value.get()
+
+
+class TestCancellationRegistry:
+    """Test scope lifecycle and how cancellation reaches the caller"""
+
+    @pytest.mark.asyncio
+    async def test_cancel_releases_quickly(self):
+        registry = CancellationRegistry()
+        before = cancellation_count("slow", "api")
+
+        runner = asyncio.create_task(registry.run("job:1", asyncio.sleep(30), operation="slow"))
+        await asyncio.sleep(0.01)
+        assert registry.is_running("job:1")
+
+        started = time.perf_counter()
+        assert registry.cancel("job:1", reason="api")
+        with pytest.raises(OperationCancelled) as exc:
+            await runner
+        assert time.perf_counter() - started < 0.1
+        assert exc.value.reason == "api"
+        assert registry.in_flight() == {}
+        assert cancellation_count("slow", "api") == before + 1
+        assert not registry.cancel("job:1")
+
+    @pytest.mark.asyncio
+    async def test_new_work_supersedes_old(self):
+        registry = CancellationRegistry()
+        first = asyncio.create_task(registry.run("agent:7", asyncio.sleep(30)))
+        await asyncio.sleep(0.01)
+
+        assert await registry.run("agent:7", asyncio.sleep(0, result="second")) == "second"
+        with pytest.raises(OperationCancelled) as exc:
+            await first
+        assert exc.value.reason == "superseded"
+
+    @pytest.mark.asyncio
+    async def test_caller_cancellation_propagates(self):
+        registry = CancellationRegistry()
+        inner_cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                inner_cancelled.set()
+                raise
+
+        caller = asyncio.create_task(registry.run("job:2", work()))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        assert inner_cancelled.is_set()
+
+    @pytest.mark.asyncio
+    async def test_checkpoint_stops_worker_thread(self):
+        registry = CancellationRegistry()
+        stopped = threading.Event()
+
+        def blocking_steps():
+            try:
+                for _ in range(3000):
+                    checkpoint()
+                    time.sleep(0.001)
+            except asyncio.CancelledError:
+                stopped.set()
+
+        runner = asyncio.create_task(registry.run("job:3", asyncio.to_thread(blocking_steps)))
+        await asyncio.sleep(0.02)
+        registry.cancel("job:3")
+        with pytest.raises(OperationCancelled):
+            await runner
+        assert await asyncio.to_thread(stopped.wait, 1.0)
+
+
+class TestCommandCancellation:
+    """Test that cancelling an async command kills the subprocess"""
+
+    @pytest.fixture(autouse=True)
+    def interpreter_on_path(self, monkeypatch):
+        from app.services.command_executor import SecureCommandExecutor
+
+        safe_env = SecureCommandExecutor._create_safe_env.__func__
+        bin_dir = os.path.dirname(sys.executable)
+
+        def env(cls):
+            result = safe_env(cls)
+            result["PATH"] = f"{bin_dir}:{result['PATH']}"
+            return result
+
+        monkeypatch.setattr(SecureCommandExecutor, "_create_safe_env", classmethod(env))
+
+    @pytest.mark.asyncio
+    async def test_cancel_kills_process(self):
+        from app.services.command_executor import SecureCommandExecutor
+
+        me = psutil.Process()
+        runner = asyncio.create_task(
+            SecureCommandExecutor.execute_async("python -m timeit -n 1000000000 pass", timeout=60)
+        )
+        for _ in range(100):
+            await asyncio.sleep(0.02)
+            if me.children():
+                break
+        assert me.children()
+
+        runner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await runner
+        assert [p for p in me.children() if p.status() != psutil.STATUS_ZOMBIE] == []
+
+    @pytest.mark.asyncio
+    async def test_completes_normally(self):
+        from app.services.command_executor import SecureCommandExecutor
+
+        result = await SecureCommandExecutor.execute_async("python --version")
+        assert result.success
+        assert "Python" in result.stdout + result.stderr
+
+    @pytest.mark.asyncio
+    async def test_git_runs_async(self, tmp_path, monkeypatch):
+        from app.core.config import settings
+        from app.services.command_executor import SecureCommandExecutor
+
+        monkeypatch.setattr(settings, "workspace_dir", str(tmp_path))
+        result = await SecureCommandExecutor.execute_git_command("git init -q", tmp_path / "repo")
+        assert result.success and (tmp_path / "repo" / ".git").is_dir()
+
+
+class TestAgentCancellation:
+    """Test supersession through the agent handler and Telegram processor"""
+
+    @pytest.mark.asyncio
+    async def test_process_message_cancelled(self):
+        from app.integrations.agent_handler import AgentHandler
+
+        handler = AgentHandler()
+        model_released = asyncio.Event()
+
+        async def slow_reply(user_id, message, context_type):
+            try:
+                await asyncio.sleep(30)  # model generating
+            finally:
+                model_released.set()
+
+        handler._process_message = slow_reply
+        pending = asyncio.create_task(handler.process_message(99, "write a novel"))
+        await asyncio.sleep(0.01)
+
+        started = time.perf_counter()
+        assert handler.cancel_processing(99, reason="superseded")
+        result = await pending
+        assert time.perf_counter() - started < 0.1
+        assert model_released.is_set()
+        assert result["cancelled"] and result["reason"] == "superseded"
+
+    @pytest.mark.asyncio
+    async def test_busy_chat_triggers_supersede_hook(self):
+        from telegram import Update
+
+        from app.integrations.telegram_updates import ChatOrderedUpdateProcessor
+
+        def make_update(update_id, chat_id):
+            return {"update_id": update_id, "message": {
+                "message_id": update_id, "date": 0, "chat": {"id": chat_id, "type": "private"}, "text": "hi"}}
+
+        busy = []
+        processor = ChatOrderedUpdateProcessor(4, on_chat_busy=lambda u: busy.append(u.update_id))
+
+        async def handle():
+            await asyncio.sleep(0.01)
+
+        updates = [Update.de_json(make_update(i, 5), None) for i in (1, 2)]
+        await asyncio.gather(*(processor.process_update(u, handle()) for u in updates))
+        assert busy == [2]
+
+    @pytest.mark.asyncio
+    async def test_workflow_stops_between_nodes(self):
+        import app.integrations  # noqa: F401  (import order of the workflow module)
+        from app.agents.full_workflow import AgentWorkflow
+        from app.core.cancellation import get_cancellation_registry
+
+        ran = []
+
+        async def step(state):
+            ran.append(state)
+            get_cancellation_registry().cancel("job:wf")
+            return state
+
+        node = AgentWorkflow._cancellable(step)
+
+        async def two_steps():
+            state = await node({"n": 1})
+            return await node(state)
+
+        with pytest.raises(OperationCancelled):
+            await get_cancellation_registry().run("job:wf", two_steps())
+        assert len(ran) == 1
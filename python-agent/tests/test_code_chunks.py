@@ -0,0 +1,73 @@
+"""
+Tests for AST-aware and windowed code chunking
+"""
+
+from app.db.code_chunks import chunk_file, chunk_python, chunk_windows, language_for_path
+
+
+SOURCE = '''"""Module doc"""
+import os
+
+LIMIT = 3
+
+
+@decorator
+def first(a):
+    return a
+
+
+class Small:
+    value = 1
+
+    def method(self):
+        return self.value
+'''
+
+
+class TestPythonChunks:
+    """Test function/class splitting with line ranges"""
+
+    def test_top_level_units(self):
+        chunks = chunk_python(SOURCE)
+
+        assert [(c.kind, c.symbol, c.start_line, c.end_line) for c in chunks] == [
+            ("module", "", 1, 4),
+            ("function", "first", 7, 9),
+            ("class", "Small", 12, 16),
+        ]
+        assert chunks[1].text.startswith("@decorator")
+
+    def test_large_class_split_into_methods(self):
+        body = "\n".join(f"    def m{i}(self):\n        return {i}\n" for i in range(40))
+        source = f"class Big:\n    '''doc'''\n\n{body}"
+
+        chunks = chunk_python(source, max_chars=200)
+
+        assert chunks[0].kind == "class" and chunks[0].end_line == 2
+        methods = [c for c in chunks if c.kind == "method"]
+        assert len(methods) == 40
+        assert methods[1].symbol == "Big.m1"
+        assert source.splitlines()[methods[1].start_line - 1].strip() == "def m1(self):"
+
+    def test_syntax_error_falls_back_to_windows(self):
+        assert chunk_python("def broken(:\n    pass\n") is None
+        chunks = chunk_file("def broken(:\n    pass\n", "python")
+        assert [c.kind for c in chunks] == ["window"]
+
+
+class TestWindows:
+    """Test size-bounded windows for other languages"""
+
+    def test_windows_bounded_with_overlap(self):
+        source = "\n".join(f"line {i:03d}" for i in range(100))
+
+        chunks = chunk_windows(source, max_chars=100, overlap_lines=2)
+
+        assert all(len(c.text) <= 100 for c in chunks)
+        assert chunks[0].start_line == 1
+        assert chunks[-1].end_line == 100
+        assert chunks[1].start_line == chunks[0].end_line - 1
+
+    def test_language_detection(self):
+        assert language_for_path("src/App.TSX") == "typescript"
+        assert language_for_path("Makefile") == "text"
@@ -0,0 +1,126 @@
+"""
+Tests for the database engines: async URL mapping, SQLite tuning, pool wait
+metrics, the async session dependency and the database health check
+"""
+
+import threading
+
+import pytest
+import pytest_asyncio
+from prometheus_client import REGISTRY
+from pydantic import SecretStr
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import app.db.session as db_session
+from app.core.config import settings
+from app.db.session import (
+    TimedAsyncQueuePool, TimedQueuePool, engine_options, get_async_database_url, sqlite_pragmas,
+)
+from app.monitoring.metrics import HealthCheck, get_metrics
+
+
+def sample(name, engine):
+    return REGISTRY.get_sample_value(name, {"engine": engine}) or 0.0
+
+
+class TestUrls:
+    """Test the sync to async driver mapping"""
+
+    @pytest.mark.parametrize("url, expected", [
+        ("sqlite:///./app.db", "sqlite+aiosqlite:///./app.db"),
+        ("postgresql://u:p@db:5432/agent", "postgresql+asyncpg://u:p@db:5432/agent"),
+        ("postgresql+psycopg2://u:p@db/agent", "postgresql+asyncpg://u:p@db/agent"),
+    ])
+    def test_async_driver(self, monkeypatch, url, expected):
+        monkeypatch.setattr(settings, "database_url", SecretStr(url))
+        assert get_async_database_url() == expected
+
+    def test_unknown_backend(self, monkeypatch):
+        monkeypatch.setattr(settings, "database_url", SecretStr("oracle://u:p@db/agent"))
+        with pytest.raises(ValueError):
+            get_async_database_url()
+
+    def test_mysql_rejected_by_config(self):
+        from pydantic import ValidationError
+        from app.core.config import Settings
+
+        with pytest.raises(ValidationError, match="MySQL is not supported"):
+            Settings(database_url="mysql://u:p@db/agent")
+
+    def test_pool_in_every_environment(self, monkeypatch):
+        monkeypatch.setattr(settings, "environment", "development")
+        options = engine_options("sqlite:///./app.db", TimedQueuePool)
+        assert options["poolclass"] is TimedQueuePool
+        assert options["pool_size"] == settings.db_pool_size
+        assert engine_options("postgresql+asyncpg://db/agent", TimedAsyncQueuePool)["connect_args"] == {"timeout": 10}
+
+
+class TestPool:
+    """Test SQLite pragmas and pool wait recording"""
+
+    @pytest.mark.asyncio
+    async def test_async_engine_pragmas(self, tmp_path):
+        url = f"sqlite+aiosqlite:///{tmp_path / 'tuned.db'}"
+        engine = create_async_engine(url, **engine_options(url, TimedAsyncQueuePool))
+        event.listen(engine.sync_engine, "connect", sqlite_pragmas)
+        try:
+            async with engine.connect() as conn:
+                assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+                assert (await conn.execute(text("PRAGMA cache_size"))).scalar() == settings.db_sqlite_cache_size
+                assert (await conn.execute(text("PRAGMA foreign_keys"))).scalar() == 1
+        finally:
+            await engine.dispose()
+
+    def test_wait_and_timeout_recorded(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "db_pool_size", 1)
+        monkeypatch.setattr(settings, "db_max_overflow", 0)
+        monkeypatch.setattr(settings, "db_pool_timeout", 0.2)
+        url = f"sqlite:///{tmp_path / 'pool.db'}"
+        engine = create_engine(url, **engine_options(url, TimedQueuePool))
+        get_metrics()
+        waits, timeouts = sample("db_pool_wait_seconds_count", "sync"), sample("db_pool_timeouts_total", "sync")
+        try:
+            held = engine.connect()
+            with pytest.raises(PoolTimeoutError):
+                engine.connect()
+            assert sample("db_pool_timeouts_total", "sync") == timeouts + 1
+
+            # A waiter is served as soon as the held connection goes back
+            released = threading.Timer(0.05, held.close)
+            released.start()
+            with engine.connect() as conn:
+                assert conn.execute(text("SELECT 1")).scalar() == 1
+            released.join()
+            assert sample("db_pool_wait_seconds_count", "sync") == waits + 3
+            assert sample("db_pool_wait_seconds_sum", "sync") >= 0.2
+        finally:
+            engine.dispose()
+
+
+class TestAsyncSessions:
+    """Test the FastAPI dependency and the health check on the async engine"""
+
+    @pytest_asyncio.fixture
+    async def factory(self, tmp_path, monkeypatch):
+        url = f"sqlite+aiosqlite:///{tmp_path / 'health.db'}"
+        engine = create_async_engine(url, **engine_options(url, TimedAsyncQueuePool))
+        factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+        monkeypatch.setattr(db_session, "AsyncSessionLocal", factory)
+        yield factory
+        await engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_get_db_yields_async_session(self, factory):
+        dependency = db_session.get_db()
+        db = await anext(dependency)
+        assert isinstance(db, AsyncSession)
+        assert (await db.execute(text("SELECT 1"))).scalar() == 1
+        await dependency.aclose()
+
+    @pytest.mark.asyncio
+    async def test_health_check_uses_async_engine(self, factory):
+        before = sample("db_pool_wait_seconds_count", "async")
+        assert await HealthCheck().check_database() is True
+        assert sample("db_pool_wait_seconds_count", "async") == before + 1
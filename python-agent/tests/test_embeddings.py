@@ -0,0 +1,157 @@
+"""
+Tests for the embedding backends: the deterministic hashed fallback, backend
+selection when no model is reachable, and a store running on the fallback
+"""
+
+import uuid
+
+import numpy as np
+import pytest
+
+import app.db.embeddings as embeddings
+from app.db.embeddings import HashedEmbeddingBackend, select_embedding_backend
+from app.monitoring.metrics import get_metrics
+
+
+def cosine(a, b):
+    return float(np.dot(a, b))  # vectors are L2-normalized
+
+
+class TestHashedBackend:
+    """Test determinism, shape and similarity of the hashed backend"""
+
+    def test_deterministic_and_normalized(self):
+        texts = ["def parse_config(path):\n    return load(path)", "SELECT * FROM builds"]
+        first = HashedEmbeddingBackend().embed(texts)
+        second = HashedEmbeddingBackend().embed(texts)
+
+        assert first.shape == (2, 384) and first.dtype == np.float32
+        assert np.array_equal(first, second)
+        assert np.allclose(np.linalg.norm(first, axis=1), 1.0, atol=1e-5)
+
+    def test_batch_matches_single(self):
+        backend = HashedEmbeddingBackend(dimension=128)
+        texts = ["alpha beta", "", "gamma", "ab", "x" * 5000]
+        batch = backend.embed(texts)
+        for i, text in enumerate(texts):
+            assert np.allclose(batch[i], backend.embed([text])[0], atol=1e-6)
+        assert not batch[1].any() and not batch[3].any()  # too short for any n-gram
+
+    def test_similar_code_scores_higher(self):
+        backend = HashedEmbeddingBackend()
+        query, near, far = backend.embed([
+            "def load_user_profile(user_id):",
+            "def load_user_profiles(user_ids):\n    return [get(u) for u in user_ids]",
+            "Kubernetes ingress timeout annotations",
+        ])
+        assert cosine(query, near) > cosine(query, far) + 0.2
+
+    def test_chroma_callable(self):
+        vectors = HashedEmbeddingBackend(dimension=16)(["one", "two"])
+        assert len(vectors) == 2 and vectors[0].shape == (16,)
+
+
+class Unreachable(embeddings.EmbeddingBackend):
+    def __init__(self, name, dimension=768):
+        self.name = name
+        self.dimension = dimension
+        self.reachable = False
+
+    def embed(self, texts):
+        if not self.reachable:
+            raise ConnectionError("connection refused")
+        return np.zeros((len(texts), self.dimension), dtype=np.float32)
+
+
+class TestSelection:
+    """Test that startup falls back to a usable backend"""
+
+    @pytest.fixture
+    def models(self, monkeypatch):
+        models = {"ollama": Unreachable("ollama", 768), "onnx": Unreachable("onnx", 384)}
+        create = embeddings._create
+        monkeypatch.setattr(
+            embeddings, "_create", lambda name, dimension: models.get(name) or create(name, dimension)
+        )
+        return models
+
+    def test_falls_back_to_hashed(self, models):
+        backend = select_embedding_backend("auto")
+        assert backend.name == "hashed" and backend.dimension == 384
+        samples = get_metrics().embedding_backend_info.collect()[0].samples
+        assert [(s.labels["backend"], s.value) for s in samples] == [("hashed", 1.0)]
+
+    def test_prefers_reachable_model(self, models):
+        models["ollama"].reachable = True
+        assert select_embedding_backend("auto").name == "ollama"
+
+    def test_keeps_store_dimension(self, models):
+        models["ollama"].reachable = models["onnx"].reachable = True
+        assert select_embedding_backend("auto", store_dimension=384).name == "onnx"
+
+        models["onnx"].reachable = False
+        backend = select_embedding_backend("auto", store_dimension=384)
+        assert backend.name == "hashed" and backend.dimension == 384
+
+    def test_explicit_hashed(self, models):
+        models["ollama"].reachable = True
+        assert select_embedding_backend("hashed", store_dimension=96).dimension == 96
+
+    def test_refuses_other_model(self, models):
+        models["ollama"].reachable = models["onnx"].reachable = True
+        models["ollama"].model = "nomic-embed-text"
+        stored = {"embedding_backend": "ollama", "embedding_model": "mxbai-embed-large"}
+        with pytest.raises(RuntimeError, match="re-index"):
+            select_embedding_backend("auto", store_dimension=768, store_identity=stored)
+
+        models["ollama"].model = "mxbai-embed-large"
+        assert select_embedding_backend("auto", store_dimension=768, store_identity=stored).name == "ollama"
+
+
+class TestOfflineStore:
+    """Test a real (in-memory) Chroma store on the hashed backend"""
+
+    @pytest.mark.asyncio
+    async def test_index_and_search(self, tmp_path, monkeypatch):
+        chromadb = pytest.importorskip("chromadb")
+        from chromadb.config import Settings as ChromaSettings
+        from app.core.config import settings
+        from app.db.vector import VectorStore
+
+        monkeypatch.setattr(settings, "data_dir", str(tmp_path))
+        monkeypatch.setattr(settings, "embedding_backend", "hashed")
+        tenant = chromadb.EphemeralClient(settings=ChromaSettings(anonymized_telemetry=False))
+        for collection in tenant.list_collections():  # ephemeral clients share state in-process
+            tenant.delete_collection(collection.name)
+        store = VectorStore(client=tenant)
+        try:
+            assert store.embedding_function.name == "hashed"
+            build = f"b-{uuid.uuid4().hex[:6]}"
+            await store.add_code_snippet("def send_invoice_email(order):\n    mailer.send(order.email)",
+                                         build, "billing.py", "python")
+            await store.add_code_snippet("class RateLimiter:\n    def allow(self, key): ...",
+                                         build, "limits.py", "python")
+
+            hits = await store.query_collection("code_snippets", "send invoice email", n_results=2)
+            assert hits[0]["metadata"]["file_path"] == "billing.py"
+            assert store._stored_dimension() == 384
+            assert store.code_collection.metadata["embedding_backend"] == "hashed"
+        finally:
+            await store.close()
+
+    @pytest.mark.asyncio
+    async def test_store_refuses_other_model(self, tmp_path, monkeypatch):
+        from app.core.config import settings
+        from app.db.local_index import LocalIndexClient
+        from app.db.vector import VectorStore
+
+        monkeypatch.setattr(settings, "data_dir", str(tmp_path))
+        monkeypatch.setattr(settings, "embedding_backend", "hashed")
+        store = VectorStore(client=LocalIndexClient(str(tmp_path / "index")))
+        await store.add_code_snippet("def ping(): ...", "b-1", "ping.py", "python")
+        await store.close()
+
+        # Same backend and dimension, different projection: the stored vectors are meaningless to it
+        monkeypatch.setattr(embeddings, "_create", lambda name, dimension: HashedEmbeddingBackend(seed=1))
+        with pytest.raises(RuntimeError, match="hashed"):
+            VectorStore(client=LocalIndexClient(str(tmp_path / "index")))
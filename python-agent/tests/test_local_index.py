@@ -0,0 +1,184 @@
+"""
+Tests for the built-in vector index: Chroma-compatible semantics, filters,
+persistence and crash recovery, compaction, IVF recall, and VectorStore on
+the local engine
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+import app.db.local_index as local_index
+from app.core.config import settings
+from app.db.local_index import LocalIndexClient, where_sql
+
+
+def rows(n, dim=16, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+@pytest.fixture
+def client(tmp_path):
+    client = LocalIndexClient(str(tmp_path / "index"))
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def collection(client):
+    collection = client.get_or_create_collection("code_snippets", embedding_function=None)
+    vectors = rows(6)
+    collection.add(
+        ids=[f"d{i}" for i in range(6)], embeddings=vectors, documents=[f"doc {i}" for i in range(6)],
+        metadatas=[{"build_id": "b1" if i < 4 else "b2", "n": i, "ok": i % 2 == 0} for i in range(6)],
+    )
+    collection.vectors = vectors
+    return collection
+
+
+class TestCollectionApi:
+    """Test the Chroma collection semantics VectorStore relies on"""
+
+    def test_query_returns_squared_l2(self, collection):
+        query = collection.vectors[2] + 0.01
+        result = collection.query(query_embeddings=[query], n_results=3)
+
+        expected = ((collection.vectors - query) ** 2).sum(axis=1)
+        assert result["ids"][0] == [f"d{i}" for i in np.argsort(expected)[:3]]
+        assert result["ids"][0][0] == "d2" and result["documents"][0][0] == "doc 2"
+        assert np.allclose(result["distances"][0], np.sort(expected)[:3], rtol=1e-2, atol=1e-2)
+        assert result["metadatas"][0][0] == {"build_id": "b1", "n": 2, "ok": True}
+
+    def test_add_keeps_existing_upsert_replaces(self, collection):
+        collection.add(ids=["d0"], embeddings=rows(1, seed=9), documents=["new"])
+        assert collection.get(ids=["d0"])["documents"] == ["doc 0"]
+
+        collection.upsert(ids=["d0"], embeddings=collection.vectors[5:6] * 0 + 100, documents=["new"])
+        assert collection.get(ids=["d0"])["documents"] == ["new"]
+        assert collection.count() == 6
+        hits = collection.query(query_embeddings=[np.full(16, 100.0)], n_results=1)
+        assert hits["ids"] == [["d0"]]
+
+    def test_where_filters(self, collection):
+        def ids(where):
+            return sorted(collection.get(where=where)["ids"])
+
+        assert ids({"build_id": "b2"}) == ["d4", "d5"]
+        assert ids({"build_id": {"$in": ["b2"]}, "n": {"$ne": 4}}) == ["d5"]
+        assert ids({"$and": [{"build_id": {"$eq": "b1"}}, {"ok": True}]}) == ["d0", "d2"]
+        assert ids({"$or": [{"n": {"$gte": 5}}, {"n": {"$lt": 1}}]}) == ["d0", "d5"]
+        assert ids({"missing": {"$ne": "x"}}) == [f"d{i}" for i in range(6)]
+
+        hits = collection.query(query_embeddings=[collection.vectors[0]], n_results=10, where={"build_id": "b2"})
+        assert sorted(hits["ids"][0]) == ["d4", "d5"]
+        with pytest.raises(ValueError):
+            where_sql({"n": {"$regex": "x"}})
+
+    def test_update_and_delete(self, collection):
+        collection.update(ids=["d1"], metadatas=[{"build_id": "b9"}])
+        assert collection.get(where={"build_id": "b9"})["ids"] == ["d1"]
+
+        collection.delete(where={"build_id": {"$eq": "b1"}})
+        collection.delete(ids=["d5"])
+        assert collection.count() == 2
+        assert collection.get()["ids"] == ["d1", "d4"]
+        assert set(collection.query(query_embeddings=[collection.vectors[0]], n_results=10)["ids"][0]) == {"d1", "d4"}
+
+    def test_dimension_is_enforced(self, collection):
+        with pytest.raises(ValueError):
+            collection.add(ids=["x"], embeddings=rows(1, dim=8))
+        assert collection.peek(1)["embeddings"].shape == (1, 16)
+
+
+class TestPersistence:
+    """Test reopening, crash leftovers and compaction"""
+
+    def test_reopen_and_torn_append(self, tmp_path, collection):
+        path = tmp_path / "index"
+        before = collection.query(query_embeddings=[collection.vectors[3]], n_results=6)
+        collection._file.write(b"\x00" * 10)  # half a row, never committed
+        collection._file.flush()
+
+        reopened_client = LocalIndexClient(str(path))
+        reopened = reopened_client.get_or_create_collection("code_snippets")
+        try:
+            assert reopened.count() == 6 and reopened._rows == 6
+            after = reopened.query(query_embeddings=[collection.vectors[3]], n_results=6)
+            assert after["ids"] == before["ids"]
+            assert [c.name for c in reopened_client.list_collections()] == ["code_snippets"]
+        finally:
+            reopened_client.close()
+
+    def test_compaction_reclaims_and_keeps_results(self, collection):
+        collection.upsert(ids=["d0", "d1"], embeddings=rows(2, seed=3), documents=["a", "b"])
+        collection.delete(ids=["d2"])
+        query = collection.vectors[4]
+        before = collection.query(query_embeddings=[query], n_results=5)
+        size_before = os.path.getsize(collection._vector_path(collection.generation))
+
+        assert collection.compact() == 3
+        assert collection.generation == 1 and collection._rows == 5
+        assert os.path.getsize(collection._vector_path(1)) < size_before
+        assert not os.path.exists(collection._vector_path(0))
+        assert collection.query(query_embeddings=[query], n_results=5)["ids"] == before["ids"]
+        assert collection.get(ids=["d0"])["documents"] == ["a"]
+
+    def test_background_compaction(self, client, collection, monkeypatch):
+        monkeypatch.setattr(local_index, "COMPACT_MIN_DEAD", 2)
+        collection.delete(ids=["d0", "d1", "d2"])
+        client.wait_for_maintenance()
+        assert collection.generation == 1 and collection._rows == 3
+        assert collection.get()["ids"] == ["d3", "d4", "d5"]
+
+
+class TestIVF:
+    """Test the coarse quantizer against exact search"""
+
+    def test_recall(self, client, monkeypatch):
+        monkeypatch.setattr(settings, "local_index_ivf_min_rows", 1000)
+        monkeypatch.setattr(settings, "local_index_ivf_probes", 8)
+        rng = np.random.default_rng(1)
+        centers = rng.standard_normal((40, 32)) * 4
+        data = (centers[rng.integers(0, 40, 4000)] + rng.standard_normal((4000, 32))).astype(np.float32)
+        collection = client.get_or_create_collection("ivf_test")
+        collection.add(ids=[str(i) for i in range(4000)], embeddings=data)
+        client.wait_for_maintenance()
+        assert collection._ivf is not None and collection._ivf.centroids.shape[0] == 63
+
+        queries = data[:50] + 0.1
+        approx = collection.query(query_embeddings=queries, n_results=10)["ids"]
+        exact = np.argsort(((data[None, :, :] - queries[:, None, :]) ** 2).sum(axis=2), axis=1)[:, :10]
+        recall = np.mean([len(set(a) & {str(i) for i in e}) / 10 for a, e in zip(approx, exact)])
+        assert recall >= 0.9
+
+        # Rows added after training are assigned to lists and found
+        collection.add(ids=["late"], embeddings=data[7:8] + 0.001)
+        assert "late" in collection.query(query_embeddings=[data[7]], n_results=2)["ids"][0]
+
+
+class TestVectorStoreEngine:
+    """Test VectorStore running on the local engine"""
+
+    @pytest.mark.asyncio
+    async def test_store_on_local_index(self, tmp_path, monkeypatch):
+        from app.db.vector import VectorStore
+
+        monkeypatch.setattr(settings, "data_dir", str(tmp_path))
+        monkeypatch.setattr(settings, "vector_store_engine", "local")
+        monkeypatch.setattr(settings, "embedding_backend", "hashed")
+        store = VectorStore()
+        assert isinstance(store.client, LocalIndexClient)
+        try:
+            await store.add_code_snippet("def send_invoice_email(order):\n    mailer.send(order)", "b1", "billing.py", "python")
+            await store.add_code_snippet("class RateLimiter:\n    def allow(self, key): ...", "b1", "limits.py", "python")
+            await store.add_documentation("Invoices are emailed nightly", "b1", "readme")
+
+            found = await store.hybrid_search("send invoice email", n_results=3)
+            assert found["code_snippets"][0]["metadata"]["file_path"] == "billing.py"
+
+            await store.delete_build_vectors("b1")
+            assert store.code_collection.count() == 0
+        finally:
+            await store.close()
+        assert os.path.isdir(tmp_path / "local_index" / "code_snippets")
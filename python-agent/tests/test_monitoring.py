@@ -0,0 +1,61 @@
+"""
+Tests for monitoring helpers: telemetry ring buffer and sampler
+"""
+
+import numpy as np
+import pytest
+
+from app.monitoring.telemetry import FIELDS, TelemetryBuffer, TelemetrySampler
+
+
+def make_sample(value: float) -> np.ndarray:
+    return np.full(len(FIELDS), value, dtype=np.float64)
+
+
+class TestTelemetryBuffer:
+    """Test ring buffer semantics"""
+
+    def test_empty_buffer(self):
+        buffer = TelemetryBuffer(4)
+        assert buffer.latest() is None
+        assert buffer.window_mean(3) is None
+        assert len(buffer.window(3)) == 0
+
+    def test_latest_and_wraparound(self):
+        buffer = TelemetryBuffer(4)
+        for value in range(10):
+            buffer.append(make_sample(value))
+
+        assert len(buffer) == 4
+        assert buffer.latest()["cpu_percent"] == 9
+        assert buffer.window(10)[:, 1].tolist() == [6, 7, 8, 9]
+
+    def test_window_mean_matches_numpy(self):
+        buffer = TelemetryBuffer(5)
+        values = [3.0, 8.0, 1.0, 9.0, 4.0, 7.0, 2.0, 6.0]
+        for value in values:
+            buffer.append(make_sample(value))
+
+        for n in range(1, 6):
+            assert buffer.window_mean(n)["memory_percent"] == pytest.approx(np.mean(values[-n:]))
+        # Windows larger than the buffer are clamped to its capacity
+        assert buffer.window_mean(50)["samples"] == 5
+
+
+class TestTelemetrySampler:
+    """Test sampling against the real host"""
+
+    def test_sample_once_populates_all_fields(self):
+        pytest.importorskip("psutil")
+        sampler = TelemetrySampler(interval=60, capacity=8)
+        assert sampler.start()
+        try:
+            sample = sampler.latest()
+            assert set(sample) == set(FIELDS)
+            assert 0 <= sample["memory_percent"] <= 100
+            assert sample["process_rss_mb"] > 0
+            assert sampler.aggregate(120)["samples"] == 1
+            assert sampler.peak("disk_percent") == sample["disk_percent"]
+        finally:
+            sampler.stop()
+        assert not sampler.running
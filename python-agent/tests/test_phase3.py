@@ -90,7 +90,6 @@ class TestDatabaseModels:
         analysis = CodeAnalysis(
             id="analysis-123",
             user_id=user.id,
-            code_to_analyze="print('hello')",
             quality_score=8.5,
             security_score=9.0
         )
@@ -115,7 +114,7 @@ class TestDatabaseModels:
         retrieved = test_db.query(VectorMemory).filter_by(id="mem-123").first()
         assert retrieved is not None
         assert retrieved.language == "python"
-        assert len(retrieved.embedding) == 768
+        assert retrieved.vector.shape == (768,)
     
     def test_telegram_user_linking(self, test_db):
         """Test Telegram user linking"""
@@ -397,7 +396,6 @@ class TestPhase3Integration:
             project_name="test",
             requirements="test",
             status=BuildStatus.RUNNING,
-            generated_code="def hello(): pass"
         )
         test_db.add(build)
         test_db.commit()
@@ -405,7 +403,7 @@ class TestPhase3Integration:
         # Add to vector store
         vector_store = VectorStore()
         await vector_store.add_code_snippet(
-            code=build.generated_code,
+            code="def hello(): pass",
             build_id=build.id,
             file_path="main.py",
             language="python"
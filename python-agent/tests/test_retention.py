@@ -0,0 +1,164 @@
+"""
+Tests for retention: batched deletes per policy, blob release and garbage
+collection, SQLite compaction, the Celery task and the in-process job
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event, func, select, text
+from sqlalchemy.orm import Session
+
+import app.db.blob_store as blob_store
+import app.db.retention as retention
+from app.core.config import settings
+from app.db.blob_store import BlobStore
+from app.db.retention import RetentionJob, RetentionReport, run_retention
+from app.db.search import ensure_search_schema
+from app.db.session import sqlite_pragmas
+from app.models.database import (
+    AuditLog, Base, Blob, Build, BuildStatus, CodeAnalysis, Memory, SearchDocument, User, VectorMemory,
+    WorkflowSession,
+)
+
+NOW = datetime(2026, 6, 1)
+OLD = NOW - timedelta(days=400)
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "_blob_store", BlobStore(tmp_path / "blobs"))
+    monkeypatch.setattr(settings, "retention_batch_size", 7)
+    monkeypatch.setattr(settings, "retention_batch_pause_ms", 0)
+    monkeypatch.setattr(settings, "blob_gc_grace_seconds", 0)
+    engine = create_engine(f"sqlite:///{tmp_path / 'retention.db'}")
+    event.listen(engine, "connect", sqlite_pragmas)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        ensure_search_schema(conn)
+    yield engine
+    engine.dispose()
+
+
+def blob(db, content, refcount):
+    digest, size, stored_size, _ = blob_store.get_blob_store().put(content)
+    db.merge(Blob(digest=digest, size=size, stored_size=stored_size, refcount=refcount))
+    return digest
+
+
+def seed(engine):
+    with Session(engine) as db:
+        user = User(username="alice", email="alice@test", hashed_password="")
+        db.add(user)
+        db.flush()
+        shared = blob(db, "shared code", 2)
+        for i in range(20):
+            db.add(Build(
+                id=f"old{i:02d}", user_id=user.id, project_name="p", requirements="r",
+                status=BuildStatus.COMPLETED, created_at=OLD,
+                build_logs_digest=blob(db, f"log {i}", 1), generated_code_digest=shared if i == 0 else None,
+            ))
+        db.add(Build(id="running", user_id=user.id, project_name="p", requirements="r",
+                     status=BuildStatus.RUNNING, created_at=OLD))
+        db.add(Build(id="recent", user_id=user.id, project_name="p", requirements="r",
+                     status=BuildStatus.COMPLETED, created_at=NOW, generated_code_digest=shared))
+        db.flush()
+
+        db.add(CodeAnalysis(id="attached", user_id=user.id, build_id="old00", created_at=OLD))
+        db.add(CodeAnalysis(id="standalone-old", user_id=user.id, created_at=OLD,
+                            code_digest=blob(db, "analysed", 1)))
+        db.add(CodeAnalysis(id="standalone-new", user_id=user.id, created_at=NOW))
+        db.add(VectorMemory(id="v0", build_id="old01", content="c", content_type="code", embedding=[0.5, 0.25]))
+
+        db.add_all(
+            AuditLog(action="GET /api/build", resource_type="api", details={"pad": "x" * 400}, created_at=OLD)
+            for _ in range(3000)
+        )
+        db.add(AuditLog(action="GET /api/build", resource_type="api", created_at=NOW))
+        db.add(WorkflowSession(user_id=1, state="idle", expires_at=NOW - timedelta(minutes=1)))
+        db.add(WorkflowSession(user_id=2, state="idle", expires_at=NOW + timedelta(hours=1)))
+        db.add(Memory(id="m-expired", user_id=user.id, memory_type="context", key="k", value={}, expires_at=OLD))
+        db.add(Memory(id="m-kept", user_id=user.id, memory_type="preference", key="k", value={}))
+        db.add_all([
+            SearchDocument(kind="build", ref_id="old00", owner="user:1", body="goal", created_at=OLD),
+            SearchDocument(kind="build_log", ref_id="old00", owner="user:1", body="log", created_at=OLD),
+            SearchDocument(kind="build", ref_id="recent", owner="user:1", body="goal", created_at=OLD),
+            SearchDocument(kind="message", ref_id="chat-old", owner="tg:1", body="hello", created_at=OLD),
+            SearchDocument(kind="message", ref_id="chat-new", owner="tg:1", body="hello", created_at=NOW),
+        ])
+        db.commit()
+        return shared
+
+
+def count(db, model, *where):
+    return db.execute(select(func.count()).select_from(model).where(*where)).scalar()
+
+
+class TestRetention:
+    """Test a full retention run against SQLite"""
+
+    def test_policies_and_compaction(self, engine):
+        shared = seed(engine)
+        report = run_retention(engine, now=NOW)
+
+        assert report.rows == {
+            "builds": 20, "code_analysis": 2, "vector_memory": 1, "audit_logs": 3000,
+            "workflow_sessions": 1, "memory": 1, "search_documents": 3,
+        }
+        with Session(engine) as db:
+            assert {b.id for b in db.scalars(select(Build))} == {"running", "recent"}
+            assert [a.id for a in db.scalars(select(CodeAnalysis))] == ["standalone-new"]
+            assert count(db, AuditLog) == 1 and count(db, WorkflowSession) == 1
+            assert [m.id for m in db.scalars(select(Memory))] == ["m-kept"]
+            assert {d.ref_id for d in db.scalars(select(SearchDocument))} == {"recent", "chat-new"}
+            # The FTS5 index follows through the delete triggers
+            assert db.execute(text("SELECT count(*) FROM search_fts WHERE search_fts MATCH 'hello'")).scalar() == 1
+            # Only the blob the recent build still references survives
+            assert [(b.digest, b.refcount) for b in db.scalars(select(Blob))] == [(shared, 1)]
+
+        assert report.blobs_removed == 21 and report.blob_bytes_reclaimed > 0
+        assert "incremental_vacuum" in report.compaction and report.database_bytes_reclaimed > 1_000_000
+        assert report.bytes_reclaimed == report.database_bytes_reclaimed + report.blob_bytes_reclaimed
+        assert report.to_dict()["rows_removed"] == 3028 and report.duration > 0
+
+    def test_zero_days_keeps_everything(self, engine, monkeypatch):
+        seed(engine)
+        for name in (
+            "retention_builds_days", "retention_analyses_days", "retention_audit_days", "retention_conversations_days",
+        ):
+            monkeypatch.setattr(settings, name, 0)
+        report = run_retention(engine, now=NOW)
+        assert report.rows == {"workflow_sessions": 1, "memory": 1}
+
+        # A second run has nothing left to do
+        assert run_retention(engine, now=NOW).rows_removed == 0
+
+
+class TestScheduling:
+    """Test the Celery task and the in-process job"""
+
+    def test_celery_task_matches_beat_schedule(self, monkeypatch):
+        pytest.importorskip("celery")
+        from app.tasks import celery_app, maintenance
+
+        monkeypatch.setattr(maintenance, "run_retention", lambda: RetentionReport(rows={"builds": 3}, duration=0.5))
+        task = maintenance.cleanup_expired_builds
+        assert celery_app.conf.beat_schedule["cleanup-expired-tasks"]["task"] == task.name
+        result = task()
+        assert result["rows_removed"] == 3 and result["duration"] == 0.5
+
+    @pytest.mark.asyncio
+    async def test_job_runs_in_background(self, monkeypatch):
+        runs = []
+        monkeypatch.setattr(retention, "run_retention", lambda: runs.append(1) or RetentionReport())
+        job = RetentionJob(interval=0.01, initial_delay=0)
+        await job.start()
+        try:
+            for _ in range(100):
+                if len(runs) >= 2:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await job.stop()
+        assert len(runs) >= 2 and job.last_report is not None
@@ -0,0 +1,224 @@
+"""
+Tests for hybrid retrieval: BM25 keyword index, rank fusion, token budget
+and keeping the keyword index in step with vector store writes
+"""
+
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.db.keyword_index import KeywordIndex, matches, tokenize
+from app.db.retrieval import reciprocal_rank_fusion
+from app.db.vector import VectorStore
+from app.monitoring.metrics import get_metrics
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class MemoryCollection:
+    """Chroma collection stand-in with real storage and a crude dense ranking"""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = {}
+        self.get_calls = 0
+        self.query_calls = 0
+
+    def add(self, ids, documents, metadatas, embeddings=None):
+        for i, d, m in zip(ids, documents, metadatas):
+            self.rows.setdefault(i, (d, m))
+
+    def upsert(self, ids, documents, metadatas, embeddings=None):
+        self.rows.update({i: (d, m) for i, d, m in zip(ids, documents, metadatas)})
+
+    def delete(self, ids=None, where=None):
+        for i in list(self.rows):
+            if (ids and i in ids) or (where and matches(self.rows[i][1], where)):
+                del self.rows[i]
+
+    def get(self, where=None, include=None):
+        self.get_calls += 1
+        rows = [(i, d, m) for i, (d, m) in self.rows.items() if matches(m, where)]
+        return {"ids": [r[0] for r in rows], "documents": [r[1] for r in rows], "metadatas": [r[2] for r in rows]}
+
+    def query(self, query_embeddings, n_results, where=None):
+        self.query_calls += 1
+        q = trigrams(query_embeddings[0][0].lower())
+        scored = sorted(
+            ((1 - len(q & trigrams(d.lower())) / max(len(q | trigrams(d.lower())), 1), i, d, m)
+             for i, (d, m) in self.rows.items() if matches(m, where)),
+        )[:n_results]
+        return {"ids": [[s[1] for s in scored]], "distances": [[s[0] for s in scored]],
+                "documents": [[s[2] for s in scored]], "metadatas": [[s[3] for s in scored]]}
+
+
+class MemoryClient:
+    def __init__(self):
+        self.collections = {}
+
+    def get_or_create_collection(self, name, metadata=None, embedding_function=None):
+        return self.collections.setdefault(name, MemoryCollection(name))
+
+
+class TextEmbedding:
+    """Passes the text through as its 'vector' so MemoryCollection can rank it"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, texts):
+        self.calls += 1
+        return [[text] for text in texts]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "data_dir", str(tmp_path))
+    vector_store = VectorStore(client=MemoryClient(), embedding_function=TextEmbedding())
+    yield vector_store
+    vector_store.executor.shutdown()
+
+
+class TestKeywordIndex:
+    """Test tokenization and BM25 ranking"""
+
+    def test_identifier_parts(self):
+        assert tokenize("parseJsonFile(HTTP_404)") == [
+            "parsejsonfile", "parse", "json", "file", "http_404", "http", "404"
+        ]
+
+    def test_exact_identifier_ranks_first(self):
+        index = KeywordIndex()
+        index.add(
+            ["a", "b", "c"],
+            ["def load_config(path): read the file", "config loading helpers and paths", "raise E1101 when missing"],
+            [{"build_id": "b1"}, {"build_id": "b1"}, {"build_id": "b2"}],
+        )
+        assert index.search("load_config")[0]["id"] == "a"
+        assert [h["id"] for h in index.search("error E1101")] == ["c"]
+        assert index.search("E1101", where={"build_id": {"$eq": "b1"}}) == []
+
+        index.remove_where({"build_id": {"$in": ["b2"]}})
+        index.remove(["a"])
+        assert len(index) == 1 and [h["id"] for h in index.search("load_config")] == ["b"]
+
+    def test_writes_during_load_win_over_snapshot(self):
+        index = KeywordIndex()
+        index.begin_load()
+        index.add(["x"], ["fresh text"], [{}])
+        index.remove(["gone"])
+        index.finish_load(["x", "gone", "kept"], ["stale text", "deleted", "old"], [{}, {}, {}])
+
+        assert index.loaded
+        assert index.search("fresh")[0]["id"] == "x" and index.search("stale") == []
+        assert [h["id"] for h in index.search("deleted old")] == ["kept"]
+
+    def test_rank_fusion(self):
+        scores = reciprocal_rank_fusion([["a", "b"], ["b", "c"]], k=60)
+        assert max(scores, key=scores.get) == "b"
+        assert scores["a"] == pytest.approx(1 / 61)
+
+
+class TestHybridRetrieval:
+    """Test fan-out, fusion across collections and the token budget"""
+
+    @pytest.mark.asyncio
+    async def test_keyword_hit_surfaces_exact_identifier(self, store):
+        docs = [f"def helper_{i}():\n    return compute_total(items, rate)" for i in range(30)]
+        docs.append("def normalize_vat_rate(r):\n    return r / 100")
+        await store.upsert_code_chunks(
+            [f"c{i}" for i in range(len(docs))], docs, [{"build_id": "b1"} for _ in docs]
+        )
+        await store.add_documentation("Totals are computed per item and rate.", "b1", "guide")
+
+        found = await store.hybrid_search("compute totals: where is normalize_vat_rate", n_results=5)
+
+        ids = [c["id"] for c in found["code_snippets"]]
+        assert "c30" in ids
+        assert found["documentation"][0]["id"] == "b1_doc_guide"
+        assert all("score" in c for c in found["code_snippets"])
+
+    @pytest.mark.asyncio
+    async def test_token_budget_and_stage_metrics(self, store):
+        long_doc = "token " * 2000  # ~3000 tokens
+        await store.upsert_code_chunks(["big", "small"], [long_doc, "token small"], [{}, {}])
+        stage = get_metrics().retrieval_stage_duration_seconds.labels(stage="fusion")
+        before = sum(b.get() for b in stage._buckets)
+
+        result = await store.retriever.retrieve("token", ["code_snippets"], n_results=5, token_budget=100)
+
+        assert [c.id for c in result.chunks] == ["small"]
+        assert result.dropped == 1 and result.tokens <= 100
+        assert set(result.timings) >= {"dense", "keyword", "search", "fusion", "budget", "total"}
+        assert sum(b.get() for b in stage._buckets) == before + 1
+
+    @pytest.mark.asyncio
+    async def test_build_filter_applies_to_code_only(self, store):
+        await store.add_code_snippet("def shared_name(): pass", "b1", "a.py", "python")
+        await store.add_code_snippet("def shared_name(): pass", "b2", "a.py", "python")
+        await store.add_documentation("shared_name explained", "b2", "api")
+
+        context = await store.get_build_context("b1", query="shared_name")
+
+        assert [c["metadata"]["build_id"] for c in context["code_snippets"]] == ["b1"]
+        assert context["documentation"][0]["id"] == "b2_doc_api"
+
+
+class TestKeywordIndexSync:
+    """Test that the keyword index follows vector store writes"""
+
+    @pytest.mark.asyncio
+    async def test_loaded_once_then_kept_in_step(self, store):
+        collection = store.code_collection
+        collection.upsert(["pre"], ["def existing_function(): pass"], [{"build_id": "b0"}])
+
+        assert (await store.keyword_search("code_snippets", "existing_function"))[0]["id"] == "pre"
+        await store.add_code_snippet("def brand_new(): pass", "b1", "n.py", "python")
+        assert (await store.keyword_search("code_snippets", "brand_new"))[0]["id"] == "b1_n.py"
+
+        await store.delete_build_vectors("b1")
+        await store.delete_code_chunks(["pre"])
+        assert await store.keyword_search("code_snippets", "brand_new existing_function") == []
+        assert collection.get_calls == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_first_searches_share_one_load(self, store):
+        await asyncio.gather(*(store.keyword_search("documentation", "x") for _ in range(5)))
+        assert store.documentation_collection.get_calls == 1
+
+
+class TestRetrievalCache:
+    """Test result and query-embedding caching keyed by index version"""
+
+    @pytest.mark.asyncio
+    async def test_repeated_retrieval_served_from_cache(self, store):
+        await store.add_code_snippet("def parse_config(): pass", "b1", "c.py", "python")
+        collection = store.code_collection
+        store.embedding_function.calls = 0  # the add was embedded too
+
+        first = await store.hybrid_search("parse_config  usage", n_results=3)
+        again = await store.hybrid_search("  parse_config usage", n_results=3)
+
+        assert again == first
+        assert collection.query_calls == 1
+        assert store.embedding_function.calls == 1  # shared by both collections' searches
+        stats = store.cache_stats()
+        assert stats["retrieval"]["hits"] == 2 and stats["retrieval"]["misses"] == 2
+        assert stats["query_embedding"]["hit_rate"] == 0.5
+
+    @pytest.mark.asyncio
+    async def test_write_bumps_version_and_misses(self, store):
+        await store.add_code_snippet("def alpha(): pass", "b1", "a.py", "python")
+        before = store.collection_version("code_snippets")
+        assert [h["id"] for h in await store.query_collection("code_snippets", "alpha", 5)] == ["b1_a.py"]
+
+        await store.add_code_snippet("def alpha_two(): pass", "b1", "b.py", "python")
+        assert store.collection_version("code_snippets") > before
+        hits = await store.query_collection("code_snippets", "alpha", 5)
+
+        assert {h["id"] for h in hits} == {"b1_a.py", "b1_b.py"}
+        assert store.code_collection.query_calls == 2
+        assert store.embedding_cache.hits == 1  # the query was only embedded once
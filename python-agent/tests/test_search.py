@@ -0,0 +1,159 @@
+"""
+Tests for full-text search: batched indexing, ranking, snippets, owner and
+kind filters, pagination and the session store feed
+"""
+
+import html
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.session_store import UserSession, _message_hooks
+from app.db import build_store
+from app.db.search import (
+    HIGHLIGHT_END, HIGHLIGHT_START, SearchIndexer, ensure_search_schema, fts5_query,
+    owners_for_subject, owners_for_telegram, render_snippet, search,
+)
+from app.models.database import Base, SearchDocument, TelegramUser, User
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'search.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(ensure_search_schema)
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def db(engine):
+    async with async_sessionmaker(bind=engine, expire_on_commit=False)() as session:
+        yield session
+
+
+@pytest.fixture
+def indexer(engine):
+    return SearchIndexer(engine, batch_size=3, flush_interval=60, max_queue=100)
+
+
+async def seed(indexer):
+    indexer.index_build("b1", 1, "payments-api", "REST API for payments with Stripe webhooks")
+    indexer.index_build_log("b1", 1, "payments-api", "compiled\nwebhook handler tests passed\n")
+    indexer.index_build("b2", 1, "blog", "Static blog generator; no payments involved except a donate link")
+    indexer.index_build("b3", 2, "payments-admin", "Admin UI for refunds")
+    indexer.add("message", "m1", "tg:42", "how do I retry failed webhooks?", title="user")
+    await indexer.flush()
+
+
+class TestIndexing:
+    """Test the write-behind indexer"""
+
+    @pytest.mark.asyncio
+    async def test_batches_upsert_and_index(self, engine, db, indexer):
+        await seed(indexer)
+        assert indexer.indexed == 5 and indexer.pending == 0
+
+        # A changed document replaces the indexed one, also within one batch
+        indexer.index_build("b2", 1, "blog", "first draft")
+        indexer.index_build("b2", 1, "blog", "Static blog generator with comments")
+        await indexer.flush()
+        assert (await db.execute(select(func.count()).select_from(SearchDocument))).scalar() == 5
+        assert (await search(db, "donate", None)).hits == []
+        assert [h.ref_id for h in (await search(db, "comments", None)).hits] == ["b2"]
+
+    @pytest.mark.asyncio
+    async def test_full_queue_drops_and_failed_batch_is_kept(self, engine, monkeypatch):
+        indexer = SearchIndexer(engine, batch_size=10, flush_interval=60, max_queue=2)
+        assert indexer.add("message", "a", "tg:1", "one") and indexer.add("message", "b", "tg:1", "two")
+        assert not indexer.add("message", "c", "tg:1", "three")
+        assert indexer.dropped == 1
+        with pytest.raises(ValueError):
+            indexer.add("note", "d", "tg:1", "four")
+
+        async def fail(documents):
+            raise RuntimeError("database is locked")
+
+        monkeypatch.setattr(indexer, "_write", fail)
+        assert await indexer.flush() == 0 and indexer.pending == 2
+
+    @pytest.mark.asyncio
+    async def test_session_messages_are_queued(self, indexer):
+        _message_hooks.append(indexer.index_message)
+        try:
+            session = UserSession(user_id=42)
+            session.add_message("user", "deploy the staging stack")
+            session.add_message("system", "internal prompt")
+            session.add_message("assistant", "staging deployed")
+        finally:
+            _message_hooks.remove(indexer.index_message)
+        assert [(d["owner"], d["title"]) for d, _ in indexer._queue] == [("tg:42", "user"), ("tg:42", "assistant")]
+
+
+class TestSearch:
+    """Test querying the SQLite FTS5 index"""
+
+    @pytest.mark.asyncio
+    async def test_ranking_snippets_and_filters(self, db, indexer):
+        await seed(indexer)
+
+        page = await search(db, "payments", ["user:1"])
+        # Title matches rank first; user 2's build is not visible
+        assert [(h.kind, h.ref_id) for h in page.hits] == [("build", "b1"), ("build_log", "b1"), ("build", "b2")]
+        assert f"{HIGHLIGHT_START}payments{HIGHLIGHT_END}" in page.hits[0].snippet
+        assert page.hits[1].score > page.hits[2].score and page.next_offset is None
+
+        # Porter stemming and prefix match on the last word
+        assert {h.kind for h in (await search(db, "webhook", ["user:1", "tg:42"])).hits} == {"build", "build_log", "message"}
+        ranked = [h.ref_id for h in (await search(db, "paym", None, kinds=["build"])).hits]
+        assert sorted(ranked) == ["b1", "b2", "b3"] and ranked[-1] == "b2"
+        assert (await search(db, "webhooks", ["user:1"], kinds=["message"])).hits == []
+        assert (await search(db, "payments", [])).hits == []
+
+    @pytest.mark.asyncio
+    async def test_pagination(self, db, indexer):
+        for i in range(7):
+            indexer.index_build(f"b{i}", 1, f"p{i}", "kubernetes operator")
+        await indexer.flush()
+
+        seen, offset = [], 0
+        while offset is not None:
+            page = await search(db, "kubernetes", ["user:1"], limit=3, offset=offset)
+            seen.extend(h.ref_id for h in page.hits)
+            offset = page.next_offset
+        assert sorted(seen) == [f"b{i}" for i in range(7)] and len(set(seen)) == 7
+
+    @pytest.mark.asyncio
+    async def test_query_syntax_is_not_interpreted(self, db, indexer):
+        await seed(indexer)
+        assert fts5_query('NOT "refunds" OR (admin*') == '"NOT" "refunds" "OR" "admin"*'
+        assert [h.ref_id for h in (await search(db, 'refunds") (admin', None)).hits] == ["b3"]
+        assert fts5_query("?!") is None and (await search(db, "?!", None)).hits == []
+
+    @pytest.mark.asyncio
+    async def test_owner_resolution(self, db):
+        db.add(User(username="api:alice", api_subject="alice", email="a@test", hashed_password=""))
+        # A Telegram account whose handle equals another principal's API subject
+        db.add(User(username="bob", email="b@test", hashed_password=""))
+        await db.flush()
+        alice, bob = (await db.execute(select(User.id).order_by(User.id))).scalars()
+        db.add(TelegramUser(telegram_id=42, user_id=alice, chat_id=42))
+        db.add(TelegramUser(telegram_id=43, user_id=bob, chat_id=43))
+        await db.commit()
+
+        assert await owners_for_subject(db, "alice") == [f"user:{alice}", "tg:42"]
+        assert await owners_for_subject(db, "nobody") == []
+        # API identities never match on username
+        assert await owners_for_subject(db, "bob") == []
+        assert await build_store.get_or_create_user_id(db, "bob") not in (alice, bob)
+        assert await owners_for_telegram(db, 42) == ["tg:42", f"user:{alice}"]
+        assert await owners_for_telegram(db, 7) == ["tg:7"]
+
+
+def test_render_snippet():
+    snippet = f"a <b> {HIGHLIGHT_START}match{HIGHLIGHT_END} & more"
+    assert render_snippet(snippet, "**", "**") == "a <b> **match** & more"
+    assert render_snippet(snippet, "<b>", "</b>", html.escape) == "a &lt;b&gt; <b>match</b> &amp; more"
@@ -0,0 +1,89 @@
+"""
+Tests for the task scheduler skill: persistent jobs and bounded execution
+"""
+
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from app.skills.base_skill import SkillResult
+from app.skills.task_scheduler import TaskSchedulerSkill
+
+
+@pytest.fixture
+def scheduler_paths(tmp_path):
+    return {
+        "tasks_file": tmp_path / "scheduled_tasks.json",
+        "jobstore_url": f"sqlite:///{tmp_path / 'jobs.sqlite'}",
+    }
+
+
+async def schedule(skill, name, schedule="every 1 hours"):
+    return await skill.execute({
+        "action": "schedule",
+        "task_name": name,
+        "schedule": schedule,
+        "skill": "project_manager",
+        "params": {"action": "status"},
+    })
+
+
+class TestTaskScheduler:
+    """Test job persistence, ids and execution"""
+
+    @pytest.mark.asyncio
+    async def test_jobs_rehydrated_after_restart(self, scheduler_paths):
+        skill = TaskSchedulerSkill(**scheduler_paths)
+        result = await schedule(skill, "nightly")
+        task_id = result.data["id"]
+        await skill.stop_scheduler()
+
+        restarted = TaskSchedulerSkill(**scheduler_paths)
+        await restarted.start_scheduler()
+        try:
+            job = restarted.scheduler.get_job(f"scheduled_{task_id}")
+            assert job is not None
+            assert job.kwargs == {"task_id": task_id}
+            assert restarted.tasks[task_id]["next_run"]
+        finally:
+            await restarted.stop_scheduler()
+
+    @pytest.mark.asyncio
+    async def test_task_ids_unique_after_delete(self, scheduler_paths):
+        skill = TaskSchedulerSkill(**scheduler_paths)
+        try:
+            first = (await schedule(skill, "a")).data["id"]
+            await schedule(skill, "b")
+            assert skill._delete_task({"task_name": "a"}).success
+            third = (await schedule(skill, "c")).data["id"]
+
+            assert third != first
+            assert len(skill.tasks) == 2
+            assert len(skill.scheduler.get_jobs()) == 2
+        finally:
+            await skill.stop_scheduler()
+
+    @pytest.mark.asyncio
+    async def test_due_job_runs_on_executor_pool(self, scheduler_paths):
+        skill = TaskSchedulerSkill(**scheduler_paths)
+        ran = asyncio.Event()
+
+        async def fake_run_skill(name, params):
+            ran.set()
+            return SkillResult(success=True, output="ok")
+
+        skill._run_skill = fake_run_skill
+        try:
+            task_id = (await schedule(skill, "soon")).data["id"]
+            skill.scheduler.modify_job(f"scheduled_{task_id}", next_run_time=datetime.now(timezone.utc))
+            skill.scheduler.wakeup()
+
+            await asyncio.wait_for(ran.wait(), timeout=5)
+            for _ in range(50):
+                if skill.tasks[task_id]["last_run"]:
+                    break
+                await asyncio.sleep(0.05)
+            assert skill.tasks[task_id]["last_run"]
+        finally:
+            await skill.stop_scheduler()
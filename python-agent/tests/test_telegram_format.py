@@ -0,0 +1,85 @@
+"""
+Tests for the Markdown -> Telegram HTML renderer
+"""
+
+import random
+
+from app.integrations.telegram_format import TelegramHTMLRenderer, markdown_to_telegram_html
+
+
+SAMPLE = """# Result
+
+Here is **the fix** for `a < b && c > d`:
+
+```python
+if x < 10 and y > 2:
+    print("<done>")
+```
+
+- first *point*
+- second with [docs](https://example.com/?a=1&b=2)
+1. step one
+snake_case_name and 2 * 3 * 4 stay as they are
+"""
+
+
+class TestMarkdownRendering:
+    """Test block and inline conversion"""
+
+    def test_escapes_plain_text(self):
+        assert markdown_to_telegram_html("x < y & <script>") == "x &lt; y &amp; &lt;script&gt;"
+
+    def test_inline_formatting(self):
+        html = markdown_to_telegram_html("**bold** __also__ *it* ~~old~~ `<tag>`")
+        assert html == "<b>bold</b> <b>also</b> <i>it</i> <s>old</s> <code>&lt;tag&gt;</code>"
+
+    def test_emphasis_inside_code_is_literal(self):
+        assert markdown_to_telegram_html("`**not bold**`") == "<code>**not bold**</code>"
+
+    def test_links_only_for_http(self):
+        html = markdown_to_telegram_html('[a](https://x.io/?q="1"&r=2) [b](javascript:alert(1))')
+        assert html.startswith('<a href="https://x.io/?q=&quot;1&quot;&amp;r=2">a</a>')
+        assert "javascript" in html and "<a" not in html[html.index("</a>"):]
+
+    def test_sample_document(self):
+        html = markdown_to_telegram_html(SAMPLE)
+        assert html.startswith("<b>Result</b>")
+        assert "<code>a &lt; b &amp;&amp; c &gt; d</code>" in html
+        assert '<pre><code class="language-python">if x &lt; 10 and y &gt; 2:\n    print("&lt;done&gt;")</code></pre>' in html
+        assert "• first <i>point</i>" in html
+        assert "1. step one" in html
+        assert "snake_case_name and 2 * 3 * 4 stay as they are" in html
+
+    def test_unclosed_fence_is_closed(self):
+        assert markdown_to_telegram_html("```\nx = 1") == "<pre><code>x = 1</code></pre>"
+
+
+class TestIncrementalRendering:
+    """Test chunked feeding matches one-shot rendering"""
+
+    def test_random_chunking_matches(self):
+        expected = markdown_to_telegram_html(SAMPLE)
+        rng = random.Random(7)
+        for _ in range(20):
+            renderer = TelegramHTMLRenderer()
+            out, pos = [], 0
+            while pos < len(SAMPLE):
+                step = rng.randint(1, 12)
+                out.append(renderer.feed(SAMPLE[pos:pos + step]))
+                pos += step
+            out.append(renderer.close())
+            assert "".join(out) == expected
+
+    def test_partial_line_is_held_back(self):
+        renderer = TelegramHTMLRenderer()
+        assert renderer.feed("**bo") == ""
+        assert renderer.feed("ld**\nnext") == "<b>bold</b>"
+        assert renderer.close() == "\nnext"
+
+    def test_pending_close_for_open_code_block(self):
+        renderer = TelegramHTMLRenderer()
+        partial = renderer.feed("```\nline 1\n")
+        assert renderer.pending_close == "</code></pre>"
+        assert partial + renderer.pending_close == "<pre><code>line 1</code></pre>"
+        renderer.feed("```\n")
+        assert renderer.pending_close == ""
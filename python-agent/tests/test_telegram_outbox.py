@@ -0,0 +1,185 @@
+"""
+Tests for the Telegram outbound delivery queue
+"""
+
+import asyncio
+import time
+
+import pytest
+from telegram.error import BadRequest, RetryAfter
+
+from app.integrations.telegram_outbox import (
+    MAX_MESSAGE_LENGTH,
+    TelegramOutbox,
+    TokenBucket,
+    split_message,
+)
+
+
+class FakeBot:
+    """Records sends; can be told to fail the first N calls"""
+
+    def __init__(self, failures=()):
+        self.sent = []
+        self.failures = list(failures)
+
+    async def send_message(self, chat_id, text, parse_mode=None, **kwargs):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append((chat_id, text, parse_mode, kwargs))
+
+
+class TestSplitMessage:
+    """Test code-block-aware splitting"""
+
+    def test_short_message_untouched(self):
+        assert split_message("hello") == ["hello"]
+
+    def test_chunks_respect_limit_and_keep_text(self):
+        text = "\n\n".join(f"Paragraph {i} " + "word " * 80 for i in range(40))
+        chunks = split_message(text)
+        assert len(chunks) > 1
+        assert all(len(c) <= MAX_MESSAGE_LENGTH for c in chunks)
+        assert "".join(chunks).replace("\n", "").replace(" ", "") == text.replace("\n", "").replace(" ", "")
+
+    def test_markdown_fence_closed_and_reopened(self):
+        code = "\n".join(f"print({i})" for i in range(1500))
+        chunks = split_message(f"Here you go:\n```python\n{code}\n```\nDone.")
+        assert len(chunks) > 1
+        for chunk in chunks:
+            assert len(chunk) <= MAX_MESSAGE_LENGTH
+            assert chunk.count("```") % 2 == 0
+        assert chunks[1].startswith("```python\n")
+
+    def test_html_pre_closed_and_reopened(self):
+        code = "\n".join(f"x = {i} &lt; {i + 1}" for i in range(800))
+        chunks = split_message(f"<b>Code</b>\n<pre><code class=\"language-py\">{code}</code></pre>", parse_mode="HTML")
+        assert len(chunks) > 1
+        for chunk in chunks:
+            assert len(chunk) <= MAX_MESSAGE_LENGTH
+            assert chunk.count("<pre>") == chunk.count("</pre>")
+        assert chunks[1].startswith('<pre><code class="language-py">')
+
+    def test_html_inline_tags_balanced(self):
+        from html.parser import HTMLParser
+
+        class Balance(HTMLParser):
+            def __init__(self):
+                super().__init__()
+                self.stack = []
+
+            def handle_starttag(self, tag, attrs):
+                self.stack.append(tag)
+
+            def handle_endtag(self, tag):
+                assert self.stack.pop() == tag
+
+        text = '<b>Report</b>\n<b>' + "important words " * 400 + '<a href="https://x.io/?a=1&amp;b=2"><i>' \
+            + "linked text " * 400 + "</i></a></b> tail"
+        chunks = split_message(text, parse_mode="HTML")
+        assert len(chunks) > 2
+        for chunk in chunks:
+            assert len(chunk) <= MAX_MESSAGE_LENGTH
+            parser = Balance()
+            parser.feed(chunk)
+            assert parser.stack == []
+        assert chunks[1].startswith("<b>")
+        assert chunks[2].startswith('<b><a href="https://x.io/?a=1&amp;b=2"><i>')
+
+
+class TestTokenBucket:
+    """Test refill and pause"""
+
+    def test_burst_then_wait(self):
+        bucket = TokenBucket(rate=10, capacity=2)
+        assert bucket.try_acquire() == 0
+        assert bucket.try_acquire() == 0
+        assert 0 < bucket.try_acquire() <= 0.1
+
+    def test_pause_delays_next_token(self):
+        bucket = TokenBucket(rate=10, capacity=5)
+        bucket.pause(2)
+        assert bucket.try_acquire() > 2
+
+
+class TestTelegramOutbox:
+    """Test ordering, retries and digests"""
+
+    @pytest.mark.asyncio
+    async def test_send_returns_immediately_and_keeps_order(self):
+        outbox = TelegramOutbox(global_rate=1000, chat_rate=1000, chat_burst=100)
+        bot = FakeBot()
+        outbox.start(bot)
+
+        for i in range(5):
+            outbox.send(1, f"a{i}")
+            outbox.send(2, f"b{i}")
+        assert bot.sent == []
+
+        await outbox.close()
+        assert [t for c, t, _, _ in bot.sent if c == 1] == [f"a{i}" for i in range(5)]
+        assert [t for c, t, _, _ in bot.sent if c == 2] == [f"b{i}" for i in range(5)]
+
+    @pytest.mark.asyncio
+    async def test_per_chat_rate_limit(self):
+        outbox = TelegramOutbox(global_rate=1000, chat_rate=20, chat_burst=1)
+        outbox.start(FakeBot())
+
+        started = time.perf_counter()
+        for i in range(5):
+            outbox.send(1, str(i))
+        await outbox.close()
+        # 1 burst token, then 4 more at 20/s
+        assert time.perf_counter() - started >= 0.18
+
+    @pytest.mark.asyncio
+    async def test_retry_after_and_markup_fallback(self):
+        outbox = TelegramOutbox(global_rate=1000, chat_rate=1000, chat_burst=10)
+        bot = FakeBot(failures=[RetryAfter(0), BadRequest("Can't parse entities")])
+        outbox.start(bot)
+
+        outbox.send(1, "<b>broken", parse_mode="HTML", reply_markup="kb")
+        await outbox.close()
+
+        assert bot.sent == [(1, "<b>broken", None, {"reply_markup": "kb"})]
+        assert outbox.stats["retried"] == 1
+
+    @pytest.mark.asyncio
+    async def test_retry_after_pauses_every_chat(self):
+        from app.integrations.telegram_outbox import OutboundMessage
+
+        outbox = TelegramOutbox(global_rate=1000, chat_rate=1000, chat_burst=10)
+        outbox.bot = FakeBot(failures=[RetryAfter(5)])
+        bucket = TokenBucket(1000, 10)
+
+        assert not await outbox._deliver(OutboundMessage(chat_id=1, text="hi"), bucket)
+        assert bucket.try_acquire() > 4
+        # Other chats wait on the global bucket too
+        assert outbox._global.try_acquire() > 4
+
+    @pytest.mark.asyncio
+    async def test_long_message_split_with_markup_on_last_part(self):
+        outbox = TelegramOutbox(global_rate=1000, chat_rate=1000, chat_burst=10)
+        bot = FakeBot()
+        outbox.start(bot)
+
+        outbox.send(1, "x " * 5000, reply_markup="kb")
+        await outbox.close()
+
+        assert len(bot.sent) == 3
+        assert [kwargs for _, _, _, kwargs in bot.sent] == [{}, {}, {"reply_markup": "kb"}]
+
+    @pytest.mark.asyncio
+    async def test_notifications_merged_into_digest(self):
+        outbox = TelegramOutbox(global_rate=1000, chat_rate=1000, chat_burst=10, digest_interval=0.05)
+        bot = FakeBot()
+        outbox.start(bot)
+
+        for i in range(4):
+            outbox.notify(7, f"task {i} done")
+        await asyncio.sleep(0.1)
+        await outbox.close()
+
+        assert len(bot.sent) == 1
+        assert bot.sent[0][1].startswith("📋 4 updates")
+        assert outbox.stats["digested"] == 4
@@ -0,0 +1,226 @@
+"""
+Tests for Telegram update ingress: per-chat ordered processing, webhook feed
+and duplicate update handling
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+from telegram import Update
+
+from app.integrations.telegram_updates import ChatOrderedUpdateProcessor, update_chat_key
+
+
+def make_update(update_id: int, chat_id: int, text: str = "hi") -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "u"},
+            "text": text,
+        },
+    }
+
+
+class TestChatOrderedUpdateProcessor:
+    """Test concurrency across chats and ordering within a chat"""
+
+    @pytest.mark.asyncio
+    async def test_same_chat_in_order_other_chats_parallel(self):
+        processor = ChatOrderedUpdateProcessor(max_active_updates=4)
+        log = []
+        active = 0
+        peak = 0
+
+        async def handle(chat_id, n):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01 * (3 - n))  # later updates finish faster
+            log.append((chat_id, n))
+            active -= 1
+
+        tasks = []
+        for n in range(3):
+            for chat_id in (1, 2, 3):
+                update = Update.de_json(make_update(n * 10 + chat_id, chat_id), None)
+                tasks.append(asyncio.create_task(processor.process_update(update, handle(chat_id, n))))
+        await asyncio.gather(*tasks)
+
+        for chat_id in (1, 2, 3):
+            assert [n for c, n in log if c == chat_id] == [0, 1, 2]
+        assert peak == 3
+        assert processor.processed == 9
+        assert processor._chat_locks == {}
+
+    @pytest.mark.asyncio
+    async def test_active_limit(self):
+        processor = ChatOrderedUpdateProcessor(max_active_updates=2)
+        active = 0
+        peak = 0
+
+        async def handle():
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+        updates = [Update.de_json(make_update(i, i), None) for i in range(6)]
+        await asyncio.gather(*(processor.process_update(u, handle()) for u in updates))
+        assert peak == 2
+
+    def test_chat_key(self):
+        assert update_chat_key(Update.de_json(make_update(1, 42), None)) == 42
+        assert update_chat_key(object()) is None
+
+
+class TestWebhookFeed:
+    """Test secret verification and queueing on the bot manager"""
+
+    @pytest.mark.asyncio
+    async def test_secret_and_feed(self, monkeypatch):
+        from pydantic import SecretStr
+
+        from app.core.config import settings
+        from app.integrations.telegram_bot import TelegramBotManager
+
+        monkeypatch.setattr(settings, "telegram_webhook_secret", SecretStr("s3cret"))
+        manager = TelegramBotManager()
+        manager.token = "123456:TEST"
+        manager.application = manager.build_application()
+
+        assert manager.verify_webhook_secret("s3cret")
+        assert not manager.verify_webhook_secret("wrong")
+        assert not manager.verify_webhook_secret(None)
+
+        await manager.feed_webhook_update(json.dumps(make_update(7, 99, "hello")).encode())
+        update = manager.application.update_queue.get_nowait()
+        assert update.update_id == 7
+        assert update.message.text == "hello"
+
+    def test_webhook_mode_requires_secret(self):
+        from pydantic import ValidationError
+
+        from app.core.config import Settings
+        from app.integrations.telegram_bot import TelegramBotManager
+
+        for mode in ("webhook", "auto"):
+            with pytest.raises(ValidationError, match="TELEGRAM_WEBHOOK_SECRET"):
+                Settings(telegram_mode=mode, telegram_webhook_url="https://agent.example.com")
+        assert Settings(telegram_mode="auto", telegram_webhook_url=None).telegram_webhook_secret is None
+
+        # Without a configured secret no header is accepted
+        manager = TelegramBotManager()
+        assert manager.webhook_secret is None
+        assert not manager.verify_webhook_secret("anything")
+
+
+class TestUpdateDeduplicator:
+    """Test TTL set, spill and response replay"""
+
+    def test_duplicate_detected_in_memory(self):
+        from app.integrations.telegram_dedup import UpdateDeduplicator, update_keys
+
+        dedup = UpdateDeduplicator()
+        update = Update.de_json(make_update(5, 1), None)
+        assert dedup.check(update_keys(update)) is None
+        assert dedup.check(update_keys(update)) == 5
+        # In-process duplicates are never replayed
+        dedup.remember_response(5, 1, "answer")
+        assert dedup.replayable_response(5) is None
+
+    def test_callback_query_id_key(self):
+        from app.integrations.telegram_dedup import UpdateDeduplicator, update_keys
+
+        payload = {
+            "update_id": 9,
+            "callback_query": {
+                "id": "abc",
+                "from": {"id": 1, "is_bot": False, "first_name": "u"},
+                "chat_instance": "x",
+                "data": "menu",
+            },
+        }
+        keys = update_keys(Update.de_json(payload, None))
+        assert keys == [9, "cb:abc"]
+
+        dedup = UpdateDeduplicator()
+        dedup.check(keys)
+        # Same callback query in a different update is still a duplicate
+        assert dedup.check([10, "cb:abc"]) == "cb:abc"
+
+    def test_ttl_and_size_bounds(self):
+        from app.integrations.telegram_dedup import UpdateDeduplicator
+
+        dedup = UpdateDeduplicator(ttl_seconds=0.01)
+        dedup.check([1])
+        time.sleep(0.02)
+        assert dedup.check([1]) is None
+
+        dedup = UpdateDeduplicator(max_entries=3)
+        for i in range(10):
+            dedup.check([i])
+        assert len(dedup) <= 4
+        assert dedup.check([9]) == 9
+
+    def test_spill_survives_restart_and_replays_once(self, tmp_path):
+        from app.integrations.telegram_dedup import UpdateDeduplicator
+
+        spill = tmp_path / "seen.sqlite"
+        first = UpdateDeduplicator(spill_path=spill)
+        first.check([42])
+        first.remember_response(42, 7, "<b>done</b>", "HTML")
+        first.check([43])
+        first.close()
+
+        restarted = UpdateDeduplicator(spill_path=spill)
+        assert restarted.check([42]) == 42
+        assert restarted.replayable_response(42) == {"chat_id": 7, "text": "<b>done</b>", "parse_mode": "HTML"}
+        assert restarted.replayable_response(42) is None
+        assert restarted.check([43]) == 43
+        assert restarted.replayable_response(43) is None
+        restarted.close()
+
+    def test_spill_writes_batched_and_expired_rows_purged(self, tmp_path):
+        import sqlite3
+
+        from app.integrations.telegram_dedup import UpdateDeduplicator
+
+        spill = tmp_path / "seen.sqlite"
+        dedup = UpdateDeduplicator(ttl_seconds=0.05, spill_path=spill, flush_interval=3600)
+        dedup.PURGE_INTERVAL = 0
+        reader = sqlite3.connect(str(spill))
+        rows = lambda: sorted(key for key, in reader.execute("SELECT key FROM seen_updates"))
+
+        dedup.check([1])
+        dedup.check([2])
+        assert rows() == []  # nothing written on the caller's thread
+        dedup.flush()
+        assert rows() == ["1", "2"]
+
+        time.sleep(0.1)
+        dedup.check([3])
+        dedup.flush()
+        assert rows() == ["3"]
+        reader.close()
+        dedup.close()
+
+    @pytest.mark.asyncio
+    async def test_bot_stops_duplicate_before_handlers(self, monkeypatch):
+        from telegram.ext import ApplicationHandlerStop
+
+        from app.integrations import telegram_bot
+        from app.integrations.telegram_dedup import UpdateDeduplicator
+
+        monkeypatch.setattr(telegram_bot, "get_update_deduplicator", lambda dedup=UpdateDeduplicator(): dedup)
+        manager = telegram_bot.TelegramBotManager()
+        update = Update.de_json(make_update(11, 3), None)
+
+        await manager.drop_duplicate_updates(update, None)
+        with pytest.raises(ApplicationHandlerStop):
+            await manager.drop_duplicate_updates(update, None)
@@ -6,7 +6,8 @@ Tests all merged functionality from TypeScript + Python
 import pytest
 import asyncio
 from app.core.error_handler import get_error_handler, ErrorCategory
-from app.core.memory_manager import get_memory_manager
+from app.core.memory_manager import get_memory_manager, MemoryManager
+from app.core.session_store import SessionStore, WorkflowState
 from app.monitoring.analytics import get_analytics_tracker
 from app.skills.registry import SkillRegistry
 
@@ -95,6 +96,95 @@ class TestMemoryManager:
         assert messages[-1]["role"] == "user"
 
 
+@pytest.fixture
+def session_store():
+    """Session store backed by a throwaway in-memory database"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from app.models.database import Base
+
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    return SessionStore(timeout_minutes=30, session_factory=sessionmaker(bind=engine))
+
+
+class TestSessionStore:
+    """Test unified per-user sessions"""
+    
+    def test_single_session_shared_with_memory(self, session_store):
+        manager = MemoryManager(session_store=session_store)
+        manager.add_user_message(42, "Hello")
+        
+        session = session_store.get(42)
+        assert session is manager.get_context(42)
+        assert len(session.messages) == 1
+        assert session.workflow_state == WorkflowState.IDLE
+    
+    def test_workflow_survives_restart(self, session_store):
+        session = session_store.get(7)
+        session.workflow_state = WorkflowState.PROJECT_GOAL
+        session.workflow_data["project_name"] = "demo"
+        session_store.persist(session)
+        
+        restarted = SessionStore(session_factory=session_store._session_factory)
+        restored = restarted.get(7)
+        assert restored.workflow_state == WorkflowState.PROJECT_GOAL
+        assert restored.workflow_data == {"project_name": "demo"}
+    
+    def test_idle_persist_removes_row(self, session_store):
+        session = session_store.get(8)
+        session.workflow_state = WorkflowState.HELP_CATEGORY
+        session_store.persist(session)
+        session.reset_workflow()
+        session_store.persist(session)
+        
+        restarted = SessionStore(session_factory=session_store._session_factory)
+        assert restarted.get(8).workflow_state == WorkflowState.IDLE
+    
+    def test_expiry_resets_everything(self, session_store):
+        from datetime import datetime, timedelta
+        
+        session = session_store.get(9)
+        session.add_message("user", "old")
+        session.workflow_state = WorkflowState.SOCIAL_CONTENT
+        session.last_activity = datetime.now() - timedelta(minutes=31)
+        
+        session = session_store.get(9)
+        assert len(session.messages) == 0
+        assert session.workflow_state == WorkflowState.IDLE
+        
+        session.last_activity = datetime.now() - timedelta(minutes=61)
+        assert session_store.cleanup_expired() == 1
+        assert 9 not in session_store
+
+    @pytest.mark.asyncio
+    async def test_async_lookup_and_reset(self, session_store):
+        from datetime import datetime, timedelta
+
+        session = await session_store.get_async(10)
+        session.workflow_state = WorkflowState.PROJECT_TECH
+        session_store.persist(session)
+
+        restarted = SessionStore(session_factory=session_store._session_factory)
+        first, second = await asyncio.gather(restarted.get_async(10), restarted.get_async(10))
+        assert first is second and first.workflow_state == WorkflowState.PROJECT_TECH
+
+        first.last_activity = datetime.now() - timedelta(minutes=31)
+        assert (await restarted.get_async(10)).workflow_state == WorkflowState.IDLE
+        assert not first.persisted
+
+        first.workflow_state = WorkflowState.LEARN_INPUT
+        restarted.persist(first)
+        await restarted.reset_async(10)
+        fresh = SessionStore(session_factory=session_store._session_factory)
+        assert (await fresh.get_async(10)).workflow_state == WorkflowState.IDLE
+
+
 class TestAnalytics:
     """Test analytics tracking"""
     
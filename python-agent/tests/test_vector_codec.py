@@ -0,0 +1,146 @@
+"""
+Tests for binary VectorMemory embeddings: packing, bulk loading for a build,
+and the Alembic migration from JSON lists
+"""
+
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.db.vector_codec import decode_matrix, decode_vector, encode_vector, load_build_vectors
+from app.models.database import Base, Build, User, VectorMemory
+
+ROOT = Path(__file__).parent.parent
+
+
+@pytest.fixture
+def vector():
+    return np.random.default_rng(7).standard_normal(768).astype(np.float32)
+
+
+class TestCodec:
+    """Test packing and unpacking of single vectors"""
+
+    def test_float32_is_exact_and_zero_copy(self, vector):
+        blob, dim, scale = encode_vector(vector)
+        assert len(blob) == 768 * 4 and dim == 768 and scale is None
+
+        decoded = decode_vector(blob)
+        assert np.array_equal(decoded, vector)
+        assert decoded.base is blob and not decoded.flags.writeable
+
+    def test_float16_halves_size(self, vector):
+        blob, _, _ = encode_vector(vector, "float16")
+        assert len(blob) == 768 * 2
+        assert np.allclose(decode_vector(blob, "float16"), vector, atol=1e-2)
+
+    def test_int8_quantization(self, vector):
+        blob, _, scale = encode_vector(vector, "int8")
+        assert len(blob) == 768
+        decoded = decode_vector(blob, "int8", scale)
+        assert decoded.dtype == np.float32
+        assert np.abs(decoded - vector).max() <= scale / 2 + 1e-6
+
+    def test_unknown_dtype(self, vector):
+        with pytest.raises(ValueError):
+            encode_vector(vector, "float64")
+
+    def test_matrix_of_mixed_dtypes(self, vector):
+        rows = [vector, vector * 2, -vector]
+        packed = [encode_vector(v, d) for v, d in zip(rows, ("float32", "float16", "int8"))]
+        matrix = decode_matrix([p[0] for p in packed], ["float32", "float16", "int8"], [p[2] for p in packed], 768)
+        assert matrix.shape == (3, 768) and matrix.dtype == np.float32
+        assert np.array_equal(matrix[0], vector)
+        assert np.allclose(matrix[1], vector * 2, atol=2e-2)
+        assert np.allclose(matrix[2], -vector, atol=packed[2][2])
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+class TestVectorMemory:
+    """Test the model columns and bulk loading"""
+
+    def test_list_assignment_packs_float32(self, db, vector):
+        db.add(VectorMemory(id="m1", content="x", content_type="code", embedding=vector.tolist()))
+        db.commit()
+        db.expire_all()
+
+        row = db.get(VectorMemory, "m1")
+        assert isinstance(row.embedding, bytes)
+        assert row.embedding_dtype == "float32" and row.embedding_dim == 768
+        assert np.array_equal(row.vector, vector)
+
+    def test_load_build_vectors(self, db, vector):
+        user = User(username="u", email="u@test.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        build = Build(id=str(uuid.uuid4()), user_id=user.id, project_name="p", requirements="r")
+        db.add(build)
+        for i, dtype in enumerate(("float32", "int8", "float16")):
+            memory = VectorMemory(id=f"m{i}", build_id=build.id, content=str(i),
+                                  content_type="test" if i == 2 else "code")
+            memory.set_vector(vector * (i + 1), dtype)
+            db.add(memory)
+        db.commit()
+
+        ids, matrix = load_build_vectors(db, build.id)
+        assert ids == ["m0", "m1", "m2"] and matrix.shape == (3, 768)
+        assert np.allclose(matrix[1], vector * 2, atol=0.05)
+
+        ids, matrix = load_build_vectors(db, build.id, content_types=["code"])
+        assert ids == ["m0", "m1"]
+        assert load_build_vectors(db, "missing")[1].shape == (0, 0)
+
+
+class TestMigration:
+    """Test converting a JSON-embedding table and back"""
+
+    def test_upgrade_and_downgrade(self, tmp_path):
+        pytest.importorskip("alembic")
+        from alembic import command
+        from alembic.config import Config
+
+        url = f"sqlite:///{tmp_path / 'legacy.db'}"
+        engine = create_engine(url)
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE vector_memory (id VARCHAR(36) PRIMARY KEY, build_id VARCHAR(36), "
+                "content TEXT NOT NULL, content_type VARCHAR(50) NOT NULL, source_file VARCHAR(255), "
+                "language VARCHAR(50), embedding JSON NOT NULL, created_at DATETIME NOT NULL)"
+            ))
+            for i in range(1203):  # several batches
+                conn.execute(
+                    text("INSERT INTO vector_memory VALUES (:id, NULL, 'c', 'code', NULL, NULL, :e, '2026-01-01')"),
+                    {"id": f"row{i:05d}", "e": f"[{i}.5, -1.25, 0.0]"},
+                )
+
+        config = Config(str(ROOT / "alembic.ini"))
+        config.set_main_option("script_location", str(ROOT / "alembic"))
+        config.set_main_option("sqlalchemy.url", url)
+        config.attributes["configure_logger"] = False
+        command.upgrade(config, "head")
+
+        session = sessionmaker(bind=engine)()
+        row = session.get(VectorMemory, "row01202")
+        assert row.embedding_dim == 3 and row.embedding_dtype == "float32"
+        assert row.vector.tolist() == [1202.5, -1.25, 0.0]
+        assert session.query(VectorMemory).count() == 1203
+        session.close()
+
+        command.downgrade(config, "base")
+        with engine.connect() as conn:
+            restored = conn.execute(text("SELECT embedding FROM vector_memory WHERE id = 'row00007'")).scalar()
+        assert restored.replace(" ", "") == "[7.5,-1.25,0.0]"
+        engine.dispose()
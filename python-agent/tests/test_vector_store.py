@@ -0,0 +1,232 @@
+"""
+Tests for the async vector store facade: dedicated threads, timeouts,
+write batching and metrics
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.db.vector import VectorStore
+from app.monitoring.metrics import get_metrics
+
+
+class FakeCollection:
+    """Chroma collection stand-in that blocks like the real client"""
+
+    def __init__(self, name, delay):
+        self.name = name
+        self.delay = delay
+        self.calls = []
+
+    def _record(self, op, **kwargs):
+        self.calls.append((op, threading.current_thread().name, kwargs))
+        time.sleep(self.delay)
+
+    def add(self, ids, documents, metadatas, embeddings=None):
+        self._record("add", ids=ids)
+
+    def upsert(self, ids, documents, metadatas, embeddings=None):
+        self._record("upsert", ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+    def delete(self, where):
+        self._record("delete", where=where)
+
+    def query(self, query_embeddings, n_results, where=None):
+        self._record("query")
+        return {"ids": [["a"]], "documents": [["code"]], "distances": [[0.1]], "metadatas": [[{}]]}
+
+    def get(self, where=None, include=None):
+        self._record("get")
+        return {"ids": [], "documents": [], "metadatas": []}
+
+
+class FakeClient:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.collections = {}
+
+    def get_or_create_collection(self, name, metadata=None, embedding_function=None):
+        return self.collections.setdefault(name, FakeCollection(name, self.delay))
+
+
+def fake_embed(texts):
+    time.sleep(0.01)
+    return [[float(len(t)), 1.0] for t in texts]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "data_dir", str(tmp_path))
+    vector_store = VectorStore(client=FakeClient(), embedding_function=fake_embed)
+    yield vector_store
+    vector_store.executor.shutdown()
+
+
+class TestVectorStoreFacade:
+    """Test that Chroma calls leave the event loop free"""
+
+    @pytest.mark.asyncio
+    async def test_query_runs_off_loop(self, store):
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        results = await store.search_similar_code("parse json", n_results=1)
+        ticking.cancel()
+
+        assert results[0]["code"] == "code"
+        assert ticks >= 5  # loop kept running during the 50 ms call
+        assert store.code_collection.calls[0][1].startswith("chroma")
+
+    @pytest.mark.asyncio
+    async def test_query_timeout(self, store):
+        store.query_timeout = 0.01
+        with pytest.raises(asyncio.TimeoutError):
+            await store.search_documentation("anything")
+
+    @pytest.mark.asyncio
+    async def test_queue_and_execute_time_recorded(self, store):
+        histogram = get_metrics().vector_search_duration_seconds
+        queued = histogram.labels(collection="code_snippets", operation="query", phase="queue")
+        before = queued._sum.get(), sum(b.get() for b in queued._buckets)
+
+        await asyncio.gather(*(store.search_similar_code(f"q{i}") for i in range(8)))
+
+        assert sum(b.get() for b in queued._buckets) == before[1] + 8
+        # 8 calls on 4 threads: some of them had to wait for a free thread
+        assert queued._sum.get() - before[0] > 0.03
+
+
+class TestWriteBatching:
+    """Test coalescing of add/delete bursts"""
+
+    @pytest.mark.asyncio
+    async def test_burst_of_adds_is_batched(self, store):
+        ids = await asyncio.gather(*(
+            store.add_code_snippet(f"print({i})", "b1", f"f{i}.py", "python") for i in range(50)
+        ))
+
+        adds = [c for c in store.code_collection.calls if c[0] == "add"]
+        assert len(adds) <= 2
+        assert sorted(i for c in adds for i in c[2]["ids"]) == sorted(ids)
+
+    @pytest.mark.asyncio
+    async def test_order_preserved_and_deletes_merged(self, store):
+        writer = store._writers["code_snippets"]
+        await asyncio.gather(
+            writer.add(["b1_a.py"], ["a"], [{}]),
+            writer.delete_build("b1"),
+            writer.delete_build("b2"),
+            writer.add(["b3_c.py"], ["c"], [{}]),
+        )
+
+        ops = [(op, kw) for op, _, kw in store.code_collection.calls]
+        assert [op for op, _ in ops] == ["add", "delete", "add"]
+        assert ops[1][1]["where"] == {"build_id": {"$in": ["b1", "b2"]}}
+
+    @pytest.mark.asyncio
+    async def test_add_failure_reaches_every_caller(self, store):
+        def broken_add(**kwargs):
+            raise RuntimeError("disk full")
+
+        store.code_collection.add = broken_add
+        results = await asyncio.gather(
+            store.add_code_snippet("a", "b1", "a.py", "python"),
+            store.add_code_snippet("b", "b1", "b.py", "python"),
+            return_exceptions=True,
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    @pytest.mark.asyncio
+    async def test_repeated_ids_in_a_batch_keep_the_first(self, store):
+        writer = store._writers["code_snippets"]
+        await asyncio.gather(
+            writer.add(["b1_a.py"], ["first"], [{}]),
+            writer.add(["b1_a.py"], ["second"], [{}]),
+            writer.add(["b1_b.py"], ["b"], [{}]),
+        )
+
+        adds = [kw for op, _, kw in store.code_collection.calls if op == "add"]
+        assert [kw["ids"] for kw in adds] == [["b1_a.py", "b1_b.py"]]
+
+    @pytest.mark.asyncio
+    async def test_bad_write_fails_only_its_caller(self, store):
+        add = store.code_collection.add
+
+        def picky_add(ids, documents, metadatas, embeddings=None):
+            if "bad" in documents:
+                raise ValueError("rejected")
+            add(ids, documents, metadatas, embeddings)
+
+        store.code_collection.add = picky_add
+        writer = store._writers["code_snippets"]
+        results = await asyncio.gather(
+            writer.add(["b1_a.py"], ["a"], [{}]),
+            writer.add(["b1_x.py"], ["bad"], [{}]),
+            writer.add(["b1_c.py"], ["c"], [{}]),
+            return_exceptions=True,
+        )
+
+        assert results[0] is None and results[2] is None
+        assert isinstance(results[1], ValueError)
+        added = [i for op, _, kw in store.code_collection.calls if op == "add" for i in kw["ids"]]
+        assert sorted(added) == ["b1_a.py", "b1_c.py"]
+
+
+class TestBulkIngestion:
+    """Test chunked ingestion of whole workspaces"""
+
+    @pytest.mark.asyncio
+    async def test_files_chunked_and_upserted_in_few_calls(self, store, monkeypatch):
+        monkeypatch.setattr(settings, "vector_upsert_batch_size", 100)
+        files = [
+            {"file_path": f"pkg/m{i}.py", "code": "import os\n\n\ndef a():\n    pass\n\n\nclass B:\n    x = 1\n"}
+            for i in range(60)
+        ] + [{"file_path": "web/app.js", "code": "const x = 1;\n"}]
+
+        result = await store.add_code_snippets_bulk(files, "b1")
+
+        assert result["files"] == 61
+        assert result["chunks"] == 60 * 3 + 1
+        calls = store.code_collection.calls
+        assert [op for op, _, _ in calls] == ["delete", "upsert", "upsert"]
+        assert calls[0][2]["where"]["$and"][0] == {"build_id": {"$eq": "b1"}}
+        upserted = [m for _, _, kw in calls[1:] for m in kw["metadatas"]]
+        assert {m["chunk_kind"] for m in upserted} == {"module", "function", "class", "window"}
+        func = next(m for m in upserted if m["symbol"] == "a")
+        assert (func["start_line"], func["end_line"], func["language"]) == (4, 5, "python")
+        assert "pkg/m0.py#L4-5" in result["ids"][1]
+        assert all(kw["embeddings"] and len(kw["embeddings"]) == len(kw["ids"]) for _, _, kw in calls[1:])
+
+    @pytest.mark.asyncio
+    async def test_repeated_path_indexed_from_last_entry(self, store):
+        files = [
+            {"file_path": "a.py", "code": "x = 1\n"},
+            {"file_path": "b.py", "code": "y = 1\n"},
+            {"file_path": "a.py", "code": "x = 2\n"},
+        ]
+        result = await store.add_code_snippets_bulk(files, "b1")
+
+        assert result["files"] == 2
+        upserted = [kw for op, _, kw in store.code_collection.calls if op == "upsert"]
+        assert len(set(result["ids"])) == len(result["ids"]) == 2
+        documents = [d for kw in upserted for d in kw["documents"]]
+        assert any("x = 2" in d for d in documents) and not any("x = 1" in d for d in documents)
+
+    @pytest.mark.asyncio
+    async def test_pending_single_adds_written_first(self, store):
+        single = asyncio.create_task(store.add_code_snippet("x = 1", "b1", "old.py", "python"))
+        await asyncio.sleep(0)
+        await store.add_code_snippets_bulk([{"file_path": "old.py", "code": "x = 2\n"}], "b1")
+        await single
+
+        assert [op for op, _, _ in store.code_collection.calls] == ["add", "delete", "upsert"]
@@ -0,0 +1,169 @@
+"""
+Tests for incremental workspace indexing: manifest diffing, chunk-level
+re-embedding, deletions, persistence and the polling watcher
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from app.db.workspace_indexer import WorkspaceIndexer
+from app.monitoring.metrics import get_metrics
+
+
+class FakeStore:
+    """Records vector writes in a dict keyed by chunk id"""
+
+    def __init__(self):
+        self.vectors = {}
+        self.embedded = []
+        self.fail = False
+
+    async def upsert_code_chunks(self, ids, documents, metadatas):
+        if self.fail:
+            raise RuntimeError("chroma down")
+        self.embedded.extend(ids)
+        for chunk_id, doc, meta in zip(ids, documents, metadatas):
+            self.vectors[chunk_id] = (doc, meta)
+
+    async def update_code_metadata(self, ids, metadatas):
+        for chunk_id, meta in zip(ids, metadatas):
+            self.vectors[chunk_id] = (self.vectors[chunk_id][0], meta)
+
+    async def delete_code_chunks(self, ids):
+        for chunk_id in ids:
+            del self.vectors[chunk_id]
+
+
+MODULE = '''import os
+
+
+def alpha():
+    return 1
+
+
+def beta():
+    return 2
+'''
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    before = path.stat().st_mtime_ns if path.exists() else 0
+    path.write_text(text)
+    # Coarse filesystem clocks: make sure the edit is visible in the mtime
+    os.utime(path, ns=(before + 10**9, before + 10**9))
+
+
+def symbols(store):
+    return sorted(meta["symbol"] for _, meta in store.vectors.values() if meta["symbol"])
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    root = tmp_path / "workspaces"
+    write(root / "proj" / "mod.py", MODULE)
+    write(root / "proj" / "web" / "app.js", "const x = 1;\n")
+    write(root / "proj" / "node_modules" / "dep.js", "ignored\n")
+    return root
+
+
+@pytest.fixture
+def indexer(workspace, tmp_path):
+    idx = WorkspaceIndexer(workspace, store=FakeStore(), manifest_path=tmp_path / "manifest.db")
+    yield idx
+    idx.manifest.close()
+
+
+class TestIncrementalSync:
+    """Test that only changed chunks are re-embedded"""
+
+    @pytest.mark.asyncio
+    async def test_initial_sync_then_noop(self, indexer):
+        first = await indexer.sync()
+        assert first["files"] == 2 and first["embedded"] == 4
+        assert symbols(indexer.store) == ["alpha", "beta"]
+        meta = next(m for _, m in indexer.store.vectors.values() if m["symbol"] == "alpha")
+        assert meta["build_id"] == "workspace:proj"
+        assert meta["file_path"] == "proj/mod.py"
+
+        again = await indexer.sync()
+        assert again["files"] == 0 and again["embedded"] == 0
+
+    @pytest.mark.asyncio
+    async def test_edit_embeds_only_changed_chunk(self, indexer, workspace):
+        await indexer.sync()
+        indexer.store.embedded.clear()
+
+        # One function changes, a blank-line shift moves the other
+        write(workspace / "proj" / "mod.py", MODULE.replace("return 1", "return 10\n\n"))
+        result = await indexer.sync([workspace / "proj" / "mod.py"])
+
+        assert result["embedded"] == 1 and result["deleted"] == 1
+        assert result["moved"] == 1
+        assert [indexer.store.vectors[i][0] for i in indexer.store.embedded] == ["def alpha():\n    return 10"]
+        beta = next(m for _, m in indexer.store.vectors.values() if m["symbol"] == "beta")
+        assert beta["start_line"] == 10
+
+    @pytest.mark.asyncio
+    async def test_touch_without_change_writes_nothing(self, indexer, workspace):
+        await indexer.sync()
+        write(workspace / "proj" / "mod.py", MODULE)
+
+        result = await indexer.sync()
+        assert result["files"] == 1
+        assert result["embedded"] == result["moved"] == result["deleted"] == 0
+
+    @pytest.mark.asyncio
+    async def test_removed_file_and_directory(self, indexer, workspace):
+        await indexer.sync()
+        (workspace / "proj" / "web" / "app.js").unlink()
+        (workspace / "proj" / "web").rmdir()
+
+        result = await indexer.sync([workspace / "proj" / "web"])
+        assert result["removed"] == 1 and result["deleted"] == 1
+        assert all(m["file_path"] == "proj/mod.py" for _, m in indexer.store.vectors.values())
+
+    @pytest.mark.asyncio
+    async def test_manifest_survives_restart(self, indexer, workspace, tmp_path):
+        await indexer.sync()
+        indexer.manifest.close()
+
+        restarted = WorkspaceIndexer(workspace, store=FakeStore(), manifest_path=tmp_path / "manifest.db")
+        result = await restarted.sync()
+        restarted.manifest.close()
+        assert result["files"] == 0 and restarted.store.embedded == []
+
+    @pytest.mark.asyncio
+    async def test_failed_write_is_retried(self, indexer, workspace):
+        indexer.store.fail = True
+        with pytest.raises(RuntimeError):
+            await indexer.sync()
+        assert indexer.manifest.files == {}
+
+        indexer.store.fail = False
+        assert (await indexer.sync([workspace / "proj" / "web"]))["files"] == 2  # rescans everything
+
+
+class TestWatcher:
+    """Test the polling watcher and the freshness metric"""
+
+    @pytest.mark.asyncio
+    async def test_polling_picks_up_edit(self, indexer, workspace):
+        freshness = get_metrics().workspace_index_freshness_seconds
+        before = sum(b.get() for b in freshness._buckets)
+        indexer.poll_interval = 0.02
+        indexer.use_inotify = False
+        await indexer.start()
+        await asyncio.sleep(0.1)
+
+        (workspace / "proj" / "new.py").write_text("def gamma():\n    return 3\n")
+        for _ in range(100):
+            await asyncio.sleep(0.02)
+            if "gamma" in symbols(indexer.store):
+                break
+        await indexer.stop()
+
+        assert "gamma" in symbols(indexer.store)
+        assert sum(b.get() for b in freshness._buckets) >= before + 3
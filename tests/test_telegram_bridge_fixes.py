@@ -139,6 +139,24 @@ class TestTelegramBridge:
             assert "Error" in result["text"]
             assert result["keyboard"] is None
     
+    @pytest.mark.asyncio
+    async def test_skill_output_is_escaped(self):
+        """Skill and model replies are Markdown, so stray <, > and & are escaped"""
+        from app.integrations.agent_handler import reply_format
+
+        assert reply_format("python-web-api") == "markdown" and reply_format("ai_chat") == "markdown"
+        assert reply_format("menu_nav") == "html" and reply_format("workflow_project_name") == "html"
+
+        with patch('app.integrations.telegram_bridge.get_agent_handler') as mock_handler:
+            mock_handler_instance = AsyncMock()
+            mock_handler.return_value = mock_handler_instance
+            mock_handler_instance.process_message.return_value = {
+                "text": "Use List<String> when a && b", "format": reply_format("python-web-api"),
+            }
+
+            result = await TelegramAgentBridge().process_telegram_message(user_id=12345, message="Hi")
+            assert "List&lt;String&gt;" in result["text"] and "a &amp;&amp; b" in result["text"]
+    
     def test_has_html_tags(self):
         """Test HTML tag detection"""
         bridge = TelegramAgentBridge()
@@ -149,18 +167,19 @@ class TestTelegramBridge:
         assert bridge._has_html_tags("Line with <i>italic</i> text") is True
     
     def test_format_plain_text(self):
-        """Test plain text formatting"""
+        """Test Markdown rendering of model output"""
         bridge = TelegramAgentBridge()
         
-        # Short first line should be bolded
-        text = "Short header\nSome content"
+        text = "# Header\nUse **care** with `a < b` & friends"
         result = bridge._format_plain_text(text)
-        assert "<b>Short header</b>" in result
+        assert "<b>Header</b>" in result
+        assert "<b>care</b>" in result
+        assert "<code>a &lt; b</code>" in result
+        assert "&amp; friends" in result
         
-        # Long first line should not be bolded
-        text = "This is a very long line that exceeds the character limit and should not be bolded\nContent"
-        result = bridge._format_plain_text(text)
-        assert "<b>" not in result.split("\n")[0]
+        # Code fences become a closed pre block
+        result = bridge._format_plain_text("```python\nx = 1\n```")
+        assert result == '<pre><code class="language-python">x = 1</code></pre>'
     
     def test_build_keyboard(self):
         """Test keyboard building"""